@@ -12,7 +12,13 @@ from core.config import load_settings
 from core.db import init_db
 from core.logger import setup_logging
 from services.database import get_db_service
+from services import queue as task_queue
 from services.queue import get_queue_manager
+from services.report.ofdata_async_client import close_async_ofdata_client
+from services.export.docx_exporter import close_docx_executor
+from services.export.gamma_async_client import close_gamma_client
+from services.cache import close_cache_service, get_cache_service
+from services.report.reference_data import get_reference_data
 from bot.middlewares.throttling import ThrottlingMiddleware
 from bot.middlewares.errors import ErrorsMiddleware
 
@@ -24,7 +30,7 @@ if sys.platform == "win32":
 from bot.handlers.start import router as start_router
 from bot.handlers.menu import router as menu_router
 from bot.handlers.search import router as search_router
-from bot.handlers.company import router as company_router
+from bot.handlers.company import register_gamma_delivery, router as company_router
 from bot.handlers.report import router as report_router
 from bot.handlers.check import router as check_router
 from bot.handlers.stats import router as stats_router
@@ -64,11 +70,12 @@ async def main():
         )
         # Initialize legacy SQLite database for backward compatibility
         await init_db(settings.SQLITE_PATH)
+        get_cache_service().start_sweeper()
+        # Справочники отчёта строятся один раз до первого запроса
+        get_reference_data().preload()
         # Initialize new database service (PostgreSQL or SQLite)
         db_service = await get_db_service()
-        # Initialize queue manager
-        queue_manager = await get_queue_manager()
-        log.info("Database and queue manager initialized successfully")
+        log.info("Database initialized successfully")
     except Exception as e:
         log.error("Failed to initialize database", error=str(e))
         raise
@@ -84,6 +91,15 @@ async def main():
         log.error("Failed to create bot instance", error=str(e))
         raise
 
+    try:
+        # Delivery handlers go first: tasks recovered on start may finish right away
+        register_gamma_delivery(task_queue.queue_manager, bot)
+        queue_manager = await get_queue_manager()
+        log.info("Queue manager initialized successfully")
+    except Exception as e:
+        log.error("Failed to initialize queue manager", error=str(e))
+        raise
+
     try:
         log.info("Creating dispatcher")
         dp = Dispatcher()
@@ -154,6 +170,30 @@ async def main():
             except Exception as e:
                 log.error("Failed to stop queue manager", error=str(e))
 
+        try:
+            await close_async_ofdata_client()
+            log.info("OFData client closed")
+        except Exception as e:
+            log.error("Failed to close OFData client", error=str(e))
+
+        try:
+            await close_gamma_client()
+            log.info("Gamma client closed")
+        except Exception as e:
+            log.error("Failed to close Gamma client", error=str(e))
+
+        try:
+            await close_docx_executor()
+            log.info("DOCX export pool closed")
+        except Exception as e:
+            log.error("Failed to close DOCX export pool", error=str(e))
+
+        try:
+            await close_cache_service()
+            log.info("Cache closed")
+        except Exception as e:
+            log.error("Failed to close cache", error=str(e))
+
         if db_service:
             try:
                 await db_service.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Отправка файлов пользователю
+
+Файлы отправляются потоком с диска (FSInputFile), а не читаются целиком в
+память. После первой загрузки Telegram возвращает file_id; он сохраняется в
+кэше по хэшу содержимого и имени файла, и тот же документ дальше
+отправляется по file_id — без повторной загрузки. Документы, собираемые в
+памяти (DOCX-приложение), отправляются через send_generated: если file_id
+уже известен, документ даже не собирается.
+
+Вместо сообщения можно передать ChatTarget — чат, известный только по id
+(например, доставка результата задачи очереди после рестарта).
+"""
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, InputFile, Message
+
+from core.logger import get_logger
+from services.cache import get_cache_service
+from settings import TELEGRAM_FILE_ID_TTL_H
+
+log = get_logger(__name__)
+
+HASH_CHUNK = 1024 * 1024
+
+
+class ChatTarget:
+    """Чат по id с теми же answer/answer_document, что у Message"""
+
+    def __init__(self, bot: Bot, chat_id: int):
+        self.bot = bot
+        self.chat_id = chat_id
+
+    async def answer(self, text: str, **kwargs) -> Message:
+        return await self.bot.send_message(self.chat_id, text, **kwargs)
+
+    async def answer_document(self, document, **kwargs) -> Message:
+        return await self.bot.send_document(self.chat_id, document, **kwargs)
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 файла, читаемого блоками"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_id_key(content_key: str, filename: str) -> str:
+    # Имя файла — часть ключа: при отправке по file_id Telegram показывает исходное имя
+    name_hash = hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+    return f"tg_file:{content_key}:{name_hash}"
+
+
+async def send_document(
+    message: Union[Message, ChatTarget],
+    path: str,
+    *,
+    filename: Optional[str] = None,
+    caption: Optional[str] = None,
+    content_key: Optional[str] = None,
+    **kwargs,
+) -> Message:
+    """
+    Отправляет документ в чат сообщения, по возможности по сохранённому file_id
+
+    Args:
+        message: Сообщение (или ChatTarget), в чат которого отправляется документ
+        path: Путь к файлу
+        filename: Имя файла у пользователя (по умолчанию — имя на диске)
+        caption: Подпись
+        content_key: Хэш содержимого, если он уже известен или файл
+            недетерминирован (например, DOCX хранит время создания)
+    """
+    filename = filename or Path(path).name
+    if content_key is None:
+        content_key = await asyncio.to_thread(file_digest, path)
+
+    async def upload() -> InputFile:
+        return FSInputFile(path, filename=filename)
+
+    return await _send(message, upload, filename, content_key, caption, **kwargs)
+
+
+async def send_generated(
+    message: Union[Message, ChatTarget],
+    build: Callable[[], Awaitable[bytes]],
+    *,
+    filename: str,
+    content_key: str,
+    caption: Optional[str] = None,
+    **kwargs,
+) -> Message:
+    """
+    Отправляет документ, собираемый в памяти; build() вызывается, только если
+    сохранённого file_id нет
+
+    Args:
+        build: Корутина-фабрика, возвращающая содержимое файла
+        content_key: Ключ содержимого, известный до сборки (например, text_key)
+    """
+    async def upload() -> InputFile:
+        return BufferedInputFile(await build(), filename=filename)
+
+    return await _send(message, upload, filename, content_key, caption, **kwargs)
+
+
+async def _send(message: Union[Message, ChatTarget], upload: Callable[[], Awaitable[InputFile]], filename: str,
+                content_key: str, caption: Optional[str], **kwargs) -> Message:
+    key = _file_id_key(content_key, filename)
+    cache = get_cache_service()
+
+    try:
+        file_id = await cache.get(key)
+    except Exception as e:
+        log.warning("delivery: file_id lookup failed", error=str(e))
+        file_id = None
+    if file_id:
+        try:
+            sent = await message.answer_document(file_id, caption=caption, **kwargs)
+            log.debug("delivery: sent by file_id", filename=filename)
+            return sent
+        except TelegramBadRequest as e:
+            # file_id больше не действителен (например, сменился токен бота) — загружаем заново
+            log.warning("delivery: stale file_id, uploading", filename=filename, error=str(e))
+            await cache.delete(key)
+
+    sent = await message.answer_document(await upload(), caption=caption, **kwargs)
+    document = getattr(sent, "document", None)
+    if document is not None:
+        try:
+            await cache.set(key, document.file_id, ttl_hours=TELEGRAM_FILE_ID_TTL_H)
+        except Exception as e:
+            log.warning("delivery: file_id store failed", error=str(e))
+    log.debug("delivery: uploaded", filename=filename)
+    return sent
+
+
+def text_key(text: str, kind: str) -> str:
+    """content_key для файла, который целиком определяется текстом (например, DOCX отчёта)"""
+    return hashlib.sha256(f"{kind}\n{text}".encode("utf-8")).hexdigest()
@@ -3,23 +3,26 @@
 Обработчики для работы с компаниями (исправленная версия)
 """
 import json
-import tempfile
 from typing import Optional
 import asyncio
-import os
-from pathlib import Path
+import time
 import inspect
 
-from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
+from aiogram import Bot, Router, F
+from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.types import FSInputFile
 
+from bot.delivery import ChatTarget, send_document, send_generated, text_key
 from bot.states import SearchState, ReportState, FeedbackState
 from bot.keyboards.main import choose_report_kb, report_menu_kb, choose_format_kb
-from services.aggregator import fetch_company_report_markdown, fetch_company_profile
+from services.aggregator import fetch_company_report, fetch_company_report_markdown, fetch_company_profile
 from core.logger import get_logger
-from settings import FEEDBACK_CHAT_ID
+from services.export.docx_exporter import export_docx
+from services.export.gamma_async_client import get_gamma_client
+from services.queue import QueueManager, QuotaExceededError, TaskPriority, TaskStatus, TaskType, get_queue_manager
+from services.report.ir import Report
+from settings import FEEDBACK_CHAT_ID, GAMMA_DAILY_LIMIT
 from settings_texts import (
     REPORT_WAIT_HINT, GAMMA_PROGRESS_HINTS, TEXT_CHOOSE_FORMAT, TEXT_CHOOSE_FORMAT_HINT,
     TEXT_FORMAT_PDF_SELECTED, TEXT_FORMAT_PPTX_SELECTED, TEXT_CHAT_ID_ERROR,
@@ -30,7 +33,8 @@ from settings_texts import (
     TEXT_PDF_STATUS_SUCCESS, TEXT_PDF_STATUS_ERROR_FINAL, TEXT_FEEDBACK_PROMPT,
     TEXT_REPORT_PAID_ORDER_MISSING, TEXT_REPORT_NO_QUERY, TEXT_REPORT_COMPANY_NOT_FOUND,
     TEXT_REPORT_SUCCESS_DOCX_ONLY, TEXT_REPORT_DOWNLOAD_WARNING, TEXT_FEEDBACK_EMPTY,
-    TEXT_FEEDBACK_SUCCESS, TEXT_FEEDBACK_FAILED, TEXT_FEEDBACK_TECH_ERROR, TEXT_FEEDBACK_ADMIN_CHAT_MISSING
+    TEXT_FEEDBACK_SUCCESS, TEXT_FEEDBACK_FAILED, TEXT_FEEDBACK_TECH_ERROR, TEXT_FEEDBACK_ADMIN_CHAT_MISSING,
+    TEXT_REPORT_QUEUED, TEXT_REPORT_GAMMA_LIMIT, TEXT_PDF_STATUS_LIMIT
 )
 
 # Создаём роутер
@@ -51,6 +55,10 @@ async def choose_format_pptx(cb: CallbackQuery, state: FSMContext):
 # Логгер
 log = get_logger(__name__)
 
+# Версия DOCX в ключе кэша file_id: поднимать при каждом изменении вывода build_docx,
+# иначе пользователям уйдут файлы, загруженные в Telegram до изменения
+DOCX_CONTENT_VERSION = "docx-v2"
+
 @router.message(F.text == "/id")
 async def show_chat_id(msg: Message):
     """Показывает chat_id текущего чата (личка/группа/канал)."""
@@ -124,7 +132,6 @@ async def generate_report(cb: CallbackQuery, state: FSMContext):
     status_msg = await cb.message.answer(
         "⏳ Пожалуйста, подождите — идёт сбор данных и формирование отчёта.\n\n" + REPORT_WAIT_HINT
     )
-    file_sent = False
     # Фоновый циклический апдейтер статуса на этапе сбора данных
     stop_cycle_event = asyncio.Event()
     async def _cycle_status_updates():
@@ -199,7 +206,8 @@ async def generate_report(cb: CallbackQuery, state: FSMContext):
         
         # Получаем отчёт компании через агрегатор
         log.info("fetch_report", query=query, user_id=cb.from_user.id)
-        response = await fetch_company_report_markdown(query)
+        report_ir = await fetch_company_report(query)
+        response = report_ir.text
         log.debug("report_ready", length=len(response) if response else 0)
         
         if not response or response.startswith("❌"):
@@ -218,251 +226,328 @@ async def generate_report(cb: CallbackQuery, state: FSMContext):
         # Основной формат отчёта по выбору пользователя (pdf|pptx). По умолчанию PDF
         data = await state.get_data()
         export_as = (data.get("gamma_export_as") or "pdf").lower()
-        main_file_path = None
-        main_file_sent = False
+        report = dict(
+            response=response,
+            ir=report_ir,
+            export_as=export_as,
+            company_name=company_name,
+            company_inn=company_inn,
+            order_id=order_id,
+        )
+        from settings import ENABLE_GAMMA_PDF
+        log.info("Gamma main: checking settings", ENABLE_GAMMA_PDF=ENABLE_GAMMA_PDF, user_id=cb.from_user.id)
+        if ENABLE_GAMMA_PDF:
+            try:
+                # Генерация идёт в очереди; файлы отправит колбэк задачи, хендлер освобождается сразу
+                await _enqueue_gamma_report(cb, state, status_msg, stats, report)
+                return
+            except QuotaExceededError:
+                log.warning("Gamma main: daily limit reached", user_id=cb.from_user.id)
+                await cb.message.answer(TEXT_REPORT_GAMMA_LIMIT)
+        else:
+            log.info("Gamma main: disabled", user_id=cb.from_user.id)
+        await _deliver_report(cb, state, status_msg, stats, report, main_file_path=None)
+        
+    except Exception as e:
+        log.error("Error in generate_report", error=str(e), error_type=type(e).__name__, user_id=cb.from_user.id)
+        await _report_failed(cb, status_msg, order_id)
+
+
+async def _enqueue_gamma_report(cb: CallbackQuery, state: FSMContext, status_msg: Message, stats, report: dict):
+    """Ставит генерацию основного файла в очередь Gamma; по готовности отправляет файлы"""
+    from settings import GAMMA_THEME
+    export_as = report["export_as"]
+    log.info("gamma_main:start", user_id=cb.from_user.id, export_as=export_as)
+    start_time = time.time()
+
+    def update_progress(status, elapsed, timeout):
+        minutes = int(elapsed // 60)
+        seconds = int(elapsed % 60)
+        # Добавим вращающиеся подсказки
         try:
-            from settings import GAMMA_THEME
-            log.info("gamma_main:start", user_id=cb.from_user.id, export_as=export_as)
-            await status_msg.edit_text(
-                ("⏳ Пожалуйста, подождите — идёт формирование основного PDF-отчёта.\n\n" if export_as == "pdf" else
-                 "⏳ Пожалуйста, подождите — идёт формирование основной PPTX-презентации.\n\n") + REPORT_WAIT_HINT
-            )
+            hint = GAMMA_PROGRESS_HINTS[int(elapsed // 15) % len(GAMMA_PROGRESS_HINTS)]
+        except Exception:
+            hint = ""
+        extra = f"\n{hint}" if hint else ""
+        what = "основной PDF-отчёт" if export_as == "pdf" else "основную PPTX-презентацию"
+        progress_text = (
+            f"⏳ Формирую {what}...{extra}\n\nСтатус: {status}\nПрошло: {minutes}м {seconds}с"
+        )
+        try:
+            result = status_msg.edit_text(progress_text)
+            if inspect.isawaitable(result):
+                asyncio.create_task(result)
+        except Exception:
+            pass
+        try:
+            send_action = cb.bot.send_chat_action(cb.message.chat.id, "upload_document")
+            if inspect.isawaitable(send_action):
+                asyncio.create_task(send_action)
+        except Exception:
+            pass
+
+    async def on_done(task):
+        main_file_path = task.result if task.status == TaskStatus.COMPLETED else None
+        log.info("gamma_main:done", user_id=cb.from_user.id, duration=time.time() - start_time,
+                 path=main_file_path, status=task.status.value, error=task.error)
+        # Если основной файл не сформировался, уведомим пользователя до отправки DOCX
+        if not main_file_path:
             try:
-                await cb.bot.send_chat_action(cb.message.chat.id, "upload_document")
+                await cb.message.answer(TEXT_REPORT_PDF_FALLBACK)
             except Exception:
                 pass
-            import time
-            start_time = time.time()
-
-            def update_progress(status, elapsed, timeout):
-                minutes = int(elapsed // 60)
-                seconds = int(elapsed % 60)
-                # Добавим вращающиеся подсказки
-                try:
-                    hint = GAMMA_PROGRESS_HINTS[int(elapsed // 15) % len(GAMMA_PROGRESS_HINTS)]
-                except Exception:
-                    hint = ""
-                extra = f"\n{hint}" if hint else ""
-                progress_text = (
-                    f"⏳ Формирую основной PDF-отчёт...{extra}\n\nСтатус: {status}\nПрошло: {minutes}м {seconds}с"
-                )
-                try:
-                    result = status_msg.edit_text(progress_text)
-                    if inspect.isawaitable(result):
-                        asyncio.create_task(result)
-                except Exception:
-                    pass
-                try:
-                    send_action = cb.bot.send_chat_action(cb.message.chat.id, "upload_document")
-                    if inspect.isawaitable(send_action):
-                        asyncio.create_task(send_action)
-                except Exception:
-                    pass
-
-            from settings import ENABLE_GAMMA_PDF
-            log.info("Gamma main: checking settings", ENABLE_GAMMA_PDF=ENABLE_GAMMA_PDF, user_id=cb.from_user.id)
-            main_file_path = None
-            if ENABLE_GAMMA_PDF:
-                log.info("Gamma main: starting generation", user_id=cb.from_user.id, export_as=export_as)
-                try:
-                    if export_as == "pptx":
-                        from services.export.gamma_exporter import generate_pptx_from_report_text
-                        main_file_path = generate_pptx_from_report_text(
-                            response,
-                            language="ru",
-                            theme_name=GAMMA_THEME or None,
-                            progress_callback=update_progress,
-                            company_name=company_name,
-                            company_inn=company_inn,
-                        )
-                    else:
-                        from services.export.gamma_exporter import generate_pdf_from_report_text
-                        main_file_path = generate_pdf_from_report_text(
-                            response,
-                            language="ru",
-                            theme_name=GAMMA_THEME or None,
-                            progress_callback=update_progress,
-                            company_name=company_name,
-                            company_inn=company_inn,
-                        )
-                    log.info("Gamma main: generation completed", user_id=cb.from_user.id, path=main_file_path)
-                except Exception as e:
-                    log.error("Gamma main: generation failed", user_id=cb.from_user.id, error=str(e))
-                    main_file_path = None
-            else:
-                log.info("Gamma main: disabled", user_id=cb.from_user.id)
-            end_time = time.time()
-            log.info("gamma_main:done", user_id=cb.from_user.id, duration=end_time-start_time, path=main_file_path)
-            # Если основной файл не сформировался, уведомим пользователя до отправки DOCX
-            if ENABLE_GAMMA_PDF and not main_file_path:
-                try:
-                    await cb.message.answer(
-                        "⚠️ Не удалось автоматически сформировать основной отчёт. Я отправлю приложение (DOCX)."
-                    )
-                except Exception:
-                    pass
-        except Exception as e:
-            log.warning("Gamma PDF failed", error=str(e), user_id=cb.from_user.id)
-
-        # Генерируем DOCX вместо TXT
-        log.info("docx:start", user_id=cb.from_user.id)
-        from docx import Document
-        from docx.shared import Pt
-        from docx.oxml.ns import qn
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-
-        doc = Document()
-        # Базовый стиль
-        style = doc.styles['Normal']
-        style.font.name = 'Calibri'
-        style._element.rPr.rFonts.set(qn('w:eastAsia'), 'Calibri')
-        style.font.size = Pt(11)
-
-        # Разбиваем отчёт по строкам и добавляем абзацы
-        for line in response.splitlines():
-            if line.strip() == '':
-                doc.add_paragraph('')
-                continue
-            # Заголовки секций (====) делаем жирными
-            if set(line.strip()) == {'='} and len(line.strip()) >= 10:
-                # Это разделитель — пропускаем, т.к. предыдущая строка уже заголовок
-                continue
-            p = doc.add_paragraph()
-            run = p.add_run(line)
-            # Если предыдущая строка была заглавными буквами/заголовком
-            if line.isupper() and len(line) < 60:
-                run.bold = True
-
-        # Сохраняем во временный файл
-        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp:
-            doc.save(tmp.name)
-            temp_path = tmp.name
-        log.debug("docx:saved", temp_path=temp_path)
-        
+        await _deliver_report(cb, state, status_msg, stats, report, main_file_path=main_file_path)
+
+    payload = {
+        "report_text": report["response"],
+        "language": "ru",
+        "theme_name": GAMMA_THEME or None,
+        "company_name": report["company_name"],
+        "company_inn": report["company_inn"],
+    }
+    # Отчёт с тем же текстом уже генерировался: отдаём готовый файл без очереди и лимита
+    cached = await get_gamma_client().cached(export_as=export_as, **payload)
+    if cached:
+        log.info("gamma_main:cache_hit", user_id=cb.from_user.id, path=cached)
+        await _deliver_report(cb, state, status_msg, stats, report, main_file_path=cached)
+        return
+
+    # Всё для доставки хранится в задаче: после рестарта колбэка в памяти уже нет
+    payload["delivery"] = dict(
+        chat_id=cb.message.chat.id,
+        user_id=cb.from_user.id,
+        status_message_id=status_msg.message_id,
+        order_id=report["order_id"],
+        export_as=export_as,
+        # IR нужен, чтобы DOCX после рестарта собрался тем же (с таблицами), что и без него
+        report_ir=report["ir"].to_dict() if report.get("ir") is not None else None,
+        **_report_files(export_as, report["company_name"], report["company_inn"]),
+    )
+    queue = await get_queue_manager()
+    task_id = await queue.add_task(
+        TaskType.GAMMA_PPTX if export_as == "pptx" else TaskType.GAMMA_PDF,
+        payload,
+        callback=on_done,
+        progress=update_progress,
+        priority=TaskPriority.PAID if report["order_id"] else TaskPriority.FREE,
+        user_id=cb.from_user.id,
+    )
+    position = await queue.get_queue_position(task_id)
+    text = TEXT_REPORT_PDF_FORMING if export_as == "pdf" else TEXT_REPORT_PPTX_FORMING
+    if position:
+        text += "\n\n" + TEXT_REPORT_QUEUED.format(
+            position=position["position"], minutes=max(1, round(position["eta_seconds"] / 60))
+        )
+    try:
+        await status_msg.edit_text(text + "\n\n" + REPORT_WAIT_HINT)
+    except Exception:
+        pass
+
+
+def _report_files(export_as: str, company_name, company_inn) -> dict:
+    """Подпись основного файла, имя и подпись DOCX-приложения"""
+    if company_name and company_inn:
+        from services.export.gamma_exporter import _safe_filename
+        safe_name = _safe_filename(company_name)
+        return dict(
+            main_caption=(
+                f"📄 {safe_name} (ИНН: {company_inn}) - Основной отчёт (PDF)"
+                if export_as == "pdf" else
+                f"📊 {safe_name} (ИНН: {company_inn}) - Основной отчёт (PPTX)"
+            ),
+            docx_filename=f"Приложение_{safe_name}_{company_inn}.docx",
+            docx_caption=f"📎 {safe_name} (ИНН: {company_inn}) - Приложение к отчёту (DOCX)",
+        )
+    return dict(
+        main_caption="📄 Основной отчёт (PDF)" if export_as == "pdf" else "📊 Основной отчёт (PPTX)",
+        docx_filename="company_report.docx",
+        docx_caption="📎 Приложение к отчёту (DOCX)",
+    )
+
+
+def _docx_source(response: str, report_ir: Optional[Report]):
+    """
+    Построитель DOCX-приложения и ключ его file_id
+
+    DOCX из IR (с таблицами) и DOCX из текста — разные файлы, поэтому и
+    ключи у них разные: иначе один вариант отправлялся бы вместо другого.
+    """
+    if report_ir is not None:
+        return lambda: export_docx(report_ir), text_key(response, DOCX_CONTENT_VERSION)
+    return lambda: export_docx(response), text_key(response, f"{DOCX_CONTENT_VERSION}-text")
+
+
+def register_gamma_delivery(queue: QueueManager, bot: Bot):
+    """Доставка отчётов Gamma, у задач которых нет колбэка в памяти (восстановлены после рестарта)"""
+    async def handler(task):
+        await _deliver_queued_report(bot, task)
+
+    for task_type in (TaskType.GAMMA_PDF, TaskType.GAMMA_PPTX):
+        queue.register_completion_handler(task_type, handler)
+
+
+async def _deliver_queued_report(bot: Bot, task):
+    """Отправляет файлы задачи Gamma по контексту доставки из её payload"""
+    delivery = task.payload.get("delivery") or {}
+    chat_id = delivery.get("chat_id")
+    if not chat_id:
+        log.warning("gamma_main:no_delivery_context", task_id=task.id)
+        return
+    chat = ChatTarget(bot, chat_id)
+    response = task.payload["report_text"]
+    report_ir = Report.from_dict(delivery["report_ir"]) if delivery.get("report_ir") else None
+    export_as = delivery.get("export_as") or "pdf"
+    main_file_path = task.result if task.status == TaskStatus.COMPLETED else None
+    log.info("gamma_main:deliver_recovered", task_id=task.id, user_id=delivery.get("user_id"),
+             path=main_file_path, status=task.status.value, error=task.error)
+    try:
+        if isinstance(main_file_path, str) and main_file_path.startswith("LINK:"):
+            link = main_file_path.split("LINK:", 1)[1]
+            await chat.answer(f"📎 {'PDF' if export_as=='pdf' else 'PPTX'}-версия доступна по ссылке: {link}")
+        elif main_file_path:
+            await send_document(chat, main_file_path, caption=delivery.get("main_caption"))
+        else:
+            await chat.answer(TEXT_REPORT_PDF_FALLBACK)
+        build, content_key = _docx_source(response, report_ir)
+        await send_generated(
+            chat,
+            build,
+            filename=delivery.get("docx_filename") or "company_report.docx",
+            caption=delivery.get("docx_caption"),
+            content_key=content_key,
+        )
+        from bot.keyboards.main import after_report_kb
+        await chat.answer(
+            "⚠️ Важно: обязательно скачайте файлы сейчас. Временные ссылки и кеш могут истечь, и повторная выдача потребует новой операции.\n\nВы можете оставить отзыв или вернуться в главное меню.",
+            reply_markup=after_report_kb()
+        )
+    except Exception as e:
+        log.error("gamma_main:deliver_recovered_failed", task_id=task.id, error=str(e))
+        await _refund_order(delivery.get("order_id"), delivery.get("user_id"))
+        try:
+            await chat.answer(REPORT_FAILED_TEXT, reply_markup=_report_failed_kb())
+        except Exception:
+            pass
+
+
+async def _deliver_report(cb: CallbackQuery, state: FSMContext, status_msg: Message, stats, report: dict,
+                          main_file_path: Optional[str]):
+    """Отправляет основной файл (или ссылку) и DOCX-приложение"""
+    response = report["response"]
+    export_as = report["export_as"]
+    company_name = report["company_name"]
+    company_inn = report["company_inn"]
+    main_file_sent = False
+    file_sent = False
+    try:
         # Отправляем файл пользователю
         log.info("send_files", user_id=cb.from_user.id)
-        with open(temp_path, 'rb') as file:
-            # Формируем название DOCX файла
-            if company_name and company_inn:
-                from services.export.gamma_exporter import _safe_filename
-                safe_name = _safe_filename(company_name)
-                docx_filename = f"Приложение_{safe_name}_{company_inn}.docx"
+        files = _report_files(export_as, company_name, company_inn)
+        
+        # Сначала отправляем основной файл (или ссылку), затем DOCX как приложение
+        if main_file_path:
+            if isinstance(main_file_path, str) and main_file_path.startswith("LINK:"):
+                link = main_file_path.split("LINK:", 1)[1]
+                await cb.message.answer(
+                    f"📎 {'PDF' if export_as=='pdf' else 'PPTX'}-версия доступна по ссылке: {link}"
+                )
             else:
-                docx_filename = "company_report.docx"
-            
-            document = BufferedInputFile(file.read(), filename=docx_filename)
-            
-            # Сначала отправляем основной файл (или ссылку), затем DOCX как приложение
-            if main_file_path:
-                if isinstance(main_file_path, str) and main_file_path.startswith("LINK:"):
-                    link = main_file_path.split("LINK:", 1)[1]
-                    await cb.message.answer(
-                        f"📎 {'PDF' if export_as=='pdf' else 'PPTX'}-версия доступна по ссылке: {link}"
-                    )
-                else:
-                    with open(main_file_path, 'rb') as fpdf:
-                        from aiogram.types import BufferedInputFile as BIF
-                        log.debug("send_main_file", path=main_file_path, user_id=cb.from_user.id)
-                        # Формируем caption
-                        pdf_caption = "📄 Основной отчёт (PDF)" if export_as == "pdf" else "📊 Основной отчёт (PPTX)"
-                        if company_name and company_inn:
-                            from services.export.gamma_exporter import _safe_filename
-                            safe_name = _safe_filename(company_name)
-                            pdf_caption = (
-                                f"📄 {safe_name} (ИНН: {company_inn}) - Основной отчёт (PDF)"
-                                if export_as == "pdf" else
-                                f"📊 {safe_name} (ИНН: {company_inn}) - Основной отчёт (PPTX)"
-                            )
-                        
-                        await cb.message.answer_document(
-                            BIF(fpdf.read(), filename=Path(main_file_path).name),
-                            caption=pdf_caption
-                        )
-                        main_file_sent = True
-            await status_msg.edit_text("✅ Отчёт готов! Отправляю приложение (DOCX)...")
-            
-            # Track successful report generation
-            await stats.track_event("report_success", cb.from_user.id, {
-                "company_name": company_name,
-                "company_inn": company_inn,
-                "has_pdf": main_file_sent if export_as == "pdf" else False,
-                "has_docx": True
-            })
-
-            # Подсчёт сформированных отчётов и уведомление каждые 5
-            try:
-                await stats.track_event("gamma_generation", cb.from_user.id, {"format": export_as})
-                today_cnt = await stats.get_event_count_today("gamma_generation")
-                if today_cnt % 5 == 0:
-                    admin_chat = str(FEEDBACK_CHAT_ID or "").strip()
-                    if admin_chat:
-                        await cb.bot.send_message(
-                            admin_chat,
-                            f"📣 Gamma отчётов сегодня: {today_cnt} (лимит 50). Пользователь #{cb.from_user.id}")
-            except Exception as _e:
-                log.warning("gamma_generation:notify_failed", error=str(_e))
-            
-            # Формируем caption для DOCX
-            docx_caption = "📎 Приложение к отчёту (DOCX)"
-            if company_name and company_inn:
-                from services.export.gamma_exporter import _safe_filename
-                safe_name = _safe_filename(company_name)
-                docx_caption = f"📎 {safe_name} (ИНН: {company_inn}) - Приложение к отчёту (DOCX)"
-            
-            await cb.message.answer_document(
-                document,
-                caption=docx_caption
-            )
-            # Итоговое сообщение: предупреждение о скачивании и две кнопки
-            from bot.keyboards.main import after_report_kb
-            await cb.message.answer(
-                "⚠️ Важно: обязательно скачайте файлы сейчас. Временные ссылки и кеш могут истечь, и повторная выдача потребует новой операции.\n\nВы можете оставить отзыв или вернуться в главное меню.",
-                reply_markup=after_report_kb()
-            )
-            file_sent = True
-        log.info("send_done", user_id=cb.from_user.id)
+                log.debug("send_main_file", path=main_file_path, user_id=cb.from_user.id)
+                await send_document(cb.message, main_file_path, caption=files["main_caption"])
+                main_file_sent = True
+        await status_msg.edit_text("✅ Отчёт готов! Отправляю приложение (DOCX)...")
         
-        # Удаляем временный файл
-        Path(temp_path).unlink(missing_ok=True)
-        log.debug("temp_deleted", temp_path=temp_path)
+        # Track successful report generation
+        await stats.track_event("report_success", cb.from_user.id, {
+            "company_name": company_name,
+            "company_inn": company_inn,
+            "has_pdf": main_file_sent if export_as == "pdf" else False,
+            "has_docx": True
+        })
+
+        # Подсчёт сформированных отчётов и уведомление каждые 5
+        try:
+            await stats.track_event("gamma_generation", cb.from_user.id, {"format": export_as})
+            today_cnt = await stats.get_event_count_today("gamma_generation")
+            if today_cnt % 5 == 0:
+                admin_chat = str(FEEDBACK_CHAT_ID or "").strip()
+                if admin_chat:
+                    await cb.bot.send_message(
+                        admin_chat,
+                        f"📣 Gamma отчётов сегодня: {today_cnt} (лимит {GAMMA_DAILY_LIMIT}). Пользователь #{cb.from_user.id}")
+        except Exception as _e:
+            log.warning("gamma_generation:notify_failed", error=str(_e))
+        
+        # DOCX собирается в пуле процессов и только если его file_id ещё не известен
+        build, content_key = _docx_source(response, report.get("ir"))
+        await send_generated(
+            cb.message,
+            build,
+            filename=files["docx_filename"],
+            caption=files["docx_caption"],
+            content_key=content_key,
+        )
+        # Итоговое сообщение: предупреждение о скачивании и две кнопки
+        from bot.keyboards.main import after_report_kb
+        await cb.message.answer(
+            "⚠️ Важно: обязательно скачайте файлы сейчас. Временные ссылки и кеш могут истечь, и повторная выдача потребует новой операции.\n\nВы можете оставить отзыв или вернуться в главное меню.",
+            reply_markup=after_report_kb()
+        )
+        file_sent = True
+        log.info("send_done", user_id=cb.from_user.id)
         
         # Переходим в состояние выбора типа отчёта
         await state.set_state(ReportState.CHOOSE)
         
     except Exception as e:
         log.error("Error in generate_report", error=str(e), error_type=type(e).__name__, user_id=cb.from_user.id)
-        
-        # Если есть оплаченный заказ, делаем возврат
-        if order_id:
-            try:
-                from services.robokassa import RobokassaService
-                from core.config import load_settings
-                settings = load_settings()
-                robokassa = RobokassaService(settings)
-                await robokassa.refund_payment(
-                    operation_id=str(order_id),
-                    amount=str(settings.REPORT_PRICE),
-                    reason="generation_failed"
-                )
-                log.info("Refund processed", order_id=order_id, user_id=cb.from_user.id)
-            except Exception as refund_error:
-                log.error("Refund failed", error=str(refund_error), order_id=order_id)
-        
-        # Если файл уже отправлен, не затираем успешный статус ошибкой
-        if not file_sent:
-            await status_msg.edit_text(
-                "❌ Произошла ошибка при формировании отчёта.\n\n"
-                "🔧 Возможные причины:\n"
-                "• Временные проблемы с API\n"
-                "• Недостаточно данных о компании\n"
-                "• Технические неполадки\n\n"
-                "💰 Если заказ был оплачен, средства будут возвращены автоматически.\n\n"
-                "⏳ Попробуйте позже или обратитесь в поддержку.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="🔄 Повторить", callback_data="report_generate")],
-                    [InlineKeyboardButton(text="🏠 Главное меню", callback_data="back_main")]
-                ])
-            )
+        await _report_failed(cb, status_msg, report["order_id"], file_sent)
+
+
+REPORT_FAILED_TEXT = (
+    "❌ Произошла ошибка при формировании отчёта.\n\n"
+    "🔧 Возможные причины:\n"
+    "• Временные проблемы с API\n"
+    "• Недостаточно данных о компании\n"
+    "• Технические неполадки\n\n"
+    "💰 Если заказ был оплачен, средства будут возвращены автоматически.\n\n"
+    "⏳ Попробуйте позже или обратитесь в поддержку."
+)
+
+
+def _report_failed_kb() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Повторить", callback_data="report_generate")],
+        [InlineKeyboardButton(text="🏠 Главное меню", callback_data="back_main")]
+    ])
+
+
+async def _refund_order(order_id, user_id):
+    """Возвращает оплату заказа (если он был)"""
+    if not order_id:
+        return
+    try:
+        from services.robokassa import RobokassaService
+        from core.config import load_settings
+        settings = load_settings()
+        robokassa = RobokassaService(settings)
+        await robokassa.refund_payment(
+            operation_id=str(order_id),
+            amount=str(settings.REPORT_PRICE),
+            reason="generation_failed"
+        )
+        log.info("Refund processed", order_id=order_id, user_id=user_id)
+    except Exception as refund_error:
+        log.error("Refund failed", error=str(refund_error), order_id=order_id)
+
+
+async def _report_failed(cb: CallbackQuery, status_msg: Message, order_id, file_sent: bool = False):
+    """Возвращает оплату (если была) и показывает ошибку формирования"""
+    await _refund_order(order_id, cb.from_user.id)
+    
+    # Если файл уже отправлен, не затираем успешный статус ошибкой
+    if not file_sent:
+        await status_msg.edit_text(REPORT_FAILED_TEXT, reply_markup=_report_failed_kb())
 
 
 @router.callback_query(F.data == "report_pdf_gamma")
@@ -513,37 +598,56 @@ async def report_pdf_gamma(cb: CallbackQuery, state: FSMContext):
         await status.edit_text("⏳ Формирую PDF-версию отчёта...\n\n📄 Это может занять до 15 минут, так как нужно собрать данные из множества источников и сформировать структурированный PDF.\n\n⏰ Пожалуйста, подождите...")
         
         # Функция для обновления прогресса
-        async def update_progress(status, elapsed, timeout):
+        async def update_progress(gen_status, elapsed, timeout):
             minutes = int(elapsed // 60)
             seconds = int(elapsed % 60)
-            progress_text = f"⏳ Формирую PDF-версию отчёта...\n\n📄 Статус: {status}\n⏰ Прошло: {minutes}м {seconds}с\n\n⏰ Пожалуйста, подождите..."
-            await status.edit_text(progress_text)
+            progress_text = f"⏳ Формирую PDF-версию отчёта...\n\n📄 Статус: {gen_status}\n⏰ Прошло: {minutes}м {seconds}с\n\n⏰ Пожалуйста, подождите..."
+            try:
+                await status.edit_text(progress_text)
+            except Exception:
+                pass
         
-        from services.export.gamma_exporter import generate_pdf_from_report_text
-        log.info("Starting Gamma PDF generation from button", user_id=cb.from_user.id)
-        import time
         start_time = time.time()
-        pdf_path = generate_pdf_from_report_text(
-            report_text, 
-            language="ru", 
-            theme_name=GAMMA_THEME or None, 
-            progress_callback=update_progress,
-            company_name=company_name,
-            company_inn=company_inn,
-        )
-        end_time = time.time()
-        log.info("Gamma PDF generation from button completed", user_id=cb.from_user.id, duration=end_time-start_time, pdf_path=pdf_path)
-        if not pdf_path:
-            await status.edit_text("❌ Не удалось сформировать PDF-отчёт")
+        
+        async def send_pdf(pdf_path):
+            log.info("Gamma PDF generation from button completed", user_id=cb.from_user.id, duration=time.time()-start_time, pdf_path=pdf_path)
+            if not pdf_path:
+                await status.edit_text("❌ Не удалось сформировать PDF-отчёт")
+                return
+            try:
+                await status.edit_text("✅ PDF готов!")
+                await send_document(cb.message, pdf_path, caption="📄 PDF-версия")
+            except Exception as e:
+                log.warning("Gamma PDF button failed", error=str(e))
+                await status.edit_text("❌ Ошибка формирования PDF")
+        
+        async def on_done(task):
+            await send_pdf(task.result if task.status == TaskStatus.COMPLETED else None)
+        
+        payload = {
+            "report_text": report_text,
+            "language": "ru",
+            "theme_name": GAMMA_THEME or None,
+            "company_name": company_name,
+            "company_inn": company_inn,
+        }
+        cached = await get_gamma_client().cached(export_as="pdf", **payload)
+        if cached and not cached.startswith("LINK:"):
+            await send_pdf(cached)
             return
-        from aiogram.types import BufferedInputFile
-        import os
-        with open(pdf_path, 'rb') as f:
-            await status.edit_text("✅ PDF готов!")
-            await cb.message.answer_document(
-                BufferedInputFile(f.read(), filename=os.path.basename(pdf_path)),
-                caption="📄 PDF-версия"
+        
+        log.info("Starting Gamma PDF generation from button", user_id=cb.from_user.id)
+        queue = await get_queue_manager()
+        try:
+            await queue.add_task(
+                TaskType.GAMMA_PDF,
+                payload,
+                callback=on_done,
+                progress=update_progress,
+                user_id=cb.from_user.id,
             )
+        except QuotaExceededError:
+            await status.edit_text(TEXT_PDF_STATUS_LIMIT)
     except Exception as e:
         log.warning("Gamma PDF button failed", error=str(e))
         await status.edit_text("❌ Ошибка формирования PDF")
@@ -14,7 +14,10 @@ DATASOURCE = "ofdata"
 # === OFData API (для поиска по названию) ===
 OFDATA_API = "https://ofdata.ru/api"
 OFDATA_KEY = "your_ofdata_api_key_here"
-OFDATA_RATE_LIMIT_QPM = 70
+# Общий лимит OFData для всех процессов (минута/час)
+OFDATA_RATE_LIMIT_PER_MINUTE = 70  # прежний OFDATA_RATE_LIMIT_QPM тоже читается
+OFDATA_RATE_LIMIT_PER_HOUR = 1000
+OFDATA_RATE_LIMIT_BACKEND = "sqlite"  # sqlite | redis | memory
 
 # OFData endpoint paths
 OFDATA_PATH_SEARCH = "/v2/search"
@@ -36,6 +39,9 @@ MAX_RETRIES = 2
 # === Кэширование ===
 CACHE_TTL_HOURS = 24
 SQLITE_PATH = "data/cache.db"
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024
+SQLITE_CACHED_STATEMENTS = 128
 
 # === Брендирование ===
 BRAND_NAME = "BizScan"
@@ -53,6 +59,22 @@ TTL_COUNTERPARTY_H = 72
 TTL_FINANCE_H = 168
 TTL_PAIDTAX_H = 168
 TTL_ARBITRAGE_H = 12
+TTL_ENFORCEMENTS_H = 12
+TTL_INSPECTIONS_H = 24
+TTL_CONTRACTS_H = 24
+TTL_PERSON_H = 72
+TTL_SEARCH_H = 24
+OFDATA_CACHE_ENABLED = True
+STALE_COUNTERPARTY_H = 720
+STALE_FINANCE_H = 720
+OFDATA_CACHE_MAX_STALE_H = 72
+CACHE_MEMORY_MAX_BYTES = 64 * 1024 * 1024
+CACHE_COMPRESSION = "zstd"  # zstd | zlib | none
+CACHE_ZSTD_DICT_PATH = "data/cache_zstd.dict"
+CACHE_SWEEP_INTERVAL = 300
+CACHE_SWEEP_BATCH = 500
+CACHE_MAX_DB_BYTES = 2 * 1024 * 1024 * 1024
+CACHE_VACUUM_PAGES = 2000
 
 # === Логирование ===
 LOG_LEVEL = "INFO"
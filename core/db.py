@@ -1,14 +1,31 @@
 # -*- coding: utf-8 -*-
 import aiosqlite
 import os
+import sqlite3
+
+from settings import SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHED_STATEMENTS
+
+# Настройки соединения: применяются к каждому новому соединению
+# (journal_mode=WAL сохраняется в файле БД, остальные действуют на соединение)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+    "PRAGMA temp_store=MEMORY",
+)
 
 DDL = '''
 CREATE TABLE IF NOT EXISTS cache (
     key TEXT PRIMARY KEY,
-    value TEXT NOT NULL,
+    value BLOB NOT NULL,
     created_at INTEGER NOT NULL,
-    ttl_hours INTEGER NOT NULL
+    ttl_hours INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL DEFAULT 0,
+    accessed_at INTEGER NOT NULL DEFAULT 0
 );
+CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache(accessed_at);
 CREATE TABLE IF NOT EXISTS search_cache (
     key TEXT PRIMARY KEY,
     value TEXT NOT NULL,
@@ -41,6 +58,65 @@ CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
 CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
 '''
 
+# Колонки, добавленные в таблицу cache после первой версии схемы
+CACHE_MIGRATIONS = (
+    ("ttl_hours", "ALTER TABLE cache ADD COLUMN ttl_hours INTEGER NOT NULL DEFAULT 24", None),
+    (
+        "expires_at",
+        "ALTER TABLE cache ADD COLUMN expires_at INTEGER NOT NULL DEFAULT 0",
+        "UPDATE cache SET expires_at = created_at + ttl_hours * 3600",
+    ),
+    (
+        "accessed_at",
+        "ALTER TABLE cache ADD COLUMN accessed_at INTEGER NOT NULL DEFAULT 0",
+        "UPDATE cache SET accessed_at = created_at",
+    ),
+)
+
+
+async def _migrate_cache(db, log):
+    """Добавляет недостающие колонки в существующую таблицу cache"""
+    cur = await db.execute("PRAGMA table_info(cache)")
+    col_names = {row[1] for row in await cur.fetchall()}
+    if not col_names:
+        return  # таблицы ещё нет — её создаст DDL
+    for column, alter_sql, backfill_sql in CACHE_MIGRATIONS:
+        if column in col_names:
+            continue
+        await db.execute(alter_sql)
+        if backfill_sql:
+            await db.execute(backfill_sql)
+        await db.commit()
+        log.info("Migrated cache table", column=column)
+
+
+# PRAGMA auto_vacuum: 2 — INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+async def _enable_incremental_vacuum(db, log):
+    """
+    auto_vacuum=INCREMENTAL для новой БД
+
+    У существующей БД режим меняется только полным VACUUM (перезапись всего
+    файла под блокировкой) — на старте его не делаем: конвертация —
+    scripts/enable_incremental_vacuum.py в окно обслуживания.
+    """
+    cur = await db.execute("PRAGMA auto_vacuum")
+    mode = (await cur.fetchone())[0]
+    if mode == AUTO_VACUUM_INCREMENTAL:
+        return
+    cur = await db.execute("PRAGMA page_count")
+    if (await cur.fetchone())[0] == 0:
+        await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        return
+    log.warning(
+        "Incremental vacuum unavailable: database was created without it; "
+        "run scripts/enable_incremental_vacuum.py to convert",
+        auto_vacuum=mode,
+    )
+
+
 async def init_db(path: str):
     from core.logger import get_logger
     log = get_logger(__name__)
@@ -57,23 +133,19 @@ async def init_db(path: str):
         log.debug("Connecting to database")
         async with aiosqlite.connect(path) as db:
             log.debug("Database connection established")
-            # Attempt lightweight migration: add ttl_hours if missing
+            await _enable_incremental_vacuum(db, log)
+            for pragma in PRAGMAS:
+                await db.execute(pragma)
+            # Lightweight migration: add missing cache columns
             try:
-                cur = await db.execute("PRAGMA table_info(cache)")
-                cols = await cur.fetchall()
-                col_names = {row[1] for row in cols}
-                if "ttl_hours" not in col_names:
-                    await db.execute("ALTER TABLE cache ADD COLUMN ttl_hours INTEGER NOT NULL DEFAULT 24")
-                    log.info("Migrated cache table: added ttl_hours column")
-                    await db.commit()
+                await _migrate_cache(db, log)
             except Exception as e:
                 # Suppress "duplicate column name" error specifically
                 if "duplicate column name" in str(e).lower():
-                    log.info("Column ttl_hours already exists, skipping migration")
+                    log.info("Cache columns already exist, skipping migration")
                 else:
                     # ignore other errors; DDL below will create table if absent
                     log.warning("Migration error (non-critical)", error=str(e))
-                pass
             
             log.debug("Executing DDL script")
             await db.executescript(DDL)
@@ -86,4 +158,25 @@ async def init_db(path: str):
         raise
 
 async def get_conn(path: str):
-    return await aiosqlite.connect(path)
+    """Долгоживущее асинхронное соединение с настроенными PRAGMA (схему создаёт init_db)"""
+    conn = await aiosqlite.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+    )
+    for pragma in PRAGMAS:
+        await conn.execute(pragma)
+    return conn
+
+
+def get_sync_conn(path: str) -> sqlite3.Connection:
+    """Синхронный вариант get_conn() для кода, работающего в потоках"""
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+        check_same_thread=False,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Микробенчмарк apply_aliases: прежний перебор всех алиасов на каждый ключ против скомпилированных алиасов."""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.bench_report_ir import synthetic_data
+from services.report import aliases_ru
+from services.report.flattener import AliasMatcher, apply_aliases, compile_aliases, flatten
+
+
+def legacy_apply_aliases(flat: Dict[str, Any], aliases: Dict[str, str]) -> Dict[str, Any]:
+    """apply_aliases, как он был: O(ключи × алиасы), split шаблонов на каждой проверке"""
+    result: Dict[str, Any] = {}
+    latest_year: Dict[str, int] = {}
+    for key, value in flat.items():
+        applied = False
+        for alias_key, alias_value in aliases.items():
+            if alias_key == key:
+                result[alias_value] = value
+                applied = True
+                break
+            if '[]' in alias_key:
+                prefix, suffix = alias_key.split('[]', 1)
+                if key.startswith(prefix) and key.endswith(suffix):
+                    if alias_value not in result:
+                        result[alias_value] = value
+                    applied = True
+                    break
+            if '<year>' in alias_key:
+                prefix, suffix = alias_key.split('<year>', 1)
+                if key.startswith(prefix) and key.endswith(suffix):
+                    year_part = key[len(prefix): len(key) - len(suffix)]
+                    if year_part.isdigit():
+                        year = int(year_part)
+                        if year > latest_year.get(alias_value, -1):
+                            result[alias_value] = value
+                            latest_year[alias_value] = year
+                    applied = True
+                    break
+        if not applied:
+            result[key] = value
+    return result
+
+
+def all_aliases(codes: int) -> Dict[str, str]:
+    """Все словари aliases_ru и шаблоны по годам для кодов строк отчётности"""
+    aliases: Dict[str, str] = {}
+    for name in dir(aliases_ru):
+        if name.endswith("_ALIASES"):
+            aliases.update(getattr(aliases_ru, name))
+    for code in range(1100, 1100 + codes):
+        aliases.setdefault(f"finances.data.<year>.{code}", f"Строка {code}")
+    return aliases
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200, help="Записей в каждой секции компании")
+    parser.add_argument("--codes", type=int, default=400, help="Дополнительных шаблонов data.<year>.<код>")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов на вариант")
+    args = parser.parse_args()
+
+    company_data, _, _ = synthetic_data(args.rows)
+    flat = flatten(company_data)
+    aliases = all_aliases(args.codes)
+    print(f"Ключей: {len(flat)}, алиасов: {len(aliases)}")
+
+    matcher = compile_aliases(aliases)
+    assert apply_aliases(flat, matcher) == legacy_apply_aliases(flat, aliases)
+
+    results = {
+        "перебор алиасов": measure(lambda: legacy_apply_aliases(flat, aliases), args.repeat),
+        "компиляция": measure(lambda: AliasMatcher(aliases), args.repeat),
+        "apply_aliases (dict)": measure(lambda: apply_aliases(flat, aliases), args.repeat),
+        "apply_aliases (matcher)": measure(lambda: apply_aliases(flat, matcher), args.repeat),
+    }
+    for name, ms in results.items():
+        print(f"{name:>24}: {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Бенчмарк сборки DOCX-приложения: прежняя построчная сборка через python-docx против docx_exporter."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from services.export.docx_exporter import build_docx, close_docx_executor, export_docx
+
+DEFAULT_FIXTURE = BASE_DIR / "tests" / "fixtures" / "large_report.txt"
+
+
+def legacy_build(report_text: str) -> bytes:
+    """Сборка DOCX, как она была в обработчике бота: абзац на строку, эвристика isupper, временный файл"""
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.shared import Pt
+
+    doc = Document()
+    style = doc.styles["Normal"]
+    style.font.name = "Calibri"
+    style._element.rPr.rFonts.set(qn("w:eastAsia"), "Calibri")
+    style.font.size = Pt(11)
+    for line in report_text.splitlines():
+        if line.strip() == "":
+            doc.add_paragraph("")
+            continue
+        if set(line.strip()) == {"="} and len(line.strip()) >= 10:
+            continue
+        p = doc.add_paragraph()
+        run = p.add_run(line)
+        if line.isupper() and len(line) < 60:
+            run.bold = True
+    with tempfile.NamedTemporaryFile(suffix=".docx") as tmp:
+        doc.save(tmp.name)
+        return Path(tmp.name).read_bytes()
+
+
+def measure(func: Callable[[str], bytes], text: str, repeat: int) -> List[float]:
+    func(text)  # прогрев: импорт, разбор шаблона
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def loop_stall(text: str, requests: int) -> float:
+    """Максимальная задержка event loop, пока идут requests сборок через export_docx"""
+    await export_docx(text)  # запуск пула процессов
+    worst = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            worst = max(worst, time.perf_counter() - started - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.gather(*(export_docx(text) for _ in range(requests)))
+    done.set()
+    await tick
+    await close_docx_executor()
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixture", type=Path, default=DEFAULT_FIXTURE, help="Текст отчёта")
+    parser.add_argument("--repeat", type=int, default=10, help="Повторов на вариант")
+    parser.add_argument("--scale", type=int, default=1, help="Склеить отчёт сам с собой N раз")
+    args = parser.parse_args()
+
+    text = "\n\n".join([args.fixture.read_text(encoding="utf-8")] * args.scale)
+    print(f"Отчёт: {len(text.splitlines())} строк, {len(text)} символов")
+    for name, func in (("legacy", legacy_build), ("docx_exporter", build_docx)):
+        timings = measure(func, text, args.repeat)
+        print(f"{name:>14}: median {statistics.median(timings) * 1000:8.1f} ms, "
+              f"min {min(timings) * 1000:8.1f} ms, {len(func(text))} байт")
+    stall = asyncio.run(loop_stall(text, args.repeat))
+    print(f"Макс. задержка event loop при {args.repeat} сборках через export_docx: {stall * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
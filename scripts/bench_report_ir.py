@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Бенчмарк IR отчёта: все форматы (TXT, Gamma, JSON, DOCX) из одной сборки против разбора готового текста."""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from loguru import logger
+
+from services.export.docx_exporter import build_docx
+from services.export.gamma_exporter import _sectioned_text
+from services.report.builder import ReportBuilder
+from services.report.ir import Report, emit, sections_from_text
+
+INCLUDE = ['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts']
+
+
+def synthetic_data(rows: int, seed: int = 1) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]:
+    """Ответы OFData в форме, которую ждут рендереры: (company_data, company_info, persons)"""
+    rnd = random.Random(seed)
+    codes = json.loads((BASE_DIR / "services" / "data" / "account_codes.json").read_text(encoding="utf-8"))
+    code_keys = [item["code"] for item in codes][:80]
+
+    def org(n: int) -> Dict[str, Any]:
+        return {"ОГРН": f"1{n:012d}", "ИНН": f"77{n:08d}", "НаимСокр": f"ООО «Контрагент {n}»"}
+
+    company_info = {
+        "ИНН": "7700000000", "ОГРН": "1027700000000", "КПП": "770001001",
+        "НаимСокр": "ООО «Ромашка»", "НаимПолн": "ОБЩЕСТВО С ОГРАНИЧЕННОЙ ОТВЕТСТВЕННОСТЬЮ «РОМАШКА»",
+        "ДатаРег": "2010-05-12", "Статус": {"Код": "001", "Наим": "Действует"},
+        "ЮрАдрес": {"НасПункт": "г. Москва", "АдресРФ": "г. Москва, ул. Тверская, д. 1", "Недост": False},
+        "ОКВЭД": {"Код": "62.01", "Наим": "Разработка компьютерного программного обеспечения"},
+        "ОКВЭДДоп": [{"Код": f"{60 + i // 10}.{i % 10}", "Наим": f"Дополнительный вид деятельности {i}"} for i in range(30)],
+        "Руковод": [{"ФИО": "Иванов Иван Иванович", "ИНН": "770000000001", "НаимДолжн": "Генеральный директор"}],
+        "Учред": {"ФЛ": [{"ФИО": f"Учредитель {i}", "ИНН": f"7700000001{i:02d}", "Доля": {"Процент": 25}} for i in range(4)]},
+        "Налоги": {
+            "ОсобРежим": ["УСН"], "СведУплГод": "2024", "СумУпл": 12_345_678, "СумНедоим": 1500, "НедоимДата": "2024-12-31",
+            "СведУпл": [{"Наим": f"Налог {i}", "Сумма": rnd.randint(1_000, 5_000_000)} for i in range(20)],
+        },
+    }
+    finances = {"data": {str(year): {code: rnd.randint(-10**9, 10**9) for code in code_keys} for year in range(2018, 2025)}}
+
+    def records(make) -> Dict[str, Any]:
+        return {"data": {"ЗапВсего": rows, "Записи": [make(i) for i in range(rows)]}}
+
+    company_data = {
+        "data": company_info,
+        "finances": finances,
+        "legal_cases": records(lambda i: {
+            "Номер": f"А40-{1000 + i}/2023", "Дата": f"{2020 + i % 5}-0{1 + i % 9}-15", "СуммИск": rnd.randint(10_000, 10**8),
+            "Ист": [org(i)] if i % 2 else [], "Ответ": [org(i + 1)] if not i % 2 else [], "Суд": "АС города Москвы",
+        }),
+        "enforcements": records(lambda i: {
+            "ИспПрНомер": f"{i}/24/77001-ИП", "ИспПрДата": f"{2020 + i % 5}-03-01", "СумДолг": rnd.randint(1_000, 10**6),
+            "ПредмИсп": "Налог, пени, штраф",
+        }),
+        "inspections": records(lambda i: {
+            "Номер": f"77{i:010d}", "Статус": "Завершена", "ТипРасп": "Плановая", "ДатаНач": f"{2020 + i % 5}-06-01",
+            "ОргКонтр": {"Наим": "ГУ МЧС России по г. Москве"}, "Цель": "Пожарная безопасность", "Наруш": bool(i % 3),
+        }),
+        "contracts": {
+            f"{law}_{role}": records(lambda i: {
+                "РегНомер": f"{law}{i:017d}", "Цена": rnd.randint(10_000, 10**7), "Дата": "2024-02-01",
+                "Заказ": org(i), "Постав": [org(i + 7)], "Объекты": [{"Наим": "Поставка оборудования"}],
+            })
+            for law in ("44", "223") for role in ("customer", "supplier")
+        },
+    }
+    persons = [{"data": {
+        "ФИО": f"Учредитель {i}", "ИНН": f"7700000001{i:02d}",
+        "Руковод": [org(100 + i * 10 + j) for j in range(3)], "Учред": [org(200 + i * 10 + j) for j in range(3)],
+    }} for i in range(4)]
+    return company_data, company_info, persons
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200, help="Записей в каждой секции (суды, ИП, проверки, закупки)")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов на вариант")
+    args = parser.parse_args()
+
+    logger.remove()  # рендереры пишут отладку через loguru — в замер она не входит
+    company_data, company_info, persons = synthetic_data(args.rows)
+    cold = ReportBuilder()
+    cold._section_cache = None
+    warm = ReportBuilder()
+
+    def render(builder: ReportBuilder) -> Report:
+        return Report(builder._render_report_sections(company_data, company_info, INCLUDE, persons))
+
+    text = render(cold).text
+    print(f"Отчёт: {len(text.splitlines())} строк, {len(text)} символов")
+
+    def text_round_trips() -> None:
+        # Как раньше: рендер в текст, затем каждый формат заново разбирает текст
+        report_text = render(cold).text
+        _sectioned_text(report_text)
+        build_docx(report_text)
+        json.dumps(Report(sections_from_text("report", report_text)).to_dict(), ensure_ascii=False)
+
+    def from_ir(builder: ReportBuilder) -> Callable[[], None]:
+        def run() -> None:
+            report = render(builder)
+            for fmt in ("txt", "gamma", "json", "docx"):
+                emit(report, fmt)
+        return run
+
+    results = {
+        "текст + разбор в каждом формате": measure(text_round_trips, args.repeat),
+        "IR, все форматы": measure(from_ir(cold), args.repeat),
+        "IR, кэш секций": measure(from_ir(warm), args.repeat),
+    }
+    report = render(warm)
+    breakdown = {
+        "рендер секций": measure(lambda: render(cold), args.repeat),
+        "рендер из кэша": measure(lambda: render(warm), args.repeat),
+        **{f"emit {fmt}": measure(lambda fmt=fmt: emit(Report(report.sections), fmt), args.repeat)
+           for fmt in ("txt", "gamma", "json", "docx")},
+    }
+    for name, ms in {**results, **breakdown}.items():
+        print(f"{name:>34}: {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
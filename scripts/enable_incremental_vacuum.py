@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Разовая конвертация SQLite-БД в auto_vacuum=INCREMENTAL
+
+Новые БД создаются в этом режиме сразу (core.db.init_db). У существующей
+режим меняется только полным VACUUM: файл переписывается целиком под
+эксклюзивной блокировкой, на время нужно столько же свободного места на
+диске. Запускать в окно обслуживания, с остановленным ботом.
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from core.db import AUTO_VACUUM_INCREMENTAL
+from core.logger import get_logger
+from settings import SQLITE_PATH
+
+log = get_logger(__name__)
+
+
+def convert(path: str) -> bool:
+    """Включает auto_vacuum=INCREMENTAL; False — БД уже в этом режиме"""
+    conn = sqlite3.connect(path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            raise RuntimeError(f"auto_vacuum was not changed for {path}")
+        return True
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=SQLITE_PATH, help="Путь к SQLite-БД")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        log.error("Database not found", db_path=args.db)
+        sys.exit(1)
+    started = time.perf_counter()
+    if convert(args.db):
+        log.info("Incremental vacuum enabled", db_path=args.db, seconds=round(time.perf_counter() - started, 1))
+    else:
+        log.info("Incremental vacuum already enabled", db_path=args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Обучение словаря zstd для кэша ответов OFData на собственных записях кэша."""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from services.cache_codec import (
+    CacheCodec,
+    CacheDecodeError,
+    DEFAULT_DICT_SIZE,
+    train_dictionary,
+    zstd_available,
+)
+from core.logger import get_logger
+from settings import SQLITE_PATH, CACHE_ZSTD_DICT_PATH
+
+log = get_logger(__name__)
+
+DEFAULT_SAMPLES = 2000
+RECOMPRESS_BATCH = 500
+
+
+def load_samples(conn: sqlite3.Connection, codec: CacheCodec, limit: int) -> list[bytes]:
+    """Случайная выборка ответов OFData в виде несжатого JSON"""
+    samples: list[bytes] = []
+    rows = conn.execute(
+        "SELECT value FROM cache WHERE key LIKE 'ofdata:%' ORDER BY random() LIMIT ?", (limit,)
+    )
+    for (stored,) in rows:
+        try:
+            value, _ = codec.decode(stored)
+        except CacheDecodeError:
+            continue
+        # Тот же JSON, что пишет CacheCodec.encode
+        samples.append(CacheCodec("none").encode(value)[0].encode("utf-8"))
+    return samples
+
+
+def recompress(conn: sqlite3.Connection, old: CacheCodec, new: CacheCodec) -> int:
+    """Пересжимает все записи новым словарём (старый нужен, чтобы их прочитать)"""
+    keys = [key for (key,) in conn.execute("SELECT key FROM cache")]
+    done = 0
+    for start in range(0, len(keys), RECOMPRESS_BATCH):
+        batch = keys[start:start + RECOMPRESS_BATCH]
+        marks = ",".join("?" * len(batch))
+        updates = []
+        for key, stored in conn.execute(f"SELECT key, value FROM cache WHERE key IN ({marks})", batch):
+            try:
+                value, _ = old.decode(stored)
+            except CacheDecodeError:
+                continue
+            updates.append((new.encode(value)[0], key))
+        conn.executemany("UPDATE cache SET value = ? WHERE key = ?", updates)
+        conn.commit()
+        done += len(updates)
+    return done
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=SQLITE_PATH, help="Путь к базе кэша")
+    parser.add_argument("--output", type=Path, default=Path(CACHE_ZSTD_DICT_PATH),
+                        help="Куда сохранить словарь")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help="Сколько записей взять для обучения")
+    parser.add_argument("--size", type=int, default=DEFAULT_DICT_SIZE, help="Размер словаря в байтах")
+    parser.add_argument("--recompress", action="store_true",
+                        help="Сразу пересжать существующие записи новым словарём")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+
+    if not zstd_available():
+        print("❌ Не найден пакет zstandard. Установите его командой: pip install zstandard", file=sys.stderr)
+        return 1
+
+    conn = sqlite3.connect(args.db)
+    try:
+        current = CacheCodec("zstd", str(args.output))
+        samples = load_samples(conn, current, args.samples)
+        if len(samples) < 10:
+            print(f"❌ Слишком мало записей для обучения: {len(samples)}", file=sys.stderr)
+            return 2
+
+        dict_data = train_dictionary(samples, args.size)
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_bytes(dict_data)
+        trained = CacheCodec("zstd", dict_data=dict_data)
+
+        raw = sum(len(sample) for sample in samples)
+        packed = sum(len(trained.encode(CacheCodec("none").decode(sample)[0])[0]) for sample in samples)
+        log.info("Словарь zstd обучен", samples=len(samples), raw=raw, packed=packed, path=str(args.output))
+        print(f"✅ Словарь сохранён: {args.output} (сжатие выборки {raw / max(packed, 1):.1f}×)")
+
+        if args.recompress:
+            count = recompress(conn, current, trained)
+            print(f"✅ Пересжато записей: {count}")
+        else:
+            # Записи прежнего словаря после перезапуска станут промахами и перезапишутся
+            print("ℹ️ Перезапустите бота, чтобы новые записи сжимались словарём")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
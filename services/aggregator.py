@@ -8,6 +8,8 @@ import asyncio
 import functools
 from typing import Dict, Any, Tuple
 from services.report import ReportBuilder
+from services.report.ir import Report
+from settings import REPORT_FANOUT_ENABLED
 from core.logger import get_logger
 log = get_logger(__name__)
 
@@ -34,6 +36,21 @@ except Exception:
 
 # Создаём экземпляр нового сборщика отчётов (отложенная инициализация)
 _builder = None
+
+REPORT_INCLUDE = ['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts']
+
+
+def _ident_for_query(query: str) -> Dict[str, str]:
+    """Идентификатор для сборщика: ИНН, ОГРН или название"""
+    kind, normalized = _detect_id_kind(query)
+    if kind == "inn":
+        log.debug("identifier: INN", inn=normalized)
+        return {"inn": normalized}
+    if kind == "ogrn":
+        log.debug("identifier: OGRN", ogrn=normalized)
+        return {"ogrn": normalized}
+    log.debug("identifier: NAME", name=query.strip())
+    return {"name": query.strip()}
 async def fetch_company_profile(input_str: str) -> Dict[str, Any]:
     """
     Адаптер для bot/ - получает профиль компании
@@ -70,26 +87,42 @@ async def fetch_company_report_markdown(query: str) -> str:
         log.debug("initializing ReportBuilder")
         _builder = ReportBuilder()
     
-    kind, normalized = _detect_id_kind(query)
-    if kind == "inn":
-        ident = {"inn": normalized}
-        log.debug("identifier: INN", inn=normalized)
-    elif kind == "ogrn":
-        ident = {"ogrn": normalized}
-        log.debug("identifier: OGRN", ogrn=normalized)
+    ident = _ident_for_query(query)
+    include = REPORT_INCLUDE
+    if REPORT_FANOUT_ENABLED:
+        # Секции загружаются параллельно в event loop, без потока на отчёт
+        log.debug("calling build_simple_report_async", ident=ident)
+        result = await _builder.build_simple_report_async(ident=ident, include=include, max_rows=500)
     else:
-        ident = {"name": query.strip()}
-        log.debug("identifier: NAME", name=query.strip())
-    
-    log.debug("calling build_simple_report", ident=ident)
-    result = await asyncio_to_thread(
-        _builder.build_simple_report,
-        ident=ident,
-        include=['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts'],
-        max_rows=500
-    )
+        log.debug("calling build_simple_report", ident=ident)
+        result = await asyncio_to_thread(
+            _builder.build_simple_report,
+            ident=ident,
+            include=include,
+            max_rows=500
+        )
     log.debug("report built", has_result=bool(result))
     return result
+async def fetch_company_report(query: str) -> Report:
+    """
+    Адаптер для bot/ - строит отчёт в виде IR (services.report.ir)
+    
+    Из одного IR получаются TXT (report.text), DOCX-приложение и JSON
+    без повторного разбора текста.
+    
+    Args:
+        query: ИНН, ОГРН или название компании
+    """
+    log.info("fetch_company_report", query=query)
+    
+    global _builder
+    if _builder is None:
+        _builder = ReportBuilder()
+    
+    ident = _ident_for_query(query)
+    if REPORT_FANOUT_ENABLED:
+        return await _builder.build_simple_report_ir_async(ident=ident, include=REPORT_INCLUDE, max_rows=500)
+    return await asyncio_to_thread(_builder.build_simple_report_ir, ident=ident, include=REPORT_INCLUDE, max_rows=500)
 async def build_markdown_report(profile: Dict[str, Any]) -> str:
     """
     Адаптер для bot/ - строит TXT отчёт из профиля
@@ -114,7 +147,7 @@ async def build_markdown_report(profile: Dict[str, Any]) -> str:
         return "❌ ИНН не найден в данных компании"
     
     # Генерируем полный отчёт
-    return _builder.build_simple_report(
-        ident={'inn': inn},
-        include=['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts'],
-    )
+    include = ['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts']
+    if REPORT_FANOUT_ENABLED:
+        return await _builder.build_simple_report_async(ident={'inn': inn}, include=include)
+    return await asyncio_to_thread(_builder.build_simple_report, ident={'inn': inn}, include=include)
@@ -2,135 +2,554 @@
 """
 Система кэширования для провайдеров данных
 """
-import json
 import asyncio
-from typing import Optional, Any, Dict
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional, Any, Dict, Iterable, List, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import urlencode
 
 import aiosqlite
 from pydantic import BaseModel
 
+from core.db import AUTO_VACUUM_INCREMENTAL, get_conn, get_sync_conn
+from services.cache_codec import CacheCodec, CacheDecodeError
 from core.logger import get_logger
+from settings import (
+    SQLITE_PATH,
+    CACHE_MEMORY_MAX_BYTES,
+    CACHE_COMPRESSION,
+    CACHE_ZSTD_DICT_PATH,
+    CACHE_MAX_DB_BYTES,
+    CACHE_SWEEP_BATCH,
+    CACHE_SWEEP_INTERVAL,
+    CACHE_VACUUM_PAGES,
+)
 
 log = get_logger(__name__)
 
+# Схему таблицы cache создаёт core.db.init_db при старте приложения
+SELECT_SQL = "SELECT value, created_at, ttl_hours FROM cache WHERE key = ?"
+UPSERT_SQL = (
+    "INSERT OR REPLACE INTO cache (key, value, created_at, ttl_hours, expires_at, accessed_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+TOUCH_SQL = "UPDATE cache SET accessed_at = ? WHERE key = ?"
+# Удаление пачками по индексу: блокировка записи держится недолго
+SWEEP_EXPIRED_SQL = "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache WHERE expires_at < ? LIMIT ?)"
+CACHE_SIZE_SQL = "SELECT total(length(key) + length(value)) FROM cache"
+LRU_SIZES_SQL = "SELECT rowid, length(key) + length(value) FROM cache ORDER BY accessed_at"
+EVICT_ROWIDS_SQL = "DELETE FROM cache WHERE rowid IN ({})"
+DELETE_SQL = "DELETE FROM cache WHERE key = ?"
+SELECT_MANY_SQL = "SELECT key, value, created_at, ttl_hours FROM cache WHERE key IN ({})"
+# Лимит переменных в одном запросе SQLite (SQLITE_MAX_VARIABLE_NUMBER в старых сборках)
+SELECT_MANY_CHUNK = 500
+
 
 class CacheConfig(BaseModel):
     """Конфигурация кэша"""
-    db_path: str = "data/cache.db"
+    db_path: str = SQLITE_PATH
     default_ttl_hours: int = 24
+    memory_max_bytes: int = CACHE_MEMORY_MAX_BYTES  # 0 — без памяти процесса
+    max_db_bytes: int = CACHE_MAX_DB_BYTES  # лимит данных кэша, 0 — без ограничения
+    sweep_batch: int = CACHE_SWEEP_BATCH
+    vacuum_pages: int = CACHE_VACUUM_PAGES
+    compression: str = CACHE_COMPRESSION  # zstd | zlib | none
+    zstd_dict_path: Optional[str] = CACHE_ZSTD_DICT_PATH
+
+
+def _is_expired(created_at: int, ttl_hours: float) -> bool:
+    return datetime.now() - datetime.fromtimestamp(created_at) > timedelta(hours=ttl_hours)
+
+
+def _now() -> int:
+    return int(datetime.now().timestamp())
+
+
+def _row(key: str, stored, created_at: int, ttl_hours: int, stale_hours: float) -> tuple:
+    """Строка для UPSERT_SQL; expires_at — конец окна устаревания, после него запись удаляет чистильщик"""
+    expires_at = created_at + int((ttl_hours + stale_hours) * 3600)
+    return key, stored, created_at, ttl_hours, expires_at, created_at
+
+
+@dataclass
+class CacheEntry:
+    """Запись кэша вместе с её возрастом"""
+    value: Any
+    created_at: int
+    ttl_hours: int
+
+    @property
+    def is_fresh(self) -> bool:
+        return not _is_expired(self.created_at, self.ttl_hours)
+
+    @property
+    def fetched_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at)
+
+
+class MemoryCache:
+    """
+    LRU-кэш в памяти процесса с бюджетом по размеру
+
+    Хранит уже разобранные значения (CacheEntry). Размер записи
+    оценивается по длине её несжатого JSON. Значения отдаются как есть,
+    без копирования: один и тот же объект получают все вызывающие, поэтому
+    менять его на месте нельзя (сначала dict(value) или copy.deepcopy).
+    Потокобезопасен: им пользуются и event loop, и синхронные клиенты.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[CacheEntry, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key: str, entry: CacheEntry, size: int) -> None:
+        if size > self.max_bytes:
+            self.pop(key)
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (entry, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
 
 
 class CacheService:
-    """Сервис кэширования"""
-    
+    """Сервис кэширования
+
+    Два уровня: LRU в памяти процесса (разобранные значения) перед SQLite.
+    Для SQLite держит одно долгоживущее соединение на event loop (aiosqlite)
+    и одно синхронное соединение для кода в потоках; оба в режиме WAL.
+    """
+
     def __init__(self, config: CacheConfig):
         self.config = config
+        self.memory = MemoryCache(config.memory_max_bytes)
+        self.codec = CacheCodec(config.compression, config.zstd_dict_path)
         self._db_path = Path(config.db_path)
         self._db_path.parent.mkdir(exist_ok=True)
-    
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._conn_lock: Optional[asyncio.Lock] = None
+        # Синхронный доступ — для клиентов, работающих в потоках
+        self._sync_conn: Optional[sqlite3.Connection] = None
+        self._sync_lock = threading.Lock()
+        # Чтения не пишут в БД: время доступа копится здесь и сохраняется чистильщиком
+        self._touched: Dict[str, int] = {}
+        self._touched_lock = threading.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+
     async def _get_connection(self) -> aiosqlite.Connection:
-        """Получает соединение с БД"""
-        conn = await aiosqlite.connect(self._db_path)
-        
-        # Создаем таблицу если не существует
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS cache (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                created_at INTEGER NOT NULL,
-                ttl_hours INTEGER NOT NULL
-            )
-        """)
-        await conn.commit()
-        
-        return conn
-    
+        """Получает соединение с БД (открывается один раз на event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._conn is not None and self._conn_loop is loop:
+            return self._conn
+        if self._conn_lock is None or self._conn_loop is not loop:
+            self._conn_lock = asyncio.Lock()
+            self._conn_loop = loop
+            await self._drop_connection()
+        async with self._conn_lock:
+            if self._conn is None:
+                self._conn = await get_conn(str(self._db_path))
+        return self._conn
+
+    async def _drop_connection(self) -> None:
+        """Останавливает соединение, оставшееся от другого (завершённого) event loop"""
+        if self._conn is not None:
+            stopped = self._conn.stop()
+            self._conn = None
+            if stopped is not None:
+                await stopped
+
+    async def close(self) -> None:
+        """Закрывает соединения (вызывается при остановке приложения)"""
+        await self.stop_sweeper()
+        self.memory.clear()
+        if self._conn is not None and self._conn_loop is not asyncio.get_running_loop():
+            await self._drop_connection()
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception as e:
+                log.warning("Cache close failed", error=str(e))
+            self._conn = None
+        self._conn_loop = None
+        self._conn_lock = None
+        with self._sync_lock:
+            if self._sync_conn is not None:
+                self._sync_conn.close()
+                self._sync_conn = None
+
     async def get(self, key: str) -> Optional[Any]:
         """Получает значение из кэша"""
+        entry = await self.get_entry(key)
+        return entry.value if entry is not None and entry.is_fresh else None
+
+    async def get_entry(self, key: str, max_stale_hours: float = 0) -> Optional[CacheEntry]:
+        """
+        Получает запись из кэша, в том числе устаревшую
+
+        Запись старше TTL, но моложе TTL + max_stale_hours возвращается
+        с is_fresh == False; более старая удаляется и считается промахом.
+        """
+        entry = self._memory_get(key, max_stale_hours)
+        if entry is not None:
+            return entry
         try:
             conn = await self._get_connection()
-            try:
-                cursor = await conn.execute(
-                    "SELECT value, created_at, ttl_hours FROM cache WHERE key = ?",
-                    (key,)
-                )
+            async with conn.execute(SELECT_SQL, (key,)) as cursor:
                 row = await cursor.fetchone()
-                
-                if not row:
-                    return None
-                
-                value, created_at, ttl_hours = row
-                created_time = datetime.fromtimestamp(created_at)
-                
-                # Проверяем, не истек ли TTL
-                if datetime.now() - created_time > timedelta(hours=ttl_hours):
-                    await self.delete(key)
-                    return None
-                
-                return json.loads(value)
-            finally:
-                await conn.close()
-                
+
+            if not row:
+                return None
+
+            value, created_at, ttl_hours = row
+
+            # Проверяем, не истекло ли окно устаревания
+            if _is_expired(created_at, ttl_hours + max_stale_hours):
+                await self.delete(key)
+                return None
+
+            return self._remember(key, value, created_at, ttl_hours)
+
         except Exception as e:
             log.error("Cache get failed", key=key, error=str(e))
             return None
-    
-    async def set(self, key: str, value: Any, ttl_hours: Optional[int] = None) -> bool:
-        """Сохраняет значение в кэш"""
+
+    async def set(self, key: str, value: Any, ttl_hours: Optional[int] = None, stale_hours: float = 0) -> bool:
+        """Сохраняет значение в кэш (stale_hours — сколько ещё хранить запись после TTL)"""
         try:
             ttl = ttl_hours or self.config.default_ttl_hours
-            serialized = json.dumps(value, ensure_ascii=False, default=str)
-            
+            stored, size = self.codec.encode(value)
+            created_at = _now()
+
             conn = await self._get_connection()
-            try:
-                await conn.execute("""
-                    INSERT OR REPLACE INTO cache (key, value, created_at, ttl_hours)
-                    VALUES (?, ?, ?, ?)
-                """, (key, serialized, int(datetime.now().timestamp()), ttl))
-                await conn.commit()
-            finally:
-                await conn.close()
-            
+            await conn.execute(UPSERT_SQL, _row(key, stored, created_at, ttl, stale_hours))
+            await conn.commit()
+
+            self.memory.put(key, CacheEntry(value, created_at, ttl), size)
             return True
-            
+
         except Exception as e:
             log.error("Cache set failed", key=key, error=str(e))
             return False
-    
+
     async def delete(self, key: str) -> bool:
         """Удаляет значение из кэша"""
+        self.memory.pop(key)
         try:
             conn = await self._get_connection()
-            try:
-                await conn.execute("DELETE FROM cache WHERE key = ?", (key,))
-                await conn.commit()
-            finally:
-                await conn.close()
+            await conn.execute(DELETE_SQL, (key,))
+            await conn.commit()
             return True
-            
+
         except Exception as e:
             log.error("Cache delete failed", key=key, error=str(e))
             return False
-    
-    async def clear_expired(self) -> int:
-        """Очищает истекшие записи"""
+
+    async def get_many(self, keys: Iterable[str], max_stale_hours: float = 0) -> Dict[str, CacheEntry]:
+        """
+        Пакетный get_entry(): всё, чего нет в памяти, читается из SQLite
+        одним запросом и поднимается в память. Промахи в результат не входят.
+        """
+        found: Dict[str, CacheEntry] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            entry = self._memory_get(key, max_stale_hours)
+            if entry is not None:
+                found[key] = entry
+            else:
+                missing.append(key)
+        if not missing:
+            return found
         try:
             conn = await self._get_connection()
-            try:
-                cursor = await conn.execute("""
-                    DELETE FROM cache 
-                    WHERE datetime(created_at, '+' || ttl_hours || ' hours') < datetime('now')
-                """)
+            for start in range(0, len(missing), SELECT_MANY_CHUNK):
+                chunk = missing[start:start + SELECT_MANY_CHUNK]
+                sql = SELECT_MANY_SQL.format(",".join("?" * len(chunk)))
+                async with conn.execute(sql, chunk) as cursor:
+                    rows = await cursor.fetchall()
+                for key, value, created_at, ttl_hours in rows:
+                    if not _is_expired(created_at, ttl_hours + max_stale_hours):
+                        entry = self._remember(key, value, created_at, ttl_hours)
+                        if entry is not None:
+                            found[key] = entry
+        except Exception as e:
+            log.error("Cache get_many failed", keys=len(missing), error=str(e))
+        return found
+
+    async def set_many(self, items: Dict[str, Any], ttl_hours: Optional[int] = None,
+                       stale_hours: float = 0) -> bool:
+        """Пакетный set(): все записи сохраняются одной транзакцией"""
+        try:
+            ttl = ttl_hours or self.config.default_ttl_hours
+            created_at = _now()
+            encoded = {key: self.codec.encode(value) for key, value in items.items()}
+
+            conn = await self._get_connection()
+            await conn.executemany(
+                UPSERT_SQL, [_row(key, stored, created_at, ttl, stale_hours) for key, (stored, _) in encoded.items()]
+            )
+            await conn.commit()
+
+            for key, (_, size) in encoded.items():
+                self.memory.put(key, CacheEntry(items[key], created_at, ttl), size)
+            return True
+
+        except Exception as e:
+            log.error("Cache set_many failed", keys=len(items), error=str(e))
+            return False
+
+    def _memory_get(self, key: str, max_stale_hours: float) -> Optional[CacheEntry]:
+        """Запись из памяти процесса, если она ещё в окне устаревания (значение общее — не менять)"""
+        entry = self.memory.get(key)
+        if entry is None:
+            return None
+        if _is_expired(entry.created_at, entry.ttl_hours + max_stale_hours):
+            self.memory.pop(key)
+            return None
+        self._touch(key)
+        return entry
+
+    def _remember(self, key: str, stored, created_at: int, ttl_hours: int) -> Optional[CacheEntry]:
+        """Разбирает значение из SQLite и кладёт его в память процесса (None — не разобрать)"""
+        try:
+            value, size = self.codec.decode(stored)
+        except CacheDecodeError as e:
+            log.warning("Cache value cannot be decoded, treating as miss", key=key, error=str(e))
+            return None
+        entry = CacheEntry(value, created_at, ttl_hours)
+        self.memory.put(key, entry, size)
+        self._touch(key)
+        return entry
+
+    def _touch(self, key: str) -> None:
+        with self._touched_lock:
+            self._touched[key] = _now()
+
+    async def clear_expired(self, max_batches: Optional[int] = None) -> int:
+        """
+        Удаляет записи с истёкшим expires_at пачками по sweep_batch строк
+
+        Между пачками управление возвращается event loop'у, а блокировка
+        записи отпускается — чтения и записи кэша не ждут долго.
+        """
+        deleted = 0
+        batches = 0
+        try:
+            conn = await self._get_connection()
+            while max_batches is None or batches < max_batches:
+                cursor = await conn.execute(SWEEP_EXPIRED_SQL, (_now(), self.config.sweep_batch))
                 await conn.commit()
-                return cursor.rowcount
-            finally:
-                await conn.close()
-                
+                deleted += cursor.rowcount
+                batches += 1
+                if cursor.rowcount < self.config.sweep_batch:
+                    break
+                await asyncio.sleep(0)
         except Exception as e:
             log.error("Cache clear_expired failed", error=str(e))
+        return deleted
+
+    async def flush_touches(self) -> int:
+        """Сохраняет накопленное время доступа (нужно для вытеснения по LRU)"""
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+        if not touched:
+            return 0
+        try:
+            conn = await self._get_connection()
+            await conn.executemany(TOUCH_SQL, [(ts, key) for key, ts in touched.items()])
+            await conn.commit()
+        except Exception as e:
+            log.error("Cache flush_touches failed", error=str(e))
+            return 0
+        return len(touched)
+
+    async def db_size(self) -> int:
+        """Занятый размер файла БД в байтах (без свободных страниц)"""
+        conn = await self._get_connection()
+        values = []
+        for pragma in ("page_count", "freelist_count", "page_size"):
+            async with conn.execute(f"PRAGMA {pragma}") as cursor:
+                values.append((await cursor.fetchone())[0])
+        page_count, freelist_count, page_size = values
+        return (page_count - freelist_count) * page_size
+
+    async def cache_size(self) -> int:
+        """Объём данных кэша в байтах (ключи и значения, без других таблиц файла)"""
+        conn = await self._get_connection()
+        async with conn.execute(CACHE_SIZE_SQL) as cursor:
+            return int((await cursor.fetchone())[0])
+
+    async def enforce_size_limit(self) -> int:
+        """
+        Вытесняет давно не читанные записи, если данные кэша больше max_db_bytes
+
+        Считается только таблица кэша: другие таблицы бота в том же файле
+        лимит не расходуют. Сколько удалить, определяется один раз — по
+        размеру строк в порядке LRU; размер файла после удаления не
+        перемеряется (частично заполненные страницы его почти не уменьшают).
+        Удаление идёт пачками не больше sweep_batch строк.
+        """
+        limit = self.config.max_db_bytes
+        if limit <= 0:
             return 0
+        evicted = 0
+        try:
+            excess = await self.cache_size() - limit
+            if excess <= 0:
+                return 0
+            conn = await self._get_connection()
+            rowids: List[int] = []
+            async with conn.execute(LRU_SIZES_SQL) as cursor:
+                async for rowid, size in cursor:
+                    rowids.append(rowid)
+                    excess -= size
+                    if excess <= 0:
+                        break
+            batch = max(1, min(self.config.sweep_batch, SELECT_MANY_CHUNK))
+            for start in range(0, len(rowids), batch):
+                chunk = rowids[start:start + batch]
+                cursor = await conn.execute(EVICT_ROWIDS_SQL.format(",".join("?" * len(chunk))), chunk)
+                await conn.commit()
+                evicted += cursor.rowcount
+                await asyncio.sleep(0)
+        except Exception as e:
+            log.error("Cache enforce_size_limit failed", error=str(e))
+        return evicted
+
+    async def incremental_vacuum(self, pages: Optional[int] = None) -> None:
+        """
+        Возвращает ОС до pages свободных страниц
+
+        Только для БД с auto_vacuum=INCREMENTAL (см. core.db.init_db); у
+        остальных incremental_vacuum ничего не делает, и проход пропускается.
+        """
+        try:
+            conn = await self._get_connection()
+            async with conn.execute("PRAGMA auto_vacuum") as cursor:
+                mode = (await cursor.fetchone())[0]
+            if mode != AUTO_VACUUM_INCREMENTAL:
+                log.debug("Cache incremental_vacuum skipped", auto_vacuum=mode)
+                return
+            await conn.execute(f"PRAGMA incremental_vacuum({int(pages or self.config.vacuum_pages)})")
+            await conn.commit()
+        except Exception as e:
+            log.error("Cache incremental_vacuum failed", error=str(e))
+
+    async def sweep(self) -> Dict[str, int]:
+        """Один проход чистильщика: время доступа, истёкшие записи, лимит размера, vacuum"""
+        stats = {
+            "touched": await self.flush_touches(),
+            "expired": await self.clear_expired(),
+            "evicted": await self.enforce_size_limit(),
+        }
+        await self.incremental_vacuum()
+        if stats["expired"] or stats["evicted"]:
+            log.info("Cache swept", **stats)
+        return stats
+
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await self.sweep()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.error("Cache sweep error", error=str(e))
+
+    def start_sweeper(self, interval: float = CACHE_SWEEP_INTERVAL) -> None:
+        """Запускает периодическую чистку в текущем event loop"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def _get_sync_connection(self) -> sqlite3.Connection:
+        """Синхронное соединение (одно на сервис, доступ под блокировкой)"""
+        if self._sync_conn is None:
+            self._sync_conn = get_sync_conn(str(self._db_path))
+        return self._sync_conn
+
+    def get_sync(self, key: str) -> Optional[Any]:
+        """Синхронный вариант get() для кода, работающего в потоках"""
+        entry = self.get_entry_sync(key)
+        return entry.value if entry is not None and entry.is_fresh else None
+
+    def get_entry_sync(self, key: str, max_stale_hours: float = 0) -> Optional[CacheEntry]:
+        """Синхронный вариант get_entry()"""
+        entry = self._memory_get(key, max_stale_hours)
+        if entry is not None:
+            return entry
+        try:
+            with self._sync_lock:
+                conn = self._get_sync_connection()
+                row = conn.execute(SELECT_SQL, (key,)).fetchone()
+                if not row:
+                    return None
+                value, created_at, ttl_hours = row
+                if _is_expired(created_at, ttl_hours + max_stale_hours):
+                    conn.execute(DELETE_SQL, (key,))
+                    conn.commit()
+                    return None
+            return self._remember(key, value, created_at, ttl_hours)
+        except Exception as e:
+            log.error("Cache get_sync failed", key=key, error=str(e))
+            return None
+
+    def set_sync(self, key: str, value: Any, ttl_hours: Optional[int] = None, stale_hours: float = 0) -> bool:
+        """Синхронный вариант set() для кода, работающего в потоках"""
+        try:
+            ttl = ttl_hours or self.config.default_ttl_hours
+            stored, size = self.codec.encode(value)
+            created_at = _now()
+            with self._sync_lock:
+                conn = self._get_sync_connection()
+                conn.execute(UPSERT_SQL, _row(key, stored, created_at, ttl, stale_hours))
+                conn.commit()
+            self.memory.put(key, CacheEntry(value, created_at, ttl), size)
+            return True
+        except Exception as e:
+            log.error("Cache set_sync failed", key=key, error=str(e))
+            return False
 
 
 # Глобальный экземпляр кэша
@@ -146,6 +565,14 @@ def get_cache_service() -> CacheService:
     return _cache_service
 
 
+async def close_cache_service() -> None:
+    """Закрывает глобальный кэш (вызывается при остановке приложения)"""
+    global _cache_service
+    if _cache_service is not None:
+        await _cache_service.close()
+        _cache_service = None
+
+
 def _build_cache_key(provider: str, endpoint: str, identifier: str) -> str:
     """Build cache key with provider name to avoid collisions"""
     return f"{provider}:{endpoint}:{identifier}"
@@ -154,19 +581,44 @@ def _build_cache_key(provider: str, endpoint: str, identifier: str) -> str:
 def _get_ttl_for_endpoint(endpoint: str) -> int:
     """Get TTL hours for specific endpoint from environment"""
     from settings import (
-        TTL_COUNTERPARTY_H, TTL_FINANCE_H, TTL_PAIDTAX_H, TTL_ARBITRAGE_H
+        TTL_COUNTERPARTY_H, TTL_FINANCE_H, TTL_PAIDTAX_H, TTL_ARBITRAGE_H,
+        TTL_ENFORCEMENTS_H, TTL_INSPECTIONS_H, TTL_CONTRACTS_H, TTL_PERSON_H, TTL_SEARCH_H,
     )
-    
+
     ttl_map = {
         "counterparty": TTL_COUNTERPARTY_H,
         "finance": TTL_FINANCE_H,
         "paid_taxes": TTL_PAIDTAX_H,
         "arbitration": TTL_ARBITRAGE_H,
+        # Эндпоинты OFData
+        "company": TTL_COUNTERPARTY_H,
+        "entrepreneur": TTL_COUNTERPARTY_H,
+        "finances": TTL_FINANCE_H,
+        "legal-cases": TTL_ARBITRAGE_H,
+        "enforcements": TTL_ENFORCEMENTS_H,
+        "inspections": TTL_INSPECTIONS_H,
+        "contracts": TTL_CONTRACTS_H,
+        "person": TTL_PERSON_H,
+        "search": TTL_SEARCH_H,
     }
-    
+
     return ttl_map.get(endpoint, 24)  # Default 24 hours
 
 
+def _get_max_stale_for_endpoint(endpoint: str) -> int:
+    """Сколько часов после TTL устаревший ответ ещё можно отдавать (stale-while-revalidate)"""
+    from settings import STALE_COUNTERPARTY_H, STALE_FINANCE_H, OFDATA_CACHE_MAX_STALE_H
+
+    stale_map = {
+        "company": STALE_COUNTERPARTY_H,
+        "entrepreneur": STALE_COUNTERPARTY_H,
+        "person": STALE_COUNTERPARTY_H,
+        "finances": STALE_FINANCE_H,
+    }
+
+    return stale_map.get(endpoint, OFDATA_CACHE_MAX_STALE_H)
+
+
 async def get_cached(provider: str, endpoint: str, identifier: str) -> Optional[Any]:
     """Получает значение из кэша с учетом провайдера"""
     key = _build_cache_key(provider, endpoint, identifier)
@@ -183,3 +635,166 @@ async def set_cached(provider: str, endpoint: str, identifier: str, value: Any)
 async def clear_cache(key: str) -> bool:
     """Очищает кэш по ключу"""
     return await get_cache_service().delete(key)
+
+
+# === Read-through кэш ответов OFData ===
+
+OFDATA_PROVIDER = "ofdata"
+
+# Принудительное обновление: чтение из кэша пропускается, запись — нет
+_cache_bypass: ContextVar[bool] = ContextVar("cache_bypass", default=False)
+
+
+@contextmanager
+def cache_bypass():
+    """Контекст принудительного обновления (действует и на задачи/потоки, запущенные внутри)"""
+    token = _cache_bypass.set(True)
+    try:
+        yield
+    finally:
+        _cache_bypass.reset(token)
+
+
+@dataclass
+class CacheStats:
+    """Счётчики попаданий/промахов по эндпоинтам (stale — попадания в устаревшую запись)"""
+    hits: Dict[str, int] = field(default_factory=dict)
+    misses: Dict[str, int] = field(default_factory=dict)
+    stale: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, endpoint: str, hit: bool, stale: bool = False) -> None:
+        counter = self.hits if hit else self.misses
+        counter[endpoint] = counter.get(endpoint, 0) + 1
+        if hit and stale:
+            self.stale[endpoint] = self.stale.get(endpoint, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "stale": sum(self.stale.values()),
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "by_endpoint": {
+                name: {"hits": self.hits.get(name, 0), "misses": self.misses.get(name, 0)}
+                for name in sorted(set(self.hits) | set(self.misses))
+            },
+        }
+
+
+ofdata_cache_stats = CacheStats()
+
+
+@dataclass
+class DataAge:
+    """Возраст данных, отданных из кэша в рамках одного отчёта"""
+    oldest: Optional[datetime] = None
+    stale: bool = False
+
+    def observe(self, entry: CacheEntry) -> None:
+        if self.oldest is None or entry.fetched_at < self.oldest:
+            self.oldest = entry.fetched_at
+        self.stale = self.stale or not entry.is_fresh
+
+
+_data_age: ContextVar[Optional[DataAge]] = ContextVar("data_age", default=None)
+
+
+@contextmanager
+def track_data_age():
+    """Собирает возраст ответов, отданных из кэша внутри контекста"""
+    age = DataAge()
+    token = _data_age.set(age)
+    try:
+        yield age
+    finally:
+        _data_age.reset(token)
+
+
+def _served(name: str, entry: Optional[CacheEntry]) -> None:
+    ofdata_cache_stats.record(name, entry is not None, stale=entry is not None and not entry.is_fresh)
+    age = _data_age.get()
+    if entry is not None and age is not None:
+        age.observe(entry)
+
+
+def _ofdata_cache_entry(endpoint: str, params: Dict[str, Any]) -> Tuple[str, str, int]:
+    """(имя эндпоинта, ключ, TTL в часах) для запроса OFData; ключ API в ключ кэша не входит"""
+    name = endpoint.strip("/").rsplit("/", 1)[-1]
+    canonical = urlencode(sorted((k, str(v)) for k, v in params.items() if k != "key"))
+    return name, _build_cache_key(OFDATA_PROVIDER, name, canonical), _get_ttl_for_endpoint(name)
+
+
+async def get_ofdata_cached(endpoint: str, params: Dict[str, Any]) -> Optional[Any]:
+    """Свежий ответ OFData из кэша (None — промах, кэш выключен или принудительное обновление)"""
+    entry = await get_ofdata_entry(endpoint, params, allow_stale=False)
+    return entry.value if entry is not None else None
+
+
+async def get_ofdata_entry(endpoint: str, params: Dict[str, Any], allow_stale: bool = True) -> Optional[CacheEntry]:
+    """
+    Запись кэша для запроса OFData
+
+    С allow_stale возвращает и устаревшую запись в пределах окна
+    устаревания эндпоинта — вызывающий сам решает, обновлять ли её.
+    """
+    name, key, ttl = _ofdata_cache_entry(endpoint, params)
+    if ttl <= 0 or _cache_bypass.get():
+        return None
+    entry = await get_cache_service().get_entry(key, _get_max_stale_for_endpoint(name))
+    if entry is not None and not entry.is_fresh and not allow_stale:
+        entry = None
+    _served(name, entry)
+    return entry
+
+
+async def set_ofdata_cached(endpoint: str, params: Dict[str, Any], value: Any) -> bool:
+    """Сохраняет ответ OFData с TTL эндпоинта"""
+    name, key, ttl = _ofdata_cache_entry(endpoint, params)
+    if ttl <= 0:
+        return False
+    return await get_cache_service().set(key, value, ttl, _get_max_stale_for_endpoint(name))
+
+
+async def warm_ofdata_cache(requests: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Поднимает в память процесса ответы для пачки запросов OFData
+
+    Один запрос к SQLite вместо одного на секцию; последующие вызовы
+    клиента находят ответы в памяти. Возвращает число найденных записей.
+    """
+    if _cache_bypass.get():
+        return 0
+    keys: List[str] = []
+    max_stale = 0
+    for endpoint, params in requests:
+        name, key, ttl = _ofdata_cache_entry(endpoint, params)
+        if ttl > 0:
+            keys.append(key)
+            max_stale = max(max_stale, _get_max_stale_for_endpoint(name))
+    if not keys:
+        return 0
+    return len(await get_cache_service().get_many(keys, max_stale))
+
+
+def get_ofdata_cached_sync(endpoint: str, params: Dict[str, Any]) -> Optional[Any]:
+    """Синхронный вариант get_ofdata_cached()"""
+    name, key, ttl = _ofdata_cache_entry(endpoint, params)
+    if ttl <= 0 or _cache_bypass.get():
+        return None
+    # Устаревшую запись не удаляем: она ещё пригодна для асинхронного клиента
+    entry = get_cache_service().get_entry_sync(key, _get_max_stale_for_endpoint(name))
+    if entry is not None and not entry.is_fresh:
+        entry = None
+    _served(name, entry)
+    return entry.value if entry is not None else None
+
+
+def set_ofdata_cached_sync(endpoint: str, params: Dict[str, Any], value: Any) -> bool:
+    """Синхронный вариант set_ofdata_cached()"""
+    name, key, ttl = _ofdata_cache_entry(endpoint, params)
+    if ttl <= 0:
+        return False
+    return get_cache_service().set_sync(key, value, ttl, _get_max_stale_for_endpoint(name))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Формат хранения значений кэша
+
+Значение — BLOB с заголовком из одного байта (версия формата):
+    0x01 — JSON, сжатый zlib
+    0x02 — JSON, сжатый zstd со словарём; следом 4 байта id словаря (big-endian)
+    0x03 — JSON, сжатый zstd без словаря
+Старые строки (TEXT с JSON) читаются как есть.
+
+Словарь zstd обучается на собственных ответах OFData (scripts/train_cache_dict.py)
+и лежит в CACHE_ZSTD_DICT_PATH. Пакет zstandard необязателен: без него
+новые значения сжимаются zlib, а записи zstd считаются промахом кэша.
+"""
+import json
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, Optional, Tuple, Union
+
+from core.logger import get_logger
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - зависит от окружения
+    zstandard = None
+
+log = get_logger(__name__)
+
+FORMAT_ZLIB = 0x01
+FORMAT_ZSTD_DICT = 0x02
+FORMAT_ZSTD = 0x03
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+DEFAULT_DICT_SIZE = 112 * 1024
+
+
+class CacheDecodeError(ValueError):
+    """Значение нельзя разобрать в этом окружении (нет zstandard или словаря)"""
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DEFAULT_DICT_SIZE) -> bytes:
+    """Обучает словарь zstd на образцах (несжатый JSON ответов)"""
+    if zstandard is None:
+        raise RuntimeError("Для обучения словаря нужен пакет zstandard")
+    return zstandard.train_dictionary(size, list(samples)).as_bytes()
+
+
+class CacheCodec:
+    """Сжатие и разбор значений кэша"""
+
+    def __init__(self, compression: str = "zstd", dict_path: Optional[str] = None,
+                 dict_data: Optional[bytes] = None):
+        if compression == "zstd" and zstandard is None:
+            log.warning("cache_codec: zstandard not installed, falling back to zlib")
+            compression = "zlib"
+        self.compression = compression
+        self._dict = None
+        self._dict_id = 0
+        if compression == "zstd" and dict_data is None and dict_path and Path(dict_path).exists():
+            dict_data = Path(dict_path).read_bytes()
+        if compression == "zstd" and dict_data:
+            self._dict = zstandard.ZstdCompressionDict(dict_data)
+            self._dict_id = self._dict.dict_id()
+            log.info("cache_codec: zstd dictionary loaded", dict_id=self._dict_id)
+        # Объекты zstandard нельзя делить между потоками
+        self._local = threading.local()
+
+    def encode(self, value: Any) -> Tuple[Union[bytes, str], int]:
+        """Возвращает (значение для SQLite, размер несжатого JSON в байтах)"""
+        raw = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        if self.compression == "none":
+            return raw.decode("utf-8"), len(raw)
+        if self.compression == "zstd":
+            if self._dict is not None:
+                header = bytes([FORMAT_ZSTD_DICT]) + struct.pack(">I", self._dict_id)
+            else:
+                header = bytes([FORMAT_ZSTD])
+            return header + self._get_compressor().compress(raw), len(raw)
+        return bytes([FORMAT_ZLIB]) + zlib.compress(raw, ZLIB_LEVEL), len(raw)
+
+    def decode(self, stored: Union[bytes, str]) -> Tuple[Any, int]:
+        """Возвращает (значение, размер несжатого JSON); CacheDecodeError — считать промахом"""
+        if isinstance(stored, str):
+            return json.loads(stored), len(stored)
+        version = stored[0]
+        if version == FORMAT_ZLIB:
+            raw = zlib.decompress(stored[1:])
+        elif version in (FORMAT_ZSTD, FORMAT_ZSTD_DICT):
+            if zstandard is None:
+                raise CacheDecodeError("zstandard is not installed")
+            if version == FORMAT_ZSTD_DICT:
+                (dict_id,) = struct.unpack(">I", stored[1:5])
+                raw = self._get_decompressor(dict_id).decompress(stored[5:])
+            else:
+                raw = self._get_decompressor(0).decompress(stored[1:])
+        elif version in (ord("{"), ord("[")):
+            raw = stored  # несжатый JSON, записанный как BLOB
+        else:
+            raise CacheDecodeError(f"unknown cache value format: {version}")
+        return json.loads(raw), len(raw)
+
+    def _get_compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self._dict)
+            self._local.compressor = compressor
+        return compressor
+
+    def _get_decompressor(self, dict_id: int):
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id and dict_id != self._dict_id:
+                raise CacheDecodeError(f"zstd dictionary {dict_id} is not loaded")
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._dict if dict_id else None)
+            decompressors[dict_id] = decompressor
+        return decompressor
@@ -7,7 +7,7 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime, date
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Integer, DateTime, Text, JSON, Index
+from sqlalchemy import String, Integer, BigInteger, Float, DateTime, Text, JSON, Index
 from core.logger import get_logger
 
 from settings import DATABASE_URL, DATABASE_TYPE
@@ -40,6 +40,34 @@ class BotStats(Base):
     )
 
 
+class QueueTaskRecord(Base):
+    """Persistent queue task (see services.queue.DatabaseTaskStore)."""
+    __tablename__ = "queue_tasks"
+    
+    id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    task_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    fair_key: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    retry_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_retries: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    created_at: Mapped[float] = mapped_column(Float, nullable=False)
+    started_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    completed_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    lease_until: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    
+    __table_args__ = (
+        Index('idx_queue_tasks_dequeue', 'task_type', 'status', 'priority', 'fair_key'),
+        Index('idx_queue_tasks_lease', 'status', 'lease_until'),
+        Index('idx_queue_tasks_completed_at', 'completed_at'),
+    )
+
+
 class DatabaseService:
     """Database service with async SQLAlchemy support."""
     
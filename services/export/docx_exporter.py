@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+DOCX-приложение к отчёту
+
+Документ собирается из шаблона (DOCX_TEMPLATE_PATH): из него берутся стили
+«Обычный», «Заголовок 1», «Сетка таблицы» и параметры страницы, содержимое
+шаблона отбрасывается. Источник — IR отчёта (services.report.ir):
+заголовки секций, строки «ключ: значение» (ключ жирным) и таблицы выводятся
+из структуры, а не угадываются по тексту. Абзацы добавляются прямо в XML
+тела документа, готовый файл сохраняется в память — без временных файлов.
+
+Сборка большого отчёта занимает заметное время и всё это время держит GIL,
+поэтому export_docx выполняет её в пуле процессов (DOCX_EXPORT_WORKERS).
+"""
+import asyncio
+import io
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional, Union
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Pt
+from lxml import etree
+
+from core.logger import get_logger
+from services.report.ir import Report, Row, Table, register_emitter, sections_from_text
+from settings import DOCX_EXPORT_WORKERS, DOCX_TEMPLATE_PATH
+
+log = get_logger(__name__)
+
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+# Управляющие символы недопустимы в XML (табуляция заменяется пробелами отдельно)
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+# Шаблон без содержимого; готовится один раз на процесс
+_template: Optional[bytes] = None
+
+
+def _prepare_template(path: str) -> bytes:
+    """Шаблон с очищенным телом и базовым шрифтом"""
+    if path and Path(path).is_file():
+        doc = Document(path)
+    else:
+        log.warning("DOCX: template not found, using python-docx default", path=path)
+        doc = Document()
+    body = doc.element.body
+    for child in list(body):
+        if child.tag != qn("w:sectPr"):
+            body.remove(child)
+
+    style = doc.styles["Normal"]
+    style.font.name = "Calibri"
+    style.element.rPr.rFonts.set(qn("w:eastAsia"), "Calibri")
+    style.font.size = Pt(11)
+
+    # Свойства демо-документа не должны попадать в приложение
+    props = doc.core_properties
+    props.title = props.subject = props.author = props.last_modified_by = ""
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _text(text: str) -> str:
+    return _INVALID_XML_CHARS.sub("", text.replace("\t", "    "))
+
+
+def _run(parent: etree._Element, text: str, bold: bool = False) -> None:
+    r = etree.SubElement(parent, qn("w:r"))
+    if bold:
+        etree.SubElement(etree.SubElement(r, qn("w:rPr")), qn("w:b"))
+    t = etree.SubElement(r, qn("w:t"))
+    t.text = text
+    if text != text.strip():
+        # Отступы вложенных полей («  Код статуса: …») иначе теряются
+        t.set(XML_SPACE, "preserve")
+
+
+def _paragraph(text: str = "", style_id: Optional[str] = None) -> etree._Element:
+    p = etree.Element(qn("w:p"))
+    if style_id:
+        ppr = etree.SubElement(p, qn("w:pPr"))
+        etree.SubElement(ppr, qn("w:pStyle")).set(qn("w:val"), style_id)
+    if text:
+        _run(p, _text(text))
+    return p
+
+
+def _row_paragraph(row: Row) -> etree._Element:
+    if row.key is None:
+        return _paragraph(" " * row.indent + row.text)
+    p = etree.Element(qn("w:p"))
+    _run(p, _text(" " * row.indent + row.key + ":"), bold=True)
+    if row.value is not None:
+        _run(p, _text(" " + row.value))
+    return p
+
+
+def _table(table: Table, style_id: Optional[str]) -> etree._Element:
+    tbl = etree.Element(qn("w:tbl"))
+    tbl_pr = etree.SubElement(tbl, qn("w:tblPr"))
+    if style_id:
+        etree.SubElement(tbl_pr, qn("w:tblStyle")).set(qn("w:val"), style_id)
+    width = etree.SubElement(tbl_pr, qn("w:tblW"))
+    width.set(qn("w:w"), "0")
+    width.set(qn("w:type"), "auto")
+    grid = etree.SubElement(tbl, qn("w:tblGrid"))
+    for _ in table.columns:
+        etree.SubElement(grid, qn("w:gridCol"))
+    # Первая строка — заголовки столбцов (жирным)
+    for n, cells in enumerate([table.columns] + table.rows):
+        tr = etree.SubElement(tbl, qn("w:tr"))
+        for cell in cells:
+            p = etree.SubElement(etree.SubElement(tr, qn("w:tc")), qn("w:p"))
+            if cell:
+                _run(p, _text(str(cell)), bold=not n)
+    return tbl
+
+
+def _style_id(doc, name: str) -> Optional[str]:
+    try:
+        return doc.styles[name].style_id
+    except KeyError:
+        return None
+
+
+@register_emitter("docx")
+def build_docx(report: Union[str, Report]) -> bytes:
+    """
+    Собирает DOCX-приложение и возвращает содержимое файла
+
+    Args:
+        report: IR отчёта или текст (переводится в IR один раз)
+    """
+    global _template
+    if _template is None:
+        _template = _prepare_template(DOCX_TEMPLATE_PATH)
+    if isinstance(report, str):
+        report = Report(sections_from_text("report", report))
+    doc = Document(io.BytesIO(_template))
+    heading = _style_id(doc, "Heading 1")
+    grid = _style_id(doc, "Table Grid")
+    # Абзацы вставляются перед параметрами страницы — последним элементом тела
+    append = doc.element.body[-1].addprevious
+
+    for section in report.sections:
+        if section.heading is not None:
+            append(_paragraph(section.heading, heading))
+        for n, block in enumerate(section.blocks):
+            if n:
+                append(_paragraph())
+            for row in block.rows:
+                append(_table(row, grid) if isinstance(row, Table) else _row_paragraph(row))
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+# Пул процессов (None — ещё не создан или отключён)
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if _executor is None and DOCX_EXPORT_WORKERS > 0:
+        # spawn: дочерний процесс не наследует потоки и соединения бота
+        _executor = ProcessPoolExecutor(
+            max_workers=DOCX_EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def export_docx(report: Union[str, Report]) -> bytes:
+    """Собирает DOCX вне event loop: в пуле процессов или, если он отключён, в потоке"""
+    global _executor
+    executor = _get_executor()
+    if executor is None:
+        return await asyncio.to_thread(build_docx, report)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, build_docx, report)
+    except BrokenProcessPool as e:
+        # Процесс пула упал (например, убит по памяти) — следующий вызов создаст новый пул
+        log.warning("DOCX: process pool broken, building in thread", error=str(e))
+        if _executor is executor:
+            _executor = None
+        executor.shutdown(wait=False)
+        return await asyncio.to_thread(build_docx, report)
+
+
+async def close_docx_executor() -> None:
+    """Останавливает пул процессов сборки DOCX"""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш готовых файлов Gamma с адресацией по содержимому
+
+Ключ — SHA-256 от всего, что влияет на результат генерации: текста отчёта,
+формата, языка, темы, числа карточек и инструкций. Одинаковые входные данные
+дают тот же файл, поэтому повторный отчёт по неизменившейся компании
+отдаётся с диска за секунды и не расходует дневной лимит Gamma.
+
+Файлы лежат в одном каталоге как <ключ>.pdf / <ключ>.pptx; если Gamma вернула
+только ссылку на редактор, сохраняется <ключ>.link. Время изменения файла —
+время последнего использования: по нему работают TTL и вытеснение по LRU
+при превышении лимита размера каталога.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from core.logger import get_logger
+from settings import (
+    GAMMA_ARTIFACT_DIR,
+    GAMMA_ARTIFACT_MAX_BYTES,
+    GAMMA_ARTIFACT_TTL_H,
+)
+
+log = get_logger(__name__)
+
+LINK_PREFIX = "LINK:"
+LINK_SUFFIX = ".link"
+TMP_SUFFIX = ".tmp"
+
+
+def artifact_key(
+    input_text: str,
+    *,
+    export_as: str,
+    language: str = "ru",
+    theme_name: Optional[str] = None,
+    num_cards: Optional[int] = None,
+    instructions: Optional[str] = None,
+) -> str:
+    """Ключ артефакта: хэш всех входных данных генерации"""
+    material = json.dumps(
+        [input_text, export_as, language, theme_name or "", num_cards, instructions or ""],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GammaArtifactStore:
+    """Каталог готовых файлов Gamma с TTL и лимитом размера"""
+
+    def __init__(self, root: str = GAMMA_ARTIFACT_DIR, ttl_hours: float = GAMMA_ARTIFACT_TTL_H,
+                 max_bytes: int = GAMMA_ARTIFACT_MAX_BYTES):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str, export_as: str) -> Path:
+        return self.root / f"{key}.{export_as}"
+
+    def _link_path(self, key: str) -> Path:
+        return self.root / f"{key}{LINK_SUFFIX}"
+
+    def _is_fresh(self, path: Path, now: float) -> bool:
+        try:
+            return now - path.stat().st_mtime < self.ttl_seconds
+        except FileNotFoundError:
+            return False
+
+    def get(self, key: str, export_as: str, dest_path: str) -> Optional[str]:
+        """
+        Результат генерации из кэша
+
+        Файл копируется в dest_path (у пользователя своё имя файла, а копия
+        в кэше не должна меняться при перезаписи dest_path).
+
+        Returns:
+            dest_path, "LINK:<url>" или None, если записи нет или она устарела
+        """
+        now = time.time()
+        for path in (self._path(key, export_as), self._link_path(key)):
+            if not path.exists():
+                continue
+            if not self._is_fresh(path, now):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                if path.suffix == LINK_SUFFIX:
+                    result = LINK_PREFIX + path.read_text(encoding="utf-8")
+                else:
+                    _copy_atomic(path, Path(dest_path))
+                    result = dest_path
+                # Отметка использования для LRU (TTL отсчитывается от неё же)
+                os.utime(path, (now, now))
+            except OSError as e:
+                log.warning("Gamma artifacts: read failed", key=key, error=str(e))
+                return None
+            log.info("Gamma artifacts: hit", key=key, export_as=export_as)
+            return result
+        return None
+
+    def put(self, key: str, export_as: str, result: Optional[str]) -> bool:
+        """Сохраняет результат генерации (путь к файлу или "LINK:<url>")"""
+        if not result:
+            return False
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            if result.startswith(LINK_PREFIX):
+                link_path = self._link_path(key)
+                tmp = _temp_path(link_path)
+                try:
+                    tmp.write_text(result[len(LINK_PREFIX):], encoding="utf-8")
+                    os.replace(tmp, link_path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+            else:
+                _copy_atomic(Path(result), self._path(key, export_as))
+                # Файл важнее ссылки: старая ссылка на этот же ключ больше не нужна
+                self._link_path(key).unlink(missing_ok=True)
+        except OSError as e:
+            log.warning("Gamma artifacts: store failed", key=key, error=str(e))
+            return False
+        log.info("Gamma artifacts: stored", key=key, export_as=export_as)
+        self.evict()
+        return True
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        if not self.root.is_dir():
+            return entries
+        with os.scandir(self.root) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.is_file():
+                    entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return entries
+
+    def evict(self) -> int:
+        """Удаляет устаревшие записи, затем самые давно использованные сверх лимита размера"""
+        now = time.time()
+        removed = 0
+        kept = []
+        for mtime, size, path in self._entries():
+            # Брошенные временные файлы (упавшая запись) тоже чистим по TTL
+            if now - mtime >= self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                removed += 1
+            elif path.suffix != TMP_SUFFIX:
+                kept.append((mtime, size, path))
+        if self.max_bytes > 0:
+            total = sum(size for _, size, _ in kept)
+            for mtime, size, path in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        if removed:
+            log.info("Gamma artifacts: evicted", removed=removed)
+        return removed
+
+
+def _temp_path(dest: Path) -> Path:
+    """Уникальный временный файл рядом с dest: параллельные записи одного dest не мешают друг другу"""
+    fd, name = tempfile.mkstemp(prefix=f"{dest.name}.", suffix=TMP_SUFFIX, dir=dest.parent)
+    os.close(fd)
+    return Path(name)
+
+
+def _copy_atomic(src: Path, dest: Path) -> None:
+    """Копия через временный файл: читатель никогда не видит недописанный файл"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(dest)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+# Глобальный экземпляр
+_artifact_store: Optional[GammaArtifactStore] = None
+
+
+def get_artifact_store() -> GammaArtifactStore:
+    """Получает глобальный кэш файлов Gamma"""
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = GammaArtifactStore()
+    return _artifact_store
@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+"""
+Асинхронный клиент Gamma Generate API
+
+Один пул keep-alive соединений httpx.AsyncClient на процесс и один поллер на
+все незавершённые генерации. Каждая генерация стоит в общем расписании;
+поллер делает одну проверку статуса, когда подходит её время, и переносит
+следующую проверку с растущим интервалом (часто в начале, реже потом).
+Ответ 429 с Retry-After приостанавливает все запросы к Gamma, а не только
+тот, что его получил.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from core.logger import get_logger
+from services.export.gamma_artifacts import GammaArtifactStore, artifact_key, get_artifact_store
+from services.export.gamma_chunks import PDF_MERGE_AVAILABLE, Chunk, merge_pdfs, plan_chunks
+from services.export.gamma_exporter import (
+    SELENIUM_AVAILABLE,
+    GammaError,
+    _build_payload,
+    _find_export_url,
+    _output_filename,
+    _sectioned_text,
+    get_pdf_via_selenium,
+)
+from services.http_pool import discard_client
+from settings import (
+    GAMMA_API_BASE,
+    GAMMA_API_KEY,
+    GAMMA_ARTIFACT_CACHE_ENABLED,
+    GAMMA_CHUNK_MAX_CARDS,
+    GAMMA_CHUNKED_ENABLED,
+    GAMMA_COMPACT_INSTRUCTIONS,
+    GAMMA_NUM_CARDS,
+    GAMMA_POLL_BACKOFF,
+    GAMMA_POLL_INITIAL_SEC,
+    GAMMA_POLL_INTERVAL_SEC,
+    GAMMA_POLL_TIMEOUT_SEC,
+    GAMMA_POOL_MAX_CONNECTIONS,
+)
+
+log = get_logger(__name__)
+
+FAILED_STATUSES = ("failed", "error")
+# Сколько раз create/files повторяются после 429, прежде чем сдаться
+RATE_LIMIT_RETRIES = 3
+
+
+def _retry_after(value: Optional[str], default: float) -> float:
+    """Секунды из заголовка Retry-After (число или HTTP-дата)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+def _generation_options(report_text: str, export_as: str, language: str,
+                        theme_name: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """Текст и параметры POST /generations для отчёта"""
+    return _sectioned_text(report_text), {
+        "export_as": export_as,
+        "format": "document",
+        "text_mode": "generate",
+        "language": language,
+        "theme_name": theme_name,
+        "card_split": "inputTextBreaks",
+        "num_cards": GAMMA_NUM_CARDS if GAMMA_NUM_CARDS > 0 else None,
+        "additional_instructions": GAMMA_COMPACT_INSTRUCTIONS,
+    }
+
+
+def _options_key(input_text: str, options: Dict[str, Any]) -> str:
+    return artifact_key(
+        input_text,
+        export_as=options["export_as"],
+        language=options["language"],
+        theme_name=options["theme_name"],
+        num_cards=options["num_cards"],
+        instructions=options["additional_instructions"],
+    )
+
+
+@dataclass
+class _Generation:
+    """Незавершённая генерация в расписании поллера"""
+    generation_id: str
+    future: asyncio.Future
+    deadline: float
+    timeout_sec: float
+    interval: float
+    progress_callback: Optional[Callable] = None
+    started: float = field(default_factory=time.monotonic)
+
+
+class AsyncGammaClient:
+    """Асинхронный клиент Gamma с общим пулом соединений и общим поллером"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = GAMMA_API_BASE,
+        timeout: float = 30.0,
+        initial_interval: float = GAMMA_POLL_INITIAL_SEC,
+        max_interval: float = GAMMA_POLL_INTERVAL_SEC,
+        backoff: float = GAMMA_POLL_BACKOFF,
+        poll_timeout: float = GAMMA_POLL_TIMEOUT_SEC,
+        max_connections: int = GAMMA_POOL_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        artifacts: Optional[GammaArtifactStore] = None,
+    ):
+        """Инициализация клиента (соединение и поллер создаются лениво в текущем event loop)"""
+        self.api_key = GAMMA_API_KEY if api_key is None else api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.initial_interval = float(initial_interval)
+        self.max_interval = max(float(max_interval), self.initial_interval)
+        self.backoff = max(1.0, float(backoff))
+        self.poll_timeout = float(poll_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections)
+        self._transport = transport
+        # Кэш готовых файлов (None — всегда генерировать заново)
+        self.artifacts = artifacts
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Расписание поллера: (время проверки, порядковый номер, генерация)
+        self._generations: Dict[str, _Generation] = {}
+        self._schedule: List[Tuple[float, int, _Generation]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._callbacks: Set[asyncio.Task] = set()
+        # До этого момента (time.monotonic) запросы к Gamma не отправляются
+        self._paused_until = 0.0
+
+    def _ensure_http(self) -> httpx.AsyncClient:
+        """Возвращает httpx.AsyncClient, привязанный к текущему event loop"""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._loop is not loop:
+            # Пул соединений и futures поллера нельзя разделять между event loop'ами;
+            # пул прежнего loop закрывается
+            discard_client(self._http, self._loop)
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport,
+            )
+            self._loop = loop
+            self._generations.clear()
+            self._schedule.clear()
+            self._wakeup = asyncio.Event()
+            self._poller = None
+            self._paused_until = 0.0
+            log.debug("AsyncGammaClient: pool created", max_connections=self.limits.max_connections)
+        return self._http
+
+    def _headers(self) -> Dict[str, str]:
+        return {"X-API-KEY": self.api_key or ""}
+
+    async def aclose(self) -> None:
+        """Останавливает поллер (ожидающие генерации отменяются) и закрывает пул"""
+        for generation in self._generations.values():
+            if not generation.future.done():
+                generation.future.cancel()
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        self._generations.clear()
+        self._schedule.clear()
+        if self._callbacks:
+            await asyncio.gather(*self._callbacks, return_exceptions=True)
+        http, loop = self._http, self._loop
+        self._http = None
+        self._loop = None
+        if loop is asyncio.get_running_loop():
+            if http is not None and not http.is_closed:
+                await http.aclose()
+        else:
+            # Пул создан в другом event loop: aclose() здесь не сработает
+            discard_client(http, loop)
+
+    # --- Общий лимит по Retry-After ---
+
+    def _pause(self, response: httpx.Response) -> float:
+        """Приостанавливает все запросы к Gamma на время из Retry-After"""
+        delay = _retry_after(response.headers.get("Retry-After"), self.max_interval)
+        until = time.monotonic() + delay
+        if until > self._paused_until:
+            self._paused_until = until
+            log.warning("Gamma: 429 rate limit, pausing all requests", retry_after=delay)
+            if self._wakeup is not None:
+                self._wakeup.set()
+        return delay
+
+    async def _wait_pause(self) -> None:
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _api_request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Запрос к API Gamma с учётом общей паузы; 429 повторяется после Retry-After"""
+        http = self._ensure_http()
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await self._wait_pause()
+            resp = await http.request(method, path, headers=self._headers(), **kwargs)
+            if resp.status_code != 429:
+                return resp
+            self._pause(resp)
+        log.error("Gamma: 429 too many requests — rate limit", path=path)
+        raise GammaError("Too Many Requests (429)")
+
+    # --- Generate API ---
+
+    async def create_generation(self, input_text: str, **options) -> str:
+        """Создаёт генерацию и возвращает generationId (параметры как у gamma_exporter.create_generation)"""
+        payload = _build_payload(input_text, **options)
+        resp = await self._api_request("POST", "/generations", json=payload)
+        log.info("Gamma: create response", status=resp.status_code)
+        if resp.status_code == 401:
+            raise GammaError("Unauthorized (401)")
+        if resp.status_code == 403:
+            raise GammaError("Forbidden (403)")
+        if resp.status_code >= 400:
+            log.error("Gamma: API error", status=resp.status_code, body=resp.text)
+            raise GammaError(f"API error {resp.status_code}")
+        data = resp.json()
+        generation_id = data.get("generationId") or data.get("id")
+        if not generation_id:
+            log.error("Gamma: generationId missing in response", response_data=data)
+            raise GammaError("generationId missing in response")
+        log.info("Gamma: generation created", generation_id=generation_id)
+        return generation_id
+
+    async def wait_generation(
+        self,
+        generation_id: str,
+        *,
+        progress_callback: Optional[Callable] = None,
+        timeout_sec: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ждёт завершения генерации через общий поллер
+
+        progress_callback(status, elapsed, timeout) вызывается после каждой
+        проверки; он может быть синхронным или корутиной.
+
+        Raises:
+            GammaError: генерация завершилась ошибкой, API вернул ошибку или истёк таймаут
+        """
+        self._ensure_http()
+        existing = self._generations.get(generation_id)
+        if existing is not None:
+            # Генерацию уже ждут: подписываемся на тот же результат
+            return await asyncio.shield(existing.future)
+
+        timeout = self.poll_timeout if timeout_sec is None else float(timeout_sec)
+        generation = _Generation(
+            generation_id=generation_id,
+            future=asyncio.get_running_loop().create_future(),
+            deadline=time.monotonic() + timeout,
+            timeout_sec=timeout,
+            interval=self.initial_interval,
+            progress_callback=progress_callback,
+        )
+        self._generations[generation_id] = generation
+        self._schedule_check(generation, time.monotonic() + generation.interval)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll_loop())
+        try:
+            return await generation.future
+        finally:
+            # Если ожидающего отменили, генерация больше не нужна поллеру
+            self._forget(generation)
+
+    def _forget(self, generation: _Generation) -> None:
+        if self._generations.get(generation.generation_id) is generation:
+            del self._generations[generation.generation_id]
+
+    def _schedule_check(self, generation: _Generation, at: float) -> None:
+        heapq.heappush(self._schedule, (at, next(self._seq), generation))
+        self._wakeup.set()
+
+    async def _poll_loop(self) -> None:
+        """Единственный поллер: проверяет генерации по расписанию, пока они есть"""
+        try:
+            while self._generations:
+                now = time.monotonic()
+                if not self._schedule:
+                    # Генерации без проверки в расписании иначе ждали бы вечно
+                    for generation in self._generations.values():
+                        self._schedule_check(generation, now)
+                next_at = max(self._schedule[0][0], self._paused_until)
+                if next_at <= now:
+                    due = []
+                    while self._schedule and self._schedule[0][0] <= now:
+                        _, _, generation = heapq.heappop(self._schedule)
+                        # Записи генераций, которые уже никто не ждёт, просто отбрасываются
+                        if self._generations.get(generation.generation_id) is generation:
+                            due.append(generation)
+                    await asyncio.gather(*(self._check_safely(generation) for generation in due))
+                    continue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), next_at - now)
+                except asyncio.TimeoutError:
+                    pass
+        except Exception as e:
+            log.error("Gamma: poller crashed", error=str(e))
+            raise
+        finally:
+            # Поллер остановился с ожидающими генерациями — ожидающие не должны висеть
+            for generation in list(self._generations.values()):
+                self._resolve(generation, error=GammaError("Gamma poller stopped"))
+
+    async def _check_safely(self, generation: _Generation) -> None:
+        """_check, после непредвиденной ошибки которого генерация проверяется снова (до дедлайна)"""
+        try:
+            await self._check(generation)
+        except Exception as e:
+            log.warning("Gamma: status check failed, retrying", generation_id=generation.generation_id, error=str(e))
+            if not generation.future.done():
+                self._reschedule(generation)
+
+    async def _check(self, generation: _Generation) -> None:
+        """Одна проверка статуса; результат — либо future, либо следующая проверка в расписании"""
+        generation_id = generation.generation_id
+        now = time.monotonic()
+        if now >= generation.deadline:
+            log.warning("Gamma: polling timeout reached", generation_id=generation_id, timeout_sec=generation.timeout_sec)
+            self._resolve(generation, error=GammaError(f"Polling timeout after {generation.timeout_sec:.0f} seconds", retryable=False))
+            return
+        try:
+            resp = await self._http.get(f"/generations/{generation_id}", headers=self._headers())
+        except httpx.HTTPError as exc:
+            log.warning("Gamma: poll request failed, retrying", generation_id=generation_id, error=str(exc))
+            self._reschedule(generation)
+            return
+        if resp.status_code == 429:
+            # Интервал не растёт: проверка просто сдвигается за общую паузу
+            self._pause(resp)
+            self._schedule_check(generation, self._paused_until)
+            return
+        if resp.status_code >= 500:
+            log.warning("Gamma: server error while polling, retrying", generation_id=generation_id, status=resp.status_code)
+            self._reschedule(generation)
+            return
+        if resp.status_code >= 400:
+            log.error("Gamma: error while polling", generation_id=generation_id, status=resp.status_code, body=resp.text)
+            self._resolve(generation, error=GammaError(f"API error {resp.status_code}"))
+            return
+
+        try:
+            data = resp.json()
+        except ValueError:
+            log.warning("Gamma: non-JSON poll response, retrying", generation_id=generation_id, body=resp.text[:200])
+            self._reschedule(generation)
+            return
+        status = data.get("status") if isinstance(data, dict) else None
+        elapsed = time.monotonic() - generation.started
+        log.info("Gamma: polling status", generation_id=generation_id, status=status, elapsed=elapsed)
+        self._report_progress(generation, status, elapsed)
+        if status == "completed":
+            log.info("Gamma: generation completed", generation_id=generation_id)
+            self._resolve(generation, result=data)
+        elif status in FAILED_STATUSES:
+            message = data.get("error") or data.get("message") or status
+            self._resolve(generation, error=GammaError(f"Generation failed: {message}", retryable=False))
+        else:
+            self._reschedule(generation)
+
+    def _reschedule(self, generation: _Generation) -> None:
+        """Следующая проверка с растущим интервалом"""
+        generation.interval = min(generation.interval * self.backoff, self.max_interval)
+        self._schedule_check(generation, time.monotonic() + generation.interval)
+
+    def _resolve(self, generation: _Generation, result: Any = None, error: Optional[Exception] = None) -> None:
+        self._forget(generation)
+        if generation.future.done():
+            return
+        if error is not None:
+            generation.future.set_exception(error)
+        else:
+            generation.future.set_result(result)
+
+    def _report_progress(self, generation: _Generation, status: Optional[str], elapsed: float) -> None:
+        """Вызывает progress_callback, не задерживая поллер (корутина запускается отдельной задачей)"""
+        if not generation.progress_callback:
+            return
+        try:
+            outcome = generation.progress_callback(status, elapsed, generation.timeout_sec)
+        except Exception as e:
+            log.debug("Gamma: progress_callback failed", error=str(e))
+            return
+        if asyncio.iscoroutine(outcome):
+            task = asyncio.get_running_loop().create_task(self._run_progress(outcome))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    @staticmethod
+    async def _run_progress(coro) -> None:
+        try:
+            await coro
+        except Exception as e:
+            log.debug("Gamma: progress_callback failed", error=str(e))
+
+    # --- Файлы ---
+
+    async def _files_endpoint_url(self, generation_id: str, export_as: str) -> Optional[str]:
+        """Ссылка на файл из эндпоинтов files (если в ответе генерации её нет)"""
+        for path in (f"/files/{generation_id}", f"/generations/{generation_id}/files"):
+            try:
+                resp = await self._api_request("GET", path)
+            except (httpx.HTTPError, GammaError) as e:
+                log.warning("Gamma: files endpoint failed", path=path, error=str(e))
+                continue
+            log.info("Gamma: files endpoint response", path=path, status=resp.status_code)
+            if resp.status_code != 200:
+                continue
+            data = resp.json()
+            url = data.get(export_as) or data.get(export_as.upper()) or data.get("url")
+            if url:
+                return url
+        return None
+
+    async def download(self, url: str, dest_path: str) -> str:
+        """Скачивает файл потоком, без загрузки целиком в память"""
+        Path(os.path.dirname(dest_path) or ".").mkdir(parents=True, exist_ok=True)
+        http = self._ensure_http()
+        log.info("Gamma: downloading", dest_path=dest_path)
+        async with http.stream("GET", url, follow_redirects=True, timeout=120.0) as resp:
+            resp.raise_for_status()
+            with open(dest_path, "wb") as f:
+                async for chunk in resp.aiter_bytes():
+                    f.write(chunk)
+        log.info("Gamma: downloaded", dest_path=dest_path, file_size=os.path.getsize(dest_path))
+        return dest_path
+
+    async def generate(
+        self,
+        report_text: str,
+        *,
+        export_as: str = "pdf",
+        out_dir: str = "reports",
+        language: str = "ru",
+        theme_name: Optional[str] = None,
+        progress_callback: Optional[Callable] = None,
+        company_name: Optional[str] = None,
+        company_inn: Optional[str] = None,
+        rate_limiter=None,
+    ) -> Optional[str]:
+        """
+        Асинхронный аналог generate_pdf_from_report_text / generate_pptx_from_report_text
+
+        Если такой же отчёт уже генерировался (см. gamma_artifacts), файл
+        берётся из кэша без обращения к Gamma. Большой PDF-отчёт делится на
+        части (см. gamma_chunks), которые генерируются параллельно; каждая
+        часть после первой ждёт rate_limiter.wait() (лимит очереди Gamma).
+
+        Returns:
+            Путь к файлу, "LINK:<gammaUrl>", если файла нет, или None
+        """
+        if not self.api_key:
+            log.warning("Gamma: no API key configured")
+            return None
+        cached = await self.cached(
+            report_text, export_as=export_as, out_dir=out_dir, language=language,
+            theme_name=theme_name, company_name=company_name, company_inn=company_inn,
+        )
+        if cached:
+            return cached
+
+        input_text, options = _generation_options(report_text, export_as, language, theme_name)
+        chunks = []
+        if export_as == "pdf" and GAMMA_CHUNKED_ENABLED and PDF_MERGE_AVAILABLE:
+            chunks = plan_chunks(report_text, GAMMA_CHUNK_MAX_CARDS)
+        if len(chunks) > 1:
+            key = _options_key(input_text, options)
+            dest = os.path.join(out_dir, _output_filename(company_name, company_inn, key[:12], export_as))
+            path = await self._generate_chunked(chunks, options, dest, progress_callback, rate_limiter)
+        else:
+            generation_id = await self.create_generation(input_text, **options)
+            result = await self.wait_generation(generation_id, progress_callback=progress_callback)
+            dest = os.path.join(out_dir, _output_filename(company_name, company_inn, generation_id, export_as))
+            path = await self._export(generation_id, result, export_as, dest)
+        if path and self.artifacts is not None:
+            await asyncio.to_thread(self.artifacts.put, _options_key(input_text, options), export_as, path)
+        return path
+
+    async def _generate_chunked(self, chunks: List[Chunk], options: Dict[str, Any], dest: str,
+                                progress_callback: Optional[Callable], rate_limiter) -> Optional[str]:
+        """Генерирует части параллельно и склеивает PDF; если хоть одна часть не удалась — None"""
+        started = time.monotonic()
+        statuses = ["pending"] * len(chunks)
+
+        def chunk_progress(index: int) -> Optional[Callable]:
+            if not progress_callback:
+                return None
+
+            def report(status, elapsed, timeout):
+                statuses[index] = status
+                done = statuses.count("completed")
+                return progress_callback(f"{status} ({done}/{len(chunks)})", time.monotonic() - started, timeout)
+
+            return report
+
+        async def generate_chunk(index: int, chunk: Chunk) -> Optional[str]:
+            if index and rate_limiter is not None:
+                # Первую часть уже оплатил воркер очереди
+                await rate_limiter.wait()
+            chunk_options = dict(options, num_cards=chunk.cards)
+            generation_id = await self.create_generation(_sectioned_text(chunk.text), **chunk_options)
+            result = await self.wait_generation(generation_id, progress_callback=chunk_progress(index))
+            path = await self._export(generation_id, result, "pdf", part_paths[index])
+            return path if path and not path.startswith("LINK:") else None
+
+        log.info("Gamma: chunked generation", chunks=len(chunks), dest=dest)
+        part_paths = [f"{dest}.part{i}" for i in range(len(chunks))]
+        tasks = [asyncio.ensure_future(generate_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            paths = await asyncio.gather(*tasks)
+            if not all(paths):
+                log.warning("Gamma: chunk failed, no merged PDF", failed=[i for i, p in enumerate(paths) if not p])
+                return None
+            return await asyncio.to_thread(merge_pdfs, paths, chunks, dest)
+        finally:
+            # Ошибка одной части отменяет остальные: склеивать уже нечего
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for path in part_paths:
+                Path(path).unlink(missing_ok=True)
+
+    async def cached(
+        self,
+        report_text: str,
+        *,
+        export_as: str = "pdf",
+        out_dir: str = "reports",
+        language: str = "ru",
+        theme_name: Optional[str] = None,
+        company_name: Optional[str] = None,
+        company_inn: Optional[str] = None,
+    ) -> Optional[str]:
+        """Результат generate() из кэша файлов, без генерации (None — нужно генерировать)"""
+        if self.artifacts is None:
+            return None
+        input_text, options = _generation_options(report_text, export_as, language, theme_name)
+        key = _options_key(input_text, options)
+        dest = os.path.join(out_dir, _output_filename(company_name, company_inn, key[:12], export_as))
+        return await asyncio.to_thread(self.artifacts.get, key, export_as, dest)
+
+    async def _export(self, generation_id: str, result: Dict[str, Any], export_as: str, dest: str) -> Optional[str]:
+        """Скачивает файл завершённой генерации (или возвращает ссылку на редактор)"""
+        url = (
+            _find_export_url(result, export_as)
+            or result.get("downloadUrl")
+            or await self._files_endpoint_url(generation_id, export_as)
+        )
+        if not url:
+            gamma_url = result.get("gammaUrl")
+            if gamma_url and export_as == "pdf" and SELENIUM_AVAILABLE:
+                try:
+                    return await asyncio.to_thread(get_pdf_via_selenium, gamma_url, dest)
+                except Exception as e:
+                    log.warning("Gamma: Selenium PDF extraction failed", error=str(e))
+            if gamma_url:
+                log.warning("Gamma: no export url found, returning edit link", gamma_url=gamma_url)
+                return f"LINK:{gamma_url}"
+            log.warning("Gamma: no export url found in any format", generation_id=generation_id)
+            return None
+
+        try:
+            return await self.download(url, dest)
+        except Exception as e:
+            # Ссылки на файлы временные: запрашиваем свежую и пробуем ещё раз
+            log.warning("Gamma: download failed, trying to get fresh URL", error=str(e))
+            try:
+                fresh = await self.wait_generation(generation_id, timeout_sec=60)
+                fresh_url = _find_export_url(fresh, export_as)
+                if fresh_url:
+                    return await self.download(fresh_url, dest)
+                log.error("Gamma: no fresh export URL found", generation_id=generation_id)
+            except Exception as fresh_error:
+                log.error("Gamma: failed to get fresh export URL", error=str(fresh_error))
+            return None
+
+    async def generate_pdf(self, report_text: str, **kwargs) -> Optional[str]:
+        return await self.generate(report_text, export_as="pdf", **kwargs)
+
+    async def generate_pptx(self, report_text: str, **kwargs) -> Optional[str]:
+        return await self.generate(report_text, export_as="pptx", **kwargs)
+
+
+# Глобальный экземпляр клиента
+_gamma_client: Optional[AsyncGammaClient] = None
+
+
+def get_gamma_client() -> AsyncGammaClient:
+    """Получает глобальный экземпляр асинхронного клиента Gamma"""
+    global _gamma_client
+    if _gamma_client is None:
+        _gamma_client = AsyncGammaClient(
+            artifacts=get_artifact_store() if GAMMA_ARTIFACT_CACHE_ENABLED else None,
+        )
+    return _gamma_client
+
+
+async def close_gamma_client() -> None:
+    """Закрывает глобальный клиент (вызывается при остановке приложения)"""
+    global _gamma_client
+    if _gamma_client is not None:
+        await _gamma_client.aclose()
+        _gamma_client = None
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Разбиение большого отчёта на несколько генераций Gamma и склейка PDF
+
+Gamma принимает не больше 60 карточек на генерацию, а время генерации
+растёт с объёмом текста. Большой отчёт делится по границам секций
+(заголовок + строка «=====») на части не больше GAMMA_CHUNK_MAX_CARDS
+карточек; части генерируются параллельно, а готовые PDF склеиваются
+локально. Первая часть начинается с карточки «Содержание», а в итоговом
+PDF есть оглавление (закладки) со ссылками на начало каждой секции.
+
+Склейка требует пакета pypdf; без него отчёт генерируется одной частью.
+"""
+from dataclasses import dataclass, field
+from typing import List, Sequence, Tuple
+
+from core.logger import get_logger
+from services.report.constants import SECTION_SEPARATOR
+
+log = get_logger(__name__)
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PDF_MERGE_AVAILABLE = True
+except ImportError:
+    PDF_MERGE_AVAILABLE = False
+
+PREAMBLE_TITLE = "Общие сведения"
+TOC_TITLE = "СОДЕРЖАНИЕ"
+CONTINUED = " (продолжение)"
+
+
+@dataclass
+class Chunk:
+    """Часть отчёта для одной генерации"""
+    text: str
+    cards: int
+    titles: List[str] = field(default_factory=list)
+
+
+def _is_separator(line: str) -> bool:
+    stripped = line.strip()
+    return len(stripped) >= 10 and set(stripped) == {"="}
+
+
+def _cards(text: str) -> int:
+    # Gamma режет текст на карточки по пустым строкам (см. gamma_exporter._sectioned_text)
+    return text.count("\n\n") + 1
+
+
+def split_sections(report_text: str) -> List[Tuple[str, str]]:
+    """Секции отчёта: [(заголовок, текст секции вместе с заголовком)]"""
+    lines = report_text.splitlines()
+    starts = [
+        i for i in range(len(lines) - 1)
+        if lines[i].strip() and _is_separator(lines[i + 1])
+    ]
+    sections = []
+    head = "\n".join(lines[:starts[0] if starts else len(lines)]).strip("\n")
+    if head.strip():
+        sections.append((PREAMBLE_TITLE, head))
+    for n, start in enumerate(starts):
+        end = starts[n + 1] if n + 1 < len(starts) else len(lines)
+        sections.append((lines[start].strip(), "\n".join(lines[start:end]).strip("\n")))
+    return sections
+
+
+def plan_chunks(report_text: str, max_cards: int) -> List[Chunk]:
+    """
+    Делит отчёт на части не больше max_cards карточек, сохраняя порядок секций
+
+    Секция целиком переносится в следующую часть, если не помещается в
+    текущую. Секция больше целой части — или не помещающаяся в ещё пустую
+    первую часть (иначе первая генерация состояла бы из одного оглавления) —
+    делится по абзацам: начало заполняет текущую часть, продолжение
+    получает заголовок «(продолжение)».
+    Отчёт, который помещается в одну генерацию, возвращается одной частью
+    без изменений.
+    """
+    max_cards = max(2, max_cards)
+    if _cards(report_text) <= max_cards:
+        return [Chunk(text=report_text, cards=_cards(report_text))]
+
+    chunks = [Chunk(text="", cards=0)]
+
+    def room() -> int:
+        # Карточка «Содержание» занимает место в первой части
+        limit = max_cards - 1 if len(chunks) == 1 else max_cards
+        return limit - chunks[-1].cards
+
+    def add(title: str, paragraphs: List[str]) -> None:
+        chunk = chunks[-1]
+        text = "\n\n".join(paragraphs)
+        chunk.text = f"{chunk.text}\n\n{text}" if chunk.text else text
+        chunk.cards += len(paragraphs)
+        if title not in chunk.titles:
+            chunk.titles.append(title)
+
+    for title, text in split_sections(report_text):
+        paragraphs = text.split("\n\n")
+        while paragraphs:
+            # Пустую часть не оставляем: первая тогда была бы одним оглавлением
+            if len(paragraphs) > room() and chunks[-1].cards and (len(paragraphs) <= max_cards or room() <= 0):
+                chunks.append(Chunk(text="", cards=0))
+            if len(paragraphs) <= room():
+                add(title, paragraphs)
+                break
+            take = room()
+            add(title, paragraphs[:take])
+            rest = paragraphs[take:]
+            rest[0] = f"{title}{CONTINUED}\n{SECTION_SEPARATOR}\n{rest[0]}"
+            paragraphs = rest
+
+    # Оглавление (без номеров страниц — они известны только после генерации)
+    titles = _unique(title for chunk in chunks for title in chunk.titles)
+    toc = TOC_TITLE + "\n" + "\n".join(f"{n}. {title}" for n, title in enumerate(titles, 1))
+    chunks[0].text = f"{toc}\n\n{chunks[0].text}"
+    chunks[0].cards += 1
+    log.info("Gamma chunks: planned", chunks=len(chunks), cards=[c.cards for c in chunks])
+    return chunks
+
+
+def _unique(items) -> List[str]:
+    seen = []
+    for item in items:
+        if item not in seen:
+            seen.append(item)
+    return seen
+
+
+def merge_pdfs(paths: Sequence[str], chunks: Sequence[Chunk], dest_path: str) -> str:
+    """Склеивает PDF частей и добавляет оглавление: закладка на первую страницу части каждой секции"""
+    writer = PdfWriter()
+    added = set()
+    for path, chunk in zip(paths, chunks):
+        start = len(writer.pages)
+        for page in PdfReader(path).pages:
+            writer.add_page(page)
+        if not start:
+            writer.add_outline_item(TOC_TITLE, 0)
+        for title in chunk.titles:
+            if title not in added:
+                writer.add_outline_item(title, start)
+                added.add(title)
+    with open(dest_path, "wb") as f:
+        writer.write(f)
+    log.info("Gamma chunks: merged", parts=len(paths), pages=len(writer.pages), dest_path=dest_path)
+    return dest_path
@@ -51,7 +51,17 @@ except ImportError:
 
 
 class GammaError(Exception):
-    pass
+    """
+    Ошибка Gamma API
+
+    retryable=False — генерация на стороне Gamma уже создана и не удалась
+    (ошибка генерации, таймаут опроса): повтор запустит новую платную
+    генерацию с тем же исходом.
+    """
+
+    def __init__(self, *args, retryable: bool = True):
+        super().__init__(*args)
+        self.retryable = retryable
 
 
 def _safe_filename(name: str, max_length: int = 50) -> str:
@@ -82,7 +92,7 @@ def _headers() -> Dict[str, str]:
     }
 
 
-def create_generation(
+def _build_payload(
     input_text: str,
     *,
     export_as: str = "pdf",
@@ -93,9 +103,8 @@ def create_generation(
     card_split: str = "inputTextBreaks",
     num_cards: Optional[int] = None,
     additional_instructions: Optional[str] = None,
-) -> str:
-    """Create a generation and return generationId."""
-    url = f"{GAMMA_API_BASE}/generations"
+) -> Dict[str, Any]:
+    """Тело запроса POST /generations (общее для синхронного и асинхронного клиента)"""
     # text_mode приоритет: аргумент -> настройка -> 'preserve'
     effective_text_mode = text_mode or GAMMA_TEXT_MODE or "preserve"
     # Enforce Gamma API limit: numCards <= 60
@@ -141,6 +150,76 @@ def create_generation(
         exportAs=export_as,
         language=language,
     )
+    return payload
+
+
+def _sectioned_text(report_text: str) -> str:
+    """Длинные инструкции в начале и визуальные разделители секций (отдельные страницы в Gamma)"""
+    try:
+        long_instr = (GAMMA_LONG_INSTRUCTIONS or "").strip()
+        if long_instr:
+            preface = long_instr + "\n\n---\n\n"
+        else:
+            preface = ""
+        return preface + report_text.replace("\n\n", "\n\n---\n\n")
+    except Exception:
+        return report_text
+
+
+def _output_filename(company_name: Optional[str], company_inn: Optional[str], generation_id: str, ext: str) -> str:
+    """Имя файла на основе названия компании и ИНН"""
+    if company_name and company_inn:
+        return f"{_safe_filename(company_name)}_{company_inn}.{ext}"
+    return f"report_{generation_id}.{ext}"
+
+
+def _find_export_url(result: Dict[str, Any], export_as: str) -> Optional[str]:
+    """Ссылка на файл экспорта в ответе GET /generations/{id}"""
+    urls = result.get("urls", {})
+    files = result.get("files", {})
+    if export_as == "pptx":
+        return (
+            result.get("pptxUrl") or
+            result.get("powerpointUrl") or
+            result.get("fileUrl") or
+            result.get("exportUrl") or
+            urls.get("pptx") or
+            files.get("pptx") or
+            urls.get("powerpoint") or
+            files.get("powerpoint")
+        )
+    return (result.get("pdfUrl") or
+            result.get("fileUrl") or
+            result.get("exportUrl") or
+            urls.get("pdf") or
+            files.get("pdf"))
+
+
+def create_generation(
+    input_text: str,
+    *,
+    export_as: str = "pdf",
+    format: str = "document",
+    text_mode: str = None,
+    language: str = "ru",
+    theme_name: Optional[str] = None,
+    card_split: str = "inputTextBreaks",
+    num_cards: Optional[int] = None,
+    additional_instructions: Optional[str] = None,
+) -> str:
+    """Create a generation and return generationId."""
+    url = f"{GAMMA_API_BASE}/generations"
+    payload = _build_payload(
+        input_text,
+        export_as=export_as,
+        format=format,
+        text_mode=text_mode,
+        language=language,
+        theme_name=theme_name,
+        card_split=card_split,
+        num_cards=num_cards,
+        additional_instructions=additional_instructions,
+    )
     with httpx.Client(timeout=30.0) as client:
         resp = client.post(url, headers=_headers(), json=payload)
     logger.info("Gamma: create response", status=resp.status_code)
@@ -216,7 +295,7 @@ def poll_generation(generation_id: str, *, interval_sec: float = None, timeout_s
                 return data
             time.sleep(effective_interval)
     logger.warning("Gamma: polling timeout reached", timeout_sec=effective_timeout)
-    raise GammaError("Polling timeout after 15 minutes")
+    raise GammaError("Polling timeout after 15 minutes", retryable=False)
 
 
 def download_file(url: str, dest_path: str) -> str:
@@ -459,16 +538,7 @@ def generate_pdf_from_report_text(
         logger.warning("Gamma: no API key configured")
         return None
     # Разделяем секции визуальными разделителями для отдельных страниц в Gamma
-    try:
-        # Вставляем длинные инструкции в начало, затем визуальные разделители секций
-        long_instr = (GAMMA_LONG_INSTRUCTIONS or "").strip()
-        if long_instr:
-            preface = long_instr + "\n\n---\n\n"
-        else:
-            preface = ""
-        sectioned_text = preface + report_text.replace("\n\n", "\n\n---\n\n")
-    except Exception:
-        sectioned_text = report_text
+    sectioned_text = _sectioned_text(report_text)
     gen_id = create_generation(
         input_text=sectioned_text,
         export_as="pdf",
@@ -489,22 +559,11 @@ def generate_pdf_from_report_text(
     logger.info("Gamma: poll result", result_keys=list(result.keys()) if isinstance(result, dict) else "not_dict")
     
     # Формируем имя файла на основе названия компании и ИНН
-    if company_name and company_inn:
-        safe_name = _safe_filename(company_name)
-        filename = f"{safe_name}_{company_inn}.pdf"
-    else:
-        filename = f"report_{gen_id}.pdf"
-    
-    # Согласно документации Gamma API, ищем PDF URL в правильных полях
-    pdf_url = None
+    filename = _output_filename(company_name, company_inn, gen_id, "pdf")
     
     # Согласно документации, ищем в следующих полях:
     # pdfUrl, fileUrl, exportUrl, urls.pdf, files.pdf
-    pdf_url = (result.get("pdfUrl") or 
-               result.get("fileUrl") or 
-               result.get("exportUrl") or 
-               result.get("urls", {}).get("pdf") or 
-               result.get("files", {}).get("pdf"))
+    pdf_url = _find_export_url(result, "pdf")
     
     logger.info("Gamma: PDF URL search", 
                 pdfUrl=result.get("pdfUrl"),
@@ -625,11 +684,7 @@ def generate_pdf_from_report_text(
             fresh_result = poll_generation(gen_id, timeout_sec=60)  # Короткий таймаут для быстрого получения
             
             # Ищем PDF URL в новом результате
-            fresh_pdf_url = (fresh_result.get("pdfUrl") or 
-                           fresh_result.get("fileUrl") or 
-                           fresh_result.get("exportUrl") or 
-                           fresh_result.get("urls", {}).get("pdf") or 
-                           fresh_result.get("files", {}).get("pdf"))
+            fresh_pdf_url = _find_export_url(fresh_result, "pdf")
             
             if fresh_pdf_url:
                 logger.info("Gamma: fresh PDF URL found", pdf_url=fresh_pdf_url)
@@ -657,15 +712,7 @@ def generate_pptx_from_report_text(
         logger.warning("Gamma: no API key configured")
         return None
     # Разделяем секции визуальными разделителями для отдельных страниц в Gamma
-    try:
-        long_instr = (GAMMA_LONG_INSTRUCTIONS or "").strip()
-        if long_instr:
-            preface = long_instr + "\n\n---\n\n"
-        else:
-            preface = ""
-        sectioned_text = preface + report_text.replace("\n\n", "\n\n---\n\n")
-    except Exception:
-        sectioned_text = report_text
+    sectioned_text = _sectioned_text(report_text)
     gen_id = create_generation(
         input_text=sectioned_text,
         export_as="pptx",
@@ -686,23 +733,10 @@ def generate_pptx_from_report_text(
     logger.info("Gamma: poll result", result_keys=list(result.keys()) if isinstance(result, dict) else "not_dict")
 
     # Имя файла
-    if company_name and company_inn:
-        safe_name = _safe_filename(company_name)
-        filename = f"{safe_name}_{company_inn}.pptx"
-    else:
-        filename = f"report_{gen_id}.pptx"
+    filename = _output_filename(company_name, company_inn, gen_id, "pptx")
 
     # Ищем PPTX URL
-    pptx_url = (
-        result.get("pptxUrl") or
-        result.get("powerpointUrl") or
-        result.get("fileUrl") or
-        result.get("exportUrl") or
-        result.get("urls", {}).get("pptx") or
-        result.get("files", {}).get("pptx") or
-        result.get("urls", {}).get("powerpoint") or
-        result.get("files", {}).get("powerpoint")
-    )
+    pptx_url = _find_export_url(result, "pptx")
     logger.info(
         "Gamma: PPTX URL search",
         pptxUrl=result.get("pptxUrl"),
@@ -784,11 +818,7 @@ def generate_pptx_from_report_text(
         logger.warning("Gamma: PPTX download failed, trying to get fresh URL", error=str(e))
         try:
             fresh_result = poll_generation(gen_id, timeout_sec=60)
-            fresh_url = (
-                fresh_result.get("pptxUrl") or fresh_result.get("powerpointUrl") or
-                fresh_result.get("fileUrl") or fresh_result.get("exportUrl") or
-                fresh_result.get("urls", {}).get("pptx") or fresh_result.get("files", {}).get("pptx")
-            )
+            fresh_url = _find_export_url(fresh_result, "pptx")
             if fresh_url:
                 logger.info("Gamma: fresh PPTX URL found", url=fresh_url)
                 return download_file(fresh_url, dest)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Закрытие httpx.AsyncClient, оставшегося от другого event loop
+
+Пул соединений клиента привязан к event loop, в котором он создан. Когда
+клиент-синглтон пересоздаётся под новый loop, старый нужно закрыть, иначе
+его сокеты остаются открытыми до сборки мусора. aclose() работает только в
+родном loop: если тот ещё крутится (в другом потоке), закрытие
+планируется в нём; если он остановлен или закрыт, сокеты пула закрываются
+напрямую — ими больше никто не пользуется.
+"""
+import asyncio
+import socket
+from typing import List, Optional
+
+import httpx
+
+from core.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def _pool_sockets(http: httpx.AsyncClient) -> List[socket.socket]:
+    """Сокеты соединений пула (у MockTransport и подобных их нет)"""
+    pool = getattr(getattr(http, "_transport", None), "_pool", None)
+    sockets = []
+    for connection in getattr(pool, "connections", ()):
+        stream = getattr(getattr(connection, "_connection", None), "_network_stream", None)
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        # asyncio отдаёт обёртку TransportSocket без close(); закрываем сам сокет
+        sock = getattr(sock, "_sock", sock)
+        if isinstance(sock, socket.socket):
+            sockets.append(sock)
+    return sockets
+
+
+def discard_client(http: Optional[httpx.AsyncClient], loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Закрывает клиент, созданный в loop, из любого другого loop или потока"""
+    if http is None or http.is_closed:
+        return
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(http.aclose(), loop)
+        return
+    try:
+        sockets = _pool_sockets(http)
+    except Exception as e:
+        log.warning("HTTP pool: cannot reach sockets of stale client", error=str(e))
+        return
+    for sock in sockets:
+        sock.close()
+    log.debug("HTTP pool: stale client closed", sockets=len(sockets))
@@ -2,21 +2,21 @@
 from __future__ import annotations
 
 import os
-import time
-from collections import deque
 from typing import Any, Dict, Optional, Tuple
 
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from .base import CompanyProvider
+from services.cache import get_ofdata_cached_sync, set_ofdata_cached_sync
+from services.rate_limit import get_ofdata_limiter
+from settings import OFDATA_CACHE_ENABLED
 import logging
 
 DEFAULT_BASE_URL = os.getenv("OFDATA_API", "https://api.ofdata.ru")
 API_KEY = os.getenv("OFDATA_KEY")
 TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "10"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "2"))
-RATE_QPM = int(os.getenv("OFDATA_RATE_LIMIT_QPM", "70"))
 
 # OFData endpoint paths
 SEARCH_PATH = os.getenv("OFDATA_PATH_SEARCH", "/v2/search")
@@ -56,20 +56,10 @@ class OFDataClient(CompanyProvider):
         self.timeout = timeout
         self._client = httpx.Client(base_url=self.base_url, timeout=self.timeout)
         self._log = logging.getLogger(__name__)
-        # Simple local rate limit: not more than RATE_QPM per minute
-        self._ticks = deque(maxlen=RATE_QPM)
 
-    def _throttle(self) -> None:
-        if RATE_QPM <= 0:
-            return
-        now = time.time()
-        self._ticks.append(now)
-        if len(self._ticks) == self._ticks.maxlen:
-            # if 70th request in the last minute — wait until window opens
-            oldest = self._ticks[0]
-            elapsed = now - oldest
-            if elapsed < 60:
-                time.sleep(60 - elapsed + 0.01)
+    def _throttle(self, path: str) -> None:
+        # Shared OFData limiter (minute + hour windows, common for all processes)
+        get_ofdata_limiter().acquire_sync(path)
 
     @retry(
         reraise=True,
@@ -78,8 +68,12 @@ class OFDataClient(CompanyProvider):
         retry=retry_if_exception_type(OFDataServerTemporaryError),
     )
     def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        self._throttle()
         params = dict(params or {})
+        if OFDATA_CACHE_ENABLED:
+            cached = get_ofdata_cached_sync(path, params)
+            if cached is not None:
+                return cached
+        self._throttle(path)
         params["key"] = self.api_key  # key ALWAYS added to query
         url = path if path.startswith("/") else f"/{path}"
         try:
@@ -115,6 +109,8 @@ class OFDataClient(CompanyProvider):
                 raise OFDataClientError(f"{status}: unexpected client error; body={resp.text[:300]}")
 
         result = resp.json() if resp.content else {}
+        if OFDATA_CACHE_ENABLED and result:
+            set_ofdata_cached_sync(path, params, result)
         self._log.info("OFData JSON result", extra={"result_type": type(result).__name__, "result_keys": list(result.keys()) if isinstance(result, dict) else "not dict", "result_length": len(result) if hasattr(result, '__len__') else 'no length'})
         return result
 
@@ -3,13 +3,18 @@
 Queue system for managing API requests to Gamma and OFData with rate limiting and quotas.
 """
 import asyncio
+import heapq
+import itertools
 import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, Callable, List
 from dataclasses import dataclass, field
-from enum import Enum
+from enum import Enum, IntEnum
 import json
 from core.logger import get_logger
+from services.rate_limit import RateWindow, _parse_weights, gcra_reserve
 
 from settings import (
     GAMMA_QUEUE_MAX_WORKERS,
@@ -18,8 +23,15 @@ from settings import (
     OFDATA_QUEUE_MAX_WORKERS,
     OFDATA_RATE_LIMIT_PER_MINUTE,
     OFDATA_RATE_LIMIT_PER_HOUR,
-    QUEUE_PROCESS_INTERVAL,
     QUEUE_CLEANUP_INTERVAL,
+    QUEUE_COMPLETED_MAX,
+    QUEUE_BACKEND,
+    QUEUE_WORKER_ID,
+    QUEUE_LEASE_SECONDS,
+    QUEUE_DEQUEUE_BATCH,
+    QUEUE_POLL_INTERVAL,
+    QUEUE_RETRY_DELAY,
+    QUEUE_TASK_WEIGHTS,
 )
 
 logger = get_logger(__name__)
@@ -32,6 +44,13 @@ class TaskType(Enum):
     OFDATA_PERSON = "ofdata_person"
 
 
+class TaskPriority(IntEnum):
+    """Priority classes; a lower value is always served first."""
+    PAID = 0
+    FREE = 10
+    PREFETCH = 20
+
+
 class TaskStatus(Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -55,71 +74,406 @@ class QueueTask:
     error: Optional[str] = None
     retry_count: int = 0
     max_retries: int = 3
+    priority: int = TaskPriority.FREE  # lower value is served first
+    user_id: Optional[int] = None
+    fair_key: float = 0.0  # start tag for per-user fair ordering within a priority
+    progress: Optional[Callable] = None  # progress(status, elapsed, timeout) for Gamma tasks
+
+
+class QuotaExceededError(Exception):
+    """Daily quota for a task type is used up."""
 
 
 class RateLimiter:
-    """Rate limiter for API requests."""
+    """GCRA rate limiter for queue workers.
+    
+    State is one theoretical arrival time per window, so every check is O(1).
+    ``wait()`` parks callers in FIFO order and sleeps exactly until the
+    window has room for their weight.
+    """
     
     def __init__(self, requests_per_minute: int, requests_per_hour: int = None):
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour or (requests_per_minute * 60)
-        self.minute_requests: List[float] = []
-        self.hour_requests: List[float] = []
+        self.windows = [
+            w for w in (
+                RateWindow("minute", self.requests_per_minute, 60.0),
+                RateWindow("hour", self.requests_per_hour, 3600.0),
+            ) if w.limit > 0
+        ]
+        self._tats: List[Optional[float]] = [None] * len(self.windows)
+        self._lock = asyncio.Lock()  # asyncio.Lock wakes waiters in FIFO order
+    
+    def _reserve(self, weight: float) -> float:
+        wait, new_tats = gcra_reserve(self._tats, self.windows, weight, time.monotonic())
+        if wait <= 0:
+            self._tats = list(new_tats)
+        return wait
     
-    async def acquire(self) -> bool:
+    async def acquire(self, weight: float = 1.0) -> bool:
         """Acquire permission to make a request. Returns True if allowed."""
-        now = time.time()
-        
-        # Clean old requests
-        minute_ago = now - 60
-        hour_ago = now - 3600
-        
-        self.minute_requests = [req_time for req_time in self.minute_requests if req_time > minute_ago]
-        self.hour_requests = [req_time for req_time in self.hour_requests if req_time > hour_ago]
-        
-        # Check limits
-        if len(self.minute_requests) >= self.requests_per_minute:
-            return False
-        if len(self.hour_requests) >= self.requests_per_hour:
-            return False
-        
-        # Record this request
-        self.minute_requests.append(now)
-        self.hour_requests.append(now)
-        return True
+        return self._reserve(weight) <= 0
     
-    def get_wait_time(self) -> float:
+    def get_wait_time(self, weight: float = 1.0) -> float:
         """Get time to wait before next request is allowed."""
-        now = time.time()
-        minute_ago = now - 60
-        hour_ago = now - 3600
-        
-        # Clean old requests
-        self.minute_requests = [req_time for req_time in self.minute_requests if req_time > minute_ago]
-        self.hour_requests = [req_time for req_time in self.hour_requests if req_time > hour_ago]
-        
-        if len(self.minute_requests) >= self.requests_per_minute:
-            return 60 - (now - min(self.minute_requests))
-        if len(self.hour_requests) >= self.requests_per_hour:
-            return 3600 - (now - min(self.hour_requests))
+        wait, _ = gcra_reserve(self._tats, self.windows, weight, time.monotonic())
+        return wait
+    
+    async def wait(self, weight: float = 1.0):
+        """Wait until a request of this weight is allowed, behind earlier callers."""
+        async with self._lock:
+            while True:
+                delay = self._reserve(weight)
+                if delay <= 0:
+                    return
+                await asyncio.sleep(delay)
+
+
+FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+# Typical run time per task type until real durations are measured (seconds)
+DEFAULT_TASK_SECONDS = {
+    TaskType.GAMMA_PDF: 120.0,
+    TaskType.GAMMA_PPTX: 120.0,
+    TaskType.OFDATA_COMPANY: 2.0,
+    TaskType.OFDATA_PERSON: 2.0,
+}
+
+
+def _task_from_row(row) -> QueueTask:
+    """Build a QueueTask from a ``queue_tasks`` row (mapping)."""
+    return QueueTask(
+        id=row["id"],
+        task_type=TaskType(row["task_type"]),
+        payload=json.loads(row["payload"]),
+        created_at=row["created_at"],
+        started_at=row["started_at"],
+        completed_at=row["completed_at"],
+        status=TaskStatus(row["status"]),
+        result=json.loads(row["result"]) if row["result"] is not None else None,
+        error=row["error"],
+        retry_count=row["retry_count"],
+        max_retries=row["max_retries"],
+        priority=row["priority"],
+        user_id=row["user_id"],
+        fair_key=row["fair_key"],
+    )
+
+
+class MemoryTaskStore:
+    """In-process task store (tests, QUEUE_BACKEND=memory); nothing survives a restart.
+    
+    Within a priority, tasks are ordered by start-time fair queuing: each user's
+    tasks get consecutive start tags from the class's virtual clock, so users
+    are served round-robin in proportion to task cost, like deficit round-robin.
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[str, QueueTask] = {}
+        self._heaps: Dict[TaskType, list] = {task_type: [] for task_type in TaskType}
+        self._seq = itertools.count()
+        self._clock: Dict[tuple, float] = {}  # (task_type, priority) -> start tag last leased
+        self._finish: Dict[tuple, float] = {}  # (task_type, priority, user_id) -> last finish tag
+    
+    def _push(self, task: QueueTask):
+        heapq.heappush(self._heaps[task.task_type], (task.priority, task.fair_key, next(self._seq), task.id))
+    
+    async def add(self, task: QueueTask, cost: float = 1.0):
+        cls = (task.task_type, task.priority)
+        flow = cls + (task.user_id,)
+        task.fair_key = max(self._clock.get(cls, 0.0), self._finish.get(flow, 0.0))
+        self._finish[flow] = task.fair_key + cost
+        self._tasks[task.id] = task
+        self._push(task)
+    
+    async def lease(self, task_type: TaskType, owner: str, limit: int, lease_seconds: float) -> List[QueueTask]:
+        heap = self._heaps[task_type]
+        leased = []
+        while heap and len(leased) < limit:
+            _, _, _, task_id = heapq.heappop(heap)
+            task = self._tasks.get(task_id)
+            if task and task.status == TaskStatus.PENDING:
+                cls = (task_type, task.priority)
+                self._clock[cls] = max(self._clock.get(cls, 0.0), task.fair_key)
+                leased.append(task)
+        return leased
+    
+    async def count_ahead(self, task: QueueTask) -> int:
+        """Number of queued tasks of the same type that will be leased before ``task``."""
+        key = (task.priority, task.fair_key)
+        return sum(
+            1 for priority, fair_key, _, task_id in self._heaps[task.task_type]
+            if (priority, fair_key) < key and task_id != task.id
+            and self._tasks.get(task_id) is not None and self._tasks[task_id].status == TaskStatus.PENDING
+        )
+    
+    async def extend(self, task_ids: List[str], owner: str, lease_seconds: float):
+        pass
+    
+    async def save(self, task: QueueTask):
+        if task.status == TaskStatus.PENDING:
+            self._push(task)  # retried or released
+        elif task.status in FINISHED_STATUSES:
+            self._tasks.pop(task.id, None)
+    
+    async def get(self, task_id: str) -> Optional[QueueTask]:
+        return self._tasks.get(task_id)
+    
+    async def recover(self, owner: str) -> int:
+        return 0
+    
+    async def purge(self, before: float) -> int:
+        # Users whose last task is behind the clock start from the clock anyway
+        stale = [flow for flow, finish in self._finish.items() if finish <= self._clock.get(flow[:2], 0.0)]
+        for flow in stale:
+            del self._finish[flow]
         return 0
 
 
+class DatabaseTaskStore:
+    """Tasks in the application database (DATABASE_URL, SQLite or PostgreSQL).
+    
+    Delivery is at-least-once: a leased task is owned by one worker until its
+    lease expires, after which any worker may take it again. Workers extend
+    leases while a task runs and give them back on shutdown.
+    
+    Fair ordering within a priority matches MemoryTaskStore, with the
+    virtual clock taken as the smallest start tag still queued or running.
+    """
+    
+    INSERT_SQL = """
+        INSERT INTO queue_tasks (id, task_type, status, priority, user_id, fair_key, payload,
+                                 retry_count, max_retries, created_at)
+        VALUES (:id, :task_type, :status, :priority, :user_id, :fair_key, :payload,
+                :retry_count, :max_retries, :created_at)
+    """
+    FAIR_SQL = """
+        SELECT MIN(fair_key) AS clock,
+               MAX(CASE WHEN COALESCE(user_id, 0) = :user_id THEN fair_key END) AS last_start
+        FROM queue_tasks
+        WHERE task_type = :task_type AND priority = :priority AND status IN ('pending', 'processing')
+    """
+    # Fair order within a priority; expired leases are picked up again
+    LEASE_SQL = """
+        UPDATE queue_tasks
+        SET status = 'processing', lease_owner = :owner, lease_until = :until
+        WHERE id IN (
+            SELECT id FROM queue_tasks
+            WHERE task_type = :task_type
+              AND (status = 'pending' OR (status = 'processing' AND lease_until < :now))
+            ORDER BY priority, fair_key, created_at
+            LIMIT :limit{lock}
+        )
+        RETURNING *
+    """
+    EXTEND_SQL = """
+        UPDATE queue_tasks SET lease_until = :until
+        WHERE status = 'processing' AND lease_owner = :owner AND id IN :ids
+    """
+    SAVE_SQL = """
+        UPDATE queue_tasks
+        SET status = :status, result = :result, error = :error, retry_count = :retry_count,
+            started_at = :started_at, completed_at = :completed_at, lease_owner = NULL, lease_until = NULL
+        WHERE id = :id
+    """
+    COUNT_AHEAD_SQL = """
+        SELECT COUNT(*) FROM queue_tasks
+        WHERE task_type = :task_type AND status = 'pending' AND id != :id
+          AND (priority < :priority OR (priority = :priority AND fair_key < :fair_key))
+    """
+    RECOVER_SQL = """
+        UPDATE queue_tasks SET status = 'pending', lease_owner = NULL, lease_until = NULL
+        WHERE status = 'processing' AND (lease_owner = :owner OR lease_until < :now)
+    """
+    PURGE_SQL = """
+        DELETE FROM queue_tasks
+        WHERE status IN ('completed', 'failed', 'cancelled') AND completed_at < :before
+    """
+    
+    def __init__(self, db_service=None):
+        self._db = db_service
+    
+    async def _session(self):
+        if self._db is None:
+            from services.database import get_db_service
+            self._db = await get_db_service()
+        return await self._db.get_session()
+    
+    async def add(self, task: QueueTask, cost: float = 1.0):
+        from sqlalchemy import text
+        
+        async with (await self._session()) as session:
+            result = await session.execute(text(self.FAIR_SQL), {
+                "task_type": task.task_type.value,
+                "priority": int(task.priority),
+                "user_id": task.user_id or 0,
+            })
+            row = result.mappings().first()
+            task.fair_key = row["clock"] or 0.0
+            if row["last_start"] is not None:
+                task.fair_key = max(task.fair_key, row["last_start"] + cost)
+            await session.execute(text(self.INSERT_SQL), {
+                "id": task.id,
+                "task_type": task.task_type.value,
+                "status": task.status.value,
+                "priority": int(task.priority),
+                "user_id": task.user_id,
+                "fair_key": task.fair_key,
+                "payload": json.dumps(task.payload, ensure_ascii=False),
+                "retry_count": task.retry_count,
+                "max_retries": task.max_retries,
+                "created_at": task.created_at,
+            })
+            await session.commit()
+    
+    async def lease(self, task_type: TaskType, owner: str, limit: int, lease_seconds: float) -> List[QueueTask]:
+        """Atomically take up to ``limit`` tasks of a type for ``lease_seconds``."""
+        from sqlalchemy import text
+        
+        async with (await self._session()) as session:
+            # Concurrent workers on PostgreSQL skip rows another transaction is leasing;
+            # SQLite serialises writers, so the plain UPDATE is already atomic
+            postgres = session.bind.dialect.name == "postgresql"
+            sql = self.LEASE_SQL.format(lock=" FOR UPDATE SKIP LOCKED" if postgres else "")
+            now = time.time()
+            result = await session.execute(text(sql), {
+                "owner": owner,
+                "until": now + lease_seconds,
+                "task_type": task_type.value,
+                "now": now,
+                "limit": limit,
+            })
+            rows = result.mappings().all()
+            await session.commit()
+        
+        tasks = [_task_from_row(row) for row in rows]
+        for task in tasks:
+            task.status = TaskStatus.PENDING  # leased, waiting for a local worker
+            task.started_at = None
+        tasks.sort(key=lambda t: (t.priority, t.fair_key, t.created_at))
+        return tasks
+    
+    async def extend(self, task_ids: List[str], owner: str, lease_seconds: float):
+        if not task_ids:
+            return
+        from sqlalchemy import bindparam, text
+        
+        async with (await self._session()) as session:
+            await session.execute(
+                text(self.EXTEND_SQL).bindparams(bindparam("ids", expanding=True)),
+                {"until": time.time() + lease_seconds, "owner": owner, "ids": list(task_ids)},
+            )
+            await session.commit()
+    
+    async def save(self, task: QueueTask):
+        """Persist the outcome of a task (finished, retried or released) and drop its lease."""
+        from sqlalchemy import text
+        
+        async with (await self._session()) as session:
+            await session.execute(text(self.SAVE_SQL), {
+                "id": task.id,
+                "status": task.status.value,
+                "result": json.dumps(task.result, ensure_ascii=False, default=str) if task.result is not None else None,
+                "error": task.error,
+                "retry_count": task.retry_count,
+                "started_at": task.started_at,
+                "completed_at": task.completed_at,
+            })
+            await session.commit()
+    
+    async def get(self, task_id: str) -> Optional[QueueTask]:
+        from sqlalchemy import text
+        
+        async with (await self._session()) as session:
+            result = await session.execute(text("SELECT * FROM queue_tasks WHERE id = :id"), {"id": task_id})
+            row = result.mappings().first()
+        return _task_from_row(row) if row else None
+    
+    async def count_ahead(self, task: QueueTask) -> int:
+        """Number of queued tasks of the same type that will be leased before ``task``."""
+        from sqlalchemy import text
+        
+        async with (await self._session()) as session:
+            result = await session.execute(text(self.COUNT_AHEAD_SQL), {
+                "task_type": task.task_type.value,
+                "id": task.id,
+                "priority": int(task.priority),
+                "fair_key": task.fair_key,
+            })
+            return result.scalar() or 0
+    
+    async def recover(self, owner: str) -> int:
+        """Return orphaned tasks to the queue: leases of this worker id and expired ones."""
+        from sqlalchemy import text
+        
+        async with (await self._session()) as session:
+            result = await session.execute(text(self.RECOVER_SQL), {"owner": owner, "now": time.time()})
+            await session.commit()
+        return result.rowcount
+    
+    async def purge(self, before: float) -> int:
+        from sqlalchemy import text
+        
+        async with (await self._session()) as session:
+            result = await session.execute(text(self.PURGE_SQL), {"before": before})
+            await session.commit()
+        return result.rowcount
+
+
+def _make_store(kind: str):
+    if (kind or "database").lower() == "memory":
+        return MemoryTaskStore()
+    return DatabaseTaskStore()
+
+
 class QueueManager:
-    """Manages API request queues with rate limiting and quotas."""
+    """Manages API request queues with rate limiting and quotas.
     
-    def __init__(self):
+    Tasks are persisted in a task store (the database by default). One
+    dispatcher per task type leases batches of tasks from the store into an
+    in-memory priority queue that the workers block on; adding a task wakes
+    the dispatcher immediately. Active tasks live in ``tasks`` and finished
+    ones in the bounded ``completed`` store, both keyed by task id.
+    
+    Priority classes (TaskPriority) are served strictly in order; within a
+    class the store interleaves users fairly, so one user's burst of tasks
+    does not delay everyone else.
+    
+    A failed task is retried after ``retry_delay`` seconds, doubling on each
+    retry, unless its error has ``retryable = False``. Finished tasks go to
+    their in-memory callback, or to the completion handler registered for
+    their type (see register_completion_handler) when there is no callback,
+    e.g. for tasks recovered after a restart.
+    """
+    
+    def __init__(self, store=None, worker_id: str = QUEUE_WORKER_ID):
+        self.store = store if store is not None else _make_store(QUEUE_BACKEND)
+        self.worker_id = worker_id
         self.tasks: Dict[str, QueueTask] = {}
+        self.completed: "OrderedDict[str, QueueTask]" = OrderedDict()
+        self.queues: Dict[TaskType, asyncio.PriorityQueue] = {}
+        self._wakeups: Dict[TaskType, asyncio.Event] = {task_type: asyncio.Event() for task_type in TaskType}
+        self._busy: Dict[TaskType, int] = {task_type: 0 for task_type in TaskType}
+        self._leased: set = set()  # ids leased by this process and not finished yet
+        self._seq = itertools.count()
         self.workers: Dict[TaskType, List[asyncio.Task]] = {}
         self.rate_limiters: Dict[TaskType, RateLimiter] = {}
         self.daily_quotas: Dict[TaskType, int] = {}
         self.daily_reset_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Initialize rate limiters
-        self.rate_limiters[TaskType.GAMMA_PDF] = RateLimiter(GAMMA_RATE_LIMIT_PER_MINUTE)
-        self.rate_limiters[TaskType.GAMMA_PPTX] = RateLimiter(GAMMA_RATE_LIMIT_PER_MINUTE)
-        self.rate_limiters[TaskType.OFDATA_COMPANY] = RateLimiter(OFDATA_RATE_LIMIT_PER_MINUTE, OFDATA_RATE_LIMIT_PER_HOUR)
-        self.rate_limiters[TaskType.OFDATA_PERSON] = RateLimiter(OFDATA_RATE_LIMIT_PER_MINUTE, OFDATA_RATE_LIMIT_PER_HOUR)
+        self.completion_handlers: Dict[TaskType, Callable] = {}
+        self.retry_delay: float = QUEUE_RETRY_DELAY
+        self._retries: set = set()  # timers handing failed tasks back to the queue
+        
+        # Initialize rate limiters: one per API, shared by its task types
+        gamma_limiter = RateLimiter(GAMMA_RATE_LIMIT_PER_MINUTE)
+        ofdata_limiter = RateLimiter(OFDATA_RATE_LIMIT_PER_MINUTE, OFDATA_RATE_LIMIT_PER_HOUR)
+        self.rate_limiters[TaskType.GAMMA_PDF] = gamma_limiter
+        self.rate_limiters[TaskType.GAMMA_PPTX] = gamma_limiter
+        self.rate_limiters[TaskType.OFDATA_COMPANY] = ofdata_limiter
+        self.rate_limiters[TaskType.OFDATA_PERSON] = ofdata_limiter
+        self.task_weights: Dict[str, float] = _parse_weights(QUEUE_TASK_WEIGHTS)
+        # Moving average of task run time, used for ETA estimates
+        self.durations: Dict[TaskType, float] = dict(DEFAULT_TASK_SECONDS)
         
         # Initialize daily quotas
         self.daily_quotas[TaskType.GAMMA_PDF] = GAMMA_DAILY_LIMIT
@@ -133,6 +487,8 @@ class QueueManager:
         
         self._running = False
         self._cleanup_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._dispatchers: List[asyncio.Task] = []
     
     async def start(self):
         """Start the queue manager."""
@@ -140,13 +496,24 @@ class QueueManager:
             return
         
         self._running = True
-        logger.info("Starting queue manager")
+        logger.info("Starting queue manager", worker_id=self.worker_id)
         
-        # Start cleanup task
+        # Tasks leased by a previous run of this worker (crash, deploy) go back to the queue
+        try:
+            recovered = await self.store.recover(self.worker_id)
+            if recovered:
+                logger.info("Recovered orphaned tasks", count=recovered)
+        except Exception as e:
+            logger.error("Task recovery failed", error=str(e))
+        
+        # Start cleanup and lease heartbeat tasks
         self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
         
-        # Start workers for each task type
+        # Start a dispatcher and workers for each task type
         for task_type in TaskType:
+            self.queues[task_type] = asyncio.PriorityQueue()
+            self._dispatchers.append(asyncio.create_task(self._dispatcher(task_type)))
             max_workers = self._get_max_workers(task_type)
             for i in range(max_workers):
                 worker = asyncio.create_task(self._worker(task_type, i))
@@ -164,23 +531,38 @@ class QueueManager:
         self._running = False
         logger.info("Stopping queue manager")
         
-        # Cancel all workers
+        # Cancel all workers, dispatchers and background tasks
+        background = [t for t in (self._cleanup_task, self._heartbeat_task) if t]
+        background.extend(self._retries)
+        for task in [*self._dispatchers, *background]:
+            task.cancel()
         for workers in self.workers.values():
             for worker in workers:
                 worker.cancel()
         
-        # Cancel cleanup task
-        if self._cleanup_task:
-            self._cleanup_task.cancel()
-        
         # Wait for workers to finish
         for workers in self.workers.values():
             await asyncio.gather(*workers, return_exceptions=True)
+            workers.clear()
+        await asyncio.gather(*self._dispatchers, *background, return_exceptions=True)
+        self._dispatchers.clear()
+        self._retries.clear()
+        
+        # Hand unfinished leased tasks back so another worker can take them right away;
+        # tasks that finished while their result was being saved are saved again
+        released = 0
+        for task_id in list(self._leased):
+            task = self.tasks.get(task_id)
+            if not task:
+                continue
+            if task.status in [TaskStatus.PENDING, TaskStatus.PROCESSING]:
+                task.status = TaskStatus.PENDING
+                task.started_at = None
+                released += 1
+            await self._save(task)
+        self._leased.clear()
         
-        if self._cleanup_task:
-            await asyncio.gather(self._cleanup_task, return_exceptions=True)
-        
-        logger.info("Queue manager stopped")
+        logger.info("Queue manager stopped", released=released)
     
     def _get_max_workers(self, task_type: TaskType) -> int:
         """Get maximum workers for task type."""
@@ -191,36 +573,91 @@ class QueueManager:
         return 1
     
     async def add_task(self, task_type: TaskType, payload: Dict[str, Any], 
-                      callback: Optional[Callable] = None) -> str:
-        """Add a task to the queue."""
-        task_id = f"{task_type.value}_{int(time.time() * 1000)}_{len(self.tasks)}"
+                      callback: Optional[Callable] = None, priority: int = TaskPriority.FREE,
+                      user_id: Optional[int] = None, progress: Optional[Callable] = None) -> str:
+        """Add a task to the queue.
+        
+        The payload is stored as JSON. ``callback(task)`` is called once the
+        task completes or fails for good, ``progress`` receives Gamma polling
+        updates on the event loop; both are kept in memory only and are not
+        called for tasks recovered after a restart. Anything needed to deliver
+        the result after a restart belongs in the payload, for the completion
+        handler of the task type. ``user_id`` is used for fair scheduling
+        between users of the same priority.
+        """
+        task_id = f"{task_type.value}_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
         
         # Check daily quota
         if not await self._check_daily_quota(task_type):
-            raise Exception(f"Daily quota exceeded for {task_type.value}")
+            raise QuotaExceededError(f"Daily quota exceeded for {task_type.value}")
         
         task = QueueTask(
             id=task_id,
             task_type=task_type,
             payload=payload,
-            callback=callback
+            callback=callback,
+            priority=priority,
+            user_id=user_id,
+            progress=progress,
         )
         
+        await self.store.add(task, cost=self.task_weights.get(task_type.value, 1.0))
         self.tasks[task_id] = task
+        self._wakeups[task_type].set()
         logger.info("Task added to queue", task_id=task_id, task_type=task_type.value)
         
         return task_id
     
+    def register_completion_handler(self, task_type: TaskType, handler: Callable):
+        """Call ``handler(task)`` for finished tasks of a type that have no in-memory callback."""
+        self.completion_handlers[task_type] = handler
+    
+    def _enqueue(self, task: QueueTask):
+        """Hand a leased task to the workers (FIFO within the same priority)."""
+        self.queues[task.task_type].put_nowait((task.priority, next(self._seq), task.id))
+    
+    def _finish(self, task: QueueTask):
+        """Move a finished task from the active map to the bounded completed store."""
+        self.tasks.pop(task.id, None)
+        self._leased.discard(task.id)
+        self.completed[task.id] = task
+        while len(self.completed) > QUEUE_COMPLETED_MAX:
+            self.completed.popitem(last=False)
+    
+    async def _save(self, task: QueueTask):
+        """Persist task state; a store outage must not kill the worker."""
+        try:
+            await self.store.save(task)
+        except Exception as e:
+            logger.error("Failed to persist task", task_id=task.id, status=task.status.value, error=str(e))
+    
+    def get_task(self, task_id: str) -> Optional[QueueTask]:
+        """Look up an active or recently finished task of this process by id."""
+        return self.tasks.get(task_id) or self.completed.get(task_id)
+    
+    async def _load_task(self, task_id: str) -> Optional[QueueTask]:
+        """Look up a task locally, then in the store (other processes, previous runs)."""
+        task = self.get_task(task_id)
+        if task:
+            return task
+        try:
+            return await self.store.get(task_id)
+        except Exception as e:
+            logger.error("Failed to load task", task_id=task_id, error=str(e))
+            return None
+    
     async def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get task status."""
-        task = self.tasks.get(task_id)
+        task = await self._load_task(task_id)
         if not task:
             return None
         
-        return {
+        status = {
             "id": task.id,
             "task_type": task.task_type.value,
             "status": task.status.value,
+            "priority": int(task.priority),
+            "user_id": task.user_id,
             "created_at": task.created_at,
             "started_at": task.started_at,
             "completed_at": task.completed_at,
@@ -228,15 +665,45 @@ class QueueManager:
             "error": task.error,
             "retry_count": task.retry_count
         }
+        if task.status == TaskStatus.PENDING:
+            status.update(await self._estimate(task))
+        return status
+    
+    async def get_queue_position(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Queue position (1 = next) and estimated seconds until a pending task is done."""
+        task = await self._load_task(task_id)
+        if not task or task.status != TaskStatus.PENDING:
+            return None
+        return await self._estimate(task)
+    
+    async def _estimate(self, task: QueueTask) -> Dict[str, Any]:
+        if task.id in self._leased:
+            ahead = 0  # already handed to a local worker
+        else:
+            try:
+                ahead = await self.store.count_ahead(task)
+            except Exception as e:
+                logger.error("Failed to count queue position", task_id=task.id, error=str(e))
+                ahead = 0
+        workers = max(1, self._get_max_workers(task.task_type))
+        average = self.durations[task.task_type]
+        # Tasks ahead run `workers` at a time, then this one runs
+        eta = (ahead // workers + 1) * average
+        return {"position": ahead + 1, "eta_seconds": round(eta, 1)}
     
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a task."""
-        task = self.tasks.get(task_id)
+        task = await self._load_task(task_id)
         if not task:
             return False
         
         if task.status in [TaskStatus.PENDING, TaskStatus.PROCESSING]:
+            # A leased task stays in its in-memory queue and is skipped when popped
             task.status = TaskStatus.CANCELLED
+            task.completed_at = time.time()
+            if task.started_at is None:
+                self._finish(task)
+            await self._save(task)
             logger.info("Task cancelled", task_id=task_id)
             return True
         
@@ -251,43 +718,77 @@ class QueueManager:
             for quota_type in self.daily_quotas:
                 self.daily_quotas[quota_type] = GAMMA_DAILY_LIMIT if quota_type in [TaskType.GAMMA_PDF, TaskType.GAMMA_PPTX] else 999999
         
-        # Check quota
-        quota = self.daily_quotas.get(task_type, 999999)
-        if quota <= 0:
+        # Check quota (types without a daily limit are not tracked)
+        if task_type not in self.daily_quotas:
+            return True
+        if self.daily_quotas[task_type] <= 0:
             return False
         
         # Decrease quota
         self.daily_quotas[task_type] -= 1
         return True
     
+    async def _dispatcher(self, task_type: TaskType):
+        """Lease tasks of one type from the store as workers become free."""
+        queue = self.queues[task_type]
+        wakeup = self._wakeups[task_type]
+        max_workers = self._get_max_workers(task_type)
+        while self._running:
+            try:
+                # Clear before leasing so a task added meanwhile is not missed
+                wakeup.clear()
+                free = max_workers - self._busy[task_type] - queue.qsize()
+                if free > 0:
+                    limit = min(free, QUEUE_DEQUEUE_BATCH)
+                    leased = await self.store.lease(task_type, self.worker_id, limit, QUEUE_LEASE_SECONDS)
+                    for task in leased:
+                        # Keep the local object of tasks added here: it holds the callback
+                        local = self.tasks.setdefault(task.id, task)
+                        local.status = TaskStatus.PENDING
+                        self._leased.add(task.id)
+                        self._enqueue(local)
+                    if len(leased) == limit:
+                        continue
+                
+                # Sleep until a task is added or a worker frees up; the timeout picks up
+                # tasks added by other processes and leases that expired
+                try:
+                    await asyncio.wait_for(wakeup.wait(), QUEUE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Dispatcher error", task_type=task_type.value, error=str(e))
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+    
     async def _worker(self, task_type: TaskType, worker_id: int):
         """Worker coroutine for processing tasks."""
         logger.info("Worker started", task_type=task_type.value, worker_id=worker_id)
         
+        queue = self.queues[task_type]
         while self._running:
             try:
-                # Find pending task of this type
-                task = None
-                for t in self.tasks.values():
-                    if t.task_type == task_type and t.status == TaskStatus.PENDING:
-                        task = t
-                        break
-                
-                if not task:
-                    await asyncio.sleep(QUEUE_PROCESS_INTERVAL)
-                    continue
-                
-                # Check rate limit
-                rate_limiter = self.rate_limiters.get(task_type)
-                if rate_limiter:
-                    if not await rate_limiter.acquire():
-                        wait_time = rate_limiter.get_wait_time()
-                        logger.debug("Rate limit reached, waiting", task_type=task_type.value, wait_time=wait_time)
-                        await asyncio.sleep(wait_time)
-                        continue
+                # Block until the dispatcher hands over a task of this type
+                _, _, task_id = await queue.get()
+                task = self.tasks.get(task_id)
+                if not task or task.status != TaskStatus.PENDING:
+                    self._leased.discard(task_id)
+                    continue  # cancelled while waiting
                 
-                # Process task
-                await self._process_task(task)
+                self._busy[task_type] += 1
+                try:
+                    # Check rate limit
+                    rate_limiter = self.rate_limiters.get(task_type)
+                    if rate_limiter:
+                        await rate_limiter.wait(self.task_weights.get(task_type.value, 1.0))
+                    
+                    # Process task
+                    await self._process_task(task)
+                finally:
+                    self._busy[task_type] -= 1
+                    self._wakeups[task_type].set()
                 
             except asyncio.CancelledError:
                 break
@@ -297,6 +798,18 @@ class QueueManager:
         
         logger.info("Worker stopped", task_type=task_type.value, worker_id=worker_id)
     
+    async def _heartbeat_loop(self):
+        """Extend leases of tasks this process holds so they are not redelivered."""
+        interval = max(1, QUEUE_LEASE_SECONDS / 3)
+        while self._running:
+            try:
+                await asyncio.sleep(interval)
+                await self.store.extend(list(self._leased), self.worker_id, QUEUE_LEASE_SECONDS)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Lease heartbeat error", error=str(e))
+    
     async def _process_task(self, task: QueueTask):
         """Process a single task."""
         task.status = TaskStatus.PROCESSING
@@ -305,58 +818,99 @@ class QueueManager:
         logger.info("Processing task", task_id=task.id, task_type=task.task_type.value)
         
         try:
-            # Import handlers dynamically to avoid circular imports
-            if task.task_type in [TaskType.GAMMA_PDF, TaskType.GAMMA_PPTX]:
-                from services.export.gamma_exporter import generate_pdf_from_report_text, generate_pptx_from_report_text
-                
-                if task.task_type == TaskType.GAMMA_PDF:
-                    result = await asyncio.to_thread(
-                        generate_pdf_from_report_text,
-                        **task.payload
-                    )
-                elif task.task_type == TaskType.GAMMA_PPTX:
-                    result = await asyncio.to_thread(
-                        generate_pptx_from_report_text,
-                        **task.payload
-                    )
-            elif task.task_type == TaskType.OFDATA_COMPANY:
-                from services.report.ofdata_client import OFDataClient
-                client = OFDataClient()
-                result = await client.get_company_data(task.payload["inn"])
-            elif task.task_type == TaskType.OFDATA_PERSON:
-                from services.report.ofdata_client import OFDataClient
-                client = OFDataClient()
-                result = await client.get_person(task.payload["inn"])
-            else:
-                raise ValueError(f"Unknown task type: {task.task_type}")
+            result = await self._execute(task)
+            
+            if task.status == TaskStatus.CANCELLED:
+                self._finish(task)
+                logger.info("Task cancelled while processing", task_id=task.id)
+                return
             
             task.result = result
             task.status = TaskStatus.COMPLETED
             task.completed_at = time.time()
+            duration = task.completed_at - task.started_at
+            self.durations[task.task_type] = 0.8 * self.durations[task.task_type] + 0.2 * duration
+            await self._save(task)
+            self._finish(task)
             
             logger.info("Task completed", task_id=task.id, task_type=task.task_type.value)
-            
-            # Call callback if provided
-            if task.callback:
-                try:
-                    if asyncio.iscoroutinefunction(task.callback):
-                        await task.callback(task)
-                    else:
-                        task.callback(task)
-                except Exception as e:
-                    logger.error("Callback error", task_id=task.id, error=str(e))
+            await self._run_callback(task)
             
         except Exception as e:
             task.error = str(e)
             task.retry_count += 1
             
-            if task.retry_count < task.max_retries:
+            # A failure the API reports as final would only repeat (and be paid for again)
+            if task.retry_count < task.max_retries and getattr(e, "retryable", True):
+                delay = self.retry_delay * 2 ** (task.retry_count - 1)
                 task.status = TaskStatus.PENDING
-                logger.warning("Task failed, retrying", task_id=task.id, retry_count=task.retry_count, error=str(e))
+                task.started_at = None
+                self._retry_later(task, delay)
+                logger.warning("Task failed, retrying", task_id=task.id, retry_count=task.retry_count,
+                               delay=delay, error=str(e))
             else:
                 task.status = TaskStatus.FAILED
                 task.completed_at = time.time()
+                await self._save(task)
+                self._finish(task)
                 logger.error("Task failed permanently", task_id=task.id, error=str(e))
+                await self._run_callback(task)
+    
+    def _retry_later(self, task: QueueTask, delay: float):
+        """Hand a failed task back to the queue after ``delay`` seconds.
+        
+        Until then the task keeps its lease (the heartbeat extends it), so no
+        other worker picks it up early; a cancel in the meantime wins.
+        """
+        async def release():
+            await asyncio.sleep(delay)
+            self._leased.discard(task.id)
+            if task.status == TaskStatus.PENDING:
+                await self._save(task)
+                self._wakeups[task.task_type].set()
+        
+        timer = asyncio.create_task(release())
+        self._retries.add(timer)
+        timer.add_done_callback(self._retries.discard)
+    
+    async def _run_callback(self, task: QueueTask):
+        """Call the task's callback, or else its type's completion handler (the task status tells the outcome)."""
+        callback = task.callback or self.completion_handlers.get(task.task_type)
+        if not callback:
+            return
+        try:
+            if asyncio.iscoroutinefunction(callback):
+                await callback(task)
+            else:
+                callback(task)
+        except Exception as e:
+            logger.error("Callback error", task_id=task.id, error=str(e))
+    
+    async def _execute(self, task: QueueTask) -> Any:
+        """Run the API call behind a task and return its result."""
+        # Import handlers dynamically to avoid circular imports
+        if task.task_type in [TaskType.GAMMA_PDF, TaskType.GAMMA_PPTX]:
+            from services.export.gamma_async_client import get_gamma_client
+            
+            export_as = "pdf" if task.task_type == TaskType.GAMMA_PDF else "pptx"
+            # The delivery context is for the completion handler, not for Gamma
+            options = {key: value for key, value in task.payload.items() if key != "delivery"}
+            # Status checks of all in-flight generations share one poller
+            return await get_gamma_client().generate(
+                export_as=export_as,
+                progress_callback=task.progress,
+                rate_limiter=self.rate_limiters.get(task.task_type),
+                **options,
+            )
+        if task.task_type == TaskType.OFDATA_COMPANY:
+            from services.report.ofdata_async_client import get_async_ofdata_client
+            client = get_async_ofdata_client()
+            return await client.get_company(inn=task.payload["inn"])
+        if task.task_type == TaskType.OFDATA_PERSON:
+            from services.report.ofdata_async_client import get_async_ofdata_client
+            client = get_async_ofdata_client()
+            return await client.get_person(inn=task.payload["inn"])
+        raise ValueError(f"Unknown task type: {task.task_type}")
     
     async def _cleanup_loop(self):
         """Cleanup old completed tasks."""
@@ -364,20 +918,23 @@ class QueueManager:
             try:
                 await asyncio.sleep(QUEUE_CLEANUP_INTERVAL)
                 
-                # Remove old completed/failed tasks (older than 1 hour)
+                # Remove old completed/failed tasks (older than 1 hour);
+                # the store is ordered by completion, so stop at the first fresh one
                 cutoff_time = time.time() - 3600
                 to_remove = []
                 
-                for task_id, task in self.tasks.items():
-                    if (task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED] 
-                        and task.completed_at and task.completed_at < cutoff_time):
-                        to_remove.append(task_id)
+                for task_id, task in self.completed.items():
+                    if task.completed_at and task.completed_at >= cutoff_time:
+                        break
+                    to_remove.append(task_id)
                 
                 for task_id in to_remove:
-                    del self.tasks[task_id]
+                    del self.completed[task_id]
+                
+                purged = await self.store.purge(cutoff_time)
                 
-                if to_remove:
-                    logger.info("Cleaned up old tasks", count=len(to_remove))
+                if to_remove or purged:
+                    logger.info("Cleaned up old tasks", count=len(to_remove), purged=purged)
                 
             except asyncio.CancelledError:
                 break
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Общий лимитер запросов к OFData (GCRA / token bucket)
+
+Состояние окна — одно число TAT (theoretical arrival time), поэтому его можно
+хранить в SQLite-файле или Redis и делить между процессами: репликами бота
+и FastAPI-приложением. Лимит задаётся сразу для минутного и часового окон,
+запрос может «весить» больше одного токена.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+from core.logger import get_logger
+from settings import (
+    OFDATA_RATE_LIMIT_PER_MINUTE,
+    OFDATA_RATE_LIMIT_PER_HOUR,
+    OFDATA_RATE_LIMIT_BACKEND,
+    OFDATA_RATE_LIMIT_DB_PATH,
+    OFDATA_RATE_LIMIT_REDIS_URL,
+    OFDATA_ENDPOINT_WEIGHTS,
+)
+
+log = get_logger(__name__)
+
+# Не спим дольше этого за раз: другой процесс мог освободить ёмкость раньше
+MAX_SLEEP_SEC = 5.0
+
+
+@dataclass(frozen=True)
+class RateWindow:
+    """Окно лимита: не более limit токенов за period секунд"""
+    name: str
+    limit: int
+    period: float
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+
+def gcra_reserve(tats: Sequence[Optional[float]], windows: Sequence[RateWindow],
+                 weight: float, now: float) -> Tuple[float, Sequence[float]]:
+    """
+    Один шаг GCRA сразу для нескольких окон
+
+    Returns:
+        (wait, new_tats): wait > 0 — сколько ждать, состояние при этом не меняется;
+        wait == 0 — запрос разрешён, new_tats нужно сохранить.
+    """
+    wait = 0.0
+    new_tats = []
+    for tat, window in zip(tats, windows):
+        cost = min(weight, window.limit)
+        new_tat = max(tat or now, now) + cost * window.interval
+        allow_at = new_tat - window.period
+        if allow_at > now:
+            wait = max(wait, allow_at - now)
+        new_tats.append(new_tat)
+    return wait, new_tats
+
+
+class MemoryRateLimitBackend:
+    """Локальное хранилище (один процесс, тесты)"""
+
+    in_process = True
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, keys: Sequence[str], windows: Sequence[RateWindow], weight: float) -> float:
+        with self._lock:
+            now = time.time()
+            wait, new_tats = gcra_reserve([self._tats.get(k) for k in keys], windows, weight, now)
+            if wait <= 0:
+                self._tats.update(zip(keys, new_tats))
+            return wait
+
+
+class SQLiteRateLimitBackend:
+    """Хранилище в SQLite-файле, общее для процессов на одной машине"""
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self._path), timeout=busy_timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                tat REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+
+    def reserve(self, keys: Sequence[str], windows: Sequence[RateWindow], weight: float) -> float:
+        with self._lock:
+            # BEGIN IMMEDIATE сразу берёт блокировку записи — read-modify-write атомарен между процессами
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                placeholders = ",".join("?" * len(keys))
+                rows = dict(self._conn.execute(
+                    f"SELECT key, tat FROM rate_limits WHERE key IN ({placeholders})", tuple(keys)
+                ).fetchall())
+                now = time.time()
+                wait, new_tats = gcra_reserve([rows.get(k) for k in keys], windows, weight, now)
+                if wait <= 0:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)",
+                        list(zip(keys, new_tats)),
+                    )
+                self._conn.execute("COMMIT")
+                return wait
+            except Exception:
+                # Откатываем, только если транзакция ещё открыта (после некоторых ошибок SQLite
+                # откатывает её сам): ROLLBACK без транзакции подменил бы исходную ошибку своей
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+
+_REDIS_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local weight = tonumber(ARGV[1])
+local wait = 0
+local new_tats = {}
+for i = 1, #KEYS do
+    local period = tonumber(ARGV[i * 2])
+    local limit = tonumber(ARGV[i * 2 + 1])
+    local cost = math.min(weight, limit)
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then tat = now end
+    local new_tat = tat + cost * period / limit
+    local allow_at = new_tat - period
+    if allow_at > now and allow_at - now > wait then wait = allow_at - now end
+    new_tats[i] = new_tat
+end
+if wait > 0 then return tostring(wait) end
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], tostring(new_tats[i]), 'PX', math.ceil((new_tats[i] - now) * 1000) + 1000)
+end
+return '0'
+"""
+
+
+class RedisRateLimitBackend:
+    """Хранилище в Redis (или совместимом сервере) — общее для нескольких машин"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("Для OFDATA_RATE_LIMIT_BACKEND=redis нужен пакет redis") from e
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_GCRA_SCRIPT)
+
+    def reserve(self, keys: Sequence[str], windows: Sequence[RateWindow], weight: float) -> float:
+        args = [weight]
+        for window in windows:
+            args.extend([window.period, window.limit])
+        return float(self._script(keys=list(keys), args=args))
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    """Разбирает строку вида "search=1,contracts=0.5" """
+    weights: Dict[str, float] = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        try:
+            weights[name.strip()] = float(value)
+        except ValueError:
+            log.warning("rate_limit: bad endpoint weight", item=item)
+    return weights
+
+
+def _endpoint_name(endpoint: Optional[str]) -> str:
+    """'/v2/legal-cases' и 'legal-cases' — один и тот же эндпоинт"""
+    return (endpoint or "").strip("/").rsplit("/", 1)[-1]
+
+
+class GCRALimiter:
+    """Лимитер с несколькими окнами и весами эндпоинтов"""
+
+    def __init__(self, name: str, windows: Sequence[RateWindow], backend,
+                 weights: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.windows = [w for w in windows if w.limit > 0]
+        self.backend = backend
+        self.weights = dict(weights or {})
+        self._keys = [f"{name}:{w.name}" for w in self.windows]
+
+    def weight_for(self, endpoint: Optional[str]) -> float:
+        return self.weights.get(_endpoint_name(endpoint), 1.0)
+
+    def try_acquire(self, endpoint: Optional[str] = None, weight: Optional[float] = None) -> float:
+        """Пытается занять токены; возвращает 0 при успехе или время ожидания в секундах"""
+        if not self.windows:
+            return 0.0
+        cost = self.weight_for(endpoint) if weight is None else weight
+        if cost <= 0:
+            return 0.0
+        return self.backend.reserve(self._keys, self.windows, cost)
+
+    async def acquire(self, endpoint: Optional[str] = None, weight: Optional[float] = None) -> None:
+        """Ждёт (не блокируя event loop), пока лимит позволит запрос"""
+        while True:
+            if getattr(self.backend, 'in_process', False):
+                wait = self.try_acquire(endpoint, weight)
+            else:
+                wait = await asyncio.to_thread(self.try_acquire, endpoint, weight)
+            if wait <= 0:
+                return
+            log.debug("rate_limit: waiting", limiter=self.name, endpoint=endpoint, wait=round(wait, 3))
+            await asyncio.sleep(min(wait, MAX_SLEEP_SEC))
+
+    def acquire_sync(self, endpoint: Optional[str] = None, weight: Optional[float] = None) -> None:
+        """Блокирующий вариант для синхронных клиентов, работающих в потоках"""
+        while True:
+            wait = self.try_acquire(endpoint, weight)
+            if wait <= 0:
+                return
+            log.debug("rate_limit: waiting", limiter=self.name, endpoint=endpoint, wait=round(wait, 3))
+            time.sleep(min(wait, MAX_SLEEP_SEC))
+
+
+def _make_backend(kind: str):
+    kind = (kind or "sqlite").lower()
+    if kind == "redis":
+        return RedisRateLimitBackend(OFDATA_RATE_LIMIT_REDIS_URL)
+    if kind == "memory":
+        return MemoryRateLimitBackend()
+    return SQLiteRateLimitBackend(OFDATA_RATE_LIMIT_DB_PATH)
+
+
+# Глобальный лимитер OFData
+_ofdata_limiter: Optional[GCRALimiter] = None
+_ofdata_limiter_lock = threading.Lock()
+
+
+def get_ofdata_limiter() -> GCRALimiter:
+    """Получает общий лимитер OFData (минутное и часовое окна)"""
+    global _ofdata_limiter
+    if _ofdata_limiter is None:
+        with _ofdata_limiter_lock:
+            if _ofdata_limiter is None:
+                try:
+                    backend = _make_backend(OFDATA_RATE_LIMIT_BACKEND)
+                except Exception as e:
+                    log.error("rate_limit: backend unavailable, using in-process limiter",
+                              backend=OFDATA_RATE_LIMIT_BACKEND, error=str(e))
+                    backend = MemoryRateLimitBackend()
+                _ofdata_limiter = GCRALimiter(
+                    "ofdata",
+                    [
+                        RateWindow("minute", OFDATA_RATE_LIMIT_PER_MINUTE, 60.0),
+                        RateWindow("hour", OFDATA_RATE_LIMIT_PER_HOUR, 3600.0),
+                    ],
+                    backend,
+                    weights=_parse_weights(OFDATA_ENDPOINT_WEIGHTS),
+                )
+    return _ofdata_limiter
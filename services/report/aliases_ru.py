@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 """
 Русские алиасы для полей OFData API
+
+Таблицы заморожены (MappingProxyType): общие для всех потоков и только для чтения.
 """
-from typing import Dict
+from types import MappingProxyType
+from typing import Mapping
 
 # Общие алиасы
-COMMON_ALIASES: Dict[str, str] = {
+COMMON_ALIASES: Mapping[str, str] = MappingProxyType({
     "ОГРН": "ОГРН",
     "ИНН": "ИНН",
     "КПП": "КПП",
@@ -69,10 +72,10 @@ COMMON_ALIASES: Dict[str, str] = {
     "ДержРеестрАО.НаимПолн": "Реестр акционеров — наименование",
     "Санкции": "Санкции",
     "СанкцииСтраны[]": "Санкции — страны",
-}
+})
 
 # Алиасы для компаний
-COMPANY_ALIASES: Dict[str, str] = {
+COMPANY_ALIASES: Mapping[str, str] = MappingProxyType({
     "УпрОрг.ОГРН": "Управляющая организация — ОГРН",
     "УпрОрг.ИНН": "Управляющая организация — ИНН",
     "УпрОрг.НаимСокр": "Управляющая организация — наименование",
@@ -92,27 +95,27 @@ COMPANY_ALIASES: Dict[str, str] = {
     "Учредители[][].ДоляПроц": "Доля, %",
     "РМСП.Кат": "Реестр МСП — категория",
     "РМСП.ДатаВкл": "Реестр МСП — дата включения",
-}
+})
 
 # Алиасы для ИП
-ENTREPRENEUR_ALIASES: Dict[str, str] = {
+ENTREPRENEUR_ALIASES: Mapping[str, str] = MappingProxyType({
     "Тип": "Тип ИП",
     "ДатаПрекращ": "Дата прекращения деятельности",
     "Налоги.ОсобРежим[]": "Особые налоговые режимы (ИП)",
-}
+})
 
 # Алиасы для финансов
-FIN_ALIASES: Dict[str, str] = {
+FIN_ALIASES: Mapping[str, str] = MappingProxyType({
     "data.<year>.2110": "Выручка (2110)",
     "data.<year>.2400": "Чистая прибыль/убыток (2400)",
     "data.<year>.3200.Итог": "Капитал и резервы — итог",
     "data.<year>.3200.НераспПриб": "Нераспределённая прибыль/убыток",
     "data.<year>.3200.УстКапитал": "Уставный капитал (3200)",
     # Прочие строки отображать как: 'Строка <код>'
-}
+})
 
 # Алиасы для арбитражных дел
-LEGAL_ALIASES: Dict[str, str] = {
+LEGAL_ALIASES: Mapping[str, str] = MappingProxyType({
     "data.ЗапВсего": "Всего дел",
     "data.ОбщСуммИск": "Общая сумма исковых требований",
     "data.Записи[].Номер": "Дело — номер",
@@ -121,24 +124,24 @@ LEGAL_ALIASES: Dict[str, str] = {
     "data.Записи[].Ист[]": "Истцы",
     "data.Записи[].Ответ[]": "Ответчики",
     "data.Записи[].СуммИск": "Сумма исковых требований",
-}
+})
 
 # Алиасы для исполнительных производств
-ENFORCE_ALIASES: Dict[str, str] = {
+ENFORCE_ALIASES: Mapping[str, str] = MappingProxyType({
     "data.Записи[].ИспПрНомер": "Исп. производство — номер",
     "data.Записи[].ИспПрДата": "Исп. производство — дата",
     "data.Записи[].СумДолг": "Сумма долга",
     "data.Записи[].ОстЗадолж": "Остаток задолженности",
     "data.Записи[].СудПристНаим": "Отдел судебных приставов",
-}
+})
 
 # Алиасы для проверок
-INSPECT_ALIASES: Dict[str, str] = {
+INSPECT_ALIASES: Mapping[str, str] = MappingProxyType({
     # заполним по фактическим ответам
-}
+})
 
 # Алиасы для госзакупок
-CONTRACTS_ALIASES: Dict[str, str] = {
+CONTRACTS_ALIASES: Mapping[str, str] = MappingProxyType({
     "data.ЗапВсего": "Всего контрактов",
     "data.Записи[].РегНомер": "Регистрационный номер",
     "data.Записи[].Дата": "Дата подписания",
@@ -147,4 +150,4 @@ CONTRACTS_ALIASES: Dict[str, str] = {
     "data.Записи[].Заказ.НаимПолн": "Заказчик — наименование",
     "data.Записи[].Постав[].НаимПолн": "Поставщик — наименование",
     "data.Записи[].Объекты[].Наим": "Объект закупки — наименование",
-}
+})
@@ -3,8 +3,13 @@
 Сборщик отчёта
 """
 import asyncio
-from typing import Dict, Any, List, Optional, Tuple
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from settings import REPORT_FANOUT_CONCURRENCY, REPORT_SECTION_CACHE_BYTES
+from services.cache import CacheEntry, DataAge, MemoryCache, cache_bypass, track_data_age
+from .ir import Block, Report, Row, Section, Table, sections_from_text, sections_size, source_digest
 from .ofdata_client import OFDataClient
+from .ofdata_async_client import get_async_ofdata_client
 from .simple_company_renderer import render_company_simple, load_aliases
 from .simple_finances_renderer import render_finances_simple
 from .render_legal import render_legal
@@ -23,7 +28,10 @@ class ReportBuilder:
     def __init__(self):
         """Инициализация сборщика"""
         self.client = OFDataClient()
+        self.async_client = None  # AsyncOFDataClient, создаётся при первом асинхронном отчёте
         self._aliases = load_aliases()
+        # Отрисованные секции по хэшу исходных данных: повторный отчёт не рендерится заново
+        self._section_cache = MemoryCache(REPORT_SECTION_CACHE_BYTES) if REPORT_SECTION_CACHE_BYTES > 0 else None
         self.openai_client = None  # Будет инициализирован при необходимости
     
     def build_report(self, query: str, include_sections: List[str] = None) -> str:
@@ -458,8 +466,11 @@ class ReportBuilder:
         Returns:
             Готовый отчёт
         """
+        return self.build_simple_report_ir(ident, include, max_rows).text
+    
+    def build_simple_report_ir(self, ident: Dict[str, Any], include: List[str], max_rows: int = 100) -> Report:
+        """То же, что build_simple_report, но в виде IR (см. services.report.ir)"""
         log.info("build_simple_report: starting", ident=ident)
-        from .formatters import format_money, format_date
         try:
             # 1. Получаем данные компании
             company_data = self.client.get_company(**ident)
@@ -477,8 +488,11 @@ class ReportBuilder:
                                 company_data = self.client.get_company(inn=inn)
                 
                 if not company_data or 'data' not in company_data:
-                    return "❌ Компания не найдена"
-            
+                    return Report.message("❌ Компания не найдена")
+
+            # Ответ клиента может быть общим для нескольких отчётов — не меняем его на месте
+            company_data = dict(company_data)
+
             # 2. Получаем данные
             company_info = company_data.get('data', company_data)
             
@@ -569,177 +583,327 @@ class ReportBuilder:
                 except Exception as e:
                     log.warning("Could not load contracts", error=str(e))
             
-            # Для налоговых данных нужно искать в правильном месте
-            taxes_data = company_info.get('Налоги', {})
+            # Физлица (руководитель и учредители) — не более 5 профилей
+            persons = []
+            if 'company' in include:
+                for inn in self._collect_person_inns(company_info):
+                    try:
+                        persons.append(self.client.get_person(inn=inn))
+                    except Exception as e:
+                        log.warning("build_simple_report: person fetch failed", inn=inn, error=str(e))
             
-            # 3. Собираем секции
-            sections = []
+            return Report(self._render_report_sections(company_data, company_info, include, persons))
             
-            # ОСНОВНОЕ
-            if 'company' in include:
-                from .simple_company_renderer import render_company_simple, load_aliases
-                company_section = render_company_simple(company_info)
-                sections.append(company_section)
-                # ФИЗЛИЦА (руководитель и учредители)
-                try:
-                    from .render_person import render_person
-                    person_inns = set()
-                    ruk = company_info.get('Руковод')
-                    # Руковод может быть dict или list
-                    if isinstance(ruk, dict):
-                        inn_ruk = ruk.get('ИНН')
-                        if inn_ruk:
-                            person_inns.add(str(inn_ruk))
-                    elif isinstance(ruk, list):
-                        for item in ruk:
-                            if isinstance(item, dict) and item.get('ИНН'):
-                                person_inns.add(str(item['ИНН']))
-                    uch = company_info.get('Учред') or {}
-                    fl_list = uch.get('ФЛ') if isinstance(uch, dict) else None
-                    if isinstance(fl_list, list):
-                        for fl in fl_list:
-                            if isinstance(fl, dict) and fl.get('ИНН'):
-                                person_inns.add(str(fl['ИНН']))
-                    # Ограничим до 5 профилей
-                    if person_inns:
-                        person_blocks = []
-                        for inn in list(person_inns)[:5]:
-                            try:
-                                person = self.client.get_person(inn=inn)
-                                if person and person.get('data'):
-                                    person_blocks.append(render_person(person))
-                            except Exception as e:
-                                log.warning("build_simple_report: person fetch failed", inn=inn, error=str(e))
-                        if person_blocks:
-                            sections.append("ФИЗИЧЕСКИЕ ЛИЦА (РУКОВОДИТЕЛЬ/УЧРЕДИТЕЛИ)\n" + "=" * 50 + "\n" + "\n\n".join(person_blocks))
-                except Exception as e:
-                    log.warning("build_simple_report: person section error", error=str(e))
+        except Exception as e:
+            log.error("ReportBuilder: error building simple report", error=str(e), ident=ident)
+            return Report.message(f"❌ Ошибка при формировании отчёта: {str(e)}")
+    
+    async def build_simple_report_async(self, ident: Dict[str, Any], include: List[str], max_rows: int = 100,
+                                        concurrency: Optional[int] = None, refresh: bool = False) -> str:
+        """
+        Строит простой отчёт, загружая независимые секции параллельно
+        
+        После получения карточки компании (и ИНН) финансы, суды, ИП, проверки,
+        госзакупки и физлица запрашиваются одновременно, но не более
+        ``concurrency`` запросов на один отчёт. Ошибка отдельной секции
+        не прерывает отчёт — секция выводится как «Данные недоступны».
+        
+        Args:
+            ident: Словарь с идентификаторами (inn, ogrn, okpo, kpp) или name
+            include: Список секций для включения
+            max_rows: Максимальное количество строк в отчёте
+            concurrency: Лимит одновременных запросов (по умолчанию REPORT_FANOUT_CONCURRENCY)
+            refresh: Принудительное обновление — не брать ответы из кэша
             
-            # НАЛОГИ
-            if 'taxes' in include:
-                if taxes_data and any(taxes_data.values()):
-                    tax_lines = ["НАЛОГИ", "=" * 50]
-                    
-                    # Особые режимы
-                    regimes = taxes_data.get('ОсобРежим', [])
-                    if regimes:
-                        from .formatters import format_list
-                        tax_lines.append(f"Режимы: {format_list(regimes)}")
-                    
-                    # Год уплаты
-                    year = taxes_data.get('СведУплГод', '—')
-                    if year != '—':
-                        tax_lines.append(f"Год: {year}")
-                    
-                    # Всего уплачено
-                    total_paid = taxes_data.get('СумУпл', 0)
-                    if isinstance(total_paid, (int, float)) and total_paid > 0:
-                        tax_lines.append(f"Всего уплачено: {format_money(total_paid)}")
-                    
-                    # Топ-5 уплаченных налогов
-                    paid_taxes = taxes_data.get('СведУпл', [])
-                    if paid_taxes:
-                        sorted_taxes = sorted(paid_taxes, key=lambda x: x.get('Сумма', 0), reverse=True)
-                        tax_lines.append("Топ-5 уплаченных налогов:")
-                        for tax in sorted_taxes[:5]:
-                            name = tax.get('Наим', '—')
-                            amount = tax.get('Сумма', 0)
-                            tax_lines.append(f"• {name}: {format_money(amount)}")
-                        # Полный список (в человекочитаемом виде)
-                        tax_lines.append("")
-                        tax_lines.append("Все уплаченные налоги (полный список):")
-                        for tax in sorted_taxes:
-                            name = tax.get('Наим', '—')
-                            amount = tax.get('Сумма', 0)
-                            year = tax.get('Год') or taxes_data.get('СведУплГод') or '—'
-                            tax_lines.append(f"• {year}: {name} — {format_money(amount)}")
-                    
-                    # Недоимка
-                    arrears = taxes_data.get('СумНедоим', 0)
-                    arrears_date = taxes_data.get('НедоимДата', '—')
-                    if isinstance(arrears, (int, float)) and arrears > 0:
-                        formatted_date = format_date(arrears_date) if arrears_date != '—' else '—'
-                        tax_lines.append(f"Недоимка: {format_money(arrears)} (на {formatted_date})")
-                    
-                    sections.append("\n".join(tax_lines))
-                else:
-                    sections.append("НАЛОГИ\n" + "=" * 50 + "\nДанные недоступны")
+        Returns:
+            Готовый отчёт
+        """
+        report = await self.build_simple_report_ir_async(ident, include, max_rows, concurrency, refresh)
+        return report.text
+    
+    async def build_simple_report_ir_async(self, ident: Dict[str, Any], include: List[str], max_rows: int = 100,
+                                           concurrency: Optional[int] = None, refresh: bool = False) -> Report:
+        """То же, что build_simple_report_async, но в виде IR (см. services.report.ir)"""
+        if refresh:
+            with cache_bypass():
+                return await self.build_simple_report_ir_async(ident, include, max_rows, concurrency)
+        with track_data_age() as data_age:
+            return await self._build_simple_report_async(ident, include, concurrency, data_age)
+    
+    async def _build_simple_report_async(self, ident: Dict[str, Any], include: List[str],
+                                         concurrency: Optional[int], data_age: DataAge) -> Report:
+        """Тело build_simple_report_async; data_age собирает возраст ответов из кэша"""
+        log.info("build_simple_report_async: starting", ident=ident)
+        client = self._get_async_client()
+        try:
+            company_data = await self._resolve_company_async(client, ident)
+            if not company_data or 'data' not in company_data:
+                return Report.message("❌ Компания не найдена")
+            # Ответ клиента может быть общим для нескольких отчётов — не меняем его на месте
+            company_data = dict(company_data)
+            company_info = company_data.get('data', company_data)
             
-            # ФИНАНСОВАЯ ОТЧЁТНОСТЬ
-            if 'finances' in include:
-                try:
-                    # Сначала проверяем, есть ли финансы в company_data (как в примере пользователя)
-                    if 'data' in company_data and any(key.isdigit() and len(key) == 4 for key in company_data['data'].keys()):
-                        finances = render_finances_simple(company_data)
-                        sections.append(finances)
-                    # Затем проверяем, есть ли финансы в company_data['finances']
-                    elif company_data.get('finances') and 'data' in company_data['finances']:
-                        finances = render_finances_simple(company_data['finances'])
-                        sections.append(finances)
-                    else:
-                        sections.append("ФИНАНСОВАЯ ОТЧЁТНОСТЬ\n" + "=" * 50 + "\nДанные недоступны")
-                except Exception as e:
-                    log.warning("Could not fetch finances", error=str(e))
-                    sections.append("ФИНАНСОВАЯ ОТЧЁТНОСТЬ\n" + "=" * 50 + "\nДанные недоступны")
+            # Секции запрашиваем по ИНН из карточки — он есть и при поиске по названию
+            inn = company_info.get('ИНН') if isinstance(company_info, dict) else None
+            section_ident = {'inn': inn} if inn else {k: v for k, v in ident.items() if k != 'name'}
             
-            # АРБИТРАЖНЫЕ ДЕЛА
+            # Секция -> (метод клиента, аргументы)
+            jobs: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+            if 'finances' in include:
+                jobs['finances'] = ('get_finances', section_ident)
             if 'legal-cases' in include:
-                try:
-                    if company_data.get('legal_cases') and 'data' in company_data['legal_cases']:
-                        legal = render_legal(company_data['legal_cases'])
-                        sections.append(legal)
-                    else:
-                        sections.append("АРБИТРАЖНЫЕ ДЕЛА\n" + "=" * 50 + "\nДанные недоступны")
-                except Exception as e:
-                    log.warning("Could not fetch legal cases", error=str(e))
-                    sections.append("АРБИТРАЖНЫЕ ДЕЛА\n" + "=" * 50 + "\nДанные недоступны")
-            
-            # ИСПОЛНИТЕЛЬНЫЕ ПРОИЗВОДСТВА
+                jobs['legal_cases'] = ('get_legal_cases', section_ident)
             if 'enforcements' in include:
-                try:
-                    if company_data.get('enforcements') and 'data' in company_data['enforcements']:
-                        enforce = render_enforce(company_data['enforcements'])
-                        sections.append(enforce)
-                    else:
-                        sections.append("ИСПОЛНИТЕЛЬНЫЕ ПРОИЗВОДСТВА\n" + "=" * 50 + "\nДанные недоступны")
-                except Exception as e:
-                    log.warning("Could not fetch enforcements", error=str(e))
-                    sections.append("ИСПОЛНИТЕЛЬНЫЕ ПРОИЗВОДСТВА\n" + "=" * 50 + "\nДанные недоступны")
-            
-            # ПРОВЕРКИ
+                jobs['enforcements'] = ('get_enforcements', section_ident)
             if 'inspections' in include:
-                try:
-                    if company_data.get('inspections') and 'data' in company_data['inspections']:
-                        inspect = render_inspect(company_data['inspections'])
-                        sections.append(inspect)
-                    else:
-                        sections.append("ПРОВЕРКИ\n" + "=" * 50 + "\nДанные недоступны")
-                except Exception as e:
-                    log.warning("Could not render inspections", error=str(e))
-                    sections.append("ПРОВЕРКИ\n" + "=" * 50 + f"\nОшибка обработки данных: {str(e)}")
-            
-            # ГОСЗАКУПКИ
+                jobs['inspections'] = ('get_inspections', section_ident)
             if 'contracts' in include:
-                try:
-                    if company_data.get('contracts'):
-                        contracts = render_contracts_simple(company_data['contracts'])
-                        sections.append(contracts)
-                    else:
-                        sections.append("ГОСЗАКУПКИ\n" + "=" * 50 + "\nДанные недоступны")
-                except Exception as e:
-                    log.warning("Could not fetch contracts", error=str(e))
-                    sections.append("ГОСЗАКУПКИ\n" + "=" * 50 + "\nДанные недоступны")
+                for law in ('44', '223'):
+                    for role in ('customer', 'supplier'):
+                        jobs[f'contracts:{law}_{role}'] = ('get_contracts', {'law': law, 'role': role, **section_ident})
+            person_inns = self._collect_person_inns(company_info) if 'company' in include else []
+            for person_inn in person_inns:
+                jobs[f'person:{person_inn}'] = ('get_person', {'inn': person_inn})
+            
+            # Все секции, что есть в кэше, поднимаем в память одним запросом
+            try:
+                await client.hydrate(jobs.values())
+            except Exception as e:
+                log.warning("build_simple_report_async: cache hydrate failed", error=str(e))
             
-            # 4. Собираем полный текст
-            full_text = "\n\n".join(sections)
+            semaphore = asyncio.Semaphore(max(1, concurrency or REPORT_FANOUT_CONCURRENCY))
             
-            # 5. OpenAI секции отключены
+            async def fetch(name: str, method: str, kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                async with semaphore:
+                    try:
+                        return await getattr(client, method)(**kwargs)
+                    except Exception as e:
+                        log.warning("build_simple_report_async: section fetch failed", section=name, error=str(e))
+                        return None
+            
+            log.debug("build_simple_report_async: fan-out", jobs=list(jobs.keys()))
+            results = dict(zip(jobs.keys(), await asyncio.gather(
+                *(fetch(name, method, kwargs) for name, (method, kwargs) in jobs.items())
+            )))
+            
+            for key in ('finances', 'legal_cases', 'enforcements', 'inspections'):
+                if results.get(key):
+                    company_data[key] = results[key]
+            contracts_data = {
+                name.split(':', 1)[1]: payload
+                for name, payload in results.items()
+                if name.startswith('contracts:') and payload
+            }
+            if contracts_data:
+                company_data['contracts'] = contracts_data
+            persons = [results.get(f'person:{person_inn}') for person_inn in person_inns]
             
-            return full_text
+            # Рендеринг — чистый CPU, выносим из event loop
+            sections = await asyncio.to_thread(self._render_report_sections, company_data, company_info, include, persons)
+            if data_age.oldest is not None:
+                sections.append(Section("footer", None, [Block([Row(f"Данные на {data_age.oldest.strftime('%d.%m.%Y %H:%M')}")])]))
+            return Report(sections)
             
         except Exception as e:
             log.error("ReportBuilder: error building simple report", error=str(e), ident=ident)
-            return f"❌ Ошибка при формировании отчёта: {str(e)}"
+            return Report.message(f"❌ Ошибка при формировании отчёта: {str(e)}")
+    
+    def _get_async_client(self):
+        """Асинхронный клиент OFData (общий на процесс)"""
+        if self.async_client is None:
+            self.async_client = get_async_ofdata_client()
+        return self.async_client
+    
+    async def _resolve_company_async(self, client, ident: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Получает карточку компании по идентификаторам или по названию"""
+        if any(key in ident for key in ('ogrn', 'inn', 'okpo')):
+            return await client.get_company(**ident)
+        if ident.get('name'):
+            search_results = await client.search(by='name', obj='company', query=ident['name'])
+            records = (search_results or {}).get('data', {}).get('Записи', [])
+            inn = records[0].get('ИНН') if records else None
+            if inn:
+                return await client.get_company(inn=inn)
+        return None
+    
+    def _render_report_sections(self, company_data: Dict[str, Any], company_info: Dict[str, Any],
+                                 include: List[str], persons: List[Dict[str, Any]]) -> List[Section]:
+        """Собирает секции IR из уже загруженных данных (без обращений к API)"""
+        # Для налоговых данных нужно искать в правильном месте
+        taxes_data = company_info.get('Налоги', {})
+        
+        # 3. Собираем секции
+        sections: List[Section] = []
+        
+        # ОСНОВНОЕ
+        if 'company' in include:
+            from .simple_company_renderer import render_company_simple
+            sections.extend(self._rendered('company', company_info, lambda: render_company_simple(company_info)))
+            # ФИЗЛИЦА (руководитель и учредители)
+            try:
+                person_data = [person for person in persons if person and person.get('data')]
+                if person_data:
+                    sections.extend(self._rendered('persons', person_data, lambda: (
+                        "ФИЗИЧЕСКИЕ ЛИЦА (РУКОВОДИТЕЛЬ/УЧРЕДИТЕЛИ)\n" + "=" * 50 + "\n"
+                        + "\n\n".join(render_person(person) for person in person_data)
+                    )))
+            except Exception as e:
+                log.warning("build_simple_report: person section error", error=str(e))
+        
+        # НАЛОГИ
+        if 'taxes' in include:
+            if taxes_data and any(taxes_data.values()):
+                sections.append(self._taxes_section(taxes_data))
+            else:
+                sections.append(_unavailable('taxes', "НАЛОГИ"))
+        
+        # ФИНАНСОВАЯ ОТЧЁТНОСТЬ
+        if 'finances' in include:
+            try:
+                # Сначала проверяем, есть ли финансы в company_data (как в примере пользователя)
+                if 'data' in company_data and any(key.isdigit() and len(key) == 4 for key in company_data['data'].keys()):
+                    sections.extend(self._rendered('finances', company_data, lambda: render_finances_simple(company_data)))
+                # Затем проверяем, есть ли финансы в company_data['finances']
+                elif company_data.get('finances') and 'data' in company_data['finances']:
+                    finances_data = company_data['finances']
+                    sections.extend(self._rendered('finances', finances_data, lambda: render_finances_simple(finances_data)))
+                else:
+                    sections.append(_unavailable('finances', "ФИНАНСОВАЯ ОТЧЁТНОСТЬ"))
+            except Exception as e:
+                log.warning("Could not fetch finances", error=str(e))
+                sections.append(_unavailable('finances', "ФИНАНСОВАЯ ОТЧЁТНОСТЬ"))
+        
+        # АРБИТРАЖНЫЕ ДЕЛА
+        if 'legal-cases' in include:
+            try:
+                if company_data.get('legal_cases') and 'data' in company_data['legal_cases']:
+                    legal_data = company_data['legal_cases']
+                    sections.extend(self._rendered('legal-cases', legal_data, lambda: render_legal(legal_data)))
+                else:
+                    sections.append(_unavailable('legal-cases', "АРБИТРАЖНЫЕ ДЕЛА"))
+            except Exception as e:
+                log.warning("Could not fetch legal cases", error=str(e))
+                sections.append(_unavailable('legal-cases', "АРБИТРАЖНЫЕ ДЕЛА"))
+        
+        # ИСПОЛНИТЕЛЬНЫЕ ПРОИЗВОДСТВА
+        if 'enforcements' in include:
+            try:
+                if company_data.get('enforcements') and 'data' in company_data['enforcements']:
+                    enforce_data = company_data['enforcements']
+                    sections.extend(self._rendered('enforcements', enforce_data, lambda: render_enforce(enforce_data)))
+                else:
+                    sections.append(_unavailable('enforcements', "ИСПОЛНИТЕЛЬНЫЕ ПРОИЗВОДСТВА"))
+            except Exception as e:
+                log.warning("Could not fetch enforcements", error=str(e))
+                sections.append(_unavailable('enforcements', "ИСПОЛНИТЕЛЬНЫЕ ПРОИЗВОДСТВА"))
+        
+        # ПРОВЕРКИ
+        if 'inspections' in include:
+            try:
+                if company_data.get('inspections') and 'data' in company_data['inspections']:
+                    inspect_data = company_data['inspections']
+                    sections.extend(self._rendered('inspections', inspect_data, lambda: render_inspect(inspect_data)))
+                else:
+                    sections.append(_unavailable('inspections', "ПРОВЕРКИ"))
+            except Exception as e:
+                log.warning("Could not render inspections", error=str(e))
+                sections.append(_unavailable('inspections', "ПРОВЕРКИ", f"Ошибка обработки данных: {str(e)}"))
+        
+        # ГОСЗАКУПКИ
+        if 'contracts' in include:
+            try:
+                if company_data.get('contracts'):
+                    contracts_data = company_data['contracts']
+                    sections.extend(self._rendered('contracts', contracts_data, lambda: render_contracts_simple(contracts_data)))
+                else:
+                    sections.append(_unavailable('contracts', "ГОСЗАКУПКИ"))
+            except Exception as e:
+                log.warning("Could not fetch contracts", error=str(e))
+                sections.append(_unavailable('contracts', "ГОСЗАКУПКИ"))
+        
+        # OpenAI секции отключены
+        
+        return sections
+    
+    def _rendered(self, group: str, source: Any, render: Callable[[], str]) -> List[Section]:
+        """Секции IR из текста рендерера; результат кэшируется по хэшу исходных данных"""
+        if self._section_cache is None:
+            return sections_from_text(group, render())
+        key = f"{group}:{source_digest(source)}"
+        entry = self._section_cache.get(key)
+        if entry is not None:
+            return entry.value
+        sections = sections_from_text(group, render())
+        self._section_cache.put(key, CacheEntry(sections, int(time.time()), 0), sections_size(sections))
+        return sections
+    
+    def _taxes_section(self, taxes_data: Dict[str, Any]) -> Section:
+        """Секция НАЛОГИ: строки «ключ: значение» и таблицы уплаченных налогов"""
+        from .formatters import format_money, format_date, format_list
+        rows: List[Any] = []
+        blocks = [Block(rows)]
+        
+        # Особые режимы
+        regimes = taxes_data.get('ОсобРежим', [])
+        if regimes:
+            rows.append(Row(key="Режимы", value=format_list(regimes)))
+        
+        # Год уплаты
+        year = taxes_data.get('СведУплГод', '—')
+        if year != '—':
+            rows.append(Row(key="Год", value=str(year)))
+        
+        # Всего уплачено
+        total_paid = taxes_data.get('СумУпл', 0)
+        if isinstance(total_paid, (int, float)) and total_paid > 0:
+            rows.append(Row(key="Всего уплачено", value=format_money(total_paid)))
+        
+        # Топ-5 уплаченных налогов
+        paid_taxes = taxes_data.get('СведУпл', [])
+        if paid_taxes:
+            sorted_taxes = sorted(paid_taxes, key=lambda x: x.get('Сумма', 0), reverse=True)
+            rows.append(Row(key="Топ-5 уплаченных налогов"))
+            rows.append(Table(
+                columns=["Налог", "Сумма"],
+                rows=[[str(tax.get('Наим', '—')), format_money(tax.get('Сумма', 0))] for tax in sorted_taxes[:5]],
+                line="• {0}: {1}",
+            ))
+            # Полный список (в человекочитаемом виде) — отдельным абзацем
+            rows = [Row(key="Все уплаченные налоги (полный список)")]
+            blocks.append(Block(rows))
+            rows.append(Table(
+                columns=["Год", "Налог", "Сумма"],
+                rows=[
+                    [str(tax.get('Год') or taxes_data.get('СведУплГод') or '—'),
+                     str(tax.get('Наим', '—')), format_money(tax.get('Сумма', 0))]
+                    for tax in sorted_taxes
+                ],
+                line="• {0}: {1} — {2}",
+            ))
+        
+        # Недоимка
+        arrears = taxes_data.get('СумНедоим', 0)
+        arrears_date = taxes_data.get('НедоимДата', '—')
+        if isinstance(arrears, (int, float)) and arrears > 0:
+            formatted_date = format_date(arrears_date) if arrears_date != '—' else '—'
+            rows.append(Row(key="Недоимка", value=f"{format_money(arrears)} (на {formatted_date})"))
+        
+        return Section('taxes', "НАЛОГИ", [block for block in blocks if block.rows])
+    
+    def _collect_person_inns(self, company_info: Dict[str, Any], limit: int = 5) -> List[str]:
+        """ИНН руководителя и учредителей-ФЛ (без повторов, не более limit)"""
+        person_inns: List[str] = []
+        ruk = company_info.get('Руковод')
+        # Руковод может быть dict или list
+        ruk_items = [ruk] if isinstance(ruk, dict) else (ruk if isinstance(ruk, list) else [])
+        uch = company_info.get('Учред') or {}
+        fl_list = uch.get('ФЛ') if isinstance(uch, dict) else None
+        for item in ruk_items + (fl_list if isinstance(fl_list, list) else []):
+            if isinstance(item, dict) and item.get('ИНН'):
+                inn = str(item['ИНН'])
+                if inn not in person_inns:
+                    person_inns.append(inn)
+        return person_inns[:limit]
     
     # OpenAI summarization disabled: method removed
 
@@ -750,3 +914,8 @@ class ReportBuilder:
 
 
 
+
+
+def _unavailable(group: str, title: str, message: str = "Данные недоступны") -> Section:
+    """Секция-заглушка: заголовок и одно сообщение"""
+    return Section(group, title, [Block([Row(message)])])
@@ -2,95 +2,224 @@
 """
 Разворачивание JSON в плоскую структуру с dot-нотацией
 """
-from typing import Dict, Any, List, Union
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 
+from core.logger import get_logger
+from settings import REPORT_FLATTEN_MAX_DEPTH, REPORT_FLATTEN_MAX_ITEMS
 
-def flatten(obj: Any, prefix: str = "") -> Dict[str, Any]:
+log = get_logger(__name__)
+
+
+def _frame(path: str, obj: Union[Dict[str, Any], List[Any]]) -> Tuple[str, bool, Iterator[Tuple[Any, Any]]]:
+    if isinstance(obj, list):
+        return path, True, enumerate(obj)
+    return path, False, iter(obj.items())
+
+
+def iter_flat(
+    obj: Any,
+    prefix: str = "",
+    max_depth: Optional[int] = None,
+    max_items: Optional[int] = None,
+) -> Iterator[Tuple[str, Any]]:
     """
-    Разворачивает вложенный объект в плоскую структуру с dot-нотацией
-    
+    Лениво отдаёт пары (путь в dot-нотации, значение) без рекурсии
+
+    Обход в глубину в порядке ключей — тот же порядок, что у flatten.
+    Контейнеры глубже max_depth пропускаются, после max_items значений
+    обход прекращается (с предупреждением в лог).
+
     Args:
         obj: Объект для разворачивания
         prefix: Префикс для ключей
-        
-    Returns:
-        Плоский словарь с ключами в dot-нотации
+        max_depth: Максимальная вложенность (по умолчанию REPORT_FLATTEN_MAX_DEPTH)
+        max_items: Максимум значений (по умолчанию REPORT_FLATTEN_MAX_ITEMS)
     """
-    result = {}
-    
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            new_prefix = f"{prefix}.{key}" if prefix else key
-            if isinstance(value, (dict, list)):
-                result.update(flatten(value, new_prefix))
-            else:
-                result[new_prefix] = value
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            new_prefix = f"{prefix}[{i}]" if prefix else f"[{i}]"
-            if isinstance(item, (dict, list)):
-                result.update(flatten(item, new_prefix))
-            else:
-                result[new_prefix] = item
-    else:
+    if not isinstance(obj, (dict, list)):
         # Примитивное значение
         if prefix:
-            result[prefix] = obj
-    
-    return result
+            yield prefix, obj
+        return
 
+    max_depth = REPORT_FLATTEN_MAX_DEPTH if max_depth is None else max_depth
+    max_items = REPORT_FLATTEN_MAX_ITEMS if max_items is None else max_items
+    # Стек открытых контейнеров: (путь контейнера, это список, итератор по детям)
+    stack = [_frame(prefix, obj)]
+    produced = 0
+    too_deep = False
 
-def apply_aliases(flat: Dict[str, Any], aliases: Dict[str, str]) -> Dict[str, Any]:
+    while stack:
+        base, is_list, children = stack[-1]
+        for key, value in children:
+            if is_list:
+                path = f"{base}[{key}]"
+            else:
+                path = f"{base}.{key}" if base else key
+            if isinstance(value, (dict, list)):
+                if len(stack) < max_depth:
+                    stack.append(_frame(path, value))
+                    break
+                if not too_deep:
+                    too_deep = True
+                    log.warning("flatten: depth limit reached, nested data skipped", path=path, max_depth=max_depth)
+                continue
+            if produced >= max_items:
+                log.warning("flatten: item limit reached, output truncated", path=path, max_items=max_items)
+                return
+            produced += 1
+            yield path, value
+        else:
+            stack.pop()
+
+
+def flatten(
+    obj: Any,
+    prefix: str = "",
+    max_depth: Optional[int] = None,
+    max_items: Optional[int] = None,
+) -> Dict[str, Any]:
     """
-    Применяет алиасы к плоским данным с учётом шаблонов
+    Разворачивает вложенный объект в плоскую структуру с dot-нотацией
     
     Args:
-        flat: Плоские данные
-        aliases: Словарь алиасов
+        obj: Объект для разворачивания
+        prefix: Префикс для ключей
+        max_depth: Максимальная вложенность (см. iter_flat)
+        max_items: Максимум значений (см. iter_flat)
         
     Returns:
-        Данные с применёнными алиасами
+        Плоский словарь с ключами в dot-нотации
     """
-    result: Dict[str, Any] = {}
-    latest_year: Dict[str, int] = {}
+    return dict(iter_flat(obj, prefix, max_depth, max_items))
 
-    for key, value in flat.items():
-        applied = False
 
-        for alias_key, alias_value in aliases.items():
-            # Точное совпадение
-            if alias_key == key:
+# Виды алиасов; при равном порядке в словаре проверяются в этой же последовательности
+_EXACT, _ARRAY, _YEAR = 0, 1, 2
+
+
+class _Node:
+    """Узел префиксного дерева шаблонов"""
+    __slots__ = ("children", "suffixes")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        # длина суффикса -> суффикс -> запись алиаса
+        self.suffixes: Dict[int, Dict[str, Tuple[int, int, str, int, int]]] = {}
+
+
+class AliasMatcher:
+    """
+    Скомпилированный словарь алиасов
+
+    Точные ключи лежат в хэш-таблице, шаблоны «path[].field» и
+    «data.<year>.code» — в префиксном дереве по части до маркера, а в узле
+    дерева — по длине и тексту суффикса. Поиск алиаса для ключа стоит
+    O(длина ключа) вместо перебора всех алиасов; семантика прежняя —
+    срабатывает первый подходящий алиас в порядке словаря.
+    """
+    __slots__ = ("_exact", "_root")
+
+    def __init__(self, aliases: Dict[str, str]) -> None:
+        self._exact: Dict[str, Tuple[int, int, str, int, int]] = {}
+        self._root = _Node()
+        for order, (alias_key, alias_value) in enumerate(aliases.items()):
+            # rank = порядок алиаса и вид проверки внутри него: меньше — раньше
+            self._exact[alias_key] = (order * 3 + _EXACT, _EXACT, alias_value, 0, 0)
+            for kind, marker in ((_ARRAY, '[]'), (_YEAR, '<year>')):
+                if marker in alias_key:
+                    prefix, suffix = alias_key.split(marker, 1)
+                    self._add(prefix, suffix, (order * 3 + kind, kind, alias_value, len(prefix), len(suffix)))
+
+    def _add(self, prefix: str, suffix: str, entry: Tuple[int, int, str, int, int]) -> None:
+        node = self._root
+        for char in prefix:
+            node = node.children.setdefault(char, _Node())
+        # Для одинаковых префикса и суффикса сработает только первый алиас
+        node.suffixes.setdefault(len(suffix), {}).setdefault(suffix, entry)
+
+    def match(self, key: str) -> Optional[Tuple[int, int, str, int, int]]:
+        """Первый по порядку алиас, подходящий ключу: (rank, вид, алиас, len(префикс), len(суффикс))"""
+        best = self._exact.get(key)
+        size = len(key)
+        node = self._root
+        position = 0
+        while True:
+            for length, by_suffix in node.suffixes.items():
+                if length <= size:
+                    entry = by_suffix.get(key[size - length:])
+                    if entry is not None and (best is None or entry[0] < best[0]):
+                        best = entry
+            if position == size:
+                return best
+            node = node.children.get(key[position])
+            if node is None:
+                return best
+            position += 1
+
+    def apply(self, flat: Union[Dict[str, Any], Iterable[Tuple[str, Any]]]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        latest_year: Dict[str, int] = {}
+
+        for key, value in (flat.items() if isinstance(flat, dict) else flat):
+            entry = self.match(key)
+            if entry is None:
+                result[key] = value
+                continue
+
+            _, kind, alias_value, prefix_length, suffix_length = entry
+            if kind == _EXACT:
                 result[alias_value] = value
-                applied = True
-                break
-
-            # Алиасы для массивов: "path[].field"
-            if '[]' in alias_key:
-                prefix, suffix = alias_key.split('[]', 1)
-                if key.startswith(prefix) and key.endswith(suffix):
-                    if alias_value not in result:
+            elif kind == _ARRAY:
+                # Для массивов берётся первый элемент
+                if alias_value not in result:
+                    result[alias_value] = value
+            else:
+                # Для годов — значение за последний год
+                year_part = key[prefix_length: len(key) - suffix_length]
+                if year_part.isdigit():
+                    year = int(year_part)
+                    if year > latest_year.get(alias_value, -1):
                         result[alias_value] = value
-                    applied = True
-                    break
+                        latest_year[alias_value] = year
 
-            # Алиасы с параметром года: "data.<year>.code"
-            if '<year>' in alias_key:
-                prefix, suffix = alias_key.split('<year>', 1)
-                if key.startswith(prefix) and key.endswith(suffix):
-                    year_part = key[len(prefix): len(key) - len(suffix)]
-                    if year_part.isdigit():
-                        year = int(year_part)
-                        prev_year = latest_year.get(alias_value, -1)
-                        if year > prev_year:
-                            result[alias_value] = value
-                            latest_year[alias_value] = year
-                    applied = True
-                    break
+        return result
 
-        if not applied:
-            result[key] = value
 
-    return result
+@lru_cache(maxsize=32)
+def _compile(items: Tuple[Tuple[str, str], ...]) -> AliasMatcher:
+    return AliasMatcher(dict(items))
+
+
+def compile_aliases(aliases: Dict[str, str]) -> AliasMatcher:
+    """
+    Компилирует словарь алиасов (результат кэшируется по содержимому словаря)
+
+    Args:
+        aliases: Словарь алиасов
+
+    Returns:
+        AliasMatcher для apply_aliases
+    """
+    return _compile(tuple(aliases.items()))
+
+
+def apply_aliases(
+    flat: Union[Dict[str, Any], Iterable[Tuple[str, Any]]],
+    aliases: Union[Dict[str, str], AliasMatcher],
+) -> Dict[str, Any]:
+    """
+    Применяет алиасы к плоским данным с учётом шаблонов
+    
+    Args:
+        flat: Плоские данные или поток пар из iter_flat
+        aliases: Словарь алиасов или результат compile_aliases
+        
+    Returns:
+        Данные с применёнными алиасами
+    """
+    matcher = aliases if isinstance(aliases, AliasMatcher) else compile_aliases(aliases)
+    return matcher.apply(flat)
 
 
 def extract_nested_value(data: Dict[str, Any], path: str, default: Any = None) -> Any:
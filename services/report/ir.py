@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Промежуточное представление отчёта (IR)
+
+Отчёт собирается один раз в виде структуры «секции → блоки → строки и
+таблицы», а нужные форматы получаются из неё эмиттерами:
+
+- txt — текст отчёта (байт в байт тот же, что раньше склеивался строками);
+- gamma — входной текст для Gamma (TXT с разделителями карточек);
+- json — словарь/JSON для кэша и внешних потребителей;
+- docx — DOCX-приложение (регистрируется в services.export.docx_exporter).
+
+Блоки в тексте разделяются пустой строкой; строка — «Ключ: значение»
+(value=None — «Ключ:» без значения) или просто текст; таблица в тексте
+выводится по шаблону строки. Секции из одного источника (group) идут
+подряд через перевод строки, секции разных источников — через пустую
+строку.
+
+Рендереры, которые пока возвращают текст, переводятся в IR один раз при
+сборке функцией sections_from_text — потребители дальше текст не разбирают.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from services.report.constants import SECTION_SEPARATOR
+
+# Длиннее — скорее фраза с двоеточием, чем название поля
+KEY_MAX_LENGTH = 80
+# Строки списков не разбираются на ключ и значение
+LIST_MARKERS = ("•", "-", "—", "*")
+
+
+@dataclass
+class Row:
+    """Строка блока"""
+    text: str = ""
+    key: Optional[str] = None
+    value: Optional[str] = None
+    indent: int = 0
+
+    def render(self) -> str:
+        if self.key is None:
+            body = self.text
+        elif self.value is None:
+            body = f"{self.key}:"
+        else:
+            body = f"{self.key}: {self.value}"
+        return " " * self.indent + body
+
+
+@dataclass
+class Table:
+    """Таблица; в тексте каждая строка выводится по шаблону line (str.format по ячейкам)"""
+    columns: List[str]
+    rows: List[List[str]]
+    line: str
+    indent: int = 0
+
+    def render(self) -> str:
+        prefix = " " * self.indent
+        return "\n".join(prefix + self.line.format(*row) for row in self.rows)
+
+
+@dataclass
+class Block:
+    """Абзац отчёта: строки и таблицы без пустых строк между ними"""
+    rows: List[Union[Row, Table]] = field(default_factory=list)
+
+
+@dataclass
+class Section:
+    """
+    Секция отчёта
+
+    title=None — текст без заголовка (вступление рендерера);
+    rule — строка-разделитель под заголовком.
+    """
+    group: str
+    title: Optional[str]
+    blocks: List[Block] = field(default_factory=list)
+    rule: str = SECTION_SEPARATOR
+
+    @property
+    def heading(self) -> Optional[str]:
+        return self.title.strip() if self.title is not None else None
+
+
+@dataclass
+class Report:
+    """Отчёт целиком"""
+    sections: List[Section] = field(default_factory=list)
+
+    @classmethod
+    def message(cls, text: str, group: str = "message") -> "Report":
+        """Отчёт из одного сообщения (ошибка, «Компания не найдена»)"""
+        return cls([Section(group, None, [Block([Row(text)])])])
+
+    @cached_property
+    def text(self) -> str:
+        """TXT-представление (вычисляется один раз)"""
+        return to_text(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"sections": [_section_to_dict(section) for section in self.sections]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Report":
+        return cls([_section_from_dict(section) for section in data.get("sections", [])])
+
+
+# === Эмиттеры ===
+
+_emitters: Dict[str, Callable[[Report], Any]] = {}
+
+
+def register_emitter(name: str):
+    """Декоратор: регистрирует функцию Report -> результат как формат name"""
+    def decorator(func: Callable[[Report], Any]) -> Callable[[Report], Any]:
+        _emitters[name] = func
+        return func
+    return decorator
+
+
+def emit(report: Report, fmt: str) -> Any:
+    """Представление отчёта в формате fmt (txt, gamma, json, docx, ...)"""
+    try:
+        emitter = _emitters[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown report format: {fmt} (known: {', '.join(sorted(_emitters))})") from None
+    return emitter(report)
+
+
+def section_text(section: Section) -> str:
+    body = "\n\n".join("\n".join(row.render() for row in block.rows) for block in section.blocks)
+    if section.title is None:
+        return body
+    header = f"{section.title}\n{section.rule}"
+    return f"{header}\n{body}" if section.blocks else header
+
+
+@register_emitter("txt")
+def to_text(report: Report) -> str:
+    parts: List[str] = []
+    group = None
+    for section in report.sections:
+        if parts:
+            parts.append("\n" if section.group == group else "\n\n")
+        parts.append(section_text(section))
+        group = section.group
+    return "".join(parts)
+
+
+@register_emitter("gamma")
+def to_gamma(report: Report) -> str:
+    # Та же разметка карточек, что у синхронного экспорта в Gamma
+    from services.export.gamma_exporter import _sectioned_text
+    return _sectioned_text(report.text)
+
+
+@register_emitter("json")
+def to_json(report: Report) -> str:
+    return json.dumps(report.to_dict(), ensure_ascii=False)
+
+
+# === Разбор текста рендереров ===
+
+def _is_rule(line: str) -> bool:
+    stripped = line.strip()
+    return len(stripped) >= 10 and set(stripped) == {"="}
+
+
+def parse_row(line: str) -> Row:
+    """Строка текста -> Row; render() возвращает исходную строку"""
+    stripped = line.lstrip(" ")
+    indent = len(line) - len(stripped)
+    if stripped and not stripped.startswith(LIST_MARKERS) and not stripped[0].isdigit():
+        key, sep, value = stripped.partition(": ")
+        if sep and key and len(key) <= KEY_MAX_LENGTH:
+            return Row(key=key, value=value, indent=indent)
+        if not sep and stripped.endswith(":") and len(stripped) <= KEY_MAX_LENGTH:
+            return Row(key=stripped[:-1], indent=indent)
+    return Row(text=stripped, indent=indent)
+
+
+def _blocks(lines: List[str]) -> List[Block]:
+    if not lines:
+        return []
+    return [
+        Block([parse_row(line) for line in chunk.split("\n")])
+        for chunk in "\n".join(lines).split("\n\n")
+    ]
+
+
+def sections_from_text(group: str, text: str) -> List[Section]:
+    """
+    Переводит текст рендерера в секции IR (заголовок + строка «=====»)
+
+    to_text(Report(sections_from_text(g, text))) == text.
+    """
+    lines = text.split("\n")
+    starts = [i for i in range(len(lines) - 1) if lines[i].strip() and _is_rule(lines[i + 1])]
+    sections = []
+    if not starts or starts[0] > 0:
+        sections.append(Section(group, None, _blocks(lines[:starts[0] if starts else len(lines)])))
+    for n, start in enumerate(starts):
+        end = starts[n + 1] if n + 1 < len(starts) else len(lines)
+        sections.append(Section(group, lines[start], _blocks(lines[start + 2:end]), rule=lines[start + 1]))
+    return sections
+
+
+def source_digest(source: Any) -> str:
+    """Хэш исходных данных секции (ключ кэша отрисованных секций)"""
+    material = json.dumps(source, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(material.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def sections_size(sections: List[Section]) -> int:
+    """Оценка размера секций в памяти (по длине текста)"""
+    return sum(len(section_text(section)) for section in sections)
+
+
+# === JSON ===
+
+def _row_to_dict(row: Union[Row, Table]) -> Dict[str, Any]:
+    if isinstance(row, Table):
+        return {"table": {"columns": row.columns, "rows": row.rows, "line": row.line}, "indent": row.indent}
+    if row.key is None:
+        return {"text": row.text, "indent": row.indent}
+    return {"key": row.key, "value": row.value, "indent": row.indent}
+
+
+def _row_from_dict(data: Dict[str, Any]) -> Union[Row, Table]:
+    if "table" in data:
+        return Table(indent=data.get("indent", 0), **data["table"])
+    if "key" in data:
+        return Row(key=data["key"], value=data.get("value"), indent=data.get("indent", 0))
+    return Row(text=data.get("text", ""), indent=data.get("indent", 0))
+
+
+def _section_to_dict(section: Section) -> Dict[str, Any]:
+    return {
+        "group": section.group,
+        "title": section.title,
+        "rule": section.rule,
+        "blocks": [[_row_to_dict(row) for row in block.rows] for block in section.blocks],
+    }
+
+
+def _section_from_dict(data: Dict[str, Any]) -> Section:
+    return Section(
+        group=data["group"],
+        title=data.get("title"),
+        blocks=[Block([_row_from_dict(row) for row in rows]) for rows in data.get("blocks", [])],
+        rule=data.get("rule", SECTION_SEPARATOR),
+    )
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+Асинхронный клиент для работы с OFData API
+
+Один экземпляр на процесс: общий пул keep-alive соединений httpx.AsyncClient,
+HTTP/2 (если установлен пакет h2) и сжатые ответы.
+"""
+import asyncio
+import importlib.util
+import os
+from typing import Dict, Any, Iterable, Optional, Set, Tuple
+
+import httpx
+
+from core.logger import get_logger
+from services.cache import get_ofdata_entry, set_ofdata_cached, warm_ofdata_cache
+from services.http_pool import discard_client
+from services.rate_limit import get_ofdata_limiter
+from services.singleflight import SingleFlight
+from settings import (
+    OFDATA_POOL_MAX_CONNECTIONS,
+    OFDATA_POOL_MAX_KEEPALIVE,
+    OFDATA_POOL_KEEPALIVE_EXPIRY,
+    OFDATA_HTTP2,
+    OFDATA_CACHE_ENABLED,
+)
+
+log = get_logger(__name__)
+
+BASE_URL = "https://api.ofdata.ru/v2"
+IDENT_KEYS = ('ogrn', 'inn', 'kpp', 'okpo')
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _ident_params(ident: Dict[str, Any], with_filters: bool = False) -> Dict[str, Any]:
+    """Собирает параметры запроса из идентификаторов (как в синхронном клиенте)"""
+    params: Dict[str, Any] = {}
+    if 'ogrn' in ident:
+        params['ogrn'] = ident['ogrn']
+    elif 'inn' in ident:
+        params['inn'] = ident['inn']
+    elif 'okpo' in ident:
+        params['okpo'] = ident['okpo']
+    else:
+        raise ValueError("Необходимо указать один из идентификаторов: ogrn, inn, okpo")
+    if 'kpp' in ident:
+        params['kpp'] = ident['kpp']
+    if with_filters:
+        for key, value in ident.items():
+            if key not in IDENT_KEYS and value is not None:
+                params[key] = value
+    return params
+
+
+def _company_request(**ident) -> Tuple[str, Dict[str, Any]]:
+    return 'company', _ident_params(ident)
+
+
+def _finances_request(**ident) -> Tuple[str, Dict[str, Any]]:
+    params = {'extended': 'true'}
+    params.update(_ident_params(ident))
+    return 'finances', params
+
+
+def _legal_cases_request(**ident) -> Tuple[str, Dict[str, Any]]:
+    return 'legal-cases', _ident_params(ident, with_filters=True)
+
+
+def _enforcements_request(**ident) -> Tuple[str, Dict[str, Any]]:
+    return 'enforcements', _ident_params(ident, with_filters=True)
+
+
+def _inspections_request(**ident) -> Tuple[str, Dict[str, Any]]:
+    return 'inspections', _ident_params(ident, with_filters=True)
+
+
+def _contracts_request(law: str, role: str, **ident) -> Tuple[str, Dict[str, Any]]:
+    params = {'law': law, 'role': role}
+    params.update(_ident_params(ident))
+    return 'contracts', params
+
+
+def _entrepreneur_request(**ident) -> Tuple[str, Dict[str, Any]]:
+    return 'entrepreneur', _ident_params(ident)
+
+
+def _person_request(*, inn: str) -> Tuple[str, Dict[str, Any]]:
+    if not inn:
+        raise ValueError("Необходимо указать ИНН физического лица")
+    return 'person', {'inn': inn}
+
+
+def _search_request(by: str, obj: str, query: str, **opts) -> Tuple[str, Dict[str, Any]]:
+    params = {'by': by, 'obj': obj, 'query': query}
+    for key, value in opts.items():
+        if value is not None:
+            params[key] = value
+    return 'search', params
+
+
+# Метод клиента -> (эндпоинт, параметры); нужен для пакетной загрузки из кэша
+REQUESTS = {
+    'get_company': _company_request,
+    'get_finances': _finances_request,
+    'get_legal_cases': _legal_cases_request,
+    'get_enforcements': _enforcements_request,
+    'get_inspections': _inspections_request,
+    'get_contracts': _contracts_request,
+    'get_entrepreneur': _entrepreneur_request,
+    'get_person': _person_request,
+    'search': _search_request,
+}
+
+
+class AsyncOFDataClient:
+    """Асинхронный клиент OFData API с общим пулом соединений"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = BASE_URL,
+        timeout: Optional[float] = None,
+        max_connections: int = OFDATA_POOL_MAX_CONNECTIONS,
+        max_keepalive: int = OFDATA_POOL_MAX_KEEPALIVE,
+        http2: bool = OFDATA_HTTP2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        limiter=None,
+        cache_enabled: bool = OFDATA_CACHE_ENABLED,
+    ):
+        """Инициализация клиента (само соединение создаётся лениво в текущем event loop)"""
+        if api_key is None:
+            try:
+                from core.config import load_settings
+                api_key = getattr(load_settings(), 'OFDATA_KEY', None)
+            except Exception:
+                api_key = None
+            api_key = api_key or os.getenv("OFDATA_KEY")
+        if not api_key:
+            raise ValueError("OFDATA_KEY не найден в настройках или переменных окружения")
+
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout if timeout is not None else float(os.getenv("REQUEST_TIMEOUT", "15"))
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=OFDATA_POOL_KEEPALIVE_EXPIRY,
+        )
+        self.http2 = bool(http2) and _http2_available()
+        self._transport = transport
+        self._limiter = limiter
+        self.cache_enabled = cache_enabled
+        self._singleflight = SingleFlight()
+        self._revalidations: Set[asyncio.Task] = set()
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_http(self) -> httpx.AsyncClient:
+        """Возвращает httpx.AsyncClient, привязанный к текущему event loop"""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._loop is not loop:
+            # Пул соединений нельзя разделять между event loop'ами; пул прежнего loop закрывается
+            discard_client(self._http, self._loop)
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self._transport,
+                headers={
+                    'User-Agent': 'BizScan/1.0',
+                    'Accept': 'application/json',
+                    'Accept-Encoding': 'gzip, deflate',
+                },
+            )
+            self._loop = loop
+            log.debug("AsyncOFDataClient: pool created", http2=self.http2,
+                      max_connections=self.limits.max_connections)
+        return self._http
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений (фоновые обновления кэша отменяются)"""
+        for task in list(self._revalidations):
+            task.cancel()
+        if self._revalidations:
+            await asyncio.gather(*self._revalidations, return_exceptions=True)
+        http, loop = self._http, self._loop
+        self._http = None
+        self._loop = None
+        if loop is asyncio.get_running_loop():
+            if http is not None and not http.is_closed:
+                await http.aclose()
+        else:
+            # Пул создан в другом event loop: aclose() здесь не сработает
+            discard_client(http, loop)
+
+    async def _make_request(self, endpoint: str, params: Dict[str, Any] = None, max_retries: int = 2) -> Dict[str, Any]:
+        """
+        Выполняет HTTP запрос к API с ретраями
+
+        Сначала проверяется кэш ответов (TTL по эндпоинту, обход —
+        services.cache.cache_bypass()). Устаревший ответ в пределах окна
+        устаревания отдаётся сразу, а обновление идёт в фоне.
+
+        Одновременные одинаковые запросы (эндпоинт + параметры без ключа)
+        объединяются в один: он расходует один слот лимита, а ответ
+        получают все ожидающие. Ответ общий — его нельзя изменять на месте.
+
+        Args:
+            endpoint: Эндпоинт API
+            params: Параметры запроса
+            max_retries: Максимальное количество попыток
+
+        Returns:
+            Ответ API
+
+        Raises:
+            RuntimeError: При ошибке API
+        """
+        params = dict(params or {})
+        params.pop('key', None)
+        flight_key = (endpoint, tuple(sorted((k, str(v)) for k, v in params.items())))
+        if self.cache_enabled:
+            entry = await get_ofdata_entry(endpoint, params)
+            if entry is not None:
+                if not entry.is_fresh:
+                    self._schedule_revalidation(flight_key, endpoint, params, max_retries)
+                log.debug("AsyncOFDataClient: cache hit", endpoint=endpoint, fresh=entry.is_fresh)
+                return entry.value
+        if self._singleflight.in_flight(flight_key):
+            log.debug("AsyncOFDataClient: joined in-flight request", endpoint=endpoint)
+        return await self._singleflight.do(
+            flight_key, lambda: self._fetch_and_store(endpoint, params, max_retries)
+        )
+
+    def _schedule_revalidation(self, flight_key, endpoint: str, params: Dict[str, Any], max_retries: int) -> None:
+        """Фоновое обновление устаревшей записи (одно на ключ)"""
+        if self._singleflight.in_flight(flight_key):
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._revalidate(flight_key, endpoint, params, max_retries)
+        )
+        self._revalidations.add(task)
+        task.add_done_callback(self._revalidations.discard)
+
+    async def _revalidate(self, flight_key, endpoint: str, params: Dict[str, Any], max_retries: int) -> None:
+        try:
+            await self._singleflight.do(
+                flight_key, lambda: self._fetch_and_store(endpoint, params, max_retries)
+            )
+            log.debug("AsyncOFDataClient: stale entry refreshed", endpoint=endpoint)
+        except Exception as e:
+            # Устаревший ответ уже отдан; следующий запрос попробует снова
+            log.warning("AsyncOFDataClient: background refresh failed", endpoint=endpoint, error=str(e))
+
+    async def _fetch_and_store(self, endpoint: str, params: Dict[str, Any], max_retries: int) -> Dict[str, Any]:
+        """Запрос к API с сохранением успешного ответа в кэш"""
+        data = await self._fetch(endpoint, params, max_retries)
+        if self.cache_enabled:
+            await set_ofdata_cached(endpoint, params, data)
+        return data
+
+    async def _fetch(self, endpoint: str, params: Dict[str, Any], max_retries: int) -> Dict[str, Any]:
+        """Сам запрос к API: лимит, ретраи, проверка meta.status"""
+        params = dict(params)
+        params['key'] = self.api_key
+        http = self._ensure_http()
+
+        last_error: Optional[Exception] = None
+        for attempt in range(max_retries + 1):
+            # Общий лимит OFData: ждём токен, не блокируя event loop
+            await (self._limiter or get_ofdata_limiter()).acquire(endpoint)
+            try:
+                log.debug("AsyncOFDataClient: request", endpoint=endpoint, attempt=attempt + 1)
+                response = await http.get(f"/{endpoint}", params=params)
+                if response.status_code in RETRY_STATUSES:
+                    raise httpx.HTTPStatusError(
+                        f"{response.status_code}: temporary server error",
+                        request=response.request,
+                        response=response,
+                    )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                last_error = e
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRY_STATUSES
+                log.warning("AsyncOFDataClient: request failed", endpoint=endpoint, attempt=attempt + 1, error=str(e))
+                if retryable and attempt < max_retries:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+                    continue
+                raise RuntimeError(f"Ошибка запроса к API: {str(e)}")
+
+            data = response.json()
+            meta = data.get('meta', {})
+            if meta.get('status') != 'ok':
+                error_msg = meta.get('message', 'Неизвестная ошибка API')
+                raise RuntimeError(f"API error: {error_msg}")
+
+            log.debug("AsyncOFDataClient: ok", endpoint=endpoint)
+            return data
+
+        raise RuntimeError(f"Все попытки исчерпаны. Последняя ошибка: {str(last_error)}")
+
+    async def hydrate(self, calls: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Поднимает из кэша в память ответы для пачки вызовов одним запросом
+
+        Args:
+            calls: Пары (имя метода клиента, именованные аргументы)
+
+        Returns:
+            Сколько ответов найдено в кэше
+        """
+        if not self.cache_enabled:
+            return 0
+        return await warm_ofdata_cache(REQUESTS[method](**kwargs) for method, kwargs in calls)
+
+    async def get_company(self, **ident) -> Dict[str, Any]:
+        """Получает информацию о компании"""
+        return await self._make_request(*_company_request(**ident))
+
+    async def get_finances(self, **ident) -> Dict[str, Any]:
+        """Получает финансовую отчётность"""
+        return await self._make_request(*_finances_request(**ident))
+
+    async def get_legal_cases(self, **ident) -> Dict[str, Any]:
+        """Получает арбитражные дела"""
+        return await self._make_request(*_legal_cases_request(**ident))
+
+    async def get_enforcements(self, **ident) -> Dict[str, Any]:
+        """Получает исполнительные производства"""
+        return await self._make_request(*_enforcements_request(**ident))
+
+    async def get_inspections(self, **ident) -> Dict[str, Any]:
+        """Получает проверки"""
+        return await self._make_request(*_inspections_request(**ident))
+
+    async def get_contracts(self, law: str, role: str, **ident) -> Dict[str, Any]:
+        """Получает контракты госзакупок (law: 44/94/223, role: customer/supplier)"""
+        return await self._make_request(*_contracts_request(law, role, **ident))
+
+    async def get_entrepreneur(self, **ident) -> Dict[str, Any]:
+        """Получает информацию об ИП"""
+        return await self._make_request(*_entrepreneur_request(**ident))
+
+    async def get_person(self, *, inn: str) -> Dict[str, Any]:
+        """Получает информацию о физическом лице по ИНН"""
+        return await self._make_request(*_person_request(inn=inn))
+
+    async def search(self, by: str, obj: str, query: str, **opts) -> Dict[str, Any]:
+        """Поиск по названию"""
+        return await self._make_request(*_search_request(by, obj, query, **opts))
+
+
+# Глобальный экземпляр клиента
+_async_client: Optional[AsyncOFDataClient] = None
+
+
+def get_async_ofdata_client() -> AsyncOFDataClient:
+    """Получает глобальный экземпляр асинхронного клиента OFData"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOFDataClient()
+    return _async_client
+
+
+async def close_async_ofdata_client() -> None:
+    """Закрывает глобальный клиент (вызывается при остановке приложения)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
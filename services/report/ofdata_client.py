@@ -7,6 +7,9 @@ import requests
 import time
 from typing import Dict, Any, Optional
 from core.logger import get_logger
+from services.cache import get_ofdata_cached_sync, set_ofdata_cached_sync
+from services.rate_limit import get_ofdata_limiter
+from settings import OFDATA_CACHE_ENABLED
 
 log = get_logger(__name__)
 
@@ -54,6 +57,13 @@ class OFDataClient:
         if params is None:
             params = {}
         
+        # Кэш ответов (ключ API в ключ кэша не входит)
+        if OFDATA_CACHE_ENABLED:
+            cached = get_ofdata_cached_sync(endpoint, params)
+            if cached is not None:
+                log.debug("OFDataClient: cache hit", endpoint=endpoint)
+                return cached
+        
         # Добавляем API ключ
         params['key'] = self.api_key
         
@@ -63,6 +73,8 @@ class OFDataClient:
         
         for attempt in range(max_retries + 1):
             try:
+                # Общий лимит OFData (минута/час) для всех процессов
+                get_ofdata_limiter().acquire_sync(endpoint)
                 log.debug("OFDataClient: request", endpoint=endpoint, attempt=attempt+1)
                 response = self.session.get(url, params=params, timeout=self.timeout)
                 response.raise_for_status()
@@ -76,6 +88,8 @@ class OFDataClient:
                     raise RuntimeError(f"API error: {error_msg}")
                 
                 log.debug("OFDataClient: ok", endpoint=endpoint)
+                if OFDATA_CACHE_ENABLED:
+                    set_ofdata_cached_sync(endpoint, params, data)
                 return data
                 
             except requests.exceptions.RequestException as e:
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Колоночные таблицы записей OFData (суды, исполнительные производства,
+проверки, закупки)
+
+Список «Записи» разбирается в столбцы: год из поля даты, сумма, флаги
+(истинность поля) и категории (коды значений поля) — каждый столбец один
+раз на таблицу. Фильтр по году и итоги дальше считаются по столбцам —
+векторно через NumPy, если он установлен, иначе теми же операциями над
+списками.
+
+Правила разбора совпадают с прежними циклами рендереров: год — число до
+первого «-» в дате; записи без даты или с неразборчивой датой (в том числе
+с годом вне 1..9999) проходят любой фильтр по году; сумма учитывается,
+только если это int или float.
+Записи, которые не являются словарями, в таблицу не попадают.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Год записи без даты или с неразборчивой датой
+NO_YEAR = -1
+# Допустимые годы: всё остальное — мусор в дате (и не помещается в int64)
+MIN_YEAR, MAX_YEAR = 1, 9999
+
+Number = Union[int, float]
+
+
+def parse_year(value: Any) -> int:
+    """Год из даты «YYYY-MM-DD» (NO_YEAR, если даты нет или она не разбирается)"""
+    if not value:
+        return NO_YEAR
+    try:
+        year = int(str(value).partition('-')[0])
+    except ValueError:
+        return NO_YEAR
+    return year if MIN_YEAR <= year <= MAX_YEAR else NO_YEAR
+
+
+class RecordTable:
+    """
+    Записи и их столбцы
+
+    records — исходные словари в исходном порядке (для построчного вывода).
+    Столбцы строятся при первом обращении, по одному проходу на столбец, и
+    дальше переиспользуются: после since() суммы и флаги разбираются только
+    у оставшихся записей.
+    """
+
+    def __init__(self, records: Iterable[Any], date_field: Optional[str] = None, amount_field: Optional[str] = None):
+        self.records: List[Dict[str, Any]] = [record for record in records if isinstance(record, dict)]
+        self.date_field = date_field
+        self.amount_field = amount_field
+        self._columns: Dict[Any, Any] = {}
+        self._labels: Dict[str, Dict[Any, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def years(self):
+        """Год записи (NO_YEAR — без даты или с неразборчивой датой)"""
+        if "years" not in self._columns:
+            field = self.date_field
+            years = [parse_year(record.get(field)) for record in self.records] if field else [NO_YEAR] * len(self)
+            self._columns["years"] = _column(years, "int64")
+        return self._columns["years"]
+
+    @property
+    def amounts(self):
+        """Сумма записи (0, если суммы нет или это не число)"""
+        if "amounts" not in self._columns:
+            field = self.amount_field
+            if field:
+                values = [record.get(field) for record in self.records]
+                amounts = [value if isinstance(value, (int, float)) else 0 for value in values]
+            else:
+                amounts = [0] * len(self)
+            self._columns["amounts"] = _amounts_column(amounts)
+        return self._columns["amounts"]
+
+    def flag(self, field: str):
+        """Столбец истинности поля field"""
+        key = ("flag", field)
+        if key not in self._columns:
+            self._columns[key] = _column([bool(record.get(field)) for record in self.records], "bool")
+        return self._columns[key]
+
+    def category(self, field: str):
+        """Коды значений поля field (словарь значение -> код — в _labels)"""
+        key = ("category", field)
+        if key not in self._columns:
+            codes = self._labels.setdefault(field, {})
+            self._columns[key] = _column(
+                [codes.setdefault(record.get(field), len(codes)) for record in self.records], "int64",
+            )
+        return self._columns[key]
+
+    def since(self, min_year: int) -> "RecordTable":
+        """Записи не старше min_year (записи без года остаются)"""
+        years = self.years
+        if NUMPY_AVAILABLE:
+            keep = np.flatnonzero((years >= min_year) | (years == NO_YEAR))
+        else:
+            keep = [i for i, year in enumerate(years) if year >= min_year or year == NO_YEAR]
+        # Фильтр ничего не отбросил — копировать записи и столбцы незачем
+        return self if len(keep) == len(self) else self._take(keep)
+
+    def total(self) -> Number:
+        """Сумма по столбцу сумм"""
+        if NUMPY_AVAILABLE:
+            return self.amounts.sum().item() if len(self) else 0
+        return sum(self.amounts)
+
+    def count(self, field: str) -> int:
+        """Число записей с истинным полем field"""
+        column = self.flag(field)
+        return int(np.count_nonzero(column)) if NUMPY_AVAILABLE else sum(column)
+
+    def count_category(self, field: str, value: Any) -> int:
+        """Число записей, у которых поле field равно value"""
+        column = self.category(field)
+        code = self._labels[field].get(value)
+        if code is None:
+            return 0
+        return int(np.count_nonzero(column == code)) if NUMPY_AVAILABLE else column.count(code)
+
+    def _take(self, indices) -> "RecordTable":
+        """Подтаблица из строк indices; уже построенные столбцы переносятся"""
+        positions = indices.tolist() if NUMPY_AVAILABLE else indices
+        table = RecordTable((), self.date_field, self.amount_field)
+        table.records = [self.records[i] for i in positions]
+        table._labels = self._labels
+        table._columns = {key: _pick(column, indices) for key, column in self._columns.items()}
+        return table
+
+
+def _column(values: List[Any], dtype: str):
+    return np.array(values, dtype=dtype) if NUMPY_AVAILABLE else values
+
+
+def _amounts_column(values: List[Number]):
+    if not NUMPY_AVAILABLE:
+        return values
+    # Целые суммы остаются целыми (итог совпадает с sum() байт в байт)
+    column = np.array(values)
+    if column.dtype.kind == "b":
+        return column.astype("int64")
+    if column.dtype.kind not in "if":
+        # Целые за пределами int64
+        return column.astype("float64")
+    return column
+
+
+def _pick(column, indices):
+    return column[indices] if NUMPY_AVAILABLE else [column[i] for i in indices]
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Справочники отчёта: алиасы полей и коды строк бухгалтерской отчётности
+
+Таблицы строятся один раз на процесс, замораживаются (MappingProxyType) и
+дальше читаются рендерерами из любых потоков без блокировок и без файлового
+ввода-вывода. Рендерер объявляет таблицу декоратором reference_table:
+
+    @reference_table("legal_aliases")
+    def load_legal_aliases() -> Mapping[str, str]:
+        return {...}
+
+— тело функции выполняется один раз, а вызовы load_legal_aliases() отдают
+замороженную таблицу из реестра.
+
+Коды строк читаются из JSON (REFERENCE_ACCOUNT_CODES_PATH); разобранный
+файл можно сохранять в бинарный кэш (REFERENCE_DATA_CACHE_PATH). Файл
+проверяется на изменения не чаще раза в REFERENCE_DATA_CHECK_SEC секунд;
+после изменения коды перечитываются, а таблицы строятся заново.
+"""
+import functools
+import json
+import os
+import pickle
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from core.logger import get_logger
+from settings import REFERENCE_ACCOUNT_CODES_PATH, REFERENCE_DATA_CACHE_PATH, REFERENCE_DATA_CHECK_SEC
+
+log = get_logger(__name__)
+
+# Версия формата бинарного кэша
+CACHE_VERSION = 1
+
+_EMPTY: Mapping[str, str] = MappingProxyType({})
+_builders: Dict[str, Callable[[], Mapping[str, str]]] = {}
+
+
+def reference_table(name: str):
+    """Декоратор: функция-построитель таблицы становится чтением из реестра"""
+    def decorator(build: Callable[[], Mapping[str, str]]) -> Callable[[], Mapping[str, str]]:
+        _builders[name] = build
+
+        @functools.wraps(build)
+        def load() -> Mapping[str, str]:
+            return get_reference_data().table(name)
+        return load
+    return decorator
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_account_codes(path: str) -> Dict[str, str]:
+    """Список {"code", "name"} из JSON -> {код: название}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        codes_data = json.load(f)
+    return {
+        item['code']: item['name']
+        for item in codes_data
+        if isinstance(item, dict) and 'code' in item and 'name' in item
+    }
+
+
+class ReferenceData:
+    """Реестр справочников процесса"""
+
+    def __init__(self, codes_path: str, cache_path: str = "", check_sec: int = 0):
+        self.codes_path = codes_path
+        self.cache_path = cache_path
+        self.check_sec = check_sec
+        # RLock: построитель таблицы может читать коды строк
+        self._lock = threading.RLock()
+        self._tables: Dict[str, Mapping[str, str]] = {}
+        self._codes: Optional[Mapping[str, str]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+
+    def account_codes(self) -> Mapping[str, str]:
+        """Коды строк отчётности {код: название}"""
+        self._maybe_reload()
+        codes = self._codes
+        if codes is None:
+            with self._lock:
+                if self._codes is None:
+                    self._load_codes()
+                codes = self._codes
+        return codes
+
+    def table(self, name: str) -> Mapping[str, str]:
+        """Замороженная таблица name (строится при первом обращении)"""
+        self._maybe_reload()
+        table = self._tables.get(name)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(name)
+                if table is None:
+                    table = MappingProxyType(dict(_builders[name]()))
+                    self._tables[name] = table
+        return table
+
+    def preload(self) -> Dict[str, int]:
+        """Строит все объявленные таблицы заранее (при старте); возвращает их размеры"""
+        sizes = {"account_codes": len(self.account_codes())}
+        sizes.update({name: len(self.table(name)) for name in list(_builders)})
+        log.info("Reference data loaded", **sizes)
+        return sizes
+
+    def reload(self, force: bool = False) -> bool:
+        """Перечитывает коды строк, если файл изменился (или force); таблицы строятся заново"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if not force and self._codes is not None and _signature(self.codes_path) == self._signature:
+                return False
+            self._load_codes(use_cache=not force)
+            self._tables = {}
+            return True
+
+    def _maybe_reload(self) -> None:
+        if self.check_sec <= 0 or self._codes is None:
+            return
+        if time.monotonic() - self._checked_at < self.check_sec:
+            return
+        if self.reload():
+            log.info("Reference data reloaded", path=self.codes_path)
+
+    def _load_codes(self, use_cache: bool = True) -> None:
+        signature = _signature(self.codes_path)
+        codes: Optional[Dict[str, str]] = None
+        if signature is None:
+            log.warning("Account codes file not found", file_path=self.codes_path)
+            codes = {}
+        elif use_cache:
+            codes = self._read_cache(signature)
+        if codes is None:
+            try:
+                codes = _parse_account_codes(self.codes_path)
+            except Exception as e:
+                log.error("Failed to load account codes", error=str(e))
+                codes = {}
+            else:
+                self._write_cache(signature, codes)
+        self._codes = MappingProxyType(codes) if codes else _EMPTY
+        self._signature = signature
+        self._checked_at = time.monotonic()
+
+    def _read_cache(self, signature: Tuple[int, int]) -> Optional[Dict[str, str]]:
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                payload: Dict[str, Any] = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning("Reference data cache unreadable", path=self.cache_path, error=str(e))
+            return None
+        # Кэш от другого файла или старой версии формата не используется
+        if payload.get("version") != CACHE_VERSION or payload.get("source") != [self.codes_path, *signature]:
+            return None
+        return payload["account_codes"]
+
+    def _write_cache(self, signature: Tuple[int, int], codes: Dict[str, str]) -> None:
+        if not self.cache_path:
+            return
+        payload = {"version": CACHE_VERSION, "source": [self.codes_path, *signature], "account_codes": codes}
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            log.warning("Could not write reference data cache", path=self.cache_path, error=str(e))
+
+
+_reference_data: Optional[ReferenceData] = None
+_reference_lock = threading.Lock()
+
+
+def get_reference_data() -> ReferenceData:
+    """Реестр справочников процесса"""
+    global _reference_data
+    if _reference_data is None:
+        with _reference_lock:
+            if _reference_data is None:
+                _reference_data = ReferenceData(
+                    REFERENCE_ACCOUNT_CODES_PATH, REFERENCE_DATA_CACHE_PATH, REFERENCE_DATA_CHECK_SEC,
+                )
+    return _reference_data
@@ -2,9 +2,11 @@
 """
 Рендер секции с исполнительными производствами - максимально простой
 """
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
 from .constants import SECTION_HEADERS, SECTION_SEPARATOR, ERROR_MESSAGES
 from .simple_company_renderer import format_value, format_dict_item
+from .records import RecordTable
+from .reference_data import reference_table
 
 
 def render_enforce(data: Dict[str, Any]) -> str:
@@ -33,24 +35,8 @@ def render_enforce(data: Dict[str, Any]) -> str:
                     if sub_key == 'Записи' and isinstance(sub_value, list):
                         current_year = 2025
                         min_year = current_year - 5  # 2020
-                        filtered_records = []
-                        
-                        for record in sub_value:
-                            record_date = record.get('ИспПрДата', '')
-                            if record_date:
-                                try:
-                                    # Парсим дату (формат: YYYY-MM-DD)
-                                    year = int(record_date.split('-')[0])
-                                    if year >= min_year:
-                                        filtered_records.append(record)
-                                except (ValueError, IndexError):
-                                    # Если не можем распарсить дату, включаем запись
-                                    filtered_records.append(record)
-                            else:
-                                # Если даты нет, включаем запись
-                                filtered_records.append(record)
-                        
-                        sub_value = filtered_records
+                        # Записи без даты остаются
+                        sub_value = RecordTable(sub_value, date_field='ИспПрДата').since(min_year).records
                     
                     sub_alias = aliases.get(f"{key}.{sub_key}", aliases.get(sub_key, sub_key))
                     formatted_value = format_value(sub_value)
@@ -76,7 +62,8 @@ def render_enforce(data: Dict[str, Any]) -> str:
     return "\n".join(lines)
 
 
-def load_enforce_aliases() -> Dict[str, str]:
+@reference_table("enforce_aliases")
+def load_enforce_aliases() -> Mapping[str, str]:
     """Алиасы для исполнительных производств"""
     return {
         'company': 'Компания',
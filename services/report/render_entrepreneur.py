@@ -4,9 +4,12 @@
 """
 from typing import Dict, Any, List
 from .formatters import format_money, format_date, format_list, clean_text
-from .flattener import flatten, apply_aliases, extract_nested_value
+from .flattener import iter_flat, apply_aliases, compile_aliases, extract_nested_value
 from .aliases_ru import COMMON_ALIASES, ENTREPRENEUR_ALIASES
 
+# Алиасы компилируются один раз при импорте
+_ALIASES = compile_aliases({**COMMON_ALIASES, **ENTREPRENEUR_ALIASES})
+
 
 def render_entrepreneur(data: Dict[str, Any]) -> str:
     """
@@ -23,10 +26,8 @@ def render_entrepreneur(data: Dict[str, Any]) -> str:
     if not data:
         return "—"
     
-    # Разворачиваем данные
-    flat_data = flatten(data)
-    aliases = {**COMMON_ALIASES, **ENTREPRENEUR_ALIASES}
-    aliased_data = apply_aliases(flat_data, aliases)
+    # Разворачиваем данные потоком, без промежуточного плоского словаря
+    aliased_data = apply_aliases(iter_flat(data), _ALIASES)
     
     # Основные реквизиты
     main_fields = [
@@ -2,9 +2,11 @@
 """
 Рендер секции с проверками - максимально простой
 """
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
 from .constants import SECTION_HEADERS, SECTION_SEPARATOR, ERROR_MESSAGES
 from .simple_company_renderer import format_value, format_dict_item
+from .records import RecordTable
+from .reference_data import reference_table
 
 
 def render_inspect(data: Dict[str, Any]) -> str:
@@ -29,31 +31,19 @@ def render_inspect(data: Dict[str, Any]) -> str:
                 # Фильтруем проверки за последние 5 лет
                 current_year = 2025
                 min_year = current_year - 5  # 2020
-                filtered_records = []
-                for inspection in records:
-                    if not isinstance(inspection, dict):
-                        continue
-                    inspection_date = inspection.get('ДатаНач', '')
-                    if inspection_date:
-                        try:
-                            year = int(str(inspection_date).split('-')[0])
-                            if year >= min_year:
-                                filtered_records.append(inspection)
-                        except (ValueError, IndexError):
-                            filtered_records.append(inspection)
-                    else:
-                        filtered_records.append(inspection)
-                records = filtered_records
+                # Не-словари отбрасываются, проверки без даты остаются
+                table = RecordTable(records, date_field='ДатаНач').since(min_year)
+                records = table.records
 
                 lines.append(SECTION_HEADERS.get('inspections', 'ПРОВЕРКИ'))
                 lines.append(SECTION_SEPARATOR)
                 header_added = True
 
-                # Статистика (защита от не-словарей)
-                total_inspections = len(records)
-                completed = sum(1 for insp in records if isinstance(insp, dict) and insp.get('Заверш', False))
-                with_violations = sum(1 for insp in records if isinstance(insp, dict) and insp.get('Наруш', False))
-                planned = sum(1 for insp in records if isinstance(insp, dict) and insp.get('ТипРасп') == 'Плановая проверка')
+                # Статистика
+                total_inspections = len(table)
+                completed = table.count('Заверш')
+                with_violations = table.count('Наруш')
+                planned = table.count_category('ТипРасп', 'Плановая проверка')
 
                 lines.append(f"Всего проверок: {total_inspections}")
                 lines.append(f"Завершено: {completed}")
@@ -98,7 +88,8 @@ def render_inspect(data: Dict[str, Any]) -> str:
     return "\n".join(lines)
 
 
-def load_inspect_aliases() -> Dict[str, str]:
+@reference_table("inspect_aliases")
+def load_inspect_aliases() -> Mapping[str, str]:
     """Алиасы для проверок"""
     return {
         'company': 'Компания',
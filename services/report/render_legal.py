@@ -2,10 +2,12 @@
 """
 Рендер секции с арбитражными делами - максимально простой
 """
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
 from .constants import SECTION_HEADERS, SECTION_SEPARATOR, ERROR_MESSAGES
 from .simple_company_renderer import format_value, format_dict_item
 from .formatters import format_money
+from .records import RecordTable
+from .reference_data import reference_table
 
 
 def render_legal(data: Dict[str, Any]) -> str:
@@ -27,35 +29,19 @@ def render_legal(data: Dict[str, Any]) -> str:
             # Обрабатываем данные дел
             records = value.get('Записи', [])
             if records:
-                # Фильтруем дела за последние 5 лет
+                # Фильтруем дела за последние 5 лет (дела без даты остаются)
                 current_year = 2025
                 min_year = current_year - 5  # 2020
-                filtered_records = []
-                
-                for case in records:
-                    case_date = case.get('Дата', '')
-                    if case_date:
-                        try:
-                            # Парсим дату (формат: YYYY-MM-DD)
-                            year = int(case_date.split('-')[0])
-                            if year >= min_year:
-                                filtered_records.append(case)
-                        except (ValueError, IndexError):
-                            # Если не можем распарсить дату, включаем дело
-                            filtered_records.append(case)
-                    else:
-                        # Если даты нет, включаем дело
-                        filtered_records.append(case)
-                
-                records = filtered_records
+                table = RecordTable(records, date_field='Дата', amount_field='СуммИск').since(min_year)
+                records = table.records
                 lines.append(SECTION_HEADERS.get('legal-cases', 'АРБИТРАЖНЫЕ ДЕЛА'))
                 lines.append(SECTION_SEPARATOR)
                 
                 # Статистика
-                total_cases = len(records)
-                total_amount = sum(case.get('СуммИск', 0) for case in records if isinstance(case.get('СуммИск'), (int, float)))
-                plaintiff_count = sum(1 for case in records if case.get('Ист'))
-                defendant_count = sum(1 for case in records if case.get('Ответ'))
+                total_cases = len(table)
+                total_amount = table.total()
+                plaintiff_count = table.count('Ист')
+                defendant_count = table.count('Ответ')
                 
                 lines.append(f"Всего дел: {total_cases}")
                 lines.append(f"Общая сумма исков: {format_money(total_amount)}")
@@ -119,7 +105,8 @@ def render_legal(data: Dict[str, Any]) -> str:
     return "\n".join(lines)
 
 
-def load_legal_aliases() -> Dict[str, str]:
+@reference_table("legal_aliases")
+def load_legal_aliases() -> Mapping[str, str]:
     """Алиасы для арбитражных дел"""
     return {
         'company': 'Компания',
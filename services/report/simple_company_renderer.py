@@ -3,8 +3,9 @@
 Максимально простой рендерер для компании
 Переводит ВСЕ поля API в человекочитаемый вид
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping
 from .formatters import format_money, format_date, format_percent
+from .reference_data import reference_table
 import re
 import json
 
@@ -181,7 +182,8 @@ def render_company_simple(data: Dict[str, Any]) -> str:
     return "\n".join(lines)
 
 
-def load_aliases() -> Dict[str, str]:
+@reference_table("company_aliases")
+def load_aliases() -> Mapping[str, str]:
     """Загружает словарь алиасов для перевода ключей"""
     return {
         # Основные поля
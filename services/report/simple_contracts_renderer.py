@@ -3,9 +3,11 @@
 Максимально простой рендерер для контрактов
 Переводит ВСЕ поля API в человекочитаемый вид
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping
 from .simple_company_renderer import format_value, format_dict_item
 from .formatters import format_money
+from .records import RecordTable
+from .reference_data import reference_table
 from loguru import logger
 
 
@@ -54,7 +56,7 @@ def render_contracts_simple(data: Dict[str, Any]) -> str:
                     if records:
                         # Статистика
                         total_contracts = len(records)
-                        total_amount = sum(contract.get('Цена', 0) for contract in records if isinstance(contract.get('Цена'), (int, float)))
+                        total_amount = RecordTable(records, amount_field='Цена').total()
                         
                         logger.info(f"render_contracts_simple: {contract_type} statistics", 
                                    total_contracts=total_contracts, total_amount=total_amount)
@@ -175,7 +177,8 @@ def render_contracts_simple(data: Dict[str, Any]) -> str:
     return result
 
 
-def load_contracts_aliases() -> Dict[str, str]:
+@reference_table("contracts_aliases")
+def load_contracts_aliases() -> Mapping[str, str]:
     """Загружает словарь алиасов для контрактов"""
     return {
         # Основные поля
@@ -2,10 +2,9 @@
 """
 Максимально простой рендерер для финансов
 """
-import json
-import os
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
 from .simple_company_renderer import format_value, format_dict_item
+from .reference_data import get_reference_data, reference_table
 from loguru import logger
 
 
@@ -200,35 +199,13 @@ def render_finances_simple(data: Dict[str, Any]) -> str:
     return result
 
 
-def load_account_codes() -> Dict[str, str]:
-    """Загружает коды счетов из JSON файла"""
-    try:
-        # Путь к файлу с кодами счетов
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        codes_file = os.path.join(current_dir, '..', 'data', 'account_codes.json')
-        
-        if not os.path.exists(codes_file):
-            logger.warning("Account codes file not found", file_path=codes_file)
-            return {}
-        
-        with open(codes_file, 'r', encoding='utf-8') as f:
-            codes_data = json.load(f)
-        
-        # Преобразуем список в словарь {код: название}
-        codes_dict = {}
-        for item in codes_data:
-            if isinstance(item, dict) and 'code' in item and 'name' in item:
-                codes_dict[item['code']] = item['name']
-        
-        logger.info("Account codes loaded", codes_count=len(codes_dict))
-        return codes_dict
-        
-    except Exception as e:
-        logger.error("Failed to load account codes", error=str(e))
-        return {}
+def load_account_codes() -> Mapping[str, str]:
+    """Коды счетов {код: название} из реестра справочников (файл читается один раз)"""
+    return get_reference_data().account_codes()
 
 
-def load_finances_aliases() -> Dict[str, str]:
+@reference_table("finances_aliases")
+def load_finances_aliases() -> Mapping[str, str]:
     """Алиасы для финансов с расшифровкой кодов счетов"""
     # Загружаем коды счетов
     account_codes = load_account_codes()
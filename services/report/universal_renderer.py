@@ -2,9 +2,10 @@
 """
 Универсальный рендерер для отображения всех полей API в человекочитаемом виде
 """
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Mapping, Union
 from .formatters import format_money, format_date, format_list, format_percent
 from .aliases_ru import COMMON_ALIASES, COMPANY_ALIASES, ENTREPRENEUR_ALIASES
+from .reference_data import reference_table
 import re
 
 
@@ -134,6 +135,12 @@ def format_dict_item(item: Dict[str, Any], aliases: Dict[str, str]) -> str:
     return " | ".join(parts) if parts else "^н/д^"
 
 
+@reference_table("universal_aliases")
+def load_universal_aliases() -> Mapping[str, str]:
+    """Все алиасы компании и ИП одной таблицей"""
+    return {**COMMON_ALIASES, **COMPANY_ALIASES, **ENTREPRENEUR_ALIASES}
+
+
 def render_all_company_data(data: Dict[str, Any]) -> str:
     """Рендерит ВСЕ данные компании в человекочитаемом виде"""
     lines = []
@@ -151,8 +158,8 @@ def render_all_company_data(data: Dict[str, Any]) -> str:
     lines.append(f"{clean_text(name)}")
     lines.append(f"ИНН {inn} • ОГРН {ogrn} • Дата регистрации {reg_date}")
     
-    # Объединяем все алиасы
-    all_aliases = {**COMMON_ALIASES, **COMPANY_ALIASES, **ENTREPRENEUR_ALIASES}
+    # Все алиасы (таблица строится один раз)
+    all_aliases = load_universal_aliases()
     
     # Основные секции с ограничением количества элементов
     sections = [
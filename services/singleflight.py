@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight: одновременные одинаковые вызовы выполняются один раз
+
+Первый вызывающий запускает задачу, остальные ждут её же результат.
+Результат общий для всех ожидающих — его нельзя изменять на месте.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.shared = 0  # сколько вызовов получили результат чужого запроса
+
+    def in_flight(self, key: Hashable) -> bool:
+        task = self._calls.get(key)
+        return task is not None and not task.done()
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет factory() или присоединяется к уже идущему вызову с тем же ключом"""
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.shared += 1
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # помечаем исключение как полученное
@@ -2,6 +2,7 @@
 """Настройки проекта BizScan - агрегация данных о компаниях"""
 
 import os
+import socket
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -42,6 +43,8 @@ def _get_float(name: str, default: float) -> float:
 # === Telegram ===
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 FEEDBACK_CHAT_ID = os.getenv("FEEDBACK_CHAT_ID", "")
+# Сколько хранить file_id отправленных документов для повторной отправки без загрузки
+TELEGRAM_FILE_ID_TTL_H = _get_int("TELEGRAM_FILE_ID_TTL_H", 24 * 30)
 
 
 # === Data Source Configuration === (OFData only)
@@ -50,6 +53,13 @@ OFDATA_API = os.getenv("OFDATA_API", "https://api.ofdata.ru/v2")
 OFDATA_KEY = os.getenv("OFDATA_KEY")
 FEATURE_OFDATA = _get_bool("FEATURE_OFDATA", True)
 
+# Пул соединений асинхронного клиента OFData (один на процесс)
+OFDATA_POOL_MAX_CONNECTIONS = _get_int("OFDATA_POOL_MAX_CONNECTIONS", 20)
+OFDATA_POOL_MAX_KEEPALIVE = _get_int("OFDATA_POOL_MAX_KEEPALIVE", 10)
+OFDATA_POOL_KEEPALIVE_EXPIRY = _get_float("OFDATA_POOL_KEEPALIVE_EXPIRY", 30.0)
+# HTTP/2 включается только если установлен пакет h2
+OFDATA_HTTP2 = _get_bool("OFDATA_HTTP2", True)
+
 # === Removed: МСП, ЕФРСБ, КАД ===
 
 # === Removed: ГИР БО, ЕИС, РАР, Прозрачный бизнес ===
@@ -64,6 +74,10 @@ DATABASE_TYPE = os.getenv("DATABASE_TYPE", "postgresql")
 
 # SQLite settings (legacy)
 SQLITE_PATH = os.getenv("SQLITE_PATH", "data/cache.db")
+# Соединения SQLite: ожидание блокировки, memory-mapped I/O, кэш подготовленных запросов
+SQLITE_BUSY_TIMEOUT_MS = _get_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_MMAP_SIZE = _get_int("SQLITE_MMAP_SIZE", 64 * 1024 * 1024)
+SQLITE_CACHED_STATEMENTS = _get_int("SQLITE_CACHED_STATEMENTS", 128)
 
 # PostgreSQL settings
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
@@ -78,6 +92,24 @@ if DATABASE_TYPE == "postgresql":
 else:
     DATABASE_URL = f"sqlite+aiosqlite:///{SQLITE_PATH}"
 
+# === Отчёт ===
+# Параллельная загрузка секций отчёта (финансы, суды, закупки, физлица...)
+REPORT_FANOUT_ENABLED = _get_bool("REPORT_FANOUT_ENABLED", True)
+# Максимум одновременных запросов к OFData на один отчёт
+REPORT_FANOUT_CONCURRENCY = _get_int("REPORT_FANOUT_CONCURRENCY", 6)
+# Кэш отрисованных секций отчёта в памяти по хэшу исходных данных (байты, 0 — отключить)
+REPORT_SECTION_CACHE_BYTES = _get_int("REPORT_SECTION_CACHE_BYTES", 16 * 1024 * 1024)
+# Ограничения разворачивания JSON в плоские ключи: глубина вложенности и число значений
+REPORT_FLATTEN_MAX_DEPTH = _get_int("REPORT_FLATTEN_MAX_DEPTH", 32)
+REPORT_FLATTEN_MAX_ITEMS = _get_int("REPORT_FLATTEN_MAX_ITEMS", 200_000)
+# Справочники отчёта: файл кодов строк отчётности, бинарный кэш разобранного файла
+# (пусто — без кэша) и период проверки изменений файла в секундах (0 — не проверять)
+REFERENCE_ACCOUNT_CODES_PATH = os.getenv(
+    "REFERENCE_ACCOUNT_CODES_PATH", str(BASE_DIR / "services" / "data" / "account_codes.json")
+)
+REFERENCE_DATA_CACHE_PATH = os.getenv("REFERENCE_DATA_CACHE_PATH", "")
+REFERENCE_DATA_CHECK_SEC = _get_int("REFERENCE_DATA_CHECK_SEC", 60)
+
 # === Кэширование ===
 CACHE_TTL_HOURS = _get_int("CACHE_TTL_HOURS", 24)
 
@@ -86,6 +118,28 @@ TTL_COUNTERPARTY_H = _get_int("TTL_COUNTERPARTY_H", 72)
 TTL_FINANCE_H = _get_int("TTL_FINANCE_H", 168)
 TTL_PAIDTAX_H = _get_int("TTL_PAIDTAX_H", 168)
 TTL_ARBITRAGE_H = _get_int("TTL_ARBITRAGE_H", 12)
+TTL_ENFORCEMENTS_H = _get_int("TTL_ENFORCEMENTS_H", 12)
+TTL_INSPECTIONS_H = _get_int("TTL_INSPECTIONS_H", 24)
+TTL_CONTRACTS_H = _get_int("TTL_CONTRACTS_H", 24)
+TTL_PERSON_H = _get_int("TTL_PERSON_H", 72)
+TTL_SEARCH_H = _get_int("TTL_SEARCH_H", 24)
+# Кэшировать ответы OFData (TTL 0 у эндпоинта отключает кэш только для него)
+OFDATA_CACHE_ENABLED = _get_bool("OFDATA_CACHE_ENABLED", True)
+# Stale-while-revalidate: сколько часов после TTL отдавать устаревший ответ,
+# обновляя его в фоне
+STALE_COUNTERPARTY_H = _get_int("STALE_COUNTERPARTY_H", 720)
+STALE_FINANCE_H = _get_int("STALE_FINANCE_H", 720)
+OFDATA_CACHE_MAX_STALE_H = _get_int("OFDATA_CACHE_MAX_STALE_H", 72)
+# Память процесса перед SQLite-кэшем (байты, 0 — отключить)
+CACHE_MEMORY_MAX_BYTES = _get_int("CACHE_MEMORY_MAX_BYTES", 64 * 1024 * 1024)
+# Сжатие значений кэша: zstd (со словарём, если он обучен) | zlib | none
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zstd")
+CACHE_ZSTD_DICT_PATH = os.getenv("CACHE_ZSTD_DICT_PATH", "data/cache_zstd.dict")
+# Фоновая чистка кэша: истёкшие записи пачками, лимит объёма данных кэша (0 — без лимита) с вытеснением по LRU
+CACHE_SWEEP_INTERVAL = _get_int("CACHE_SWEEP_INTERVAL", 300)
+CACHE_SWEEP_BATCH = _get_int("CACHE_SWEEP_BATCH", 500)
+CACHE_MAX_DB_BYTES = _get_int("CACHE_MAX_DB_BYTES", 2 * 1024 * 1024 * 1024)
+CACHE_VACUUM_PAGES = _get_int("CACHE_VACUUM_PAGES", 2000)
 
 # === Брендирование ===
 BRAND_NAME = os.getenv("BRAND_NAME", "BizScan")
@@ -136,6 +190,27 @@ GAMMA_COMPACT_INSTRUCTIONS = os.getenv(
 # Тайминги ожидания Gamma (секунды)
 GAMMA_POLL_TIMEOUT_SEC = _get_int("GAMMA_POLL_TIMEOUT_SEC", 1200)   # 15 минут по умолчанию
 GAMMA_POLL_INTERVAL_SEC = _get_int("GAMMA_POLL_INTERVAL_SEC", 20)   # опрос каждые 5 сек
+# Асинхронный поллер: первая проверка через GAMMA_POLL_INITIAL_SEC, затем интервал
+# растёт в GAMMA_POLL_BACKOFF раз до GAMMA_POLL_INTERVAL_SEC
+GAMMA_POLL_INITIAL_SEC = _get_float("GAMMA_POLL_INITIAL_SEC", 3.0)
+GAMMA_POLL_BACKOFF = _get_float("GAMMA_POLL_BACKOFF", 1.5)
+GAMMA_POOL_MAX_CONNECTIONS = _get_int("GAMMA_POOL_MAX_CONNECTIONS", 10)
+# Большой PDF-отчёт делится по секциям на несколько параллельных генераций
+# (не больше GAMMA_CHUNK_MAX_CARDS карточек в каждой, лимит Gamma — 60), PDF склеиваются локально
+GAMMA_CHUNKED_ENABLED = _get_bool("GAMMA_CHUNKED_ENABLED", True)
+GAMMA_CHUNK_MAX_CARDS = _get_int("GAMMA_CHUNK_MAX_CARDS", 50)
+# Кэш готовых файлов Gamma по хэшу входных данных: повторный отчёт по неизменившейся
+# компании отдаётся сразу и не расходует дневной лимит (GAMMA_ARTIFACT_MAX_BYTES=0 — без лимита)
+GAMMA_ARTIFACT_CACHE_ENABLED = _get_bool("GAMMA_ARTIFACT_CACHE_ENABLED", True)
+GAMMA_ARTIFACT_DIR = os.getenv("GAMMA_ARTIFACT_DIR", "data/gamma_artifacts")
+GAMMA_ARTIFACT_TTL_H = _get_int("GAMMA_ARTIFACT_TTL_H", 72)
+GAMMA_ARTIFACT_MAX_BYTES = _get_int("GAMMA_ARTIFACT_MAX_BYTES", 1024 * 1024 * 1024)
+
+# === DOCX-приложение ===
+# Шаблон со стилями и полями страницы (содержимое шаблона не используется)
+DOCX_TEMPLATE_PATH = os.getenv("DOCX_TEMPLATE_PATH", "templates/ДЕМО_Приложение_ООО_Улыбка_Удачи.docx")
+# Сборка DOCX в отдельных процессах, чтобы не блокировать бота (0 — в потоке)
+DOCX_EXPORT_WORKERS = _get_int("DOCX_EXPORT_WORKERS", 1)
 
 # === Цены ===
 # Стоимость формирования отчёта (руб.) — настраивается через переменную окружения REPORT_PRICE
@@ -167,10 +242,27 @@ GAMMA_RATE_LIMIT_PER_MINUTE = _get_int("GAMMA_RATE_LIMIT_PER_MINUTE", 5)  # Requ
 
 # OFData API queue settings  
 OFDATA_QUEUE_MAX_WORKERS = _get_int("OFDATA_QUEUE_MAX_WORKERS", 5)  # Max concurrent OFData requests
-OFDATA_RATE_LIMIT_PER_MINUTE = _get_int("OFDATA_RATE_LIMIT_PER_MINUTE", 30)  # Requests per minute
+# Requests per minute; falls back to the older OFDATA_RATE_LIMIT_QPM (70 by default, as before)
+OFDATA_RATE_LIMIT_PER_MINUTE = _get_int("OFDATA_RATE_LIMIT_PER_MINUTE", _get_int("OFDATA_RATE_LIMIT_QPM", 70))
 OFDATA_RATE_LIMIT_PER_HOUR = _get_int("OFDATA_RATE_LIMIT_PER_HOUR", 1000)  # Requests per hour
+# Shared (cross-process) OFData limiter backend: sqlite | redis | memory
+OFDATA_RATE_LIMIT_BACKEND = os.getenv("OFDATA_RATE_LIMIT_BACKEND", "sqlite")
+OFDATA_RATE_LIMIT_DB_PATH = os.getenv("OFDATA_RATE_LIMIT_DB_PATH", "data/ratelimit.db")
+OFDATA_RATE_LIMIT_REDIS_URL = os.getenv("OFDATA_RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Per-endpoint request weights, e.g. "search=1,contracts=1" (default weight is 1)
+OFDATA_ENDPOINT_WEIGHTS = os.getenv("OFDATA_ENDPOINT_WEIGHTS", "")
+
+# Per-task-type weights for the queue rate limiters, e.g. "ofdata_person=0.5" (default weight is 1)
+QUEUE_TASK_WEIGHTS = os.getenv("QUEUE_TASK_WEIGHTS", "")
 
 # Queue processing intervals (seconds)
-QUEUE_PROCESS_INTERVAL = _get_int("QUEUE_PROCESS_INTERVAL", 1)  # How often to process queue
+QUEUE_COMPLETED_MAX = _get_int("QUEUE_COMPLETED_MAX", 1000)  # Finished tasks kept for status lookups
 QUEUE_CLEANUP_INTERVAL = _get_int("QUEUE_CLEANUP_INTERVAL", 300)  # Cleanup old tasks every 5 minutes
+# Task persistence: database (DATABASE_URL, survives restarts) | memory
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "database")
+QUEUE_WORKER_ID = os.getenv("QUEUE_WORKER_ID", socket.gethostname())  # Lease owner; keep stable across restarts
+QUEUE_LEASE_SECONDS = _get_int("QUEUE_LEASE_SECONDS", 300)  # Visibility timeout for tasks in progress
+QUEUE_DEQUEUE_BATCH = _get_int("QUEUE_DEQUEUE_BATCH", 10)  # Tasks leased per database round-trip
+QUEUE_POLL_INTERVAL = _get_int("QUEUE_POLL_INTERVAL", 5)  # Check for tasks from other processes / expired leases
+QUEUE_RETRY_DELAY = _get_int("QUEUE_RETRY_DELAY", 30)  # Delay before retrying a failed task; doubles on each retry
 
@@ -190,6 +190,11 @@ TEXT_REPORT_PDF_FORMING = "⏳ Пожалуйста, подождите — ид
 TEXT_REPORT_PPTX_FORMING = "⏳ Пожалуйста, подождите — идёт формирование основной PPTX-презентации."
 TEXT_REPORT_PDF_FALLBACK = "⚠️ Не удалось автоматически сформировать основной отчёт. Я отправлю приложение (DOCX)."
 TEXT_REPORT_LINK_AVAILABLE = "📎 {format}-версия доступна по ссылке: {link}"
+TEXT_REPORT_QUEUED = (
+    "🕒 Место в очереди: {position}, ориентировочно {minutes} мин. "
+    "Файл придёт в этот чат, как только будет готов — ботом можно пользоваться и дальше."
+)
+TEXT_REPORT_GAMMA_LIMIT = "⚠️ Дневной лимит формирования отчётов исчерпан. Я отправлю приложение (DOCX)."
 TEXT_REPORT_ERROR_DETAILED = (
     "❌ Произошла ошибка при формировании отчёта.\n\n"
     "🔧 Возможные причины:\n"
@@ -206,6 +211,7 @@ TEXT_PDF_STATUS_FORMING_DETAILED = "⏳ Формирую PDF-версию отч
 TEXT_PDF_STATUS_ERROR = "❌ Не удалось сформировать PDF-отчёт"
 TEXT_PDF_STATUS_SUCCESS = "✅ PDF готов!"
 TEXT_PDF_STATUS_ERROR_FINAL = "❌ Ошибка формирования PDF"
+TEXT_PDF_STATUS_LIMIT = "❌ Дневной лимит формирования отчётов исчерпан. Попробуйте завтра."
 TEXT_FEEDBACK_PROMPT = "📝 Пожалуйста, напишите ваш отзыв одним сообщением."
 TEXT_REPORT_SUCCESS_DOCX_ONLY = "✅ Отчёт готов! Отправляю приложение (DOCX)..."
 TEXT_REPORT_DOWNLOAD_WARNING = "⚠️ Важно: обязательно скачайте файлы сейчас. Временные ссылки и кеш могут истечь, и повторная выдача потребует новой операции."
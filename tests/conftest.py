@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Общие фикстуры тестов
+"""
+import asyncio
+
+import pytest
+
+import services.cache as cache
+from core.db import init_db
+from services.cache import CacheConfig, CacheService, CacheStats
+
+
+@pytest.fixture
+def tmp_cache(tmp_path, monkeypatch):
+    """CacheService на временной БД вместо глобального"""
+    path = str(tmp_path / "cache.db")
+    asyncio.run(init_db(path))
+    service = CacheService(CacheConfig(db_path=path))
+    monkeypatch.setattr(cache, "_cache_service", service)
+    monkeypatch.setattr(cache, "ofdata_cache_stats", CacheStats())
+    yield service
+    asyncio.run(service.close())
@@ -3,7 +3,7 @@
 Тесты для агрегатора
 """
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 import asyncio
 import services.aggregator as aggregator
 from services.aggregator import fetch_company_report_markdown, fetch_company_profile
@@ -30,13 +30,13 @@ class TestAggregator(unittest.TestCase):
         # Мокаем builder
         mock_builder = Mock()
         mock_builder_class.return_value = mock_builder
-        mock_builder.build_simple_report.return_value = "Тестовый отчёт"
+        mock_builder.build_simple_report_async = AsyncMock(return_value="Тестовый отчёт")
         
         # Тестируем
         result = asyncio.run(fetch_company_report_markdown(self.test_inn))
         
         self.assertEqual(result, "Тестовый отчёт")
-        mock_builder.build_simple_report.assert_called_once_with(
+        mock_builder.build_simple_report_async.assert_awaited_once_with(
             ident={'inn': self.test_inn},
             include=['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts'],
             max_rows=500
@@ -49,13 +49,13 @@ class TestAggregator(unittest.TestCase):
         # Мокаем builder
         mock_builder = Mock()
         mock_builder_class.return_value = mock_builder
-        mock_builder.build_simple_report.return_value = "Тестовый отчёт"
+        mock_builder.build_simple_report_async = AsyncMock(return_value="Тестовый отчёт")
         
         # Тестируем
         result = asyncio.run(fetch_company_report_markdown(self.test_ogrn))
         
         self.assertEqual(result, "Тестовый отчёт")
-        mock_builder.build_simple_report.assert_called_once_with(
+        mock_builder.build_simple_report_async.assert_awaited_once_with(
             ident={'ogrn': self.test_ogrn},
             include=['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts'],
             max_rows=500
@@ -68,13 +68,13 @@ class TestAggregator(unittest.TestCase):
         # Мокаем builder
         mock_builder = Mock()
         mock_builder_class.return_value = mock_builder
-        mock_builder.build_simple_report.return_value = "Тестовый отчёт"
+        mock_builder.build_simple_report_async = AsyncMock(return_value="Тестовый отчёт")
         
         # Тестируем
         result = asyncio.run(fetch_company_report_markdown(self.test_name))
         
         self.assertEqual(result, "Тестовый отчёт")
-        mock_builder.build_simple_report.assert_called_once_with(
+        mock_builder.build_simple_report_async.assert_awaited_once_with(
             ident={'name': self.test_name},
             include=['company', 'taxes', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts'],
             max_rows=500
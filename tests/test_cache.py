@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для кэша ответов OFData
+"""
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+
+import services.cache as cache
+from core.db import init_db
+from services.cache import CacheConfig, CacheService, cache_bypass
+from services.cache_codec import CacheCodec, CacheDecodeError, train_dictionary
+from services.rate_limit import GCRALimiter, MemoryRateLimitBackend, RateWindow
+from services.report import ofdata_client
+from services.report.builder import ReportBuilder
+from services.report.ofdata_async_client import AsyncOFDataClient
+
+
+def _client(handler):
+    limiter = GCRALimiter("test", [RateWindow("minute", 100, 60.0)], MemoryRateLimitBackend())
+    return AsyncOFDataClient(
+        api_key="test_key", transport=httpx.MockTransport(handler), limiter=limiter, cache_enabled=True
+    )
+
+
+def _age_row(service, hours):
+    with service._sync_lock:
+        service._sync_conn.execute(
+            "UPDATE cache SET created_at = created_at - ?1, expires_at = expires_at - ?1", (int(hours * 3600),)
+        )
+        service._sync_conn.commit()
+    service.memory.clear()
+
+
+def test_cache_key_ignores_api_key_and_param_order():
+    _, first, _ = cache._ofdata_cache_entry("contracts", {"inn": "1", "law": "44", "key": "a"})
+    _, second, _ = cache._ofdata_cache_entry("/v2/contracts", {"law": 44, "inn": "1", "key": "b"})
+    assert first == second == "ofdata:contracts:inn=1&law=44"
+
+
+def test_repeat_request_within_ttl_makes_no_network_calls(tmp_cache):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"meta": {"status": "ok"}, "data": {"ИНН": "1234567890"}})
+
+    async def run():
+        client = _client(handler)
+        try:
+            first = await client.get_company(inn="1234567890")
+            second = await client.get_company(inn="1234567890")
+            with cache_bypass():
+                third = await client.get_company(inn="1234567890")
+            return first, second, third
+        finally:
+            await client.aclose()
+
+    first, second, third = asyncio.run(run())
+
+    assert first == second == third
+    assert len(calls) == 2  # первый запрос и принудительное обновление
+    stats = cache.ofdata_cache_stats.snapshot()
+    assert stats["by_endpoint"]["company"] == {"hits": 1, "misses": 1}
+
+
+def test_expired_entry_is_a_miss(tmp_cache):
+    tmp_cache.set_sync("k", {"a": 1}, ttl_hours=1)
+    assert tmp_cache.get_sync("k") == {"a": 1}
+    _age_row(tmp_cache, 2)
+    assert tmp_cache.get_sync("k") is None
+    assert asyncio.run(tmp_cache.get("k")) is None
+
+
+def test_errors_are_not_cached(tmp_cache):
+    def handler(request):
+        return httpx.Response(200, json={"meta": {"status": "error", "message": "Неверный ИНН"}})
+
+    async def run():
+        client = _client(handler)
+        try:
+            with pytest.raises(RuntimeError):
+                await client.get_person(inn="123")
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert cache.get_ofdata_cached_sync("person", {"inn": "123"}) is None
+
+
+def test_stale_entry_is_served_and_refreshed_in_background(tmp_cache):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"meta": {"status": "ok"}, "data": {"Версия": "новая"}})
+
+    cache.set_ofdata_cached_sync("company", {"inn": "1234567890"}, {"meta": {"status": "ok"}, "data": {"Версия": "старая"}})
+    _age_row(tmp_cache, 100)  # TTL компании 72 ч, окно устаревания больше
+
+    async def run():
+        client = _client(handler)
+        try:
+            with cache.track_data_age() as age:
+                first = await client.get_company(inn="1234567890")
+                second = await client.get_company(inn="1234567890")
+            await asyncio.gather(*client._revalidations)
+            third = await client.get_company(inn="1234567890")
+            return first, second, third, age
+        finally:
+            await client.aclose()
+
+    first, second, third, age = asyncio.run(run())
+
+    assert first["data"]["Версия"] == second["data"]["Версия"] == "старая"
+    assert third["data"]["Версия"] == "новая"
+    assert len(calls) == 1  # одно фоновое обновление на ключ
+    assert age.stale is True
+    assert age.oldest is not None
+    assert cache.ofdata_cache_stats.snapshot()["stale"] == 2
+
+
+def test_entry_beyond_max_stale_is_a_miss(tmp_cache, monkeypatch):
+    monkeypatch.setattr(cache, "_get_max_stale_for_endpoint", lambda name: 1)
+    cache.set_ofdata_cached_sync("company", {"inn": "1"}, {"data": {}})
+    _age_row(tmp_cache, 74)
+    assert asyncio.run(cache.get_ofdata_entry("company", {"inn": "1"})) is None
+
+
+def test_connection_is_reused_and_uses_wal(tmp_cache):
+    async def run():
+        await tmp_cache.set("k", {"a": 1})
+        first = tmp_cache._conn
+        assert await tmp_cache.get("k") == {"a": 1}
+        async with first.execute("PRAGMA journal_mode") as cursor:
+            mode = (await cursor.fetchone())[0]
+        return first, tmp_cache._conn, mode
+
+    first, second, mode = asyncio.run(run())
+    assert first is second
+    assert mode == "wal"
+
+
+def test_memory_tier_evicts_by_byte_budget():
+    memory = cache.MemoryCache(max_bytes=100)
+    entry = cache.CacheEntry({"a": 1}, 0, 1)
+    memory.put("a", entry, 40)
+    memory.put("b", entry, 40)
+    memory.get("a")  # "a" становится самой свежей
+    memory.put("c", entry, 40)
+    assert memory.get("b") is None
+    assert memory.get("a") is entry
+    assert memory.size == 80
+    memory.put("huge", entry, 1000)
+    assert memory.get("huge") is None
+
+
+def test_memory_tier_serves_decoded_objects(tmp_cache, monkeypatch):
+    def fail(stored):
+        raise AssertionError("значение из памяти не должно разбираться повторно")
+
+    async def run():
+        await tmp_cache.set("k", {"a": [1]})
+        monkeypatch.setattr(tmp_cache.codec, "decode", fail)
+        first = await tmp_cache.get("k")
+        second = await tmp_cache.get("k")
+        return first, second
+
+    first, second = asyncio.run(run())
+    # Без повторного json.loads и без копирования: значение общее
+    assert first is second and first == {"a": [1]}
+
+
+def test_report_build_does_not_change_cached_company(tmp_cache, monkeypatch):
+    monkeypatch.setattr(ofdata_client, "OFDATA_CACHE_ENABLED", True)
+    company = {"meta": {"status": "ok"}, "data": {"НаимПолн": "ООО \"ТЕСТ\"", "ИНН": "1"}}
+    cache.set_ofdata_cached_sync("company", {"inn": "1"}, company)
+    cache.set_ofdata_cached_sync("finances", {"extended": "true", "inn": "1"}, {"data": {"2023": {"2110": 5}}})
+    builder = ReportBuilder()
+    builder.client.session.get = lambda *args, **kwargs: pytest.fail("запрос мимо кэша")
+
+    first = builder.build_simple_report({"inn": "1"}, ["company", "finances"])
+    second = builder.build_simple_report({"inn": "1"}, ["company", "finances"])
+
+    assert first == second
+    assert cache.get_ofdata_cached_sync("company", {"inn": "1"}) == company
+    assert "finances" not in company
+
+
+def test_get_many_reads_sqlite_in_one_batch(tmp_cache):
+    async def run():
+        await tmp_cache.set_many({"a": 1, "b": [2], "c": {"x": 3}})
+        tmp_cache.memory.clear()
+        entries = await tmp_cache.get_many(["a", "b", "c", "missing"])
+        return entries
+
+    entries = asyncio.run(run())
+    assert {key: entry.value for key, entry in entries.items()} == {"a": 1, "b": [2], "c": {"x": 3}}
+    assert len(tmp_cache.memory) == 3
+
+
+def test_hydrate_warms_memory_for_report_sections(tmp_cache):
+    cache.set_ofdata_cached_sync("finances", {"extended": "true", "inn": "1"}, {"data": {"f": 1}})
+    cache.set_ofdata_cached_sync("contracts", {"law": "44", "role": "customer", "inn": "1"}, {"data": {"c": 1}})
+    tmp_cache.memory.clear()
+
+    def handler(request):
+        raise AssertionError("network must not be used")
+
+    async def run():
+        client = _client(handler)
+        try:
+            found = await client.hydrate([
+                ("get_finances", {"inn": "1"}),
+                ("get_contracts", {"law": "44", "role": "customer", "inn": "1"}),
+                ("get_inspections", {"inn": "1"}),
+            ])
+            warmed = len(tmp_cache.memory)
+            finances = await client.get_finances(inn="1")
+            return found, warmed, finances
+        finally:
+            await client.aclose()
+
+    found, warmed, finances = asyncio.run(run())
+    assert found == 2
+    assert warmed == 2
+    assert finances == {"data": {"f": 1}}
+
+
+SAMPLE = {"meta": {"status": "ok"}, "data": {"Записи": [{"ИНН": str(i), "НаимПолн": "ООО «Ромашка»"} for i in range(50)]}}
+
+
+def test_codec_zlib_roundtrip_and_legacy_text():
+    codec = CacheCodec("zlib")
+    stored, size = codec.encode(SAMPLE)
+    assert isinstance(stored, bytes) and stored[0] == 0x01
+    assert len(stored) < size
+    assert codec.decode(stored) == (SAMPLE, size)
+    # Строки, записанные до сжатия, читаются как есть
+    assert codec.decode('{"a": 1}')[0] == {"a": 1}
+
+
+def test_codec_zstd_with_dictionary():
+    pytest.importorskip("zstandard")
+    samples = [
+        CacheCodec("none").encode({"data": {"ИНН": str(i), "НаимПолн": f"ООО «Компания {i}»", "Записи": []}})[0].encode()
+        for i in range(300)
+    ]
+    dict_data = train_dictionary(samples, 4096)
+    codec = CacheCodec("zstd", dict_data=dict_data)
+    stored, _ = codec.encode(SAMPLE)
+    assert stored[0] == 0x02
+    assert codec.decode(stored)[0] == SAMPLE
+    # Без словаря запись не разобрать — это промах, а не падение
+    with pytest.raises(CacheDecodeError):
+        CacheCodec("zstd").decode(stored)
+
+
+def test_undecodable_rows_are_misses(tmp_cache):
+    with tmp_cache._sync_lock:
+        conn = tmp_cache._get_sync_connection()
+        conn.execute(
+            "INSERT INTO cache (key, value, created_at, ttl_hours) VALUES ('bad', ?, strftime('%s','now'), 24)",
+            (b"\x7fgarbage",),
+        )
+        conn.commit()
+    assert tmp_cache.get_sync("bad") is None
+    assert asyncio.run(tmp_cache.get("bad")) is None
+
+
+def test_sweeper_deletes_expired_rows_in_batches(tmp_cache):
+    tmp_cache.config.sweep_batch = 3
+    for i in range(7):
+        tmp_cache.set_sync(f"old{i}", i, ttl_hours=1)
+    tmp_cache.set_sync("kept", "x", ttl_hours=1, stale_hours=10)
+    _age_row(tmp_cache, 2)
+
+    deleted = asyncio.run(tmp_cache.clear_expired())
+
+    assert deleted == 7
+    rows = tmp_cache._sync_conn.execute("SELECT key FROM cache").fetchall()
+    assert rows == [("kept",)]
+
+
+def _fill_uncompressed(tmp_cache, count):
+    tmp_cache.config.compression = "none"
+    tmp_cache.codec = CacheCodec("none")
+    for i in range(count):
+        tmp_cache.set_sync(f"k{i:02d}", "x" * 4000)
+    with tmp_cache._sync_lock:
+        tmp_cache._sync_conn.execute("UPDATE cache SET accessed_at = 1")
+        tmp_cache._sync_conn.commit()
+    tmp_cache.memory.clear()
+
+
+def test_size_limit_evicts_least_recently_used(tmp_cache):
+    _fill_uncompressed(tmp_cache, 20)
+    assert tmp_cache.get_sync("k00") == "x" * 4000  # k00 читали недавно
+
+    async def run():
+        await tmp_cache.flush_touches()
+        row = (await tmp_cache.cache_size()) // 20
+        # Превышение чуть больше четырёх строк — удаляются ровно пять
+        tmp_cache.config.max_db_bytes = await tmp_cache.cache_size() - 4 * row - 1
+        evicted = await tmp_cache.enforce_size_limit()
+        return evicted, await tmp_cache.cache_size()
+
+    evicted, size = asyncio.run(run())
+    assert evicted == 5
+    assert size <= tmp_cache.config.max_db_bytes
+    keys = {key for (key,) in tmp_cache._sync_conn.execute("SELECT key FROM cache")}
+    assert len(keys) == 15 and "k00" in keys
+
+
+def test_size_limit_ignores_other_tables(tmp_cache):
+    _fill_uncompressed(tmp_cache, 5)
+    with tmp_cache._sync_lock:
+        tmp_cache._sync_conn.execute("CREATE TABLE other (data BLOB)")
+        tmp_cache._sync_conn.execute("INSERT INTO other VALUES (zeroblob(200000))")
+        tmp_cache._sync_conn.commit()
+
+    async def run():
+        tmp_cache.config.max_db_bytes = await tmp_cache.cache_size() + 1
+        return await tmp_cache.enforce_size_limit()
+
+    assert asyncio.run(run()) == 0
+    assert tmp_cache._sync_conn.execute("SELECT count(*) FROM cache").fetchone() == (5,)
+
+
+def test_existing_database_is_not_vacuumed_on_start(tmp_path, monkeypatch):
+    from scripts.enable_incremental_vacuum import convert
+
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE legacy (x)")
+    conn.commit()
+    conn.close()
+    asyncio.run(init_db(path))
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    conn.close()
+
+    service = CacheService(CacheConfig(db_path=path))
+    executed = []
+
+    async def run():
+        conn = await service._get_connection()
+        await conn.set_trace_callback(executed.append)
+        await service.incremental_vacuum()
+        await service.close()
+
+    asyncio.run(run())
+    assert "PRAGMA auto_vacuum" in executed
+    assert not any("incremental_vacuum(" in sql for sql in executed)
+
+    assert convert(path) is True and convert(path) is False
+    fresh = str(tmp_path / "fresh.db")
+    asyncio.run(init_db(fresh))
+    conn = sqlite3.connect(fresh)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    conn.close()
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты отправки файлов с повторным использованием file_id
+"""
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendDocument
+from aiogram.types import BufferedInputFile, FSInputFile
+
+from bot.delivery import send_document, send_generated, text_key
+
+
+class FakeMessage:
+    """Сообщение, отправка документа в которое записывается, а Telegram выдаёт file_id"""
+
+    def __init__(self, stale_file_ids=(), prefix="file"):
+        self.sent = []
+        self.prefix = prefix
+        self.stale_file_ids = set(stale_file_ids)
+
+    async def answer_document(self, document, caption=None, **kwargs):
+        if isinstance(document, str) and document in self.stale_file_ids:
+            raise TelegramBadRequest(SendDocument(chat_id=1, document=document), "wrong file identifier")
+        self.sent.append(document)
+        file_id = document if isinstance(document, str) else f"{self.prefix}-{len(self.sent)}"
+        return SimpleNamespace(document=SimpleNamespace(file_id=file_id))
+
+
+def test_identical_file_is_resent_by_file_id(tmp_path, tmp_cache):
+    first = tmp_path / "a" / "report.pdf"
+    second = tmp_path / "b" / "report.pdf"
+    for path in (first, second):
+        path.parent.mkdir()
+        path.write_bytes(b"%PDF-same")
+
+    async def main():
+        message = FakeMessage()
+        await send_document(message, str(first), caption="PDF")
+        await send_document(message, str(second), caption="PDF")
+        return message.sent
+
+    sent = asyncio.run(main())
+
+    assert isinstance(sent[0], FSInputFile)
+    assert sent[0].filename == "report.pdf"
+    assert sent[1] == "file-1"
+
+
+def test_different_content_or_name_is_uploaded(tmp_path, tmp_cache):
+    path = tmp_path / "report.pdf"
+
+    async def main():
+        message = FakeMessage()
+        path.write_bytes(b"%PDF-1")
+        await send_document(message, str(path))
+        path.write_bytes(b"%PDF-2")
+        await send_document(message, str(path))
+        await send_document(message, str(path), filename="other.pdf")
+        return message.sent
+
+    assert all(isinstance(doc, FSInputFile) for doc in asyncio.run(main()))
+
+
+def test_content_key_overrides_file_hash(tmp_path, tmp_cache):
+    path = tmp_path / "report.docx"
+    key = text_key("текст отчёта", "docx")
+
+    async def main():
+        message = FakeMessage()
+        path.write_bytes(b"docx built at 10:00")
+        await send_document(message, str(path), content_key=key)
+        path.write_bytes(b"docx built at 10:05")
+        await send_document(message, str(path), content_key=key)
+        return message.sent
+
+    assert asyncio.run(main())[1] == "file-1"
+
+
+def test_stale_file_id_falls_back_to_upload(tmp_path, tmp_cache):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1")
+
+    async def main():
+        await send_document(FakeMessage(), str(path))
+        message = FakeMessage(stale_file_ids={"file-1"}, prefix="fresh")
+        await send_document(message, str(path))
+        await send_document(message, str(path))
+        return message.sent
+
+    sent = asyncio.run(main())
+    assert isinstance(sent[0], FSInputFile)
+    assert sent[1] == "fresh-1"  # новый file_id от повторной загрузки
+
+
+def test_generated_document_is_built_only_without_file_id(tmp_cache):
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return b"docx"
+
+    async def main():
+        message = FakeMessage()
+        key = text_key("текст отчёта", "docx")
+        for _ in range(2):
+            await send_generated(message, build, filename="Приложение.docx", content_key=key)
+        return message.sent
+
+    sent = asyncio.run(main())
+    assert isinstance(sent[0], BufferedInputFile)
+    assert sent[0].filename == "Приложение.docx"
+    assert sent[1] == "file-1"
+    assert len(builds) == 1
+
+
+class FakeBot:
+    """Bot, отправки которого записываются по чатам"""
+
+    def __init__(self):
+        self.documents = []
+        self.messages = []
+
+    async def send_document(self, chat_id, document, caption=None, **kwargs):
+        self.documents.append((chat_id, document, caption))
+        return SimpleNamespace(document=SimpleNamespace(file_id=f"file-{len(self.documents)}"))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+def test_recovered_gamma_task_is_delivered_from_payload(tmp_path, tmp_cache, monkeypatch):
+    import bot.handlers.company as company
+    from services.queue import QueueTask, TaskStatus, TaskType
+
+    async def fake_docx(report):
+        return b"PK-docx"
+
+    monkeypatch.setattr(company, "export_docx", fake_docx)
+    pdf = tmp_path / "report.pdf"
+    pdf.write_bytes(b"%PDF-1")
+    delivery = dict(chat_id=42, user_id=7, status_message_id=1, order_id=None, export_as="pdf",
+                    **company._report_files("pdf", "ООО Ромашка", "7700000000"))
+    task = QueueTask(
+        id="t1", task_type=TaskType.GAMMA_PDF, status=TaskStatus.COMPLETED, result=str(pdf),
+        payload={"report_text": "отчёт", "delivery": delivery},
+    )
+    bot = FakeBot()
+
+    asyncio.run(company._deliver_queued_report(bot, task))
+
+    (chat, main, caption), (_, docx, docx_caption) = bot.documents
+    assert chat == 42 and isinstance(main, FSInputFile) and caption == delivery["main_caption"]
+    assert docx.filename == "Приложение_ООО_Ромашка_7700000000.docx" and docx_caption == delivery["docx_caption"]
+    assert [chat for chat, _ in bot.messages] == [42]
+
+
+def test_recovered_gamma_task_builds_docx_from_stored_ir(tmp_cache, monkeypatch):
+    import json
+
+    import bot.handlers.company as company
+    from services.queue import QueueTask, TaskStatus, TaskType
+    from services.report.ir import Block, Report, Section, Table
+
+    built = []
+
+    async def fake_docx(report):
+        built.append(report)
+        return b"PK-docx"
+
+    monkeypatch.setattr(company, "export_docx", fake_docx)
+    ir = Report([Section("taxes", "НАЛОГИ", [Block([Table(["Год", "Сумма"], [["2023", "5"]], "{}: {}")])])])
+    delivery = dict(chat_id=42, user_id=7, status_message_id=1, order_id=None, export_as="pdf",
+                    report_ir=ir.to_dict(), **company._report_files("pdf", None, None))
+    # payload задачи хранится в БД как JSON
+    payload = json.loads(json.dumps({"report_text": ir.text, "delivery": delivery}, ensure_ascii=False))
+    task = QueueTask(id="t1", task_type=TaskType.GAMMA_PDF, status=TaskStatus.FAILED, payload=payload)
+
+    asyncio.run(company._deliver_queued_report(FakeBot(), task))
+
+    assert built == [ir]
+    # DOCX из текста — другой файл, и его file_id хранится под другим ключом
+    assert company._docx_source(ir.text, ir)[1] != company._docx_source(ir.text, None)[1]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты сборки DOCX-приложения
+"""
+import asyncio
+import io
+from pathlib import Path
+
+from docx import Document
+
+import services.export.docx_exporter as docx_module
+from services.export.docx_exporter import build_docx, close_docx_executor, export_docx
+from services.report.constants import SECTION_SEPARATOR
+from services.report.ir import Block, Report, Row, Section, Table
+
+LARGE_REPORT = Path(__file__).parent / "fixtures" / "large_report.txt"
+
+REPORT = "\n".join([
+    "НАЗВАНИЕ: ООО «РОМАШКА»",
+    "ИНН: 7700000000",
+    "",
+    "НАЛОГИ",
+    SECTION_SEPARATOR,
+    "Статус:",
+    "  Код статуса: 001",
+    "",
+    "ПРОВЕРКИ",
+    SECTION_SEPARATOR,
+    "Всего: 2\x0b",
+])
+
+
+def _paragraphs(data):
+    return [(p.style.name, p.text) for p in Document(io.BytesIO(data)).paragraphs]
+
+
+def test_headings_come_from_sections():
+    paragraphs = _paragraphs(build_docx(REPORT))
+
+    assert [text for style, text in paragraphs if style == "Heading 1"] == ["НАЛОГИ", "ПРОВЕРКИ"]
+    # Строки в верхнем регистре без разделителя — обычный текст, разделители не попадают в документ
+    assert ("Normal", "ИНН: 7700000000") in paragraphs
+    assert not any(SECTION_SEPARATOR in text for _, text in paragraphs)
+
+
+def test_indentation_and_invalid_characters():
+    paragraphs = _paragraphs(build_docx(REPORT))
+
+    assert ("Normal", "  Код статуса: 001") in paragraphs
+    assert paragraphs[-1] == ("Normal", "Всего: 2")
+
+
+def test_template_content_is_dropped():
+    document = Document(io.BytesIO(build_docx("Одна строка")))
+
+    assert [p.text for p in document.paragraphs] == ["Одна строка"]
+    assert document.core_properties.author == ""
+
+
+def test_report_ir_is_rendered_without_parsing():
+    report = Report([
+        Section("company", None, [Block([Row(key="ИНН", value="1")])]),
+        Section("taxes", "НАЛОГИ", [Block([
+            Row(key="Все налоги"),
+            Table(columns=["Налог", "Сумма"], rows=[["НДС", "10 ₽"]], line="• {0}: {1}"),
+        ])]),
+    ])
+
+    document = Document(io.BytesIO(build_docx(report)))
+
+    assert [(p.style.name, p.text) for p in document.paragraphs] == [
+        ("Normal", "ИНН: 1"), ("Heading 1", "НАЛОГИ"), ("Normal", "Все налоги:"),
+    ]
+    assert document.paragraphs[0].runs[0].bold
+    table = document.tables[0]
+    assert [[cell.text for cell in row.cells] for row in table.rows] == [["Налог", "Сумма"], ["НДС", "10 ₽"]]
+    assert table.style.name == "Table Grid"
+
+
+def test_large_report_in_process_pool(monkeypatch):
+    text = LARGE_REPORT.read_text(encoding="utf-8")
+    monkeypatch.setattr(docx_module, "DOCX_EXPORT_WORKERS", 1)
+
+    async def main():
+        try:
+            return await asyncio.gather(export_docx(text), export_docx(text))
+        finally:
+            await close_docx_executor()
+
+    first, second = asyncio.run(main())
+
+    assert _paragraphs(first) == _paragraphs(second) == _paragraphs(build_docx(text))
+    headings = [text for style, text in _paragraphs(first) if style == "Heading 1"]
+    assert headings[0] == "ФИЗИЧЕСКИЕ ЛИЦА (РУКОВОДИТЕЛЬ/УЧРЕДИТЕЛИ)"
+    assert "ПРОВЕРКИ" in headings
+
+
+def test_thread_fallback_without_workers(monkeypatch):
+    monkeypatch.setattr(docx_module, "DOCX_EXPORT_WORKERS", 0)
+
+    data = asyncio.run(export_docx(REPORT))
+
+    assert _paragraphs(data) == _paragraphs(build_docx(REPORT))
+    assert docx_module._executor is None
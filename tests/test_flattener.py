@@ -2,8 +2,67 @@
 """
 Тесты для flattener.py
 """
+import random
+
 import pytest
-from services.report.flattener import flatten, apply_aliases, pick
+from services.report.flattener import flatten, iter_flat, apply_aliases, compile_aliases, pick
+from services.report.aliases_ru import COMMON_ALIASES, COMPANY_ALIASES, FIN_ALIASES
+
+
+def reference_flatten(obj, prefix=""):
+    """Прежний рекурсивный flatten — эталон путей и порядка"""
+    result = {}
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            new_prefix = f"{prefix}.{key}" if prefix else key
+            if isinstance(value, (dict, list)):
+                result.update(reference_flatten(value, new_prefix))
+            else:
+                result[new_prefix] = value
+    elif isinstance(obj, list):
+        for i, item in enumerate(obj):
+            new_prefix = f"{prefix}[{i}]" if prefix else f"[{i}]"
+            if isinstance(item, (dict, list)):
+                result.update(reference_flatten(item, new_prefix))
+            else:
+                result[new_prefix] = item
+    elif prefix:
+        result[prefix] = obj
+    return result
+
+
+def reference_apply_aliases(flat, aliases):
+    """Прежний перебор всех алиасов для каждого ключа — эталон семантики"""
+    result = {}
+    latest_year = {}
+    for key, value in flat.items():
+        applied = False
+        for alias_key, alias_value in aliases.items():
+            if alias_key == key:
+                result[alias_value] = value
+                applied = True
+                break
+            if '[]' in alias_key:
+                prefix, suffix = alias_key.split('[]', 1)
+                if key.startswith(prefix) and key.endswith(suffix):
+                    if alias_value not in result:
+                        result[alias_value] = value
+                    applied = True
+                    break
+            if '<year>' in alias_key:
+                prefix, suffix = alias_key.split('<year>', 1)
+                if key.startswith(prefix) and key.endswith(suffix):
+                    year_part = key[len(prefix): len(key) - len(suffix)]
+                    if year_part.isdigit():
+                        year = int(year_part)
+                        if year > latest_year.get(alias_value, -1):
+                            result[alias_value] = value
+                            latest_year[alias_value] = year
+                    applied = True
+                    break
+        if not applied:
+            result[key] = value
+    return result
 
 
 class TestFlattener:
@@ -217,3 +276,85 @@ class TestFlattener:
             "НеизвестноеПоле": "значение"
         }
 
+    def test_apply_aliases_first_match_wins(self):
+        """Тест порядка: срабатывает первый подходящий алиас, а не самый точный"""
+        flat_data = {
+            "Налоги.СведУпл[0].Наим": "НДС",
+            "data.2023.2110": 1,
+            "data.x.2110": 2,
+        }
+
+        aliases = {
+            "Налоги.СведУпл[].Наим": "Шаблон",
+            "Налоги.СведУпл[0].Наим": "Точный",
+            "data.<year>.2110": "Выручка",
+            "data.[]": "Массив",
+        }
+
+        result = apply_aliases(flat_data, aliases)
+
+        # "data.x.2110" поглощается шаблоном года без числового года
+        assert result == {"Шаблон": "НДС", "Выручка": 1}
+
+    def test_apply_aliases_overlapping_prefix_and_suffix(self):
+        """Тест шаблонов, у которых префикс и суффикс перекрываются в ключе"""
+        aliases = {"ab[]bc": "Массив", "x<year>x": "Год", "a[]<year>b": "Оба"}
+        flat_data = {"abc": 1, "x": 2, "a[]2020b": 3, "a1<year>b": 4}
+
+        assert apply_aliases(flat_data, aliases) == reference_apply_aliases(flat_data, aliases)
+
+    def test_compiled_aliases_match_reference(self):
+        """Тест скомпилированных алиасов против прежнего перебора на реальных словарях"""
+        rnd = random.Random(7)
+        aliases = {**COMMON_ALIASES, **COMPANY_ALIASES, **FIN_ALIASES}
+        keys = []
+        for alias_key in aliases:
+            keys.append(alias_key)
+            keys.append(alias_key.replace("[]", f"[{rnd.randint(0, 3)}]").replace("<year>", str(rnd.randint(2018, 2024))))
+            keys.append(alias_key.replace("<year>", "ГОД") + ".Лишнее")
+        rnd.shuffle(keys)
+        flat_data = {key: n for n, key in enumerate(keys)}
+
+        assert apply_aliases(flat_data, aliases) == reference_apply_aliases(flat_data, aliases)
+        assert apply_aliases(flat_data, compile_aliases(aliases)) == apply_aliases(flat_data, aliases)
+        assert compile_aliases(dict(aliases)) is compile_aliases(aliases)
+
+    def test_flatten_matches_recursive_version(self):
+        """Тест итеративного обхода против прежней рекурсии: пути, порядок, пустые контейнеры"""
+        data = [
+            {"Учред": {"ФЛ": [{"ФИО": "А", "Доля": {"Процент": 50}}, []], "РосОрг": {}}, "": {"x": 1}, 7: "семь"},
+            [1, [2, [3]]],
+            "скаляр",
+        ]
+
+        for obj, prefix in [(data, ""), (data[0], ""), (data[1], "arr"), ("скаляр", "p"), ("скаляр", "")]:
+            assert list(iter_flat(obj, prefix)) == list(reference_flatten(obj, prefix).items())
+            assert flatten(obj, prefix) == reference_flatten(obj, prefix)
+
+    def test_flatten_depth_limit(self):
+        """Тест глубокой вложенности: без RecursionError, глубже лимита — пропуск"""
+        deep = "лист"
+        for _ in range(5000):
+            deep = {"a": deep}
+        data = {"ИНН": "1", "Вложено": deep, "ОГРН": "2"}
+
+        assert flatten(data, max_depth=3) == {"ИНН": "1", "ОГРН": "2"}
+        (path, value), = flatten(deep, max_depth=6000).items()
+        assert value == "лист" and path.count(".") == 4999
+
+    def test_flatten_item_limit_and_laziness(self):
+        """Тест лимита значений и ленивого обхода"""
+        data = {"Записи": [{"Номер": i, "Сумма": i * 10} for i in range(1000)]}
+
+        assert list(flatten(data, max_items=3)) == ["Записи[0].Номер", "Записи[0].Сумма", "Записи[1].Номер"]
+        stream = iter_flat(data)
+        assert next(stream) == ("Записи[0].Номер", 0)
+
+    def test_apply_aliases_streams_pairs(self):
+        """Тест применения алиасов к потоку пар без плоского словаря"""
+        data = {"Налоги": {"СведУпл": [{"Наим": "НДС"}, {"Наим": "Налог на прибыль"}]}, "ИНН": "1"}
+        aliases = {"Налоги.СведУпл[].Наим": "Уплаченный налог", "ИНН": "ИНН"}
+
+        assert apply_aliases(iter_flat(data), aliases) == apply_aliases(flatten(data), aliases) == {
+            "Уплаченный налог": "НДС", "ИНН": "1",
+        }
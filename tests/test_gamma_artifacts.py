@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты кэша готовых файлов Gamma
+"""
+import os
+import shutil
+import threading
+import time
+
+import services.export.gamma_artifacts as gamma_artifacts
+from services.export.gamma_artifacts import GammaArtifactStore, artifact_key
+
+
+def _file(path, data=b"%PDF-1"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_key_depends_on_every_generation_input():
+    base = dict(export_as="pdf", language="ru", theme_name="classic", num_cards=40, instructions="кратко")
+    key = artifact_key("отчёт", **base)
+    assert key == artifact_key("отчёт", **base)
+    for field, value in [("export_as", "pptx"), ("language", "en"), ("theme_name", None),
+                         ("num_cards", 20), ("instructions", "подробно")]:
+        assert artifact_key("отчёт", **{**base, field: value}) != key
+    assert artifact_key("отчёт ", **base) != key
+
+
+def test_put_then_get_copies_file_to_destination(tmp_path):
+    store = GammaArtifactStore(str(tmp_path / "store"), ttl_hours=1, max_bytes=0)
+    src = _file(tmp_path / "reports" / "gen.pdf", b"%PDF-report")
+
+    assert store.put("k1", "pdf", src)
+    dest = tmp_path / "out" / "ООО_7700000000.pdf"
+    assert store.get("k1", "pdf", str(dest)) == str(dest)
+    assert dest.read_bytes() == b"%PDF-report"
+
+    # Перезапись выданного файла не портит копию в кэше
+    dest.write_bytes(b"changed")
+    assert store.get("k1", "pdf", str(dest)) == str(dest)
+    assert dest.read_bytes() == b"%PDF-report"
+
+    assert store.get("k1", "pptx", str(tmp_path / "x.pptx")) is None
+    assert store.get("missing", "pdf", str(tmp_path / "y.pdf")) is None
+
+
+def test_concurrent_hits_for_one_destination(tmp_path, monkeypatch):
+    store = GammaArtifactStore(str(tmp_path / "store"), ttl_hours=1, max_bytes=0)
+    assert store.put("k1", "pdf", _file(tmp_path / "gen.pdf", b"%PDF-report"))
+    dest = str(tmp_path / "out" / "report.pdf")
+    copied = threading.Barrier(2)
+    real_copyfile = shutil.copyfile
+
+    def copyfile(src, dst):
+        real_copyfile(src, dst)
+        copied.wait(timeout=5)  # обе копии дописаны до первого os.replace
+
+    monkeypatch.setattr(gamma_artifacts.shutil, "copyfile", copyfile)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get("k1", "pdf", dest))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [dest, dest]
+    assert os.listdir(tmp_path / "out") == ["report.pdf"]
+
+
+def test_link_results_are_cached(tmp_path):
+    store = GammaArtifactStore(str(tmp_path), ttl_hours=1, max_bytes=0)
+    assert store.put("k1", "pdf", "LINK:https://gamma.app/docs/abc")
+    assert store.get("k1", "pdf", str(tmp_path / "out.pdf")) == "LINK:https://gamma.app/docs/abc"
+    assert not store.put("k2", "pdf", None)
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    store = GammaArtifactStore(str(tmp_path / "store"), ttl_hours=1, max_bytes=0)
+    store.put("old", "pdf", _file(tmp_path / "a.pdf"))
+    stale = time.time() - 2 * 3600
+    os.utime(tmp_path / "store" / "old.pdf", (stale, stale))
+
+    assert store.get("old", "pdf", str(tmp_path / "out.pdf")) is None
+    assert not (tmp_path / "store" / "old.pdf").exists()
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path):
+    store = GammaArtifactStore(str(tmp_path / "store"), ttl_hours=1, max_bytes=250)
+    now = time.time()
+    for i, key in enumerate(["a", "b"]):
+        store.put(key, "pdf", _file(tmp_path / f"{key}.pdf", b"x" * 100))
+        os.utime(tmp_path / "store" / f"{key}.pdf", (now - 100 + i, now - 100 + i))
+    # "a" использован последним, поэтому вытесняется "b"
+    assert store.get("a", "pdf", str(tmp_path / "out.pdf"))
+
+    store.put("c", "pdf", _file(tmp_path / "c.pdf", b"x" * 100))
+
+    assert sorted(p.name for p in (tmp_path / "store").iterdir()) == ["a.pdf", "c.pdf"]
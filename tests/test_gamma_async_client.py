@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты асинхронного клиента Gamma на локальном stub-сервере
+"""
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+
+import services.export.gamma_async_client as gamma_module
+from services.export.gamma_async_client import AsyncGammaClient, _retry_after
+from services.export.gamma_exporter import GammaError
+from services.queue import MemoryTaskStore, QueueManager, TaskStatus, TaskType
+
+
+class StubGamma:
+    """Минимальный Gamma API: генерация завершается после заданного числа проверок статуса"""
+
+    def __init__(self, polls_needed=(1,), final_status="completed", pdf=None):
+        self.polls_needed = list(polls_needed)
+        self.pdf = pdf  # тело ответа на скачивание вместо "%PDF-<id>"
+        self.final_status = final_status
+        self.generations = {}
+        self.status_requests = []  # (generation_id, time.monotonic())
+        self.rate_limited = []  # Retry-After для следующих запросов статуса
+        self.garbage = 0  # сколько следующих ответов статуса придут не JSON
+        self.created = []
+        self.base = ""
+
+    async def create(self, request):
+        body = await request.json()
+        generation_id = f"gen-{len(self.created) + 1}"
+        polls = self.polls_needed[len(self.created) % len(self.polls_needed)]
+        self.created.append(body)
+        self.generations[generation_id] = {"polls_left": polls, "export_as": body["exportAs"]}
+        return web.json_response({"generationId": generation_id})
+
+    async def status(self, request):
+        generation_id = request.match_info["generation_id"]
+        self.status_requests.append((generation_id, time.monotonic()))
+        if self.rate_limited:
+            return web.json_response({}, status=429, headers={"Retry-After": self.rate_limited.pop(0)})
+        if self.garbage:
+            self.garbage -= 1
+            return web.Response(text="<html>maintenance</html>")
+        generation = self.generations[generation_id]
+        generation["polls_left"] -= 1
+        if generation["polls_left"] > 0:
+            return web.json_response({"generationId": generation_id, "status": "pending"})
+        data = {"generationId": generation_id, "status": self.final_status}
+        if self.final_status == "completed":
+            data[f"{generation['export_as']}Url"] = f"{self.base}/download/{generation_id}"
+        return web.json_response(data)
+
+    async def download(self, request):
+        if self.pdf is not None:
+            return web.Response(body=self.pdf)
+        return web.Response(body=b"%PDF-" + request.match_info["generation_id"].encode())
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v0.2/generations", self.create)
+        app.router.add_get("/v0.2/generations/{generation_id}", self.status)
+        app.router.add_get("/download/{generation_id}", self.download)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.base = f"http://{host}:{port}"
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def polls_of(self, generation_id):
+        return [at for gid, at in self.status_requests if gid == generation_id]
+
+
+def _client(server, **options):
+    options.setdefault("initial_interval", 0.02)
+    options.setdefault("max_interval", 0.05)
+    options.setdefault("backoff", 1.5)
+    return AsyncGammaClient(api_key="test", base_url=f"{server.base}/v0.2", **options)
+
+
+def _run(stub, scenario, **options):
+    async def main():
+        server = await stub.start()
+        client = _client(server, **options)
+        try:
+            return await scenario(server, client)
+        finally:
+            await client.aclose()
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_generations_share_one_poller():
+    stub = StubGamma(polls_needed=(1, 2, 3, 4, 5))
+
+    async def scenario(server, client):
+        ids = [await client.create_generation("текст", export_as="pdf") for _ in range(5)]
+        waits = [asyncio.ensure_future(client.wait_generation(gid)) for gid in ids]
+        await asyncio.sleep(0)
+        poller = client._poller
+        results = await asyncio.gather(*waits)
+        return ids, results, poller
+
+    ids, results, poller = _run(stub, scenario)
+
+    assert [r["generationId"] for r in results] == ids
+    assert all(r["status"] == "completed" for r in results)
+    # Ровно одна проверка на каждый запланированный опрос, без лишних запросов
+    assert [len(stub.polls_of(gid)) for gid in ids] == [1, 2, 3, 4, 5]
+    assert poller.done()
+
+
+def test_poll_interval_backs_off_up_to_cap():
+    stub = StubGamma(polls_needed=(5,))
+
+    async def scenario(server, client):
+        started = time.monotonic()
+        await client.wait_generation(await client.create_generation("текст"))
+        return started
+
+    started = _run(stub, scenario, initial_interval=0.05, max_interval=0.2, backoff=2.0)
+    times = [started] + stub.polls_of("gen-1")
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    # Интервалы 0.05, 0.1, 0.2, 0.2, 0.2 (с запасом на планировщик)
+    for gap, expected in zip(gaps, [0.05, 0.1, 0.2, 0.2, 0.2]):
+        assert expected * 0.9 <= gap < expected + 0.1
+
+
+def test_retry_after_pauses_every_generation():
+    stub = StubGamma(polls_needed=(2,))
+    stub.rate_limited = ["0.3"]
+
+    async def scenario(server, client):
+        ids = [await client.create_generation("текст") for _ in range(3)]
+        return await asyncio.gather(*(client.wait_generation(gid) for gid in ids))
+
+    results = _run(stub, scenario)
+
+    assert len(results) == 3
+    limited_at = stub.status_requests[0][1]
+    after = [at for _, at in stub.status_requests[1:]]
+    # Запросы, ушедшие одновременно с получившим 429, уже в пути;
+    # после него к Gamma ничего не отправляется, пока действует Retry-After
+    burst = [at for at in after if at - limited_at < 0.05]
+    rest = [at for at in after if at - limited_at >= 0.05]
+    assert len(burst) <= 2
+    assert len(rest) >= 3 and min(rest) >= limited_at + 0.27
+
+
+def test_create_waits_for_global_pause():
+    stub = StubGamma()
+
+    async def scenario(server, client):
+        client._ensure_http()
+        client._paused_until = time.monotonic() + 0.2
+        started = time.monotonic()
+        await client.create_generation("текст")
+        return time.monotonic() - started
+
+    assert _run(stub, scenario) >= 0.18
+
+
+def test_failed_generation_raises():
+    stub = StubGamma(polls_needed=(2,), final_status="failed")
+
+    async def scenario(server, client):
+        with pytest.raises(GammaError):
+            await client.wait_generation(await client.create_generation("текст"))
+        return client._generations
+
+    assert _run(stub, scenario) == {}
+
+
+def test_polling_timeout_raises():
+    stub = StubGamma(polls_needed=(1000,))
+
+    async def scenario(server, client):
+        with pytest.raises(GammaError, match="timeout"):
+            await client.wait_generation(await client.create_generation("текст"), timeout_sec=0.15)
+
+    _run(stub, scenario)
+
+
+def test_non_json_status_is_retried():
+    stub = StubGamma(polls_needed=(1,))
+    stub.garbage = 2
+
+    async def scenario(server, client):
+        return await client.wait_generation(await client.create_generation("текст"), timeout_sec=2)
+
+    assert _run(stub, scenario)["status"] == "completed"
+    assert len(stub.polls_of("gen-1")) == 3
+
+
+def test_poller_failure_fails_waiters():
+    stub = StubGamma(polls_needed=(1000,))
+
+    async def broken(generation):
+        raise RuntimeError("poller bug")
+
+    async def scenario(server, client):
+        client._check_safely = broken
+        with pytest.raises(GammaError, match="poller stopped"):
+            await asyncio.wait_for(client.wait_generation(await client.create_generation("текст")), 2)
+        return client._generations
+
+    assert _run(stub, scenario) == {}
+
+
+def test_generation_missing_from_schedule_is_still_checked():
+    stub = StubGamma(polls_needed=(2,))
+
+    async def scenario(server, client):
+        wait = asyncio.ensure_future(client.wait_generation(await client.create_generation("текст")))
+        await asyncio.sleep(0)
+        client._schedule.clear()
+        return await asyncio.wait_for(wait, 2)
+
+    assert _run(stub, scenario)["status"] == "completed"
+
+
+def test_cancelled_waiter_leaves_schedule():
+    stub = StubGamma(polls_needed=(1000,))
+
+    async def scenario(server, client):
+        gid = await client.create_generation("текст")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.wait_generation(gid), 0.1)
+        # Проверка, начатая до отмены, могла ещё не дойти до сервера
+        await asyncio.sleep(0.03)
+        polls = len(stub.polls_of(gid))
+        await asyncio.sleep(0.15)
+        return polls, len(stub.polls_of(gid)), client._generations
+
+    before, after, pending = _run(stub, scenario)
+    assert pending == {}
+    assert after == before
+
+
+def test_generate_downloads_file_and_reports_progress(tmp_path):
+    stub = StubGamma(polls_needed=(3,))
+    progress = []
+
+    async def on_progress(status, elapsed, timeout):
+        progress.append(status)
+
+    async def scenario(server, client):
+        return await client.generate_pdf(
+            "Раздел 1\n\nРаздел 2",
+            out_dir=str(tmp_path),
+            progress_callback=on_progress,
+            company_name="ООО Ромашка",
+            company_inn="7700000000",
+        )
+
+    path = _run(stub, scenario)
+
+    assert path == str(tmp_path / "ООО_Ромашка_7700000000.pdf")
+    assert open(path, "rb").read() == b"%PDF-gen-1"
+    assert progress == ["pending", "pending", "completed"]
+    assert "---" in stub.created[0]["inputText"]
+
+
+def test_retry_after_header_formats():
+    assert _retry_after("7", 1.0) == 7.0
+    assert _retry_after(None, 1.0) == 1.0
+    assert _retry_after("garbage", 2.0) == 2.0
+    assert _retry_after("Wed, 21 Oct 2015 07:28:00 GMT", 1.0) == 0.0
+
+
+def test_queue_runs_gamma_task_through_async_client(tmp_path, monkeypatch):
+    stub = StubGamma(polls_needed=(2,))
+
+    async def main():
+        server = await stub.start()
+        client = _client(server)
+        monkeypatch.setattr(gamma_module, "_gamma_client", client)
+        manager = QueueManager(store=MemoryTaskStore(), worker_id="test")
+        progress = []
+        done = asyncio.Event()
+        await manager.start()
+        try:
+            task_id = await manager.add_task(
+                TaskType.GAMMA_PPTX,
+                {"report_text": "текст", "out_dir": str(tmp_path)},
+                callback=lambda task: done.set(),
+                progress=lambda status, elapsed, timeout: progress.append(status),
+            )
+            await asyncio.wait_for(done.wait(), 5)
+            return manager.get_task(task_id), progress
+        finally:
+            await manager.stop()
+            await client.aclose()
+            await server.stop()
+
+    task, progress = asyncio.run(main())
+
+    assert task.status == TaskStatus.COMPLETED
+    assert task.result == str(tmp_path / "report_gen-1.pptx")
+    assert progress == ["pending", "completed"]
+
+
+def test_failed_generation_in_queue_is_not_retried(tmp_path, monkeypatch):
+    stub = StubGamma(polls_needed=(1,), final_status="failed")
+
+    async def main():
+        server = await stub.start()
+        client = _client(server)
+        monkeypatch.setattr(gamma_module, "_gamma_client", client)
+        manager = QueueManager(store=MemoryTaskStore(), worker_id="test")
+        manager.retry_delay = 0
+        done = asyncio.Event()
+        finished = []
+
+        async def handler(task):
+            finished.append(task)
+            done.set()
+
+        manager.register_completion_handler(TaskType.GAMMA_PDF, handler)
+        await manager.start()
+        try:
+            await manager.add_task(
+                TaskType.GAMMA_PDF,
+                {"report_text": "текст", "out_dir": str(tmp_path), "delivery": {"chat_id": 1}},
+            )
+            await asyncio.wait_for(done.wait(), 5)
+            return finished[0]
+        finally:
+            await manager.stop()
+            await client.aclose()
+            await server.stop()
+
+    task = asyncio.run(main())
+
+    assert task.status == TaskStatus.FAILED and "Generation failed" in task.error
+    # Каждый повтор — новая платная генерация: неудавшуюся не повторяем
+    assert len(stub.created) == 1
+
+
+def test_repeat_report_is_served_from_artifact_cache(tmp_path):
+    from services.export.gamma_artifacts import GammaArtifactStore
+
+    stub = StubGamma(polls_needed=(2,))
+    store = GammaArtifactStore(str(tmp_path / "artifacts"), ttl_hours=1, max_bytes=0)
+
+    async def scenario(server, client):
+        client.artifacts = store
+        options = dict(out_dir=str(tmp_path / "reports"), company_name="Ромашка", company_inn="7700000000")
+        first = await client.generate_pdf("Раздел 1\n\nРаздел 2", **options)
+        requests = len(stub.status_requests)
+        second = await client.generate_pdf("Раздел 1\n\nРаздел 2", **options)
+        cached = await client.cached("Раздел 1\n\nРаздел 2", export_as="pdf", **options)
+        changed = await client.cached("Раздел 1\n\nРаздел 3", export_as="pdf", **options)
+        return first, second, cached, changed, requests
+
+    first, second, cached, changed, requests = _run(stub, scenario)
+
+    assert first == second == cached
+    assert open(second, "rb").read() == b"%PDF-gen-1"
+    assert changed is None
+    # Повтор не создаёт генерацию и не опрашивает Gamma
+    assert len(stub.created) == 1
+    assert len(stub.status_requests) == requests
+
+
+def test_large_report_is_generated_in_parallel_chunks(tmp_path, monkeypatch):
+    pypdf = pytest.importorskip("pypdf")
+    import io
+
+    from services.report.constants import SECTION_SEPARATOR
+
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=100, height=100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+
+    stub = StubGamma(polls_needed=(3,), pdf=buffer.getvalue())
+    monkeypatch.setattr(gamma_module, "GAMMA_CHUNK_MAX_CARDS", 10)
+    report = "\n\n".join(
+        ["ООО «Ромашка»"]
+        + [f"РАЗДЕЛ {n}\n{SECTION_SEPARATOR}\n" + "\n\n".join(f"строка {i}" for i in range(8)) for n in range(3)]
+    )
+
+    class Limiter:
+        waits = 0
+
+        async def wait(self):
+            Limiter.waits += 1
+
+    async def scenario(server, client):
+        started = time.monotonic()
+        path = await client.generate_pdf(report, out_dir=str(tmp_path), rate_limiter=Limiter())
+        return path, time.monotonic() - started
+
+    path, elapsed = _run(stub, scenario, initial_interval=0.1, max_interval=0.1)
+
+    assert len(stub.created) == 3
+    assert [body["numCards"] for body in stub.created] == [10, 8, 8]
+    assert Limiter.waits == 2
+    # Части опрашиваются параллельно: время как у одной генерации, а не у трёх
+    assert elapsed < 0.6
+    merged = pypdf.PdfReader(path)
+    assert len(merged.pages) == 3
+    assert [item.title for item in merged.outline] == ["СОДЕРЖАНИЕ", "Общие сведения", "РАЗДЕЛ 0", "РАЗДЕЛ 1", "РАЗДЕЛ 2"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [Path(path).name]
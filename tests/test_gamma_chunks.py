@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты разбиения большого отчёта на генерации Gamma и склейки PDF
+"""
+import pytest
+
+from services.export.gamma_chunks import (
+    CONTINUED, PREAMBLE_TITLE, TOC_TITLE, merge_pdfs, plan_chunks, split_sections,
+)
+from services.report.constants import SECTION_SEPARATOR
+
+
+def _section(title, paragraphs):
+    body = "\n\n".join(f"{title} строка {i}" for i in range(paragraphs))
+    return f"{title}\n{SECTION_SEPARATOR}\n{body}"
+
+
+def _report(*sizes):
+    head = "ООО «Ромашка»\nИНН 7700000000"
+    titles = ["НАЛОГИ", "ФИНАНСОВАЯ ОТЧЁТНОСТЬ", "АРБИТРАЖНЫЕ ДЕЛА", "ПРОВЕРКИ", "ГОСЗАКУПКИ"]
+    return "\n\n".join([head] + [_section(t, n) for t, n in zip(titles, sizes)])
+
+
+def test_split_sections_by_header_and_separator():
+    sections = split_sections(_report(2, 3))
+    assert [title for title, _ in sections] == [PREAMBLE_TITLE, "НАЛОГИ", "ФИНАНСОВАЯ ОТЧЁТНОСТЬ"]
+    assert sections[1][1].startswith("НАЛОГИ\n" + SECTION_SEPARATOR)
+    assert sections[2][1].endswith("ФИНАНСОВАЯ ОТЧЁТНОСТЬ строка 2")
+
+
+def test_small_report_is_one_unchanged_chunk():
+    report = _report(2, 3)
+    chunks = plan_chunks(report, max_cards=50)
+    assert len(chunks) == 1
+    assert chunks[0].text == report
+
+
+def test_large_report_is_split_at_section_boundaries():
+    report = _report(20, 25, 30, 10, 15)
+    chunks = plan_chunks(report, max_cards=40)
+
+    assert len(chunks) > 1
+    assert all(chunk.cards <= 40 for chunk in chunks)
+    assert all(chunk.text.count("\n\n") + 1 == chunk.cards for chunk in chunks)
+    # Каждая часть, кроме первой (с оглавлением), начинается с заголовка секции
+    for chunk in chunks[1:]:
+        assert chunk.text.splitlines()[1] == SECTION_SEPARATOR
+    # Без карточки оглавления части складываются обратно в исходный отчёт
+    first = chunks[0].text.split("\n\n", 1)[1]
+    assert "\n\n".join([first] + [chunk.text for chunk in chunks[1:]]) == report
+
+
+def test_first_chunk_starts_with_table_of_contents():
+    chunks = plan_chunks(_report(30, 30, 30), max_cards=40)
+    toc = chunks[0].text.split("\n\n")[0].splitlines()
+    assert toc == [TOC_TITLE, f"1. {PREAMBLE_TITLE}", "2. НАЛОГИ", "3. ФИНАНСОВАЯ ОТЧЁТНОСТЬ", "4. АРБИТРАЖНЫЕ ДЕЛА"]
+
+
+def test_oversized_section_is_continued_in_next_chunk():
+    chunks = plan_chunks(_report(90), max_cards=40)
+    assert [chunk.cards for chunk in chunks] == [40, 40, 12]
+    assert chunks[0].titles == [PREAMBLE_TITLE, "НАЛОГИ"]
+    assert chunks[1].text.startswith(f"НАЛОГИ{CONTINUED}\n{SECTION_SEPARATOR}")
+    assert chunks[1].titles == ["НАЛОГИ"]
+
+
+def test_first_chunk_is_never_only_table_of_contents():
+    # Первая секция не помещается рядом с оглавлением, но помещается в целую часть
+    chunks = plan_chunks(_section("A", 10) + "\n\n" + _section("B", 5), max_cards=10)
+
+    assert [chunk.cards for chunk in chunks] == [10, 6]
+    assert chunks[0].titles == ["A"]
+    assert chunks[1].text.startswith(f"A{CONTINUED}\n{SECTION_SEPARATOR}\n")
+
+
+def test_merge_pdfs_adds_outline_per_section(tmp_path):
+    pypdf = pytest.importorskip("pypdf")
+
+    def pdf(name, pages):
+        writer = pypdf.PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=200, height=200)
+        path = tmp_path / name
+        with open(path, "wb") as f:
+            writer.write(f)
+        return str(path)
+
+    chunks = plan_chunks(_report(30, 30, 30), max_cards=40)
+    paths = [pdf(f"part{i}.pdf", 2 + i) for i in range(len(chunks))]
+    dest = merge_pdfs(paths, chunks, str(tmp_path / "merged.pdf"))
+
+    reader = pypdf.PdfReader(dest)
+    assert len(reader.pages) == sum(2 + i for i in range(len(chunks)))
+    outline = {item.title: reader.get_destination_page_number(item) for item in reader.outline}
+    assert outline[TOC_TITLE] == 0
+    assert outline[PREAMBLE_TITLE] == 0
+    assert outline["АРБИТРАЖНЫЕ ДЕЛА"] == sum(2 + i for i in range(len(chunks) - 1))
@@ -3,7 +3,7 @@
 Тесты для новой архитектуры отчётов
 """
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, patch, AsyncMock
 import asyncio
 from services.report.builder import ReportBuilder
 from services.report.formatters import format_money, format_date, format_list, format_percent
@@ -204,13 +204,13 @@ class TestAggregator(unittest.TestCase):
         # Мокаем builder
         mock_builder = Mock()
         mock_builder_class.return_value = mock_builder
-        mock_builder.build_simple_report.return_value = "Тестовый отчёт"
+        mock_builder.build_simple_report_async = AsyncMock(return_value="Тестовый отчёт")
         
         # Тестируем
         result = asyncio.run(fetch_company_report_markdown("1234567890"))
         
         self.assertEqual(result, "Тестовый отчёт")
-        mock_builder.build_simple_report.assert_called_once()
+        mock_builder.build_simple_report_async.assert_awaited_once()
     
     @patch('services.aggregator._builder', None)
     @patch('services.aggregator.ReportBuilder')
@@ -219,13 +219,13 @@ class TestAggregator(unittest.TestCase):
         # Мокаем builder
         mock_builder = Mock()
         mock_builder_class.return_value = mock_builder
-        mock_builder.build_simple_report.return_value = "Тестовый отчёт"
+        mock_builder.build_simple_report_async = AsyncMock(return_value="Тестовый отчёт")
         
         # Тестируем
         result = asyncio.run(fetch_company_report_markdown("ООО ТЕСТ"))
         
         self.assertEqual(result, "Тестовый отчёт")
-        mock_builder.build_simple_report.assert_called_once()
+        mock_builder.build_simple_report_async.assert_awaited_once()
 
 
 if __name__ == '__main__':
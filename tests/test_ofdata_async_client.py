@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для асинхронного клиента OFData
+"""
+import asyncio
+import http.server
+import json
+import threading
+
+import httpx
+import pytest
+
+from services.export.gamma_async_client import AsyncGammaClient
+from services.http_pool import _pool_sockets
+from services.rate_limit import GCRALimiter, MemoryRateLimitBackend, RateWindow
+from services.report.ofdata_async_client import AsyncOFDataClient
+
+
+def _client(handler):
+    limiter = GCRALimiter("test", [RateWindow("minute", 100, 60.0)], MemoryRateLimitBackend())
+    return AsyncOFDataClient(
+        api_key="test_key", transport=httpx.MockTransport(handler), limiter=limiter, cache_enabled=False
+    )
+
+
+def test_get_company_adds_key_and_ident():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"meta": {"status": "ok"}, "data": {"ИНН": "1234567890"}})
+
+    async def run():
+        client = _client(handler)
+        try:
+            return await client.get_company(inn="1234567890")
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+
+    assert result["data"]["ИНН"] == "1234567890"
+    assert seen[0].url.path == "/v2/company"
+    assert seen[0].url.params["key"] == "test_key"
+    assert seen[0].url.params["inn"] == "1234567890"
+
+
+def test_pool_is_reused_between_calls():
+    def handler(request):
+        return httpx.Response(200, json={"meta": {"status": "ok"}, "data": {}})
+
+    async def run():
+        client = _client(handler)
+        await client.get_finances(inn="1234567890")
+        first = client._http
+        await client.get_contracts(law="44", role="customer", inn="1234567890")
+        second = client._http
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+
+
+class _OkHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: соединения остаются в пуле
+
+    def do_GET(self):
+        body = json.dumps({"meta": {"status": "ok"}, "data": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_pool_of_previous_event_loop_is_closed(local_server):
+    limiter = GCRALimiter("test", [RateWindow("minute", 100, 60.0)], MemoryRateLimitBackend())
+    ofdata = AsyncOFDataClient(api_key="k", base_url=local_server, limiter=limiter, cache_enabled=False, http2=False)
+    gamma = AsyncGammaClient(api_key="k", base_url=local_server)
+
+    async def request():
+        await ofdata.get_company(inn="1")
+        await gamma._ensure_http().get("/")
+        return _pool_sockets(ofdata._http) + _pool_sockets(gamma._http)
+
+    # Каждый asyncio.run — свой event loop, как у синхронного кода, вызывающего клиент
+    first = asyncio.run(request())
+    second = asyncio.run(request())
+
+    assert len(first) == 2 and all(sock.fileno() == -1 for sock in first)
+    assert all(sock.fileno() != -1 for sock in second)
+
+    async def close():
+        await ofdata.aclose()
+        await gamma.aclose()
+
+    # aclose из чужого loop тоже закрывает сокеты, а не падает на «Event loop is closed»
+    asyncio.run(close())
+    assert all(sock.fileno() == -1 for sock in second)
+
+
+def test_retries_temporary_errors(monkeypatch):
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"meta": {"status": "ok"}, "data": {"ok": True}})
+
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr("services.report.ofdata_async_client.asyncio.sleep", no_sleep)
+
+    async def run():
+        client = _client(handler)
+        try:
+            return await client.get_legal_cases(inn="1234567890", role="defendant")
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+    assert calls["n"] == 2
+    assert result["data"]["ok"] is True
+
+
+def test_api_error_raises_runtime_error():
+    def handler(request):
+        return httpx.Response(200, json={"meta": {"status": "error", "message": "Неверный ИНН"}})
+
+    async def run():
+        client = _client(handler)
+        try:
+            await client.get_person(inn="123")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(RuntimeError, match="Неверный ИНН"):
+        asyncio.run(run())
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    calls = []
+
+    async def handler(request):
+        calls.append(dict(request.url.params))
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json={"meta": {"status": "ok"}, "data": {"ИНН": request.url.params["inn"]}})
+
+    async def run():
+        client = _client(handler)
+        try:
+            results = await asyncio.gather(
+                client.get_company(inn="1234567890"),
+                client.get_company(inn="1234567890"),
+                client.get_company(inn="1234567890"),
+                client.get_company(inn="0987654321"),
+            )
+            shared = client._singleflight.shared
+            # После завершения повторный запрос снова идёт в сеть
+            await client.get_company(inn="1234567890")
+            return results, shared
+        finally:
+            await client.aclose()
+
+    results, shared = asyncio.run(run())
+
+    assert len(calls) == 3
+    assert shared == 2
+    assert results[0] is results[1] is results[2]
+    assert results[3]["data"]["ИНН"] == "0987654321"
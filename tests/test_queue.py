@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для очереди задач Gamma/OFData
+"""
+import asyncio
+import time
+
+import pytest
+
+import services.queue as queue_module
+from services.queue import (
+    DatabaseTaskStore, MemoryTaskStore, QueueManager, QueueTask, RateLimiter, TaskPriority, TaskStatus, TaskType,
+)
+from services.rate_limit import RateWindow
+
+
+class StubQueueManager(QueueManager):
+    """Очередь без реальных API: задача возвращает свой payload"""
+
+    def __init__(self, delay: float = 0.0, fail_times: int = 0, store=None, worker_id: str = "test",
+                 error: Exception = None):
+        super().__init__(store=store or MemoryTaskStore(), worker_id=worker_id)
+        self.delay = delay
+        self.fail_times = fail_times
+        self.error = error or RuntimeError("boom")
+        self.retry_delay = 0
+        self.executed = []
+
+    async def _execute(self, task):
+        self.executed.append(task.id)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise self.error
+        return task.payload
+
+
+async def _wait_status(manager, task_id, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        task = manager.get_task(task_id)
+        if task and task.status == status:
+            return task
+        await asyncio.sleep(0.001)
+    raise AssertionError(f"task {task_id} did not reach {status}")
+
+
+def test_worker_wakes_immediately_on_add():
+    async def main():
+        manager = StubQueueManager()
+        await manager.start()
+        try:
+            await asyncio.sleep(0)  # workers park on their queues
+            started = time.monotonic()
+            task_id = await manager.add_task(TaskType.OFDATA_COMPANY, {"inn": "7707083893"})
+            task = await _wait_status(manager, task_id, TaskStatus.COMPLETED)
+            return time.monotonic() - started, task
+        finally:
+            await manager.stop()
+
+    elapsed, task = asyncio.run(main())
+    assert elapsed < 0.2
+    assert task.result == {"inn": "7707083893"}
+
+
+def test_completed_tasks_leave_active_map_and_store_is_bounded(monkeypatch):
+    monkeypatch.setattr(queue_module, "QUEUE_COMPLETED_MAX", 3)
+
+    async def main():
+        manager = StubQueueManager()
+        await manager.start()
+        try:
+            ids = [await manager.add_task(TaskType.OFDATA_PERSON, {"n": i}) for i in range(5)]
+            await _wait_status(manager, ids[-1], TaskStatus.COMPLETED)
+            return manager, ids
+        finally:
+            await manager.stop()
+
+    manager, ids = asyncio.run(main())
+    assert manager.tasks == {}
+    assert list(manager.completed) == ids[-3:]
+    assert asyncio.run(manager.get_task_status(ids[0])) is None
+    assert asyncio.run(manager.get_task_status(ids[-1]))["status"] == "completed"
+
+
+def test_priority_order_within_task_type():
+    async def main():
+        manager = StubQueueManager()
+        low = await manager.add_task(TaskType.GAMMA_PDF, {}, priority=5)
+        first = await manager.add_task(TaskType.GAMMA_PDF, {}, priority=0)
+        second = await manager.add_task(TaskType.GAMMA_PDF, {}, priority=0)
+        await manager.start()
+        try:
+            await _wait_status(manager, low, TaskStatus.COMPLETED)
+        finally:
+            await manager.stop()
+        return manager.executed, [first, second, low]
+
+    executed, expected = asyncio.run(main())
+    assert executed == expected
+
+
+def test_cancelled_pending_task_is_skipped():
+    async def main():
+        manager = StubQueueManager()
+        task_id = await manager.add_task(TaskType.OFDATA_COMPANY, {})
+        other_id = await manager.add_task(TaskType.OFDATA_COMPANY, {})
+        assert await manager.cancel_task(task_id)
+        await manager.start()
+        try:
+            await _wait_status(manager, other_id, TaskStatus.COMPLETED)
+        finally:
+            await manager.stop()
+        return manager, task_id, other_id
+
+    manager, task_id, other_id = asyncio.run(main())
+    assert manager.executed == [other_id]
+    assert manager.get_task(task_id).status == TaskStatus.CANCELLED
+
+
+def test_failed_task_is_requeued_for_retry():
+    async def main():
+        manager = StubQueueManager(fail_times=1)
+        await manager.start()
+        try:
+            task_id = await manager.add_task(TaskType.OFDATA_COMPANY, {"inn": "1"})
+            return await _wait_status(manager, task_id, TaskStatus.COMPLETED)
+        finally:
+            await manager.stop()
+
+    task = asyncio.run(main())
+    assert task.retry_count == 1
+    assert task.result == {"inn": "1"}
+
+
+def test_retry_backs_off_exponentially():
+    async def main():
+        manager = StubQueueManager(fail_times=2)
+        manager.retry_delay = 0.05
+        started = []
+        original = manager._execute
+
+        async def execute(task):
+            started.append(time.monotonic())
+            return await original(task)
+
+        manager._execute = execute
+        await manager.start()
+        try:
+            task_id = await manager.add_task(TaskType.OFDATA_COMPANY, {"inn": "1"})
+            await _wait_status(manager, task_id, TaskStatus.COMPLETED)
+        finally:
+            await manager.stop()
+        return started
+
+    started = asyncio.run(main())
+    gaps = [b - a for a, b in zip(started, started[1:])]
+    assert len(gaps) == 2
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1
+
+
+def test_non_retryable_error_fails_at_once():
+    error = RuntimeError("Generation failed: bad input")
+    error.retryable = False
+
+    async def main():
+        manager = StubQueueManager(fail_times=3, error=error)
+        await manager.start()
+        try:
+            task_id = await manager.add_task(TaskType.GAMMA_PDF, {})
+            return await _wait_status(manager, task_id, TaskStatus.FAILED), manager.executed
+        finally:
+            await manager.stop()
+
+    task, executed = asyncio.run(main())
+    assert task.retry_count == 1 and len(executed) == 1
+
+
+def test_completion_handler_runs_for_tasks_without_callback():
+    async def main():
+        store = MemoryTaskStore()
+        # Задача из прошлого запуска: в store есть, колбэка в памяти нет
+        await StubQueueManager(store=store).add_task(TaskType.GAMMA_PDF, {"delivery": {"chat_id": 1}})
+        manager = StubQueueManager(store=store)
+        done = asyncio.Event()
+        seen = []
+
+        async def handler(task):
+            seen.append((task.status, task.payload["delivery"]))
+            done.set()
+
+        manager.register_completion_handler(TaskType.GAMMA_PDF, handler)
+        await manager.start()
+        try:
+            await asyncio.wait_for(done.wait(), 2)
+        finally:
+            await manager.stop()
+        return seen
+
+    assert asyncio.run(main()) == [(TaskStatus.COMPLETED, {"chat_id": 1})]
+
+
+
+
+async def _lease_order(store, tasks):
+    manager = StubQueueManager(store=store)
+    ids = {}
+    for name, user_id, priority in tasks:
+        ids[await manager.add_task(TaskType.GAMMA_PDF, {}, priority=priority, user_id=user_id)] = name
+    leased = []
+    while True:
+        batch = await store.lease(TaskType.GAMMA_PDF, "test", 1, 60)
+        if not batch:
+            return [ids[t.id] for t in leased]
+        leased.extend(batch)
+
+
+FLOOD = [
+    ("a1", 1, TaskPriority.FREE), ("a2", 1, TaskPriority.FREE), ("a3", 1, TaskPriority.FREE),
+    ("b1", 2, TaskPriority.FREE), ("prefetch", None, TaskPriority.PREFETCH),
+    ("paid", 3, TaskPriority.PAID), ("b2", 2, TaskPriority.FREE),
+]
+# Paid first, then free users interleaved, background prefetch last
+FAIR_ORDER = ["paid", "a1", "b1", "a2", "b2", "a3", "prefetch"]
+
+
+def test_memory_store_interleaves_users_within_priority():
+    assert asyncio.run(_lease_order(MemoryTaskStore(), FLOOD)) == FAIR_ORDER
+
+
+def test_queue_position_and_eta():
+    async def main():
+        manager = StubQueueManager()
+        first = await manager.add_task(TaskType.GAMMA_PDF, {}, user_id=1)
+        second = await manager.add_task(TaskType.GAMMA_PDF, {}, user_id=1)
+        third = await manager.add_task(TaskType.GAMMA_PDF, {}, user_id=1)
+        paid = await manager.add_task(TaskType.GAMMA_PDF, {}, priority=TaskPriority.PAID, user_id=2)
+        positions = [await manager.get_queue_position(i) for i in (paid, first, second, third)]
+        return positions, await manager.get_task_status(third)
+
+    positions, status = asyncio.run(main())
+    assert [p["position"] for p in positions] == [1, 2, 3, 4]
+    # Two Gamma workers, 120 s per task by default
+    assert [p["eta_seconds"] for p in positions] == [120, 120, 240, 240]
+    assert status["position"] == 4
+
+
+def _fast_limiter(limit, period):
+    limiter = RateLimiter(limit)
+    limiter.windows = [RateWindow("test", limit, period)]
+    limiter._tats = [None]
+    return limiter
+
+
+def test_rate_limiter_wakes_waiters_in_fifo_order():
+    async def main():
+        limiter = _fast_limiter(2, 0.2)  # burst of 2, then one every 0.1s
+        order = []
+
+        async def call(n):
+            await limiter.wait()
+            order.append((n, time.monotonic()))
+
+        started = time.monotonic()
+        await asyncio.gather(*(call(n) for n in range(5)))
+        return started, order
+
+    started, order = asyncio.run(main())
+    assert [n for n, _ in order] == [0, 1, 2, 3, 4]
+    assert order[1][1] - started < 0.05
+    assert 0.25 <= order[-1][1] - started < 0.45
+
+
+def test_rate_limiter_weights_and_wait_time():
+    limiter = _fast_limiter(4, 60)
+    assert asyncio.run(limiter.acquire(weight=3))
+    assert limiter.get_wait_time(weight=1) == 0
+    assert not asyncio.run(limiter.acquire(weight=2))
+    assert 14 < limiter.get_wait_time(weight=2) <= 15
+
+
+def test_task_types_of_one_api_share_a_limiter(monkeypatch):
+    monkeypatch.setattr(queue_module, "QUEUE_TASK_WEIGHTS", "ofdata_person=0.5")
+    manager = QueueManager(store=MemoryTaskStore())
+    assert manager.rate_limiters[TaskType.OFDATA_COMPANY] is manager.rate_limiters[TaskType.OFDATA_PERSON]
+    assert manager.rate_limiters[TaskType.GAMMA_PDF] is manager.rate_limiters[TaskType.GAMMA_PPTX]
+    assert manager.task_weights == {"ofdata_person": 0.5}
+
+
+
+def test_callback_runs_after_final_failure():
+    async def main():
+        manager = StubQueueManager(fail_times=3)
+        done = asyncio.Event()
+        seen = []
+
+        async def callback(task):
+            seen.append(task.status)
+            done.set()
+
+        await manager.start()
+        try:
+            await manager.add_task(TaskType.OFDATA_COMPANY, {}, callback=callback)
+            await asyncio.wait_for(done.wait(), 2)
+        finally:
+            await manager.stop()
+        return seen
+
+    assert asyncio.run(main()) == [TaskStatus.FAILED]
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    pytest.importorskip("sqlalchemy")
+    from services.database import DatabaseService
+
+    service = DatabaseService(f"sqlite+aiosqlite:///{tmp_path / 'queue.db'}")
+    yield service
+    asyncio.run(service.close())
+
+
+def test_database_store_leases_in_priority_batches(db_service):
+    async def main():
+        store = DatabaseTaskStore(db_service)
+        for i, priority in enumerate([5, 0, 1]):
+            await store.add(QueueTask(id=f"t{i}", task_type=TaskType.GAMMA_PDF, payload={"n": i},
+                                      priority=priority, created_at=1000.0 + i))
+        first = await store.lease(TaskType.GAMMA_PDF, "a", 2, 60)
+        second = await store.lease(TaskType.GAMMA_PDF, "b", 2, 60)
+        third = await store.lease(TaskType.GAMMA_PDF, "b", 2, 60)
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert [t.id for t in first] == ["t1", "t2"]
+    assert [t.id for t in second] == ["t0"]
+    assert second[0].payload == {"n": 0}
+    assert third == []
+
+
+
+def test_database_store_interleaves_users_within_priority(db_service):
+    assert asyncio.run(_lease_order(DatabaseTaskStore(db_service), FLOOD)) == FAIR_ORDER
+
+
+def test_database_store_redelivers_expired_lease(db_service):
+    async def main():
+        store = DatabaseTaskStore(db_service)
+        await store.add(QueueTask(id="t", task_type=TaskType.OFDATA_COMPANY, payload={}))
+        await store.lease(TaskType.OFDATA_COMPANY, "crashed", 1, -1)
+        return await store.lease(TaskType.OFDATA_COMPANY, "other", 1, 60)
+
+    assert [t.id for t in asyncio.run(main())] == ["t"]
+
+
+def test_pending_task_survives_restart(db_service):
+    async def main():
+        first = StubQueueManager(store=DatabaseTaskStore(db_service), worker_id="bot-1")
+        task_id = await first.add_task(TaskType.GAMMA_PDF, {"report_text": "отчёт"})
+        # Simulate a crash right after the task was leased
+        await first.store.lease(TaskType.GAMMA_PDF, "bot-1", 1, 300)
+
+        second = StubQueueManager(store=DatabaseTaskStore(db_service), worker_id="bot-1")
+        await second.start()
+        try:
+            await _wait_status(second, task_id, TaskStatus.COMPLETED)
+        finally:
+            await second.stop()
+        return await DatabaseTaskStore(db_service).get(task_id)
+
+    stored = asyncio.run(main())
+    assert stored.status == TaskStatus.COMPLETED
+    assert stored.result == {"report_text": "отчёт"}
+
+
+def test_stop_releases_unfinished_leases(db_service):
+    async def main():
+        manager = StubQueueManager(delay=10, store=DatabaseTaskStore(db_service), worker_id="bot-1")
+        await manager.start()
+        task_id = await manager.add_task(TaskType.GAMMA_PDF, {})
+        await _wait_status(manager, task_id, TaskStatus.PROCESSING)
+        await manager.stop()
+        return await DatabaseTaskStore(db_service).get(task_id)
+
+    stored = asyncio.run(main())
+    assert stored.status == TaskStatus.PENDING
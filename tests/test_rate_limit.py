@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты для общего лимитера OFData (GCRA)
+"""
+import asyncio
+import time
+
+import pytest
+
+import services.rate_limit as rate_limit
+
+from services.rate_limit import (
+    GCRALimiter,
+    MemoryRateLimitBackend,
+    RateWindow,
+    SQLiteRateLimitBackend,
+    gcra_reserve,
+)
+
+
+def test_gcra_allows_burst_up_to_limit():
+    windows = [RateWindow("minute", 3, 60.0)]
+    tats = [None]
+    now = 1000.0
+    for _ in range(3):
+        wait, tats = gcra_reserve(tats, windows, 1, now)
+        assert wait == 0
+    wait, _ = gcra_reserve(tats, windows, 1, now)
+    assert wait == 20.0  # один токен возвращается каждые 60/3 секунд
+
+
+def test_gcra_hour_window_limits_too():
+    windows = [RateWindow("minute", 10, 60.0), RateWindow("hour", 2, 3600.0)]
+    tats = [None, None]
+    for _ in range(2):
+        wait, tats = gcra_reserve(tats, windows, 1, 0.0)
+        assert wait == 0
+    wait, _ = gcra_reserve(tats, windows, 1, 0.0)
+    assert wait == 1800.0
+
+
+def test_endpoint_weights():
+    limiter = GCRALimiter(
+        "t", [RateWindow("minute", 4, 60.0)], MemoryRateLimitBackend(), weights={"contracts": 0.5, "company": 2}
+    )
+    assert limiter.weight_for("/v2/company") == 2
+    assert limiter.try_acquire("company") == 0
+    assert limiter.try_acquire("contracts") == 0
+    assert limiter.try_acquire("contracts") == 0
+    assert limiter.try_acquire("company") > 0  # осталось 1 из 4
+    assert limiter.try_acquire("search") == 0
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    windows = [RateWindow("minute", 2, 60.0)]
+    first = GCRALimiter("ofdata", windows, SQLiteRateLimitBackend(path))
+    second = GCRALimiter("ofdata", windows, SQLiteRateLimitBackend(path))
+
+    assert first.try_acquire() == 0
+    assert second.try_acquire() == 0
+    assert first.try_acquire() > 0
+    assert second.try_acquire() > 0
+
+
+def test_sqlite_backend_keeps_original_error(tmp_path, monkeypatch):
+    backend = SQLiteRateLimitBackend(str(tmp_path / "ratelimit.db"))
+
+    def fail(*args):
+        # SQLite уже откатил транзакцию сам (как после SQLITE_FULL/IOERR)
+        backend._conn.execute("ROLLBACK")
+        raise ValueError("исходная ошибка")
+
+    monkeypatch.setattr(rate_limit, "gcra_reserve", fail)
+    with pytest.raises(ValueError):
+        backend.reserve(["k"], [RateWindow("minute", 2, 60.0)], 1)
+    assert not backend._conn.in_transaction
+
+
+def test_async_acquire_waits_without_blocking():
+    limiter = GCRALimiter("t", [RateWindow("second", 2, 0.2)], MemoryRateLimitBackend())
+
+    async def run():
+        ticks = []
+
+        async def heartbeat():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+
+        started = time.monotonic()
+        beat = asyncio.create_task(heartbeat())
+        for _ in range(4):
+            await limiter.acquire()
+        elapsed = time.monotonic() - started
+        await beat
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(run())
+    assert elapsed >= 0.18
+    assert len(ticks) == 5
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты колоночных таблиц записей
+"""
+import pytest
+
+import services.report.records as records_module
+from services.report.records import NO_YEAR, RecordTable, parse_year
+from services.report.render_inspect import render_inspect
+from services.report.render_legal import render_legal
+
+CASES = [
+    {"Номер": "А1", "Дата": "2023-05-01", "СуммИск": 100, "Ист": [{"ИНН": "1"}]},
+    {"Номер": "А2", "Дата": "2018-01-10", "СуммИск": 500, "Ответ": [{"ИНН": "1"}]},
+    {"Номер": "А3", "Дата": "", "СуммИск": "много", "Ответ": [{"ИНН": "1"}]},
+    {"Номер": "А4", "Дата": "неизвестно", "СуммИск": 2.5},
+    "не словарь",
+    {"Номер": "А5", "Дата": "2023-12-31", "СуммИск": 100, "Ист": [], "Ответ": [{"ИНН": "1"}]},
+    {"Номер": "А6", "Дата": "2021-03-03", "СуммИск": 300},
+]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if not records_module.NUMPY_AVAILABLE:
+            pytest.skip("numpy не установлен")
+    else:
+        monkeypatch.setattr(records_module, "NUMPY_AVAILABLE", False)
+    return request.param
+
+
+def _table():
+    return RecordTable(CASES, date_field="Дата", amount_field="СуммИск")
+
+
+def test_parse_year():
+    assert parse_year("2023-05-01") == 2023
+    assert parse_year(2021) == 2021
+    assert parse_year("") == parse_year(None) == parse_year("дата") == NO_YEAR
+    assert parse_year("9" * 19 + "-01-01") == parse_year("0-01-01") == NO_YEAR
+
+
+def test_filter_keeps_undated_records(backend):
+    table = _table().since(2020)
+
+    assert [case["Номер"] for case in table.records] == ["А1", "А3", "А4", "А5", "А6"]
+    assert len(_table()) == 6
+
+
+def test_totals_and_flags(backend):
+    table = _table().since(2020)
+
+    assert table.total() == 502.5
+    assert table.count("Ист") == 1
+    assert table.count("Ответ") == 2
+    integer_total = RecordTable(CASES[:2], amount_field="СуммИск").total()
+    assert integer_total == 600 and isinstance(integer_total, int)
+    assert RecordTable([], amount_field="СуммИск").since(2020).total() == 0
+
+
+def test_categories(backend):
+    table = RecordTable(
+        [{"ТипРасп": "Плановая проверка"}, {"ТипРасп": "Внеплановая"}, {}, {"ТипРасп": "Плановая проверка"}],
+    )
+
+    assert table.count_category("ТипРасп", "Плановая проверка") == 2
+    assert table.count_category("ТипРасп", None) == 1
+    assert table.count_category("ТипРасп", "Документарная") == 0
+
+
+def test_out_of_range_year_counts_as_undated(backend):
+    table = RecordTable([{"Дата": "1" * 19 + "-01-01"}, {"Дата": "0-01-01"}, {"Дата": "2010-01-01"}], date_field="Дата")
+
+    assert len(table.since(2020)) == 2
+
+
+def test_renderers_use_table_statistics(backend):
+    legal = render_legal({"data": {"Записи": [case for case in CASES if isinstance(case, dict)]}})
+
+    assert "Всего дел: 5" in legal
+    assert "Общая сумма исков: 502,50 ₽" in legal
+    assert "Как истец: 1 дел" in legal and "Как ответчик: 2 дел" in legal
+
+    inspections = render_inspect({"data": {"Записи": [
+        {"Номер": "1", "ДатаНач": "2024-01-01", "ТипРасп": "Плановая проверка", "Заверш": True},
+        {"Номер": "2", "ДатаНач": "2010-01-01", "ТипРасп": "Плановая проверка", "Наруш": True},
+        "не словарь",
+        {"Номер": "3", "Наруш": True},
+    ]}})
+
+    assert "Всего проверок: 2" in inspections
+    assert "Завершено: 1" in inspections and "С нарушениями: 1" in inspections and "Плановых: 1" in inspections
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты реестра справочников отчёта
+"""
+import json
+import os
+import threading
+
+import pytest
+
+import services.report.reference_data as reference_data
+from services.report.reference_data import ReferenceData, reference_table
+from services.report.render_legal import load_legal_aliases
+from services.report.simple_company_renderer import load_aliases
+from services.report.simple_finances_renderer import load_account_codes, load_finances_aliases
+
+
+@pytest.fixture
+def codes_file(tmp_path):
+    path = tmp_path / "account_codes.json"
+    path.write_text(json.dumps([{"code": "2110", "name": "Выручка"}, {"code": "bad"}]), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def registry(codes_file, tmp_path, monkeypatch):
+    data = ReferenceData(str(codes_file), str(tmp_path / "reference.pickle"))
+    monkeypatch.setattr(reference_data, "_reference_data", data)
+    return data
+
+
+def _rewrite(path, codes):
+    stat = path.stat()
+    path.write_text(json.dumps(codes), encoding="utf-8")
+    # mtime меняется гарантированно, даже если запись попала в тот же тик часов
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_tables_are_built_once_and_frozen(registry):
+    assert load_aliases() is load_aliases()
+    assert load_legal_aliases()["data"] == "Данные арбитражных дел"
+    with pytest.raises(TypeError):
+        load_aliases()["ИНН"] = "другое"
+
+
+def test_finances_aliases_include_account_codes(registry):
+    assert dict(load_account_codes()) == {"2110": "Выручка"}
+    assert load_finances_aliases()["2110"] == "Выручка"
+    assert load_finances_aliases()["Итог"] == "Итог"
+
+
+def test_reload_on_file_change(registry, codes_file):
+    before = load_finances_aliases()
+    assert registry.reload() is False
+    assert load_finances_aliases() is before
+
+    _rewrite(codes_file, [{"code": "2400", "name": "Чистая прибыль"}])
+
+    assert registry.reload() is True
+    assert dict(load_account_codes()) == {"2400": "Чистая прибыль"}
+    assert "2110" not in load_finances_aliases() and load_finances_aliases()["2400"] == "Чистая прибыль"
+
+
+def test_periodic_check_picks_up_changes(codes_file, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(reference_data.time, "monotonic", lambda: now[0])
+    data = ReferenceData(str(codes_file), check_sec=60)
+    assert dict(data.account_codes()) == {"2110": "Выручка"}
+
+    _rewrite(codes_file, [{"code": "2400", "name": "Чистая прибыль"}])
+    now[0] += 30
+    assert dict(data.account_codes()) == {"2110": "Выручка"}
+    now[0] += 31
+    assert dict(data.account_codes()) == {"2400": "Чистая прибыль"}
+
+
+def test_binary_cache_skips_json_parsing(codes_file, tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "reference.pickle")
+    ReferenceData(str(codes_file), cache_path).account_codes()
+
+    def fail(path):
+        raise AssertionError("JSON не должен разбираться при валидном кэше")
+
+    monkeypatch.setattr(reference_data, "_parse_account_codes", fail)
+    assert dict(ReferenceData(str(codes_file), cache_path).account_codes()) == {"2110": "Выручка"}
+
+    # Кэш от изменившегося файла не используется
+    _rewrite(codes_file, [{"code": "2400", "name": "Чистая прибыль"}])
+    monkeypatch.undo()
+    assert dict(ReferenceData(str(codes_file), cache_path).account_codes()) == {"2400": "Чистая прибыль"}
+
+
+def test_missing_file_gives_empty_codes(tmp_path):
+    assert dict(ReferenceData(str(tmp_path / "missing.json")).account_codes()) == {}
+
+
+def test_concurrent_first_access_builds_table_once(registry):
+    calls = []
+    started = threading.Barrier(8)
+
+    @reference_table("test_concurrent")
+    def load_test_table():
+        calls.append(1)
+        return {"a": "b"}
+
+    results = []
+
+    def worker():
+        started.wait()
+        results.append(load_test_table())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reference_data._builders.pop("test_concurrent")
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
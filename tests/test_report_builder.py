@@ -2,6 +2,7 @@
 """
 Тесты для ReportBuilder
 """
+import asyncio
 import unittest
 from unittest.mock import Mock, patch
 from services.report.builder import ReportBuilder
@@ -95,6 +96,60 @@ class TestReportBuilder(unittest.TestCase):
         
         self.assertIn('❌ Компания не найдена', result)
 
+    def test_build_simple_report_async_fan_out(self):
+        """Секции загружаются параллельно с учётом лимита, ошибка секции не роняет отчёт"""
+        state = {'in_flight': 0, 'max_in_flight': 0, 'calls': []}
+        
+        class FakeAsyncClient:
+            async def hydrate(self, calls):
+                state['hydrated'] = [method for method, _ in calls]
+                return 0
+            
+            async def _call(self, name, payload=None, fail=False):
+                state['calls'].append(name)
+                state['in_flight'] += 1
+                state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+                await asyncio.sleep(0.01)
+                state['in_flight'] -= 1
+                if fail:
+                    raise RuntimeError("boom")
+                return payload
+            
+            async def get_company(self, **ident):
+                return {'data': {'НаимПолн': 'ООО "ТЕСТ"', 'ИНН': '1234567890',
+                                 'Руковод': [{'ИНН': '111111111111'}]}}
+            
+            async def get_finances(self, **ident):
+                return await self._call('finances', fail=True)
+            
+            async def get_legal_cases(self, **ident):
+                return await self._call('legal', {'data': {'Записи': []}})
+            
+            async def get_enforcements(self, **ident):
+                return await self._call('enforcements')
+            
+            async def get_inspections(self, **ident):
+                return await self._call('inspections')
+            
+            async def get_contracts(self, law, role, **ident):
+                return await self._call(f'contracts_{law}_{role}')
+            
+            async def get_person(self, *, inn):
+                return await self._call(f'person_{inn}')
+        
+        self.builder.async_client = FakeAsyncClient()
+        result = asyncio.run(self.builder.build_simple_report_async(
+            ident={'inn': '1234567890'},
+            include=['company', 'finances', 'legal-cases', 'enforcements', 'inspections', 'contracts'],
+            concurrency=3,
+        ))
+        
+        self.assertEqual(len(state['calls']), 9)
+        self.assertEqual(len(state['hydrated']), 9)
+        self.assertEqual(state['max_in_flight'], 3)
+        self.assertIn('ООО "ТЕСТ"', result)
+        self.assertIn("ФИНАНСОВАЯ ОТЧЁТНОСТЬ\n" + "=" * 50 + "\nДанные недоступны", result)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты промежуточного представления отчёта
+"""
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from services.export.gamma_exporter import _sectioned_text
+from services.report.builder import ReportBuilder
+from services.report.constants import SECTION_SEPARATOR
+from services.report.ir import Report, Row, Table, emit, parse_row, sections_from_text
+
+LARGE_REPORT = Path(__file__).parent / "fixtures" / "large_report.txt"
+
+
+@pytest.mark.parametrize("text", [
+    LARGE_REPORT.read_text(encoding="utf-8"),
+    "",
+    "Вступление\n\nНАЛОГИ\n" + SECTION_SEPARATOR + "\n",
+    "\nФИЗИЧЕСКИЕ ЛИЦА\n" + SECTION_SEPARATOR + "\nФИО: —\n\n\n  1. ООО: x",
+    "ПУСТО\n" + "=" * 12,
+])
+def test_text_round_trip(text):
+    report = Report(sections_from_text("company", text))
+
+    assert report.text == text
+    assert Report.from_dict(json.loads(emit(report, "json"))).text == text
+
+
+def test_rows_are_split_into_keys_and_values():
+    assert parse_row("  Код статуса: 001") == Row(key="Код статуса", value="001", indent=2)
+    assert parse_row("Статус:") == Row(key="Статус")
+    assert parse_row("• НДС: 10 ₽") == Row(text="• НДС: 10 ₽")
+    assert parse_row("1. Код: 32.50") == Row(text="1. Код: 32.50")
+    assert parse_row("https://egrul.nalog.ru") == Row(text="https://egrul.nalog.ru")
+
+
+def test_sections_keep_titles_and_groups():
+    report = Report(sections_from_text("contracts", LARGE_REPORT.read_text(encoding="utf-8")))
+
+    assert report.sections[0].heading is None
+    assert report.sections[-1].heading == "ГОСЗАКУПКИ - 223_SUPPLIER"
+    assert {section.group for section in report.sections} == {"contracts"}
+
+
+def test_gamma_emitter_matches_text_export():
+    report = Report(sections_from_text("company", LARGE_REPORT.read_text(encoding="utf-8")))
+
+    assert emit(report, "gamma") == _sectioned_text(report.text)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="Unknown report format"):
+        emit(Report(), "xlsx")
+
+
+def test_taxes_section_is_structured():
+    taxes = {
+        "СведУплГод": "2024",
+        "СумУпл": 300,
+        "СведУпл": [{"Наим": "НДС", "Сумма": 100}, {"Наим": "НДФЛ", "Сумма": 200}],
+    }
+    builder = ReportBuilder()
+
+    sections = builder._render_report_sections({"data": {}}, {"Налоги": taxes}, ["taxes"], [])
+
+    first, full_list = sections[0].blocks
+    assert first.rows[0] == Row(key="Год", value="2024")
+    assert isinstance(first.rows[-1], Table) and [row[0] for row in first.rows[-1].rows] == ["НДФЛ", "НДС"]
+    assert full_list.rows[1].columns == ["Год", "Налог", "Сумма"]
+    text = Report(sections).text
+    assert text.startswith("НАЛОГИ\n" + SECTION_SEPARATOR + "\nГод: 2024\n")
+    assert "\n\nВсе уплаченные налоги (полный список):\n• 2024: НДФЛ — " in text
+
+
+def test_rendered_sections_are_cached_by_source():
+    builder = ReportBuilder()
+    legal = {"data": {"Записи": [{"Номер": "А40-1/2024", "Дата": "2024-01-10"}]}}
+
+    with patch("services.report.builder.render_legal", return_value="АРБИТРАЖНЫЕ ДЕЛА\n" + SECTION_SEPARATOR + "\nВсего дел: 1") as render:
+        first = Report(builder._render_report_sections({"legal_cases": legal}, {}, ["legal-cases"], [])).text
+        second = Report(builder._render_report_sections({"legal_cases": dict(legal)}, {}, ["legal-cases"], [])).text
+        changed = {"data": {"Записи": []}}
+        builder._render_report_sections({"legal_cases": changed}, {}, ["legal-cases"], [])
+
+    assert first == second
+    assert render.call_count == 2
@@ -3,7 +3,7 @@
 Актуальные тесты для агрегатора текстового отчёта
 """
 import asyncio
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, patch, AsyncMock
 
 from services import aggregator
 from services.aggregator import build_markdown_report
@@ -20,13 +20,13 @@ class TestReportRenderer:
 
         with patch("services.aggregator.ReportBuilder") as mock_builder_class:
             mock_builder = Mock()
-            mock_builder.build_simple_report.return_value = "Отчёт"
+            mock_builder.build_simple_report_async = AsyncMock(return_value="Отчёт")
             mock_builder_class.return_value = mock_builder
 
             result = asyncio.run(build_markdown_report(profile))
 
             assert result == "Отчёт"
-            mock_builder.build_simple_report.assert_called_once_with(
+            mock_builder.build_simple_report_async.assert_awaited_once_with(
                 ident={"inn": "1234567890"},
                 include=[
                     "company",
@@ -44,16 +44,16 @@ class TestReportRenderer:
 
         with patch("services.aggregator.ReportBuilder") as mock_builder_class:
             mock_builder = Mock()
-            mock_builder.build_simple_report.return_value = "Первый"
+            mock_builder.build_simple_report_async = AsyncMock(return_value="Первый")
             mock_builder_class.return_value = mock_builder
 
             first = asyncio.run(build_markdown_report(profile))
-            mock_builder.build_simple_report.return_value = "Второй"
+            mock_builder.build_simple_report_async.return_value = "Второй"
             second = asyncio.run(build_markdown_report(profile))
 
             assert first == "Первый"
             assert second == "Второй"
-            assert mock_builder.build_simple_report.call_count == 2
+            assert mock_builder.build_simple_report_async.await_count == 2
             mock_builder_class.assert_called_once()
 
     def test_build_markdown_report_missing_inn(self):